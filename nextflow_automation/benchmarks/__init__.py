@@ -0,0 +1,2 @@
+from .benchmark import generate_dataset, read_trace, summarize, build_report, compare_reports, run_benchmarks, main
+from .predict_resources import input_bytes, fit_models, predict, process_inputs, write_config
@@ -0,0 +1,603 @@
+"""
+benchmark.py module
+
+End-to-end benchmark harness for the WESley workflows.
+
+Subcommands:
+  - generate: write a synthetic dataset at a configurable scale from a reference FASTA:
+              paired FASTQs per tumor/normal sample and lane (reads sampled from the target intervals,
+              with germline and somatic SNVs planted), the target intervals (.bed / .interval_list),
+              a metadata sheet and per-caller VEP-style VCFs for consensus calling
+  - run:      run the workflows locally on a generated dataset, one Nextflow run per entry workflow
+              (chaining outputs, eg: the DATA_PROCESSING BAMs feed mutation calling, CNVkit and
+              fingerprinting), each with its own trace file, and write a benchmark report
+  - report:   summarize Nextflow trace file(s) into a benchmark report
+  - compare:  diff a benchmark report against a stored baseline report and exit non-zero on regressions
+
+The report holds, per workflow run and process: task counts, total and longest task wall time,
+CPU efficiency (CPU time used / CPU time allocated), peak RSS and read/write bytes.
+
+Usage:
+    python benchmark.py generate --reference hg38_chr22.fasta --samples 4 --lanes 2 --depth 60 \\
+        --intervals 500 -o /scratch/bench/dataset
+    python benchmark.py run --dataset /scratch/bench/dataset --ref_dir /path/to/references \\
+        --params mutation_calling=mc_refs.yaml --workflows data_processing mutation_calling \\
+        -o /scratch/bench/run --baseline baselines/small.json
+    python benchmark.py report -o report.json data_processing=trace.txt
+    python benchmark.py compare --baseline baselines/small.json report.json
+
+Python version: 3.10+
+"""
+
+import argparse
+import bisect
+import glob
+import gzip
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+COMPLEMENT = str.maketrans("ACGTN", "TGCAN")
+BASES = "ACGT"
+CALLERS = {"mutect2": "mutect2.paired.vep.vcf", "MuSE": "MuSE.vep.vcf", "varscan2": "varscan2.vep.vcf"}
+
+TRACE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark.config")
+WORKFLOWS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIME_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+# metric: (direction a regression moves it in, minimum absolute change that counts)
+COMPARED_METRICS = {
+    "wall_time_s": ("up", 5.0),
+    "max_task_s": ("up", 5.0),
+    "cpu_efficiency": ("down", 5.0),
+    "peak_rss_bytes": ("up", 64 * 1024 ** 2),
+    "read_bytes": ("up", 64 * 1024 ** 2),
+    "write_bytes": ("up", 64 * 1024 ** 2),
+}
+
+
+# ─── synthetic datasets ─────────────────────────────────────────────────────
+
+def read_fasta(path: str) -> dict[str, str]:
+    """Read a (small) FASTA file into {contig: upper-case sequence}."""
+    contigs, name, chunks = {}, None, []
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith(">"):
+                if name:
+                    contigs[name] = "".join(chunks).upper()
+                name, chunks = line[1:].split()[0], []
+            elif line:
+                chunks.append(line)
+    if name:
+        contigs[name] = "".join(chunks).upper()
+    return contigs
+
+
+def pick_intervals(contigs: dict[str, str], n_intervals: int, rng: random.Random,
+                   min_length: int = 150, max_length: int = 400) -> list[tuple[str, int, int]]:
+    """Pick up to n_intervals non-overlapping, N-free target intervals (0-based, half-open), sorted."""
+    candidates = [(name, len(seq)) for name, seq in contigs.items() if len(seq) > max_length * 2]
+    if not candidates:
+        raise ValueError("reference has no contig long enough for target intervals")
+    total = sum(length for _, length in candidates)
+    taken: dict[str, list[tuple[int, int]]] = {name: [] for name, _ in candidates}
+
+    intervals = []
+    for _ in range(n_intervals * 20):
+        if len(intervals) == n_intervals:
+            break
+        pick = rng.uniform(0, total)
+        for name, length in candidates:
+            if pick < length:
+                break
+            pick -= length
+        size = rng.randint(min_length, max_length)
+        start = rng.randint(0, length - size)
+        end = start + size
+        if "N" in contigs[name][start:end] or any(start < e + 100 and end > s - 100 for s, e in taken[name]):
+            continue
+        taken[name].append((start, end))
+        intervals.append((name, start, end))
+
+    order = {name: i for i, name in enumerate(contigs)}
+    return sorted(intervals, key=lambda interval: (order[interval[0]], interval[1]))
+
+
+def plant_variants(contigs: dict[str, str], intervals: list[tuple[str, int, int]], rate: float,
+                   rng: random.Random) -> dict[tuple[str, int], str]:
+    """Random SNVs at roughly rate per target base: {(contig, 0-based position): alt base}."""
+    variants = {}
+    for contig, start, end in intervals:
+        for pos in range(start, end):
+            if rng.random() < rate:
+                ref = contigs[contig][pos]
+                variants[(contig, pos)] = rng.choice([base for base in BASES if base != ref])
+    return variants
+
+
+def simulate_reads(contigs: dict[str, str], intervals: list[tuple[str, int, int]], n_pairs: int,
+                   variants: dict[tuple[str, int], tuple[str, float]], read_length: int, rng: random.Random,
+                   error_rate: float = 0.001, fragment_mean: int = 250):
+    """Yield (read1, read2) sequences of n_pairs fragments overlapping the intervals.
+
+    variants maps (contig, position) to (alt base, allele fraction); each fragment carries each
+    variant it covers with that probability.
+    """
+    weights = [end - start for _, start, end in intervals]
+    by_contig: dict[str, list[tuple[int, str, float]]] = {}
+    for (contig, pos), (alt, fraction) in sorted(variants.items()):
+        by_contig.setdefault(contig, []).append((pos, alt, fraction))
+    positions = {contig: [pos for pos, _, _ in sites] for contig, sites in by_contig.items()}
+
+    for contig, start, end in rng.choices(intervals, weights=weights, k=n_pairs):
+        sequence = contigs[contig]
+        length = max(read_length, min(int(rng.gauss(fragment_mean, 30)), len(sequence)))
+        fragment_start = min(max(0, rng.randint(start - length + 1, end - 1)), len(sequence) - length)
+        fragment = list(sequence[fragment_start:fragment_start + length])
+
+        # variants covered by the fragment, then sequencing errors at exponentially spaced bases
+        sites = by_contig.get(contig, [])
+        first = bisect.bisect_left(positions.get(contig, []), fragment_start)
+        last = bisect.bisect_left(positions.get(contig, []), fragment_start + length)
+        for pos, alt, fraction in sites[first:last]:
+            if rng.random() < fraction:
+                fragment[pos - fragment_start] = alt
+        i = int(rng.expovariate(error_rate))
+        while i < length:
+            fragment[i] = rng.choice(BASES)
+            i += 1 + int(rng.expovariate(error_rate))
+        fragment = "".join(fragment)
+        yield fragment[:read_length], fragment[-read_length:].translate(COMPLEMENT)[::-1]
+
+
+def write_fastq_pair(prefix: str, name: str, reads, read_length: int) -> int:
+    """Write reads as gzipped {prefix}_R1_001.fastq.gz / _R2_001.fastq.gz; return the pair count."""
+    quality = "F" * read_length
+    count = 0
+    with gzip.open(f"{prefix}_R1_001.fastq.gz", "wt", compresslevel=1) as r1, \
+            gzip.open(f"{prefix}_R2_001.fastq.gz", "wt", compresslevel=1) as r2:
+        for count, (read1, read2) in enumerate(reads, 1):
+            r1.write(f"@{name}:{count} 1:N:0\n{read1}\n+\n{quality}\n")
+            r2.write(f"@{name}:{count} 2:N:0\n{read2}\n+\n{quality}\n")
+    return count
+
+
+def write_caller_vcfs(out_dir: str, sample: str, contigs: dict[str, str], somatic: dict[tuple[str, int], str],
+                      rng: random.Random, intervals: list[tuple[str, int, int]]):
+    """Per-caller VEP-style VCFs: each caller finds most planted somatic SNVs plus a few private calls."""
+    os.makedirs(out_dir, exist_ok=True)
+    header = ["##fileformat=VCFv4.2", '##FILTER=<ID=PASS,Description="All filters passed">']
+    header += [f"##contig=<ID={name},length={len(seq)}>" for name, seq in contigs.items()]
+    header += ['##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. '
+               'Format: Allele|Consequence|SYMBOL">']
+    order = {name: i for i, name in enumerate(contigs)}
+
+    for caller, suffix in CALLERS.items():
+        calls = {site: alt for site, alt in somatic.items() if rng.random() < 0.85}
+        for _ in range(max(1, len(somatic) // 10)):
+            contig, start, end = rng.choice(intervals)
+            pos = rng.randrange(start, end)
+            calls[(contig, pos)] = rng.choice([base for base in BASES if base != contigs[contig][pos]])
+        with open(os.path.join(out_dir, f"{sample}.{suffix}"), "w") as f:
+            f.write("\n".join(header + ["#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNORMAL\tTUMOR"]) + "\n")
+            for (contig, pos), alt in sorted(calls.items(), key=lambda call: (order[call[0][0]], call[0][1])):
+                f.write(f"{contig}\t{pos + 1}\t.\t{contigs[contig][pos]}\t{alt}\t.\tPASS\t"
+                        f"CSQ={alt}|missense_variant|SYN{pos % 97}\tGT:AD\t0/0:40,0\t0/1:28,12\n")
+
+
+def generate_dataset(out_dir: str, reference: str, samples: int = 2, lanes: int = 1, depth: int = 30,
+                     intervals: int = 100, read_length: int = 100, seed: int = 1) -> dict:
+    """Write a synthetic dataset (see the module docstring) to out_dir; return its description."""
+    rng = random.Random(seed)
+    contigs = read_fasta(reference)
+    targets = pick_intervals(contigs, intervals, rng)
+    target_bases = sum(end - start for _, start, end in targets)
+    pairs_per_lane = max(1, depth * target_bases // (2 * read_length * lanes))
+
+    fastq_dir = os.path.join(out_dir, "fastqs")
+    os.makedirs(fastq_dir, exist_ok=True)
+
+    with open(os.path.join(out_dir, "targets.bed"), "w") as f:
+        f.writelines(f"{contig}\t{start}\t{end}\ttarget_{i}\n" for i, (contig, start, end) in enumerate(targets, 1))
+    with open(os.path.join(out_dir, "intervals.interval_list"), "w") as f:
+        f.write("@HD\tVN:1.6\tSO:coordinate\n")
+        f.writelines(f"@SQ\tSN:{name}\tLN:{len(seq)}\n" for name, seq in contigs.items())
+        f.writelines(f"{contig}\t{start + 1}\t{end}\t+\ttarget_{i}\n" for i, (contig, start, end) in enumerate(targets, 1))
+
+    sample_ids, fastqs, barcode = [], 0, 0
+    for patient in range(1, samples + 1):
+        germline = plant_variants(contigs, targets, 0.002, rng)
+        germline_af = {site: (alt, rng.choice([0.5, 0.5, 1.0])) for site, alt in germline.items()}
+        somatic = {site: alt for site, alt in plant_variants(contigs, targets, 0.0005, rng).items() if site not in germline}
+        tumor, normal = f"BX{patient}", f"BX{patient}_NORMAL"
+
+        for sample_id, variants in ((tumor, {**germline_af, **{s: (a, 0.3) for s, a in somatic.items()}}),
+                                    (normal, germline_af)):
+            barcode += 1
+            for lane in range(1, lanes + 1):
+                reads = simulate_reads(contigs, targets, pairs_per_lane, variants, read_length, rng)
+                prefix = os.path.join(fastq_dir, f"{sample_id}_S{barcode}_L{lane:03d}")
+                write_fastq_pair(prefix, f"{sample_id}:L{lane:03d}", reads, read_length)
+                fastqs += 2
+            sample_ids.append(sample_id)
+
+        write_caller_vcfs(os.path.join(out_dir, "caller_vcfs", tumor), tumor, contigs, somatic, rng, targets)
+
+    with open(os.path.join(out_dir, "metadata.csv"), "w") as f:
+        f.write("WES ID,Short ID\n")
+        f.writelines(f"{sample_id},{sample_id}\n" for sample_id in sample_ids)
+
+    description = {
+        "reference": os.path.abspath(reference), "samples": samples, "lanes": lanes, "depth": depth,
+        "intervals": len(targets), "target_bases": target_bases, "read_length": read_length, "seed": seed,
+        "read_pairs_per_lane": pairs_per_lane, "fastqs": fastqs, "sample_ids": sample_ids,
+    }
+    with open(os.path.join(out_dir, "dataset.json"), "w") as f:
+        json.dump(description, f, indent=2)
+    return description
+
+
+# ─── trace reports ──────────────────────────────────────────────────────────
+
+def parse_duration(value: str) -> float | None:
+    """Seconds from a trace duration: raw milliseconds ('12345') or formatted ('1h 2m 3s', '850ms')."""
+    value = value.strip()
+    if value in ("", "-"):
+        return None
+    if re.fullmatch(r"\d+(\.\d+)?", value):
+        return float(value) / 1000
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*(ms|s|m|h|d)", value)
+    if not parts:
+        raise ValueError(f"unrecognized duration: {value!r}")
+    return sum(float(number) * TIME_UNITS[unit] for number, unit in parts)
+
+
+def parse_size(value: str) -> float | None:
+    """Bytes from a trace memory/IO value: raw bytes ('1048576') or formatted ('1 MB', '2.5 GB')."""
+    value = value.strip()
+    if value in ("", "-"):
+        return None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?B)?", value)
+    if not match:
+        raise ValueError(f"unrecognized size: {value!r}")
+    return float(match.group(1)) * SIZE_UNITS[match.group(2) or "B"]
+
+
+def parse_percent(value: str) -> float | None:
+    value = value.strip().rstrip("%")
+    return None if value in ("", "-") else float(value)
+
+
+def read_trace(path: str) -> list[dict]:
+    """Read a Nextflow trace file into task dicts with numeric realtime/cpu/memory/IO fields (and workdir, if traced)."""
+    with open(path) as f:
+        columns = f.readline().rstrip("\n").split("\t")
+        rows = [dict(zip(columns, line.rstrip("\n").split("\t"))) for line in f if line.strip()]
+
+    tasks = []
+    for row in rows:
+        process = row.get("process") or re.sub(r"\s*\(.*\)$", "", row.get("name", ""))
+        tasks.append({
+            "process": process.split(":")[-1],
+            "tag": row.get("tag", "-"),
+            "status": row.get("status", ""),
+            "exit": row.get("exit", "-"),
+            "workdir": row.get("workdir"),
+            "realtime": parse_duration(row.get("realtime", "-")),
+            "cpu_percent": parse_percent(row.get("%cpu", "-")),
+            "cpus": int(row["cpus"]) if row.get("cpus", "-").isdigit() else 1,
+            "peak_rss": parse_size(row.get("peak_rss", "-")),
+            "read_bytes": parse_size(row.get("rchar", "-")),
+            "write_bytes": parse_size(row.get("wchar", "-")),
+        })
+    return tasks
+
+
+def summarize(tasks: list[dict]) -> dict[str, dict]:
+    """Per-process metrics of the completed tasks (cached tasks were not measured and are skipped)."""
+    summary = {}
+    for task in tasks:
+        process = summary.setdefault(task["process"], {
+            "tasks": 0, "failed": 0, "wall_time_s": 0.0, "max_task_s": 0.0, "cpu_time_s": 0.0,
+            "allocated_cpu_s": 0.0, "peak_rss_bytes": 0.0, "read_bytes": 0.0, "write_bytes": 0.0,
+        })
+        if task["status"] in ("FAILED", "ABORTED"):
+            process["failed"] += 1
+        if task["status"] != "COMPLETED" or task["realtime"] is None:
+            continue
+        process["tasks"] += 1
+        process["wall_time_s"] += task["realtime"]
+        process["max_task_s"] = max(process["max_task_s"], task["realtime"])
+        process["cpu_time_s"] += (task["cpu_percent"] or 0) / 100 * task["realtime"]
+        process["allocated_cpu_s"] += task["cpus"] * task["realtime"]
+        process["peak_rss_bytes"] = max(process["peak_rss_bytes"], task["peak_rss"] or 0)
+        process["read_bytes"] += task["read_bytes"] or 0
+        process["write_bytes"] += task["write_bytes"] or 0
+
+    for process in summary.values():
+        allocated = process.pop("allocated_cpu_s")
+        cpu_time = process.pop("cpu_time_s")
+        process["cpu_efficiency"] = round(100 * cpu_time / allocated, 1) if allocated else None
+        for metric in ("wall_time_s", "max_task_s"):
+            process[metric] = round(process[metric], 3)
+    return dict(sorted(summary.items()))
+
+
+def build_report(traces: dict[str, str], elapsed: dict[str, float] | None = None, dataset: dict | None = None) -> dict:
+    """Benchmark report of named trace files ({run name: trace path})."""
+    report = {"dataset": dataset or {}, "workflows": {}}
+    for name, trace in traces.items():
+        report["workflows"][name] = {"processes": summarize(read_trace(trace))}
+        if elapsed and name in elapsed:
+            report["workflows"][name]["elapsed_s"] = round(elapsed[name], 1)
+    return report
+
+
+def compare_reports(current: dict, baseline: dict, tolerance: float = 0.25) -> tuple[list[dict], list[str]]:
+    """Return (regressions, notes) of current against baseline.
+
+    A metric regresses when it moves the wrong way by more than tolerance (relative) and by more
+    than the metric's minimum absolute change, so noise on short tasks is not reported.
+    """
+    regressions, notes = [], []
+    for workflow, baseline_run in baseline.get("workflows", {}).items():
+        current_run = current.get("workflows", {}).get(workflow)
+        if current_run is None:
+            notes.append(f"{workflow}: not in the current report")
+            continue
+
+        metrics = [("(workflow)", "elapsed_s", baseline_run.get("elapsed_s"), current_run.get("elapsed_s"))]
+        for process, baseline_metrics in baseline_run["processes"].items():
+            current_metrics = current_run["processes"].get(process)
+            if current_metrics is None:
+                notes.append(f"{workflow}: process {process} did not run")
+                continue
+            if current_metrics["failed"] > baseline_metrics["failed"]:
+                regressions.append({"workflow": workflow, "process": process, "metric": "failed",
+                                    "baseline": baseline_metrics["failed"], "current": current_metrics["failed"]})
+            metrics += [(process, metric, baseline_metrics.get(metric), current_metrics.get(metric))
+                        for metric in COMPARED_METRICS]
+        notes += [f"{workflow}: new process {process}"
+                  for process in current_run["processes"] if process not in baseline_run["processes"]]
+
+        for process, metric, before, after in metrics:
+            if before is None or after is None:
+                continue
+            direction, min_change = COMPARED_METRICS.get(metric, ("up", 5.0))
+            change = after - before if direction == "up" else before - after
+            if change > min_change and change > tolerance * abs(before):
+                regressions.append({"workflow": workflow, "process": process, "metric": metric,
+                                    "baseline": before, "current": after})
+    return regressions, notes
+
+
+# ─── running the workflows ──────────────────────────────────────────────────
+
+@dataclass
+class Run:
+    """One Nextflow run of a benchmarked workflow."""
+    name: str
+    workflow: str
+    script: str
+    entry: str | None
+    params: dict[str, str] = field(default_factory=dict)
+
+
+def bam_index(bam: str) -> str | None:
+    return next((index for index in (f"{bam}.bai", bam[:-4] + ".bai") if os.path.exists(index)), None)
+
+
+def write_manifest(bam_dir: str, path: str) -> int:
+    """Mutation calling manifest pairing each tumor BQSR BAM with its _NORMAL BAM; return the sample count."""
+    bams = {os.path.basename(bam).split(".BQSR")[0]: bam for bam in glob.glob(os.path.join(bam_dir, "*.BQSR.bam"))}
+    samples = []
+    for sample_id, bam in sorted(bams.items()):
+        if sample_id.endswith("_NORMAL"):
+            continue
+        normal = bams.get(f"{sample_id}_NORMAL")
+        samples.append({
+            "sample_id": sample_id, "tumor_id": sample_id, "tumor_bam": bam, "tumor_bai": bam_index(bam),
+            "tumor_sbi": None, "normal_id": f"{sample_id}_NORMAL" if normal else None, "normal_bam": normal,
+            "normal_bai": bam_index(normal) if normal else None,
+        })
+    with open(path, "w") as f:
+        json.dump({"samples": samples}, f, indent=2)
+    return len(samples)
+
+
+def plan_runs(workflows: list[str], dataset: str, results: str, ref_dir: str) -> list[Run]:
+    """The Nextflow runs of the selected workflows, in dependency order."""
+    bam_dir = os.path.join(results, "data_processing", "preprocessing", "analysis_ready_bams")
+    plan = {
+        "data_processing": [Run("data_processing", "data_processing", "data_processing.nf", "DATA_PROCESSING", {
+            "fastq_dir": os.path.join(dataset, "fastqs"), "output_dir": os.path.join(results, "data_processing"),
+            "metadata": os.path.join(dataset, "metadata.csv"), "platform": "ILLUMINA", "seq_center": "benchmark",
+        })],
+        "mutation_calling": [Run("mutation_calling", "mutation_calling", "mutation_calling.nf", None, {
+            "samples": os.path.join(results, "manifest.json"), "output_dir": os.path.join(results, "mutation_calling"),
+            "interval_list": os.path.join(dataset, "intervals.interval_list"),
+        })],
+        "consensus_calling": [Run("consensus_calling", "consensus_calling", "consensus_calling.nf", None, {
+            "base_dir": os.path.join(results, "consensus_calling"),
+        })],
+        "cnvkit": [
+            Run("cnvkit:CREATE_NORM", "cnvkit", "cnvkit.nf", "CREATE_NORM", {
+                "bam_dir": bam_dir, "output_dir": os.path.join(results, "cnvkit"), "capture_kit": "benchmark",
+                "seq_platform": "synthetic", "targets": os.path.join(dataset, "targets.bed"),
+            }),
+            Run("cnvkit:CNV_CALLING", "cnvkit", "cnvkit.nf", "CNV_CALLING", {
+                "bam_dir": bam_dir, "output_dir": os.path.join(results, "cnvkit"),
+                "pooled_normal": "benchmark_synthetic_pooled_normal.cnn", "batch_name": "benchmark",
+            }),
+        ],
+        "fingerprint": [
+            Run("fingerprint:EXTRACT", "fingerprint", "fingerprint.nf", "EXTRACT", {
+                "bam_dir": bam_dir, "output_dir": os.path.join(results, "fingerprint"),
+            }),
+            Run("fingerprint:CROSSCHECK", "fingerprint", "fingerprint.nf", "CROSSCHECK", {
+                "vcf_dir": os.path.join(results, "fingerprint", "fingerprint", "vcfs"),
+                "output_dir": os.path.join(results, "fingerprint"),
+            }),
+        ],
+    }
+    runs = []
+    for workflow in plan:
+        if workflow in workflows:
+            for run in plan[workflow]:
+                run.params["ref_dir"] = ref_dir
+                runs.append(run)
+    return runs
+
+
+def nextflow_command(run: Run, trace: str, params_file: str | None, nextflow: str = "nextflow") -> list[str]:
+    workflow_dir = os.path.join(WORKFLOWS_DIR, run.workflow)
+    command = [nextflow, "-C", os.path.join(workflow_dir, "nextflow.config"), "-C", TRACE_CONFIG,
+               "run", os.path.join(workflow_dir, run.script)]
+    if run.entry:
+        command += ["-entry", run.entry]
+    command += ["-with-trace", trace]
+    if params_file:
+        command += ["-params-file", params_file]
+    for name, value in run.params.items():
+        command += [f"--{name}", str(value)]
+    return command
+
+
+def prepare(run: Run, dataset: str, results: str):
+    """Stage the inputs a run takes from the dataset or from earlier runs."""
+    bam_dir = os.path.join(results, "data_processing", "preprocessing", "analysis_ready_bams")
+    if run.workflow in ("mutation_calling", "cnvkit", "fingerprint") and run.name != "fingerprint:CROSSCHECK":
+        if not glob.glob(os.path.join(bam_dir, "*.BQSR.bam")):
+            raise FileNotFoundError(f"{run.name} needs the DATA_PROCESSING BAMs in {bam_dir}; run data_processing first")
+    if run.workflow == "mutation_calling":
+        write_manifest(bam_dir, run.params["samples"])
+    elif run.workflow == "consensus_calling":
+        shutil.copytree(os.path.join(dataset, "caller_vcfs"), run.params["base_dir"], dirs_exist_ok=True)
+
+
+def run_benchmarks(dataset: str, ref_dir: str, out_dir: str, workflows: list[str],
+                   params_files: dict[str, str] | None = None, nextflow: str = "nextflow") -> dict:
+    """Run the selected workflows on a generated dataset; return the benchmark report."""
+    dataset, ref_dir, out_dir = (os.path.abspath(path) for path in (dataset, ref_dir, out_dir))
+    results = os.path.join(out_dir, "results")
+    os.makedirs(results, exist_ok=True)
+    with open(os.path.join(dataset, "dataset.json")) as f:
+        description = json.load(f)
+
+    traces, elapsed = {}, {}
+    for run in plan_runs(workflows, dataset, results, ref_dir):
+        prepare(run, dataset, results)
+        run_dir = os.path.join(out_dir, run.name.replace(":", "_"))
+        os.makedirs(run_dir, exist_ok=True)
+        trace = os.path.join(run_dir, "trace.txt")
+        command = nextflow_command(run, trace, (params_files or {}).get(run.workflow), nextflow)
+
+        print(f"[{run.name}] {' '.join(command)}", file=sys.stderr)
+        started = time.monotonic()
+        subprocess.run(command, cwd=run_dir, check=True)
+        elapsed[run.name] = time.monotonic() - started
+        traces[run.name] = trace
+
+    report = build_report(traces, elapsed, description)
+    with open(os.path.join(out_dir, "benchmark_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def format_regressions(regressions: list[dict], notes: list[str]) -> str:
+    lines = [f"{len(regressions)} regression(s)"]
+    lines += [f"  {r['workflow']} {r['process']} {r['metric']}: {r['baseline']} -> {r['current']}" for r in regressions]
+    lines += [f"  note: {note}" for note in notes]
+    return "\n".join(lines)
+
+
+def named_paths(values: list[str], option: str) -> dict[str, str]:
+    pairs = {}
+    for value in values or []:
+        if "=" not in value:
+            raise SystemExit(f"{option} expects NAME=PATH, got {value!r}")
+        name, path = value.split("=", 1)
+        pairs[name] = path
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark harness for WESley")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Write a synthetic dataset")
+    generate.add_argument("--reference", type=str, required=True, help="Reference FASTA to sample reads from")
+    generate.add_argument("--samples", type=int, default=2, help="Number of tumor/normal pairs (default: 2)")
+    generate.add_argument("--lanes", type=int, default=1, help="Lanes per sample (default: 1)")
+    generate.add_argument("--depth", type=int, default=30, help="Mean read depth over the targets (default: 30)")
+    generate.add_argument("--intervals", type=int, default=100, help="Number of target intervals (default: 100)")
+    generate.add_argument("--read_length", type=int, default=100, help="Read length (default: 100)")
+    generate.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    generate.add_argument("-o", "--output_dir", type=str, required=True, help="Dataset directory")
+
+    run = subparsers.add_parser("run", help="Run the workflows on a dataset and report their traces")
+    run.add_argument("--dataset", type=str, required=True, help="Dataset directory from 'generate'")
+    run.add_argument("--ref_dir", type=str, required=True, help="Reference directory for the workflows")
+    run.add_argument("--workflows", nargs="+", default=["data_processing", "mutation_calling", "consensus_calling",
+                                                        "cnvkit", "fingerprint"], help="Workflows to run (default: all)")
+    run.add_argument("--params", nargs="*", help="Per-workflow Nextflow params files, as WORKFLOW=FILE")
+    run.add_argument("--nextflow", type=str, default="nextflow", help="Nextflow executable (default: nextflow)")
+    run.add_argument("-o", "--output_dir", type=str, required=True, help="Directory for results, traces and the report")
+
+    report = subparsers.add_parser("report", help="Summarize trace files into a benchmark report")
+    report.add_argument("traces", nargs="+", help="Trace files as NAME=TRACE")
+    report.add_argument("-o", "--output", type=str, required=True, help="Benchmark report (JSON)")
+
+    compare = subparsers.add_parser("compare", help="Diff a benchmark report against a baseline")
+    compare.add_argument("report", help="Benchmark report (JSON)")
+
+    for subparser in (run, compare):
+        subparser.add_argument("--baseline", type=str, required=subparser is compare, help="Baseline benchmark report")
+        subparser.add_argument("--tolerance", type=float, default=0.25,
+                               help="Relative change allowed before a metric counts as a regression (default: 0.25)")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        description = generate_dataset(args.output_dir, args.reference, args.samples, args.lanes, args.depth,
+                                       args.intervals, args.read_length, args.seed)
+        print(f"Wrote {description['fastqs']} FASTQs ({description['read_pairs_per_lane']} read pairs per lane) over "
+              f"{description['intervals']} intervals to {args.output_dir}", file=sys.stderr)
+        return
+
+    if args.command == "report":
+        current = build_report(named_paths(args.traces, "traces"))
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+        return
+
+    if args.command == "run":
+        current = run_benchmarks(args.dataset, args.ref_dir, args.output_dir, args.workflows,
+                                 named_paths(args.params, "--params"), args.nextflow)
+        if not args.baseline:
+            return
+    else:
+        with open(args.report) as f:
+            current = json.load(f)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions, notes = compare_reports(current, baseline, args.tolerance)
+    print(format_regressions(regressions, notes))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+benchmark_make_mc_manifest.py module
+
+This python script benchmarks 'build_manifest_local' from 'make_mc_manifest.py' against the
+previous per-BAM glob implementation on a synthetic BAM directory.
+
+Usage:
+    python -m nextflow_automation.benchmarks.benchmark_make_mc_manifest --samples 10000 --normals 2000
+
+Python version: 3.10+
+Polars version: 1.34.0
+"""
+import argparse
+import glob
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from nextflow_automation.mutation_calling.make_mc_manifest import (
+    build_manifest_local, find_normal_info, lookup_shortid
+)
+
+
+def legacy_build_manifest_local(bam_dir: str, metadata_sheet: str) -> list[dict]:
+    """Previous build_manifest_local: per-BAM globs and per-sample Polars filters (baseline)."""
+    metadata_df = pl.read_excel(metadata_sheet)
+    metadata_subset = metadata_df.select(["WES ID", "Short ID", "Sample Type", "Line", "DOES PT HAVE NRM?"])
+    normals_df = metadata_subset.filter(pl.col("Sample Type") == "NRM")
+
+    samples = []
+    for file in glob.glob(f"{bam_dir}/*.bam"):
+        bam_file = os.path.basename(file)
+        path = os.path.dirname(file)
+
+        bai_files = glob.glob(f"{bam_dir}/{bam_file}*bai")
+        sbi_files = glob.glob(f"{bam_dir}/{bam_file}*sbi")
+
+        tcgb_match = re.search(r"^\d+\w*-\d+", bam_file)
+        short_match = re.search(r"\w+\d+", bam_file)
+        original_id = (tcgb_match.group(0) if tcgb_match
+                       else short_match.group(0) if short_match
+                       else None)
+        if not original_id:
+            continue
+
+        short_id = lookup_shortid(original_id, metadata_subset) if tcgb_match else original_id
+        normal_info = find_normal_info(short_id, metadata_subset, normals_df, bam_dir)
+
+        samples.append({
+            "sample_id": original_id,
+            "tumor_id": short_id,
+            "tumor_bam": f"{path}/{bam_file}",
+            "tumor_bai": bai_files[0] if bai_files else None,
+            "tumor_sbi": sbi_files[0] if sbi_files else None,
+            "normal_id":  None if normal_info["Normal_ID"]  == "NO_FILE" else normal_info["Normal_ID"],
+            "normal_bam": None if normal_info["Normal_BAM"] == "NO_FILE" else normal_info["Normal_BAM"],
+            "normal_bai": None if normal_info["Normal_BAI"] == "NO_FILE" else normal_info["Normal_BAI"],
+        })
+
+    return samples
+
+
+def make_synthetic_batch(root: str, n_samples: int, n_normals: int) -> tuple[str, str]:
+    """Create a BAM directory (empty files) and metadata sheet with n_samples tumors.
+
+    Tumors cycle through n_normals cell lines; most have one normal, every tenth line has
+    two, and a fifth of the tumors are named by TCGB ID instead of short ID.
+    """
+    bam_dir = os.path.join(root, "bams")
+    normals_dir = os.path.join(bam_dir, "normals")
+    os.makedirs(normals_dir)
+
+    rows = []
+    for line in range(n_normals):
+        for copy in range(2 if line % 10 == 0 else 1):
+            short_id = f"PT{line}.BLD{copy}"
+            rows.append((f"22-{line:05d}{copy}", short_id, "NRM", str(line), "Y"))
+            Path(normals_dir, f"{short_id}.{line}.bam").touch()
+            Path(normals_dir, f"{short_id}.{line}.bam.bai").touch()
+
+    for i in range(n_samples):
+        wes_id, short_id = f"23-{i:05d}", f"GBX{i}"
+        rows.append((wes_id, short_id, "GBX", str(i % n_normals), "Y" if i % 7 else "N"))
+        bam_name = f"{wes_id}.BQSR.bam" if i % 5 == 0 else f"{short_id}.BQSR.bam"
+        Path(bam_dir, bam_name).touch()
+        Path(bam_dir, f"{bam_name}.bai").touch()
+        if i % 2:
+            Path(bam_dir, f"{bam_name}.sbi").touch()
+
+    metadata_file = os.path.join(root, "metadata.xlsx")
+    pl.DataFrame(rows, schema=["WES ID", "Short ID", "Sample Type", "Line", "DOES PT HAVE NRM?"],
+                 orient="row").write_excel(metadata_file)
+    return bam_dir, metadata_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local manifest builder")
+    parser.add_argument("--samples", type=int, default=10000, help="Number of tumor BAMs (default: 10000)")
+    parser.add_argument("--normals", type=int, default=2000, help="Number of cell lines with normals (default: 2000)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the current implementation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        bam_dir, metadata_file = make_synthetic_batch(root, args.samples, args.normals)
+        n_entries = len(os.listdir(bam_dir)) + len(os.listdir(os.path.join(bam_dir, "normals")))
+        print(f"Synthetic batch: {args.samples} tumor BAMs, {n_entries} directory entries")
+
+        start = time.perf_counter()
+        samples = build_manifest_local(bam_dir, metadata_file)
+        indexed = time.perf_counter() - start
+        print(f"build_manifest_local:        {indexed:8.2f} s ({len(samples)} samples)")
+
+        if not args.skip_legacy:
+            start = time.perf_counter()
+            legacy = legacy_build_manifest_local(bam_dir, metadata_file)
+            baseline = time.perf_counter() - start
+            print(f"legacy (per-BAM glob):       {baseline:8.2f} s ({len(legacy)} samples)")
+            print(f"speedup:                     {baseline / indexed:8.1f}x, identical output: {samples == legacy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+predict_resources.py module
+
+Trace-driven resource predictor for the WESley workflows.
+
+The nextflow.config labels size every task of a process the same way (eg: 'highMem' = 40 GB) and double
+memory/time on each retry, so small tasks hog a node and large ones fail until an attempt is big enough.
+This tool learns, per process, how CPU, peak memory and run time scale with the task's input size from
+historical Nextflow trace files, and turns those models into resource directives.
+
+The input size of a task is the total size of the files staged into its work directory (BAMs, FASTQs,
+interval lists, ...), so traces need the 'workdir' field (benchmark.config traces it) and the work
+directories must still exist when fitting. Tasks whose work directory is gone still count towards the
+process's CPU usage and size-independent limits.
+
+Per process:
+  - memory (MB) and time (minutes) are fit as intercept + slope * input MB (least squares), then scaled
+    so every observed task fits with --margin to spare
+  - cpus is the 95th percentile of the CPUs actually used (%cpu / 100), rounded up
+
+Subcommands:
+  - fit:      learn the models from trace files and write them to a model JSON
+  - config:   write a Nextflow config with a withName block per modeled process of a workflow; the
+              directives are closures over the process's path inputs, so each task is sized from its
+              own inputs (and still escalates with task.attempt should it fail)
+  - predict:  print the directives for one task, given its process and input files
+
+Usage:
+    python predict_resources.py fit -o resources.json run1/trace.txt run2/trace.txt
+    python predict_resources.py config --model resources.json --workflow_dir ../data_processing \\
+        --max_cpus 30 --max_memory 120 -o data_processing.resources.config
+    nextflow -C ../data_processing/nextflow.config -c data_processing.resources.config run ...
+    python predict_resources.py predict --model resources.json --process BWA_ALIGN R1.fq.gz R2.fq.gz
+
+Python version: 3.10+
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import sys
+
+try:
+    from .benchmark import read_trace
+except ImportError:
+    from benchmark import read_trace
+
+MB = 1024 ** 2
+
+# floors for predicted directives: JVM tools need some heap, and very short limits kill tasks on slow disks
+MIN_MEMORY_MB = 512
+MIN_TIME_MIN = 10
+MIN_TASKS = 3
+
+
+# ─── input sizes ────────────────────────────────────────────────────────────
+
+def path_size(path: str) -> int:
+    """Size of a file, or of all files below a directory."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def input_bytes(workdir: str | None) -> int | None:
+    """Total size of the inputs Nextflow staged (symlinked) into a task work directory; None if it is gone."""
+    if not workdir or not os.path.isdir(workdir):
+        return None
+    total = 0
+    for root, dirs, names in os.walk(workdir):
+        for name in dirs + names:
+            path = os.path.join(root, name)
+            if os.path.islink(path) and os.path.exists(path):
+                total += path_size(path)
+    return total
+
+
+# ─── fitting ────────────────────────────────────────────────────────────────
+
+def quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)] if ordered else 0.0
+
+
+def fit_linear(points: list[tuple[float, float]], margin: float) -> dict:
+    """intercept + slope * x covering every (x, y) with margin to spare.
+
+    Least squares on the sized points; a negative intercept is refit through the origin and a negative
+    slope (or too few distinct sizes) falls back to a constant. The line is then scaled up until it
+    covers the largest y / prediction ratio.
+    """
+    xs, ys = [x for x, _ in points], [y for _, y in points]
+    intercept, slope = max(ys), 0.0
+    if len(set(xs)) >= MIN_TASKS:
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        slope = (sum((x - mean_x) * (y - mean_y) for x, y in points)
+                 / sum((x - mean_x) ** 2 for x in xs))
+        intercept = mean_y - slope * mean_x
+        if intercept < 0:
+            intercept, slope = 0.0, sum(x * y for x, y in points) / sum(x * x for x in xs)
+        if slope <= 0:
+            intercept, slope = max(ys), 0.0
+
+    scale = max((y / (intercept + slope * x) for x, y in points if intercept + slope * x > 0), default=1.0)
+    scale = max(scale, 1.0) * (1 + margin)
+    # rounded up, so the stored line still covers every point
+    return {"intercept": math.ceil(intercept * scale * 1e3) / 1e3, "slope": math.ceil(slope * scale * 1e6) / 1e6}
+
+
+def fit_models(traces: list[str], margin: float = 0.2, min_tasks: int = MIN_TASKS) -> dict:
+    """Per-process resource models from trace files; processes with fewer than min_tasks completed tasks are left out."""
+    observations = {}
+    for trace in traces:
+        for task in read_trace(trace):
+            if task["status"] != "COMPLETED" or task["realtime"] is None or task["peak_rss"] is None:
+                continue
+            size = input_bytes(task["workdir"])
+            observations.setdefault(task["process"], []).append({
+                "input_mb": None if size is None else size / MB,
+                "memory_mb": task["peak_rss"] / MB,
+                "time_min": task["realtime"] / 60,
+                "cpus_used": (task["cpu_percent"] or 0) / 100,
+                "cpus": task["cpus"],
+            })
+
+    processes = {}
+    for process, tasks in sorted(observations.items()):
+        if len(tasks) < min_tasks:
+            continue
+        sized = [task for task in tasks if task["input_mb"] is not None]
+        model = {"tasks": len(tasks), "sized_tasks": len(sized), "max_input_mb": None,
+                 "cpus": min(max(math.ceil(quantile([task["cpus_used"] for task in tasks], 0.95)), 1),
+                             max(task["cpus"] for task in tasks))}
+        for resource in ("memory_mb", "time_min"):
+            if len(sized) >= min_tasks:
+                model[resource] = fit_linear([(task["input_mb"], task[resource]) for task in sized], margin)
+            else:
+                model[resource] = fit_linear([(0.0, task[resource]) for task in tasks], margin)
+        if sized:
+            model["max_input_mb"] = round(max(task["input_mb"] for task in sized), 1)
+        processes[process] = model
+    return {"margin": margin, "traces": [os.path.abspath(trace) for trace in traces], "processes": processes}
+
+
+# ─── directives ─────────────────────────────────────────────────────────────
+
+def predict(model: dict, input_mb: float, limits: dict | None = None) -> dict:
+    """First-attempt cpus, memory (MB) and time (minutes) of a task with input_mb of inputs."""
+    limits = limits or {}
+    memory = model["memory_mb"]["intercept"] + model["memory_mb"]["slope"] * input_mb
+    time = model["time_min"]["intercept"] + model["time_min"]["slope"] * input_mb
+    return {
+        "cpus": min(model["cpus"], limits.get("cpus") or model["cpus"]),
+        "memory_mb": math.floor(min(max(math.ceil(memory), MIN_MEMORY_MB), limits.get("memory_mb") or math.inf)),
+        "time_min": math.floor(min(max(math.ceil(time), MIN_TIME_MIN), limits.get("time_min") or math.inf)),
+    }
+
+
+def process_inputs(workflow_dir: str) -> dict[str, list[str]]:
+    """{process name: path input variable names} of the .nf modules below a workflow directory."""
+    inputs = {}
+    for module in sorted(glob.glob(os.path.join(workflow_dir, "**", "*.nf"), recursive=True)):
+        with open(module) as f:
+            text = f.read()
+        for match in re.finditer(r"^process\s+(\w+)\s*\{(.*?)^}", text, re.S | re.M):
+            block = re.search(r"^\s*input:\s*$(.*?)^\s*(?:output|when|script|shell|exec):", match.group(2), re.S | re.M)
+            names = re.findall(r"\bpath\s*\(?\s*(\w+)", block.group(1)) if block else []
+            inputs[match.group(1)] = list(dict.fromkeys(names))
+    return inputs
+
+
+def directive(model: dict, resource: str, unit: str, floor: int, limit: float | None, inputs: list[str]) -> str:
+    """A directive closure: the model over the task's input MB, floored, capped and escalated per attempt."""
+    fit = model[resource]
+    value = f"{fit['intercept']}"
+    prefix = ""
+    if fit["slope"] and inputs:
+        prefix = f"def mb = [{', '.join(inputs)}].flatten().collect {{ it.size() }}.sum(0) / {MB}; "
+        value = f"{fit['intercept']} + {fit['slope']} * mb"
+    value = f"Math.max(Math.ceil({value}), {floor}) * task.attempt"
+    if limit:
+        value = f"Math.min({value}, {math.floor(limit)})"
+    return f"{{ {prefix}\"${{({value}) as long}}{unit}\" }}"
+
+
+def write_config(models: dict, workflow_dir: str, path: str, limits: dict | None = None) -> list[str]:
+    """Write a Nextflow config sizing the workflow's modeled processes; return the process names written."""
+    limits = limits or {}
+    inputs = process_inputs(workflow_dir)
+    written = [process for process in models["processes"] if process in inputs]
+
+    lines = [
+        "/*",
+        f"    Resources predicted by predict_resources.py from {len(models['traces'])} trace file(s)",
+        "    (overrides the cpu/memory/time labels of the processes below; others keep their labels)",
+        "*/",
+        "",
+        "process {",
+    ]
+    for process in written:
+        model = models["processes"][process]
+        lines += [
+            f"    // {model['tasks']} tasks, {model['sized_tasks']} with measured inputs (max {model['max_input_mb']} MB)",
+            f"    withName: '{process}' {{",
+            f"        cpus = {min(model['cpus'], limits.get('cpus') or model['cpus'])}",
+            f"        memory = {directive(model, 'memory_mb', ' MB', MIN_MEMORY_MB, limits.get('memory_mb'), inputs[process])}",
+            f"        time = {directive(model, 'time_min', 'm', MIN_TIME_MIN, limits.get('time_min'), inputs[process])}",
+            "    }",
+        ]
+    lines.append("}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict task resources from Nextflow traces")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fit = subparsers.add_parser("fit", help="Fit per-process resource models from trace files")
+    fit.add_argument("traces", nargs="+", help="Nextflow trace files (with the workdir field)")
+    fit.add_argument("--margin", type=float, default=0.2,
+                     help="Headroom above the largest observed usage (default: 0.2)")
+    fit.add_argument("--min_tasks", type=int, default=MIN_TASKS,
+                     help=f"Completed tasks needed to model a process (default: {MIN_TASKS})")
+    fit.add_argument("-o", "--output", type=str, required=True, help="Model file (JSON)")
+
+    config = subparsers.add_parser("config", help="Write a Nextflow resource config for a workflow")
+    config.add_argument("--workflow_dir", type=str, required=True, help="Workflow directory (its modules are scanned)")
+    config.add_argument("-o", "--output", type=str, required=True, help="Nextflow config to write")
+
+    predict_task = subparsers.add_parser("predict", help="Print the directives for one task")
+    predict_task.add_argument("--process", type=str, required=True, help="Process name, eg: BWA_ALIGN")
+    predict_task.add_argument("inputs", nargs="*", help="The task's input files")
+
+    for subparser in (config, predict_task):
+        subparser.add_argument("--model", type=str, required=True, help="Model file from 'fit'")
+        subparser.add_argument("--max_cpus", type=int, help="Cap on cpus")
+        subparser.add_argument("--max_memory", type=float, help="Cap on memory, in GB")
+        subparser.add_argument("--max_time", type=float, help="Cap on time, in hours")
+
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        models = fit_models(args.traces, args.margin, args.min_tasks)
+        with open(args.output, "w") as f:
+            json.dump(models, f, indent=2)
+        print(f"Modeled {len(models['processes'])} processes from {len(args.traces)} trace file(s)", file=sys.stderr)
+        return
+
+    with open(args.model) as f:
+        models = json.load(f)
+    limits = {"cpus": args.max_cpus,
+              "memory_mb": args.max_memory and args.max_memory * 1024,
+              "time_min": args.max_time and args.max_time * 60}
+
+    if args.command == "config":
+        written = write_config(models, args.workflow_dir, args.output, limits)
+        print(f"Wrote resources for {len(written)} processes to {args.output}", file=sys.stderr)
+        return
+
+    if args.process not in models["processes"]:
+        raise SystemExit(f"no model for process {args.process}")
+    input_mb = sum(path_size(path) for path in args.inputs) / MB
+    print(json.dumps(predict(models["processes"][args.process], input_mb, limits)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .catalog import OutputCatalog, file_md5, artifact_entry, read_entries, catalog_files, query_catalogs, write_tsv, main
@@ -0,0 +1,257 @@
+"""
+catalog.py module
+
+Output catalog for the WESley workflows.
+
+Downstream workflows used to find their inputs by globbing the output trees of earlier runs
+('**/*.bam', '**/*mutect2.paired.vep.vcf*', ...), which takes minutes on shared storage, and left
+sample IDs to filename regexes. Instead, every workflow records the artifacts it publishes in a
+SQLite catalog, one row per file: its published path, sample, caller, artifact type, size and
+checksum, and the workflow and run that published it. Consumers query the catalog instead:
+
+  - record: add a workflow's published artifacts, listed in a TSV of sample_id, caller,
+            artifact_type, published path and the file's name in --artifact_dir
+  - add:    add files published outside the workflows (e.g. BAMs moved into a normals/ directory)
+  - query:  write the artifacts matching a type, caller, sample and/or directory as a TSV
+  - prune:  drop the entries whose files no longer exist
+
+A file published again replaces its entry. Checksums are MD5s; a file's '.md5' sidecar (as
+written by GATK/Picard next to BAMs) is used instead of reading the file when present.
+
+Each run records its artifacts in a catalog file of its own ('output_catalog.<run name>.sqlite'),
+so runs finishing at the same time never overwrite each other's entries. 'query' and 'prune'
+take the catalog directory and work on all its files; a path recorded by several runs keeps its
+most recently recorded entry.
+
+Usage:
+    python catalog.py record --catalog output_catalog.happy_euler.sqlite --entries entries.tsv --artifact_dir artifacts --workflow data_processing --run happy_euler
+    python catalog.py query --catalog /refs/output_catalog --type vep_vcf --under /data/batch_07 -o artifacts.tsv
+    python catalog.py add --catalog /refs/output_catalog/output_catalog.manual.sqlite --type bam /data/bams/normals/*.BQSR.bam
+
+Python version: 3.10+
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# columns written by 'query', in order
+QUERY_COLUMNS = ["sample_id", "caller", "artifact_type", "path", "size", "checksum"]
+
+
+def file_md5(path: str) -> str:
+    """MD5 of a file, taken from its '.md5' sidecar when there is one."""
+    sidecar = f"{path}.md5"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            tokens = f.read().split()
+        if tokens:
+            return tokens[0]
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_entry(path: str, published_path: str, artifact_type: str, sample_id: str | None = None,
+                   caller: str | None = None, workflow: str | None = None, run: str | None = None) -> dict:
+    """Catalog entry of a file published at published_path, measured from path (the same content)."""
+    return {
+        "path": published_path,
+        "sample_id": sample_id or None,
+        "caller": caller or None,
+        "artifact_type": artifact_type,
+        "size": os.path.getsize(path),
+        "checksum": file_md5(path),
+        "workflow": workflow,
+        "run": run,
+    }
+
+
+def read_entries(entries_tsv: str, artifact_dir: str, workflow: str | None = None, run: str | None = None) -> list[dict]:
+    """Catalog entries of a workflow's artifacts.
+
+    entries_tsv has no header; each row is sample_id, caller, artifact_type, published path and
+    the name of the file in artifact_dir (empty sample_id or caller fields are stored as NULL).
+    """
+    entries = []
+    with open(entries_tsv) as f:
+        for row in csv.reader(f, delimiter="\t"):
+            if not row:
+                continue
+            sample_id, caller, artifact_type, published_path, name = row
+            entries.append(artifact_entry(os.path.join(artifact_dir, name), published_path, artifact_type,
+                                          sample_id, caller, workflow, run))
+    return entries
+
+
+class OutputCatalog:
+    """SQLite catalog of published artifacts, keyed by published path."""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                path TEXT PRIMARY KEY, sample_id TEXT, caller TEXT, artifact_type TEXT NOT NULL,
+                size INTEGER NOT NULL, checksum TEXT NOT NULL, workflow TEXT, run TEXT, recorded_at TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS artifacts_by_type ON artifacts (artifact_type, caller);
+            CREATE INDEX IF NOT EXISTS artifacts_by_sample ON artifacts (sample_id);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, entries: list[dict]) -> int:
+        """Add entries, replacing earlier entries for the same paths; return the number recorded."""
+        recorded_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO artifacts VALUES "
+                "(:path, :sample_id, :caller, :artifact_type, :size, :checksum, :workflow, :run, :recorded_at)",
+                [{**entry, "recorded_at": recorded_at} for entry in entries])
+        return len(entries)
+
+    def query(self, artifact_types: list[str] | None = None, callers: list[str] | None = None,
+              sample_ids: list[str] | None = None, under: str | None = None) -> list[dict]:
+        """Entries matching all of the given filters, ordered by path.
+
+        under selects the artifacts anywhere below a directory, as a range scan on the paths.
+        """
+        clauses, values = [], []
+        for column, wanted in (("artifact_type", artifact_types), ("caller", callers), ("sample_id", sample_ids)):
+            if wanted:
+                clauses.append(f"{column} IN ({','.join('?' * len(wanted))})")
+                values.extend(wanted)
+        if under:
+            prefix = under.rstrip("/") + "/"
+            # every path starting with '<dir>/' sorts between '<dir>/' and '<dir>0' ('0' follows '/')
+            clauses.append("path >= ? AND path < ?")
+            values.extend([prefix, prefix[:-1] + "0"])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        self.conn.row_factory = sqlite3.Row
+        rows = self.conn.execute(f"SELECT * FROM artifacts {where} ORDER BY path", values).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune(self) -> int:
+        """Drop the entries whose files no longer exist; return how many were dropped."""
+        missing = [(path,) for (path,) in self.conn.execute("SELECT path FROM artifacts") if not os.path.exists(path)]
+        with self.conn:
+            self.conn.executemany("DELETE FROM artifacts WHERE path = ?", missing)
+        return len(missing)
+
+
+def catalog_files(catalog: str) -> list[str]:
+    """The catalog files of a catalog directory ('output_catalog*.sqlite'), or [catalog] for a file."""
+    if os.path.isdir(catalog):
+        return sorted(glob.glob(os.path.join(glob.escape(catalog), "output_catalog*.sqlite")))
+    return [catalog] if os.path.exists(catalog) else []
+
+
+def query_catalogs(catalogs: list[str], artifact_types: list[str] | None = None, callers: list[str] | None = None,
+                   sample_ids: list[str] | None = None, under: str | None = None) -> list[dict]:
+    """OutputCatalog.query over several catalog files, ordered by path.
+
+    A path recorded in more than one catalog keeps its most recently recorded entry.
+    """
+    latest = {}
+    for path in catalogs:
+        with OutputCatalog(path, readonly=True) as catalog:
+            for entry in catalog.query(artifact_types, callers, sample_ids, under):
+                current = latest.get(entry["path"])
+                if current is None or entry["recorded_at"] >= current["recorded_at"]:
+                    latest[entry["path"]] = entry
+    return [latest[path] for path in sorted(latest)]
+
+
+def write_tsv(entries: list[dict], output) -> None:
+    """Write entries as a TSV with a QUERY_COLUMNS header (NULLs as empty fields)."""
+    writer = csv.writer(output, delimiter="\t", lineterminator="\n")
+    writer.writerow(QUERY_COLUMNS)
+    for entry in entries:
+        writer.writerow(["" if entry[column] is None else entry[column] for column in QUERY_COLUMNS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog of the artifacts published by the WESley workflows")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="Add a workflow's published artifacts")
+    record.add_argument("--entries", type=str, required=True,
+                        help="TSV of sample_id, caller, artifact_type, published path and file name")
+    record.add_argument("--artifact_dir", type=str, default=".", help="Directory the listed files are in")
+    record.add_argument("--workflow", type=str, help="Workflow that published the artifacts")
+    record.add_argument("--run", type=str, help="Run name of the workflow")
+
+    add = subparsers.add_parser("add", help="Add files published outside the workflows")
+    add.add_argument("paths", nargs="+", help="Files to add, cataloged at their absolute paths")
+    add.add_argument("--type", type=str, required=True, help="Artifact type (eg: bam)")
+    add.add_argument("--caller", type=str, help="Variant caller that produced the files")
+    add.add_argument("--sample", type=str,
+                     help="Sample ID (default: each file name up to its first '.')")
+
+    query = subparsers.add_parser("query", help="Write the matching artifacts as a TSV")
+    query.add_argument("--type", nargs="*", help="Artifact types to select")
+    query.add_argument("--caller", nargs="*", help="Callers to select")
+    query.add_argument("--sample", nargs="*", help="Sample IDs to select")
+    query.add_argument("--under", type=str, help="Only artifacts below this directory")
+    query.add_argument("-o", "--output", type=str, help="Output TSV (default: stdout)")
+
+    subparsers.add_parser("prune", help="Drop the entries whose files no longer exist")
+
+    for name, subparser in subparsers.choices.items():
+        subparser.add_argument("--catalog", type=str, required=True,
+                               help="Catalog directory, or a single SQLite catalog" if name in ("query", "prune")
+                               else "SQLite catalog to record in (created if missing)")
+
+    args = parser.parse_args()
+
+    if args.command in ("query", "prune"):
+        catalogs = catalog_files(args.catalog)
+        if not catalogs:
+            sys.exit(f"catalog {args.catalog} does not exist")
+
+        if args.command == "query":
+            entries = query_catalogs(catalogs, args.type, args.caller, args.sample, args.under)
+            if args.output:
+                with open(args.output, "w") as f:
+                    write_tsv(entries, f)
+            else:
+                write_tsv(entries, sys.stdout)
+            print(f"{len(entries)} artifacts", file=sys.stderr)
+        else:
+            for path in catalogs:
+                with OutputCatalog(path) as catalog:
+                    print(f"Dropped {catalog.prune()} missing artifacts from {path}", file=sys.stderr)
+        return
+
+    with OutputCatalog(args.catalog) as catalog:
+        if args.command == "record":
+            count = catalog.record(read_entries(args.entries, args.artifact_dir, args.workflow, args.run))
+            print(f"Recorded {count} artifacts in {args.catalog}", file=sys.stderr)
+        elif args.command == "add":
+            entries = [artifact_entry(path, os.path.abspath(path), args.type,
+                                      args.sample or os.path.basename(path).split(".")[0], args.caller, workflow="manual")
+                       for path in args.paths]
+            print(f"Recorded {catalog.record(entries)} artifacts in {args.catalog}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
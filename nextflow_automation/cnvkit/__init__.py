@@ -0,0 +1 @@
+from .segment_store import SegmentStore, read_segments, gene_interval, main
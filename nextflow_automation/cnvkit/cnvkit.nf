@@ -14,6 +14,11 @@ include { SEGMENT } from './modules/segment.nf'
 include { EXPORT } from './modules/export.nf'
 include { MERGE } from './modules/merge.nf'
 include { POOL } from './modules/pool.nf'
+include { REFERENCE_REGIONS; COVERAGE } from './modules/coverage.nf'
+include { FIX } from './modules/fix.nf'
+include { STORE_SEGMENTS } from './modules/segment_store.nf'
+include { CATALOG_RECORD; CATALOG_QUERY; catalog_inputs; with_catalog } from './modules/catalog.nf'
+include { bam_key } from '../shared/bam_key.nf'
 
 
 // define functions for user guidance
@@ -35,6 +40,12 @@ def help_message() {
         Optional arguments:
         --cpus                        Number of CPUs to use for processing (default: 1)
         --legacy                      Run legacy pipeline mode (default: false)
+        --per_sample                  Compute coverage and copy ratios per sample instead of one cnvkit batch task (default: false)
+        --coverage_cache_dir          Directory caching per-sample coverage for --per_sample (default: <ref_dir>/cnvkit_coverage)
+        --segment_store_dir           Cohort-wide Parquet segment store the batch is added to (default: <ref_dir>/cnv_segment_store)
+        --catalog_dir                 Directory of the output catalog the segments are recorded in (default: <ref_dir>/output_catalog)
+        --from_catalog                Take the BAMs below --bam_dir from the output catalog instead of searching the directory (default: false)
+        --catalog_scan                With --from_catalog, search --bam_dir anyway, warning about BAMs the catalog is missing (default: false)
         --help                        Show this help message and exit
         
         Examples:
@@ -42,6 +53,9 @@ def help_message() {
         # Basic usage with required parameters
         nextflow -C nextflow.config run cnvkit.nf -entry "CNV_CALLING" --bam_dir /path/to/bams --output_dir /path/to/output --ref_dir /path/to/reference --pooled_normal pooled_normal.cnn --batch_name batch_01
         
+        # Per-sample coverage, reusing the cached coverage of samples already processed
+        nextflow -C nextflow.config run cnvkit.nf -entry "CNV_CALLING" --bam_dir /path/to/bams --output_dir /path/to/output --ref_dir /path/to/reference --pooled_normal pooled_normal.cnn --batch_name batch_01 --per_sample
+        
         # With optional parameters
         nextflow -C nextflow.config run cnvkit.nf -entry "CNV_CALLING" --bam_dir /path/to/bams --output_dir /path/to/output --ref_dir /path/to/reference --pooled_normal pooled_normal.cnn --batch_name batch_01 --cpus 30
         """.stripIndent()
@@ -61,13 +75,16 @@ def help_message() {
         --output_dir                  Path to the output directory
         --capture_kit                 Name of the capture kit (used for naming output files, eg: SeqCap, KAPA, etc.)
         --annotation                  Gene annotation file name (eg: refFlat.txt)
-        --targets                     Target BED file name (eg: targets.bed)
+        --targets                     Target BED file name in --ref_dir (eg: targets.bed), or a path to one
         
         Optional arguments:
         --ref_genome                  Reference genome FASTA file name (default: Homo_sapiens_assembly38.fasta)
         --access                      Accessible genomic regions BED file name (default: hg38_access.bed)
         --seq_platform                Sequencing platform name (used in output CNN file naming)
         --cpus                        Number of CPUs to use for processing (default: 1)
+        --catalog_dir                 Directory of the output catalog (default: <ref_dir>/output_catalog)
+        --from_catalog                Take the BAMs below --bam_dir from the output catalog instead of searching the directory (default: false)
+        --catalog_scan                With --from_catalog, search --bam_dir anyway, warning about BAMs the catalog is missing (default: false)
         --help                        Show this help message and exit
         
         Examples:
@@ -95,6 +112,45 @@ def log_workflow() {
     """.stripIndent()
 }
 
+// output catalog shared by the workflows
+def catalog_dir() {
+    return params.catalog_dir ?: "${params.ref_dir}/output_catalog"
+}
+
+// the catalog files of the output catalog (one per run that recorded artifacts)
+def catalog_files() {
+    return files("${catalog_dir()}/output_catalog*.sqlite").findAll { it.exists() }
+}
+
+// BAMs below --bam_dir; with --from_catalog, the BAMs the output catalog has there, without walking --bam_dir
+workflow INPUT_BAMS {
+    main:
+    if (params.from_catalog) {
+        def catalogs = catalog_files()
+        if (!catalogs) {
+            error "ERROR: --from_catalog needs the output catalog in ${catalog_dir()}"
+        }
+        catalog_bams = CATALOG_QUERY(file("${projectDir}/../catalog/catalog.py"), catalogs, ['bam', 'cram'], file(params.bam_dir).toString())
+    }
+
+    if (params.from_catalog && !params.catalog_scan) {
+        bams = catalog_inputs(catalog_bams).map { sample_id, bam -> bam }
+    } else {
+        bams = channel.fromPath([
+                "${params.bam_dir}/*.{bam,cram}",      // top level directory
+                "${params.bam_dir}/**/*.{bam,cram}"    // subdirectories
+            ])
+    }
+    if (params.from_catalog && params.catalog_scan) {
+        // warn about the BAMs the output catalog is missing
+        bams = with_catalog(bams.map { bam -> tuple(null, bam) }, catalog_bams)
+            .map { sample_id, bam -> bam }
+    }
+
+    emit:
+    bams
+}
+
 // main workflow
 workflow CNV_CALLING {
     // Show help message if requested
@@ -130,27 +186,40 @@ workflow CNV_CALLING {
 
     log_workflow()  // log workflow parameters
 
-    // channel in the bams as individual tuples, then combine into a list of BAMs
-    channel
-        // channel in bams individually
-        .fromPath([
-                "${params.bam_dir}/*.bam",      // top level directory
-                "${params.bam_dir}/**/*.bam"    // subdirectories
-            ])
+    // channel in the tumor bams individually
+    INPUT_BAMS()
+        .bams
         .filter { !(it =~ /(?i)(PBMC|BLD|CD45|NORM|NORMAL|Blood)/)}  // filter out normal samples (case-insensitive)
-        .collect()  // collect each tuple into a list
-        .set { tumor_bams }  // set as tumor_bams data structure
-
-    // run CNVKit batch 
-    cnr_list = BATCH(tumor_bams)
-
-    // data manipulation
-    cnr_files = cnr_list
-                    .flatten()  // ungroup list of cnr files for individual processing
-                    .map { cnr_file -> 
-                                def sample_id = (cnr_file.name =~ /^(.+?)\./)[0][1]  // match patterns before the first "."
-                                tuple(sample_id, cnr_file)
-                    }
+        .set { tumor_bams }
+
+    if (params.per_sample) {
+        // target and antitarget regions of the pooled normal
+        regions = REFERENCE_REGIONS()
+
+        // per-sample coverage, cached by target set and BAM checksum
+        coverage_cache_dir = params.coverage_cache_dir ?: "${params.ref_dir}/cnvkit_coverage"
+        coverage_inputs = tumor_bams
+            .map { bam ->
+                def bai = [file("${bam}.bai"), file("${bam.parent}/${bam.baseName}.bai"), file("${bam}.crai")].find { it.exists() }
+                tuple(bam.simpleName, bam_key(bam), bam, bai ?: [])
+            }
+            .combine(regions)
+        coverage = COVERAGE(coverage_inputs, coverage_cache_dir)
+
+        // correct each sample against the pooled normal
+        cnr_files = FIX(coverage)
+    } else {
+        // run CNVKit batch on the list of tumor BAMs
+        cnr_list = BATCH(tumor_bams.collect())
+
+        // data manipulation
+        cnr_files = cnr_list
+                        .flatten()  // ungroup list of cnr files for individual processing
+                        .map { cnr_file -> 
+                                    def sample_id = (cnr_file.name =~ /^(.+?)\./)[0][1]  // match patterns before the first "."
+                                    tuple(sample_id, cnr_file)
+                        }
+    }
 
     // run CNVKit segment
     cns_files = SEGMENT(cnr_files)
@@ -165,6 +234,24 @@ workflow CNV_CALLING {
 
     // merge all the .seg files
     MERGE(seg_file_list)
+
+    // add the batch's segments to the cohort-wide segment store
+    segment_store_dir = params.segment_store_dir ?: "${params.ref_dir}/cnv_segment_store"
+    STORE_SEGMENTS(seg_file_list, file("${projectDir}/segment_store.py"), segment_store_dir)
+
+    // record the per-sample segments in the output catalog
+    catalog_artifacts = cns_files
+        .map { sample_id, cns -> tuple(sample_id, 'cns', file("${params.output_dir}/cnv_calling/raw_files/${cns.name}"), cns) }
+        .mix(seg_files.map { seg -> tuple(seg.simpleName, 'seg', file("${params.output_dir}/cnv_calling/segmentation/${seg.name}"), seg) })
+    CATALOG_RECORD(
+        catalog_artifacts
+            .map { sample_id, type, published, artifact -> [sample_id, '', type, published, artifact.name].join('\t') }
+            .collectFile(name: 'catalog_entries.tsv', newLine: true, sort: true),
+        catalog_artifacts.map { row -> row[3] }.collect(),
+        file("${projectDir}/../catalog/catalog.py"),
+        'cnvkit',
+        catalog_dir()
+    )
 }
 
 workflow CREATE_NORM {
@@ -212,16 +299,12 @@ workflow CREATE_NORM {
     log_workflow()
 
     // channel in the normal bams as individual tuples, then combine into a list of BAMs
-    channel
-        // channel in bams individually
-        .fromPath([
-                "${params.bam_dir}/*.bam",      // top level directory
-                "${params.bam_dir}/**/*.bam"    // subdirectories
-            ])
+    INPUT_BAMS()
+        .bams
         .filter { it =~ /(?i)(PBMC|BLD|CD45|NORM|NORMAL|Blood)/ }  // filter out tumor samples (case-insensitive)
         .collect()  // collect each tuple into a list
         .set { normal_bams }  // set as tumor_bams data structure
 
-    // create pooled normal using cnvkit batch
-    POOL(normal_bams)
+    // create pooled normal using cnvkit batch (a --targets path is staged, a file name is found in ref_dir)
+    POOL(normal_bams, params.targets.contains('/') ? file(params.targets, checkIfExists: true) : [])
 }
\ No newline at end of file
@@ -21,7 +21,9 @@ process BATCH {
 
     script:
     def cnn = params.legacy ? "KAPA_HyperExome_hg38_capture_targets.reference.cnn" : params.pooled_normal
-    
+    // CRAMs are decoded against the reference
+    def fasta_arg = ([bam_list].flatten().any { it.name.endsWith('.cram') } ? "--fasta /references/${params.ref_genome}" : "")
+
     """
     # locate the pooled normal file
     POOLED_NORMAL=\$(find /references -name "${cnn}" -type f | head -n 1)
@@ -29,6 +31,7 @@ process BATCH {
     # run the cnvkit batch pipeline
     cnvkit.py batch ${bam_list.join(' ')} \
     -r "\${POOLED_NORMAL}" \
+    ${fasta_arg} \
     -p ${params.cpus}
     """
 }
\ No newline at end of file
@@ -0,0 +1,67 @@
+/*
+coverage.nf
+
+This module computes per-sample CNVKit coverage as independent tasks:
+  - REFERENCE_REGIONS splits the pooled normal into the target and antitarget BED files that
+    'cnvkit.py batch -r' derives from it, and names the target set by their checksum
+  - COVERAGE runs 'cnvkit.py coverage' for one BAM on both region sets
+
+COVERAGE keeps its .targetcoverage.cnn / .antitargetcoverage.cnn files in a storeDir keyed by
+target set and BAM checksum, so a BAM is only read again when it or the target set changes.
+
+CNVKit version: 0.9.10
+*/
+
+process REFERENCE_REGIONS {
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    output:
+    tuple env(TARGET_SET), path("targets.bed"), path("antitargets.bed")
+
+    script:
+    def cnn = params.legacy ? "KAPA_HyperExome_hg38_capture_targets.reference.cnn" : params.pooled_normal
+
+    """
+    # locate the pooled normal file
+    POOLED_NORMAL=\$(find /references -name "${cnn}" -type f | head -n 1)
+
+    # split the reference bins into targets and antitargets (as cnvkit batch -r does)
+    awk -F '\\t' 'NR > 1 && \$4 != "Antitarget" && \$4 != "Background" { print \$1 "\\t" \$2 "\\t" \$3 "\\t" \$4 }' "\${POOLED_NORMAL}" > targets.bed
+    awk -F '\\t' 'NR > 1 && (\$4 == "Antitarget" || \$4 == "Background") { print \$1 "\\t" \$2 "\\t" \$3 "\\t" \$4 }' "\${POOLED_NORMAL}" > antitargets.bed
+
+    TARGET_SET=\$(cat targets.bed antitargets.bed | md5sum | cut -c 1-16)
+    """
+}
+
+process COVERAGE {
+    label 'medCpu'
+    label 'medMem'
+    label 'medTime'
+    tag "$sample_id"
+    storeDir "${cache_dir}/${target_set}/${bam_key}"
+
+    input:
+    tuple val(sample_id), val(bam_key), path(bam), path(bai), val(target_set), path(targets), path(antitargets)
+    val cache_dir
+
+    output:
+    tuple val(sample_id), path("${bam.baseName}.targetcoverage.cnn"), path("${bam.baseName}.antitargetcoverage.cnn")
+
+    script:
+    // CRAMs are decoded against the reference
+    def fasta_arg = (bam.name.endsWith('.cram') ? "-f /references/${params.ref_genome}" : "")
+
+    """
+    cnvkit.py coverage ${bam} ${targets} \
+    ${fasta_arg} \
+    -p ${task.cpus} \
+    -o "${bam.baseName}.targetcoverage.cnn"
+
+    cnvkit.py coverage ${bam} ${antitargets} \
+    ${fasta_arg} \
+    -p ${task.cpus} \
+    -o "${bam.baseName}.antitargetcoverage.cnn"
+    """
+}
@@ -0,0 +1,37 @@
+/*
+fix.nf
+
+This module combines one sample's target and antitarget coverage and corrects it against
+the pooled normal into a copy ratio (.cnr) file using CNVKit fix.
+
+CNVKit version: 0.9.10
+*/
+
+process FIX {
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+    tag "$sample_id"
+    publishDir "${params.output_dir}/cnv_calling/raw_files", mode: 'copy'
+
+    input:
+    tuple val(sample_id), path(target_coverage), path(antitarget_coverage)
+
+    output:
+    tuple val(sample_id), path("*.cnr")
+
+    script:
+    def cnn = params.legacy ? "KAPA_HyperExome_hg38_capture_targets.reference.cnn" : params.pooled_normal
+    def stem = target_coverage.name - ".targetcoverage.cnn"
+
+    """
+    # locate the pooled normal file
+    POOLED_NORMAL=\$(find /references -name "${cnn}" -type f | head -n 1)
+
+    cnvkit.py fix \
+    $target_coverage \
+    $antitarget_coverage \
+    "\${POOLED_NORMAL}" \
+    -o "${stem}.cnr"
+    """
+}
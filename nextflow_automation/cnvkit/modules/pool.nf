@@ -2,7 +2,8 @@
 pool.nf
 
 This module inputs the analysis-ready BQSR BAM files and uses the CNVKit pipeline
-for batch analysis.
+for batch analysis. The target BED is staged when --targets is a path; a bare file
+name is looked up in the reference directory.
 
 CNVKit version: 0.9.10
 */
@@ -15,15 +16,17 @@ process POOL {
 
     input:
     path(normal_bam_list)
+    path(targets_bed, stageAs: "targets/*")  // [] when --targets is a file name in ref_dir
     
     output:
     path("*.cnn")
 
     script:
+    def targets = targets_bed ?: "\$(find /references -name \"${params.targets}\" -type f | head -n 1)"
     """
     # find and initialize reference files
     ANNOTATION=\$(find /references -name "${params.annotation}" -type f | head -n 1)
-    TARGETS=\$(find /references -name "${params.targets}" -type f | head -n 1)
+    TARGETS=${targets}
 
     # run the cnvkit batch pipeline
     cnvkit.py batch \
@@ -0,0 +1,33 @@
+/*
+segment_store.nf
+
+This module ingests the batch's exported .seg files into the cohort-wide Parquet segment
+store with 'segment_store.py'. Only the batch's own partitions and index are written, and
+they are published into 'store_dir' next to the other batches.
+
+Python version: 3.10
+*/
+
+process STORE_SEGMENTS {
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+    publishDir "${store_dir}", mode: 'copy'
+
+    input:
+    path(seg_files)
+    path segment_store_script
+    val store_dir
+
+    output:
+    path("chrom=*/batch=*/segments.parquet")
+    path("_index/batch=*.parquet")
+
+    script:
+    """
+    python3 ${segment_store_script} ingest \\
+        --store . \\
+        --batch "${params.batch_name}" \\
+        ${seg_files}
+    """
+}
@@ -0,0 +1,267 @@
+"""
+segment_store.py module
+
+Cohort-wide Parquet store of CNVkit segments for the WESley CNV calling pipeline.
+
+The exported .seg files (and/or the .cns files) of a batch are ingested into a store partitioned by
+chromosome and batch:
+
+    <store>/chrom=<chrom>/batch=<batch>/segments.parquet   segments sorted by start position
+    <store>/_index/batch=<batch>.parquet                   one row per partition of the batch
+
+Coordinates are stored 0-based, half-open (as in .cns files). Ingesting a batch only writes that
+batch's files, so the store is appendable as new batches land (re-ingesting a batch replaces it),
+and the layout can be read by any hive-partitioning aware Parquet reader.
+
+The index records the position range and longest segment of each partition. An interval query only
+opens the partitions of its chromosome whose range overlaps it, and reads the rows with
+    query_start - max_length <= start < query_end  and  end > query_start
+which, as segments are sorted by start, Parquet row group statistics narrow down to a few row groups.
+
+Usage:
+    python segment_store.py ingest --store /path/to/cnv_segment_store --batch wes-10 *.seg
+    python segment_store.py query --store /path/to/cnv_segment_store --region chr9:21967752-21995301
+    python segment_store.py query --store /path/to/cnv_segment_store --gene CDKN2A --annotation refFlat.txt --max_log2 -0.4
+
+Python version: 3.10+
+"""
+
+import argparse
+import glob
+import os
+import re
+import shutil
+import sys
+
+import polars as pl
+
+SEGMENT_SCHEMA = {
+    "sample": pl.Utf8,
+    "start": pl.Int64,
+    "end": pl.Int64,
+    "num_probes": pl.Int64,
+    "log2": pl.Float64,
+    "source": pl.Utf8,
+}
+INDEX_SCHEMA = {
+    "chrom": pl.Utf8,
+    "batch": pl.Utf8,
+    "path": pl.Utf8,
+    "rows": pl.Int64,
+    "min_start": pl.Int64,
+    "max_end": pl.Int64,
+    "max_length": pl.Int64,
+}
+ROW_GROUP_SIZE = 4096
+REGION_PATTERN = re.compile(r"^([^:]+):([\d,]+)-([\d,]+)$")
+
+
+def read_segments(path: str) -> pl.DataFrame:
+    """Read a CNVkit .seg or .cns file as chrom plus SEGMENT_SCHEMA columns (0-based, half-open)."""
+    if not path.endswith((".seg", ".cns")):
+        raise ValueError(f"{path} is not a .seg or .cns file")
+    table = pl.read_csv(path, separator="\t", infer_schema_length=0)
+
+    if path.endswith(".seg"):
+        # cnvkit export seg: ID chrom loc.start loc.end num.mark seg.mean, 1-based starts
+        segments = table.select(
+            pl.col("ID").alias("sample"),
+            pl.col("chrom"),
+            (pl.col("loc.start").cast(pl.Int64) - 1).alias("start"),
+            pl.col("loc.end").cast(pl.Int64).alias("end"),
+            pl.col("num.mark").cast(pl.Int64).alias("num_probes"),
+            pl.col("seg.mean").cast(pl.Float64).alias("log2"),
+            pl.lit("seg").alias("source"),
+        )
+    else:
+        # cnvkit segment: chromosome start end gene log2 [depth probes weight ...], sample named by file
+        probes = pl.col("probes").cast(pl.Int64) if "probes" in table.columns else pl.lit(None, pl.Int64)
+        segments = table.select(
+            pl.lit(os.path.basename(path).split(".")[0]).alias("sample"),
+            pl.col("chromosome").alias("chrom"),
+            pl.col("start").cast(pl.Int64),
+            pl.col("end").cast(pl.Int64),
+            probes.alias("num_probes"),
+            pl.col("log2").cast(pl.Float64),
+            pl.lit("cns").alias("source"),
+        )
+
+    return segments
+
+
+class SegmentStore:
+    """Parquet segment store partitioned by chromosome and batch, see the module docstring."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def index(self) -> pl.DataFrame:
+        """The partition index of every ingested batch."""
+        paths = sorted(glob.glob(os.path.join(self.root, "_index", "batch=*.parquet")))
+        if not paths:
+            return pl.DataFrame(schema=INDEX_SCHEMA)
+        return pl.concat([pl.read_parquet(path) for path in paths])
+
+    def batches(self) -> list[str]:
+        return sorted(self.index()["batch"].unique().to_list())
+
+    def ingest(self, paths: list[str], batch: str) -> int:
+        """Write the segments of one batch's .seg/.cns files (replacing the batch); return the segment count."""
+        if not batch or "/" in batch or batch.startswith("."):
+            raise ValueError(f"invalid batch name: {batch!r}")
+
+        segments = pl.concat([read_segments(path) for path in paths]) if paths else pl.DataFrame()
+        self.remove(batch)
+
+        partitions = []
+        if segments.height:
+            for (chrom,), partition in segments.sort("chrom", "start", "end", "sample").group_by("chrom", maintain_order=True):
+                relative_path = os.path.join(f"chrom={chrom}", f"batch={batch}", "segments.parquet")
+                os.makedirs(os.path.dirname(os.path.join(self.root, relative_path)), exist_ok=True)
+                partition.select(list(SEGMENT_SCHEMA)).write_parquet(
+                    os.path.join(self.root, relative_path), row_group_size=ROW_GROUP_SIZE, statistics=True
+                )
+                partitions.append({
+                    "chrom": chrom,
+                    "batch": batch,
+                    "path": relative_path,
+                    "rows": partition.height,
+                    "min_start": partition["start"].min(),
+                    "max_end": partition["end"].max(),
+                    "max_length": (partition["end"] - partition["start"]).max(),
+                })
+
+        # the batch's index is written last, so a partly ingested batch is never queried
+        os.makedirs(os.path.join(self.root, "_index"), exist_ok=True)
+        index_path = os.path.join(self.root, "_index", f"batch={batch}.parquet")
+        pl.DataFrame(partitions, schema=INDEX_SCHEMA).write_parquet(index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        return segments.height
+
+    def remove(self, batch: str):
+        """Drop a batch's index and partitions from the store."""
+        index_path = os.path.join(self.root, "_index", f"batch={batch}.parquet")
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        for partition_dir in glob.glob(os.path.join(self.root, "chrom=*", f"batch={batch}")):
+            shutil.rmtree(partition_dir)
+
+    def query(self, chrom: str, start: int, end: int, batches: list[str] | None = None,
+              samples: list[str] | None = None, min_log2: float | None = None,
+              max_log2: float | None = None, source: str | None = None) -> pl.DataFrame:
+        """Segments overlapping chrom:[start, end) (0-based, half-open), with their overlap in bp."""
+        partitions = self.index().filter(
+            (pl.col("chrom") == chrom) & (pl.col("min_start") < end) & (pl.col("max_end") > start)
+        )
+        if batches:
+            partitions = partitions.filter(pl.col("batch").is_in(batches))
+
+        frames = []
+        for partition in partitions.iter_rows(named=True):
+            condition = (
+                (pl.col("start") >= start - partition["max_length"]) & (pl.col("start") < end) & (pl.col("end") > start)
+            )
+            if samples:
+                condition &= pl.col("sample").is_in(samples)
+            if min_log2 is not None:
+                condition &= pl.col("log2") >= min_log2
+            if max_log2 is not None:
+                condition &= pl.col("log2") <= max_log2
+            if source:
+                condition &= pl.col("source") == source
+            frames.append(
+                pl.scan_parquet(os.path.join(self.root, partition["path"]))
+                .filter(condition)
+                .with_columns(pl.lit(partition["batch"]).alias("batch"), pl.lit(chrom).alias("chrom"))
+                .collect()
+            )
+
+        columns = ["batch", "sample", "chrom", "start", "end", "num_probes", "log2", "source"]
+        if not frames:
+            return pl.DataFrame(schema={**SEGMENT_SCHEMA, "batch": pl.Utf8, "chrom": pl.Utf8,
+                                        "overlap": pl.Int64}).select(columns + ["overlap"])
+        return (
+            pl.concat([frame.select(columns) for frame in frames])
+            .with_columns((pl.min_horizontal("end", pl.lit(end)) - pl.max_horizontal("start", pl.lit(start))).alias("overlap"))
+            .sort("batch", "sample", "start")
+        )
+
+
+def parse_region(region: str) -> tuple[str, int, int]:
+    """Parse 'chr9:21967752-21995301' (1-based, inclusive) into 0-based, half-open (chrom, start, end)."""
+    match = REGION_PATTERN.match(region)
+    if not match:
+        raise ValueError(f"invalid region {region!r}, expected CHROM:START-END")
+    chrom, start, end = match.group(1), int(match.group(2).replace(",", "")), int(match.group(3).replace(",", ""))
+    if start < 1 or end < start:
+        raise ValueError(f"invalid region {region!r}")
+    return chrom, start - 1, end
+
+
+def gene_interval(annotation: str, gene: str) -> tuple[str, int, int]:
+    """Span (0-based, half-open) of a gene's transcripts in a refFlat file (as used by CNVkit)."""
+    spans = {}
+    with open(annotation) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            # refFlat: geneName name chrom strand txStart txEnd ...
+            if len(fields) > 5 and fields[0] == gene and "_" not in fields[2]:
+                chrom_start, chrom_end = spans.get(fields[2], (int(fields[4]), int(fields[5])))
+                spans[fields[2]] = (min(chrom_start, int(fields[4])), max(chrom_end, int(fields[5])))
+    if not spans:
+        raise ValueError(f"gene {gene} not found in {annotation}")
+    if len(spans) > 1:
+        raise ValueError(f"gene {gene} is annotated on several chromosomes: {', '.join(sorted(spans))}")
+    chrom, (start, end) = next(iter(spans.items()))
+    return chrom, start, end
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort-wide Parquet store of CNVkit segments for WESley")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Add (or replace) one batch's segments")
+    ingest.add_argument("files", nargs="+", help=".seg and/or .cns files of the batch")
+    ingest.add_argument("--batch", type=str, required=True, help="Batch name (eg: wes-10)")
+
+    query = subparsers.add_parser("query", help="Segments overlapping a region or gene, across batches")
+    target = query.add_mutually_exclusive_group(required=True)
+    target.add_argument("--region", type=str, help="Region CHROM:START-END (1-based, inclusive)")
+    target.add_argument("--gene", type=str, help="Gene name, looked up in --annotation")
+    query.add_argument("--annotation", type=str, help="refFlat gene annotation file (required with --gene)")
+    query.add_argument("--batches", type=str, nargs="+", help="Only these batches")
+    query.add_argument("--samples", type=str, nargs="+", help="Only these samples")
+    query.add_argument("--min_log2", type=float, help="Only segments with log2 >= this (eg: 0.3 for gains)")
+    query.add_argument("--max_log2", type=float, help="Only segments with log2 <= this (eg: -0.4 for losses)")
+    query.add_argument("--source", choices=["seg", "cns"], help="Only segments ingested from this file type")
+    query.add_argument("-o", "--output", type=str, help="Output TSV (default: stdout)")
+
+    for subparser in (ingest, query):
+        subparser.add_argument("--store", type=str, required=True, help="Segment store directory")
+
+    args = parser.parse_args()
+    store = SegmentStore(args.store)
+
+    if args.command == "ingest":
+        count = store.ingest(args.files, args.batch)
+        print(f"Stored {count} segments of batch {args.batch} from {len(args.files)} files", file=sys.stderr)
+        return
+
+    if args.gene:
+        if not args.annotation:
+            parser.error("--annotation is required with --gene")
+        chrom, start, end = gene_interval(args.annotation, args.gene)
+    else:
+        chrom, start, end = parse_region(args.region)
+
+    segments = store.query(chrom, start, end, args.batches, args.samples, args.min_log2, args.max_log2, args.source)
+    if args.output:
+        segments.write_csv(args.output, separator="\t")
+    else:
+        sys.stdout.write(segments.write_csv(separator="\t"))
+    print(f"{segments.height} segments of {segments['sample'].n_unique()} samples overlap {chrom}:{start + 1}-{end}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .call_consensus import normalize, call_consensus, main
@@ -0,0 +1,333 @@
+"""
+call_consensus.py module
+
+Single-pass streaming consensus engine for the WESley consensus calling pipeline.
+
+Streams the per-caller VCFs (Mutect2, MuSE, VarScan2) as a k-way merge by position, normalizes
+every record on the fly and writes one consensus VCF with the sites supported by at least
+--min_callers callers. It replaces the REHEADER -> INDEX -> INTERSECT -> MERGE_VCFS -> NORM_INDELS
+chain that follows SORT_VCFS with a single task:
+  - sites match on normalized CHROM/POS/REF/ALT, like 'bcftools isec' (identical REF and ALT)
+  - normalization trims bases shared by all alleles; with --fasta, indels are also left-aligned
+  - each kept site is written once, from the first caller (in input order) that called it,
+    like 'bcftools norm -d none' after MergeVcfs
+  - INFO/CALLERS and INFO/NCALLERS record which callers supported the site
+  - sample columns are renamed and ordered NORMAL, TUMOR (using ##normal_sample/##tumor_sample
+    when present, as Mutect2 writes them)
+
+Inputs must be coordinate sorted (plain or bgzipped VCF). Memory is bounded by the number of sites
+within --max_shift bases of the current position, not by the size of the inputs.
+
+Usage:
+    python call_consensus.py -o SAMPLE.consensus.norm.vcf \\
+        --names mutect2,MuSE,varscan2 --min_callers 2 [--fasta ref.fasta] \\
+        SAMPLE.mutect2.vcf SAMPLE.MuSE.vcf SAMPLE.varscan2.vcf
+
+Python version: 3.10+
+"""
+
+import argparse
+import gzip
+import heapq
+import os
+import re
+import sys
+
+BASES = re.compile(r"^[ACGTNacgtn]+$")
+TCGB_ID = re.compile(r"^[0-9]+[A-Z]?-[0-9]+$")
+STRUCTURED_META = re.compile(r"^##(INFO|FORMAT|FILTER|ALT|contig)=<ID=([^,>]+)")
+
+
+def open_vcf(path: str):
+    """Open a plain or gzip/bgzip-compressed VCF for reading text."""
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt")
+    return open(path)
+
+
+class FastaReference:
+    """Random access to an indexed FASTA (.fai) with a small block cache."""
+
+    BLOCK = 65536
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = {}
+        with open(f"{path}.fai") as fai:
+            for line in fai:
+                name, length, offset, line_bases, line_width = line.split("\t")[:5]
+                self.index[name] = (int(length), int(offset), int(line_bases), int(line_width))
+        self.handle = open(path, "rb")
+        self.cache = (None, -1, "")
+
+    def contigs(self) -> list[tuple[str, int]]:
+        return [(name, entry[0]) for name, entry in self.index.items()]
+
+    def _read(self, chrom: str, start: int, end: int) -> str:
+        length, offset, line_bases, line_width = self.index[chrom]
+        start, end = max(start, 0), min(end, length)
+        if start >= end:
+            return ""
+        first = offset + (start // line_bases) * line_width + start % line_bases
+        last = offset + ((end - 1) // line_bases) * line_width + (end - 1) % line_bases
+        self.handle.seek(first)
+        return self.handle.read(last - first + 1).decode().replace("\n", "").replace("\r", "")
+
+    def fetch(self, chrom: str, start: int, end: int) -> str:
+        """Return the uppercase reference bases in [start, end) (0-based)."""
+        if chrom not in self.index:
+            return ""
+        cached_chrom, block_start, block = self.cache
+        if cached_chrom != chrom or start < block_start or end > block_start + len(block):
+            block_start = max(start - self.BLOCK + (end - start), 0)
+            block = self._read(chrom, block_start, max(end, block_start + self.BLOCK)).upper()
+            self.cache = (chrom, block_start, block)
+        return block[start - block_start:end - block_start]
+
+    def close(self):
+        self.handle.close()
+
+
+class VcfReader:
+    """Reads the header of a VCF and iterates its records as lists of columns."""
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self.handle = open_vcf(path)
+        self.meta = []
+        self.samples = []
+        self.contigs = []
+        self.tumor_sample = None
+        self.normal_sample = None
+        for line in self.handle:
+            line = line.rstrip("\r\n")
+            if line.startswith("##"):
+                self.meta.append(line)
+                if line.startswith("##contig=<"):
+                    contig = STRUCTURED_META.match(line)
+                    if contig:
+                        self.contigs.append(contig.group(2))
+                elif line.startswith("##tumor_sample="):
+                    self.tumor_sample = line.split("=", 1)[1]
+                elif line.startswith("##normal_sample="):
+                    self.normal_sample = line.split("=", 1)[1]
+            elif line.startswith("#CHROM"):
+                self.samples = line.split("\t")[9:]
+                break
+            else:
+                raise ValueError(f"{path}: missing #CHROM header line")
+
+    def sample_columns(self) -> list[int | None]:
+        """Column indexes (into the sample columns) of the NORMAL and TUMOR samples."""
+        names = self.samples
+        if "NORMAL" in names or "TUMOR" in names:
+            return [names.index(s) if s in names else None for s in ("NORMAL", "TUMOR")]
+        if self.tumor_sample in names:
+            normal = names.index(self.normal_sample) if self.normal_sample in names else None
+            return [normal, names.index(self.tumor_sample)]
+        if len(names) == 1:
+            return [None, 0]
+        if len(names) == 2:
+            # same rule as the REHEADER module: the TCGB-style ID is the tumor
+            if TCGB_ID.match(names[0]) and not TCGB_ID.match(names[1]):
+                return [1, 0]
+            return [0, 1]
+        return [None, None]
+
+    def records(self):
+        for line in self.handle:
+            if line.startswith("#") or not line.strip():
+                continue
+            yield line.rstrip("\r\n").split("\t")
+
+    def close(self):
+        self.handle.close()
+
+
+def normalize(chrom: str, pos: int, ref: str, alts: list[str], fasta: FastaReference | None = None,
+              max_shift: int = 1000) -> tuple[int, str, list[str]]:
+    """Normalize a VCF allele set: trim shared bases and, with a reference, left-align indels.
+
+    Shared trailing bases are trimmed first (extending the alleles to the left from the
+    reference when an allele would become empty, which left-aligns indels by at most
+    max_shift bases), then shared leading bases. Alleles stay at least one base long.
+    Symbolic, breakend and spanning-deletion alleles are returned unchanged.
+    """
+    if not BASES.match(ref) or not all(BASES.match(alt) for alt in alts):
+        return pos, ref, alts
+
+    alleles = [ref.upper()] + [alt.upper() for alt in alts]
+    shifted = 0
+    while len({allele[-1] for allele in alleles}) == 1:
+        if min(len(allele) for allele in alleles) == 1:
+            if fasta is None or pos <= 1 or shifted >= max_shift:
+                break
+            base = fasta.fetch(chrom, pos - 2, pos - 1)
+            if not base:
+                break
+            alleles = [base + allele for allele in alleles]
+            pos -= 1
+            shifted += 1
+        alleles = [allele[:-1] for allele in alleles]
+
+    while min(len(allele) for allele in alleles) > 1 and len({allele[0] for allele in alleles}) == 1:
+        alleles = [allele[1:] for allele in alleles]
+        pos += 1
+
+    return pos, alleles[0], alleles[1:]
+
+
+def merge_header(readers: list[VcfReader], contigs: list[str], fasta: FastaReference | None,
+                 min_callers: int) -> list[str]:
+    """Union of the input headers (first definition of each ID wins) plus the consensus fields."""
+    fileformat = next((line for reader in readers for line in reader.meta if line.startswith("##fileformat=")),
+                      "##fileformat=VCFv4.2")
+    contig_lines = {}
+    seen = set()
+    meta = []
+    for reader in readers:
+        for line in reader.meta:
+            if line.startswith(("##fileformat=", "##tumor_sample=", "##normal_sample=")):
+                continue
+            structured = STRUCTURED_META.match(line)
+            if structured and structured.group(1) == "contig":
+                contig_lines.setdefault(structured.group(2), line)
+                continue
+            key = structured.groups() if structured else line
+            if key not in seen:
+                seen.add(key)
+                meta.append(line)
+
+    if not contig_lines and fasta is not None:
+        contig_lines = {name: f"##contig=<ID={name},length={length}>" for name, length in fasta.contigs()}
+
+    names = ",".join(reader.name for reader in readers)
+    return [
+        fileformat,
+        *meta,
+        '##INFO=<ID=CALLERS,Number=.,Type=String,Description="Variant callers that reported this site">',
+        '##INFO=<ID=NCALLERS,Number=1,Type=Integer,Description="Number of variant callers that reported this site">',
+        f"##consensus_calling=<Callers=\"{names}\",MinCallers={min_callers}>",
+        *(contig_lines[name] for name in contigs if name in contig_lines),
+        "##normal_sample=NORMAL",
+        "##tumor_sample=TUMOR",
+        "\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT", "NORMAL", "TUMOR"]),
+    ]
+
+
+def call_consensus(vcf_paths: list[str], output, names: list[str] | None = None, min_callers: int = 2,
+                   fasta_path: str | None = None, max_shift: int = 1000) -> int:
+    """Write the consensus of vcf_paths to the open text stream output; return the number of sites."""
+    names = names or [os.path.basename(path).split(".")[1] if path.count(".") > 1 else f"caller{i}"
+                      for i, path in enumerate(vcf_paths)]
+    if len(names) != len(vcf_paths):
+        raise ValueError("one caller name is required per input VCF")
+
+    fasta = FastaReference(fasta_path) if fasta_path else None
+    readers = [VcfReader(path, name) for path, name in zip(vcf_paths, names)]
+    try:
+        # contig order: reference index when given, else the headers (first file first)
+        contigs = [name for name, _ in fasta.contigs()] if fasta else []
+        for reader in readers:
+            contigs += [contig for contig in reader.contigs if contig not in contigs]
+        rank = {contig: i for i, contig in enumerate(contigs)}
+
+        def contig_rank(chrom: str) -> int:
+            if chrom not in rank:
+                rank[chrom] = len(rank)
+                contigs.append(chrom)
+            return rank[chrom]
+
+        def stream(caller: int, reader: VcfReader):
+            previous = (-1, 0)
+            for fields in reader.records():
+                key = (contig_rank(fields[0]), int(fields[1]))
+                if key < previous:
+                    raise ValueError(f"{reader.path} is not coordinate sorted (at {fields[0]}:{fields[1]})")
+                previous = key
+                yield key[0], key[1], caller, fields
+
+        columns = [reader.sample_columns() for reader in readers]
+        for line in merge_header(readers, contigs, fasta, min_callers):
+            output.write(line + "\n")
+
+        margin = max_shift if fasta else 0
+        pending = {}   # normalized site -> [caller flags, (caller, record) to write]
+        order = []     # heap of pending sites
+        written = 0
+
+        def flush(until: tuple[int, int] | None):
+            nonlocal written
+            while order and (until is None or order[0][0] < until[0] or order[0][1] < until[1] - margin):
+                site = heapq.heappop(order)
+                callers, (caller, fields) = pending.pop(site)
+                if sum(callers) >= min_callers:
+                    output.write(format_record(site, callers, caller, fields) + "\n")
+                    written += 1
+
+        def format_record(site, callers, caller, fields):
+            _, pos, ref, alt = site
+            supported = [name for name, called in zip(names, callers) if called]
+            tags = f"CALLERS={','.join(supported)};NCALLERS={len(supported)}"
+            info = fields[7] if len(fields) > 7 and fields[7] not in ("", ".") else ""
+            samples = fields[9:]
+            sample_values = [samples[i] if i is not None and i < len(samples) else "." for i in columns[caller]]
+            return "\t".join([fields[0], str(pos), fields[2], ref, alt, fields[5], fields[6],
+                              f"{info};{tags}" if info else tags,
+                              fields[8] if len(fields) > 8 else ".", *sample_values])
+
+        streams = [stream(caller, reader) for caller, reader in enumerate(readers)]
+        for contig, raw_pos, caller, fields in heapq.merge(*streams, key=lambda record: record[:2]):
+            flush((contig, raw_pos))
+            pos, ref, alts = normalize(fields[0], raw_pos, fields[3], fields[4].split(","), fasta, max_shift)
+            site = (contig, pos, ref, ",".join(alts))
+            if site not in pending:
+                pending[site] = [[False] * len(readers), (caller, fields)]
+                heapq.heappush(order, site)
+            entry = pending[site]
+            if not entry[0][caller]:
+                entry[0][caller] = True
+                if caller < entry[1][0]:
+                    entry[1] = (caller, fields)
+        flush(None)
+        return written
+    finally:
+        for reader in readers:
+            reader.close()
+        if fasta:
+            fasta.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Streaming consensus of per-caller VCFs for the WESley consensus calling pipeline"
+    )
+    parser.add_argument("vcfs", nargs="+", help="Coordinate-sorted caller VCFs (.vcf or .vcf.gz), highest priority first")
+    parser.add_argument("-o", "--output", type=str, default="-", help="Output VCF path (default: stdout)")
+    parser.add_argument(
+        "--names", type=str,
+        help="Comma-separated caller names, one per VCF (default: second dot-field of each file name)"
+    )
+    parser.add_argument("--min_callers", type=int, default=2, help="Minimum number of supporting callers (default: 2)")
+    parser.add_argument("--fasta", type=str, help="Indexed reference FASTA; enables indel left-alignment")
+    parser.add_argument(
+        "--max_shift", type=int, default=1000,
+        help="Maximum distance an indel is left-aligned, which bounds the reorder buffer (default: 1000)"
+    )
+
+    args = parser.parse_args()
+    names = args.names.split(",") if args.names else None
+
+    if args.output == "-":
+        written = call_consensus(args.vcfs, sys.stdout, names, args.min_callers, args.fasta, args.max_shift)
+    else:
+        with open(args.output, "w") as output:
+            written = call_consensus(args.vcfs, output, names, args.min_callers, args.fasta, args.max_shift)
+    print(f"Consensus sites written: {written}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
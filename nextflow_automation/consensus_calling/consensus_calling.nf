@@ -7,6 +7,7 @@ This is the main nextflow module which conducts the workflow for Consensus Calli
 nextflow.enable.dsl = 2
 
 // import modules
+include { CALL_CONSENSUS } from './modules/call_consensus.nf'
 include { SORT_VCFS } from './modules/sort_vcfs.nf'
 include { REHEADER } from './modules/reheader.nf'
 include { INDEX } from './modules/index.nf'
@@ -14,10 +15,11 @@ include { INTERSECT } from './modules/intersect.nf'
 include { MERGE_VCFS } from './modules/merge_vcfs.nf'
 include { NORM_INDELS } from './modules/norm_indels.nf'
 include { VEP } from './modules/vep.nf'
+include { VEP_SITES; VEP_JOIN } from './modules/vep_store.nf'
 include { CREATE_MAF } from './modules/create_maf.nf'
-include { KEEP_NONSYNONYMOUS } from './modules/keep_nonsynonymous.nf'
-include { RENAME_HG38 } from './modules/rename_hg38.nf'
+include { PROCESS_MAF } from './modules/process_maf.nf'
 include { ONCOKB } from './modules/oncokb.nf'
+include { CATALOG_RECORD; CATALOG_QUERY; catalog_inputs; with_catalog } from './modules/catalog.nf'
 
 // main workflow
 workflow {
@@ -35,6 +37,21 @@ workflow {
         
         Optional arguments:
         --cpus                        Number of CPUs to use for processing (default: 30)
+        --min_callers                 Minimum number of callers supporting a consensus site (default: 2)
+        --left_align_indels           Left-align indels against the reference before matching sites (default: false)
+        --consensus_engine            'streaming' (single call_consensus.py task after SORT_VCFS) or 'bcftools' (reheader/isec/merge/norm chain)
+        --compress_vcfs               Write the sorted VCFs bgzipped, kept compressed by the 'bcftools' engine (default: false)
+        --nonsynonymous_list          Variant classifications/consequences to filter out (default: <ref_dir>/nonsynonymous.txt)
+        --oncokb_cache_dir            Directory the shared OncoKB annotation cache is published to (default: <ref_dir>/oncokb_cache)
+        --oncokb_cache                OncoKB caches to read, may be a glob (default: <oncokb_cache_dir>/oncokb_cache*.sqlite)
+        --vep_cache_version           VEP cache release for new consensus sites (default: 115, as in mutation calling)
+        --vep_store_dir               Directory the shared VEP annotation store is published to (default: <ref_dir>/vep_store)
+        --vep_store                   VEP annotation stores to read, may be a glob (default: <vep_store_dir>/vep_store*.sqlite)
+        --catalog_dir                 Directory of the output catalog (default: <ref_dir>/output_catalog)
+        --from_catalog                Take the caller VCFs below --base_dir from the output catalog instead of
+                                      searching the directory (default: false)
+        --catalog_scan                With --from_catalog, search --base_dir anyway, taking the VCFs' sample IDs
+                                      from the catalog and warning about VCFs it is missing (default: false)
         --help                        Show this help message and exit
         
         Examples:
@@ -52,6 +69,11 @@ workflow {
     }
 
     // Parameter validation
+    if (!(params.consensus_engine in ['streaming', 'bcftools'])) {
+        error "ERROR: --consensus_engine must be 'streaming' or 'bcftools'"
+        exit 1
+    }
+
     if (!params.base_dir) {
         error "ERROR: --base_dir parameter is required"
         exit 1
@@ -82,15 +104,42 @@ workflow {
     // Start of main workflow //
     ////////////////////////////
 
-    // channel in vcfs from 3 different variant callers (Mutect2, MuSE, VarScan2)
-    mutect2_vcfs = channel.fromPath("${params.base_dir}/**/*mutect2.paired.vep.vcf*")
-        .map { file -> [file.baseName.replaceAll(/\.mutect2.*/, ''), file] }
-    
-    muse_vcfs = channel.fromPath("${params.base_dir}/**/*MuSE.vep.vcf*")
-        .map { file -> [file.baseName.replaceAll(/\.MuSE.*/, ''), file] }
-    
-    varscan_vcfs = channel.fromPath("${params.base_dir}/**/*varscan2.vep.vcf*")
-        .map { file -> [file.baseName.replaceAll(/\.varscan2.*/, ''), file] }
+    catalog_script = file("${projectDir}/../catalog/catalog.py")
+    catalog_dir = params.catalog_dir ?: "${params.ref_dir}/output_catalog"
+    catalogs = files("${catalog_dir}/output_catalog*.sqlite").findAll { it.exists() }
+
+    if (params.from_catalog) {
+        // the caller VCFs mutation calling recorded in the output catalog below --base_dir
+        if (!catalogs) {
+            error "ERROR: --from_catalog needs the output catalog in ${catalog_dir}"
+        }
+        catalog_vcfs = CATALOG_QUERY(catalog_script, catalogs, ['vep_vcf'], file(params.base_dir).toString())
+    }
+
+    if (params.from_catalog && !params.catalog_scan) {
+        // take the VCFs from the catalog rows only; --base_dir is not walked
+        cataloged_vcfs = catalog_inputs(catalog_vcfs)
+        mutect2_vcfs = cataloged_vcfs.filter { sample_id, file -> file.name =~ /mutect2\.paired\.vep\.vcf/ }
+        muse_vcfs = cataloged_vcfs.filter { sample_id, file -> file.name =~ /MuSE\.vep\.vcf/ }
+        varscan_vcfs = cataloged_vcfs.filter { sample_id, file -> file.name =~ /varscan2\.vep\.vcf/ }
+    } else {
+        // channel in vcfs from 3 different variant callers (Mutect2, MuSE, VarScan2)
+        mutect2_vcfs = channel.fromPath("${params.base_dir}/**/*mutect2.paired.vep.vcf*")
+            .map { file -> [file.baseName.replaceAll(/\.mutect2.*/, ''), file] }
+
+        muse_vcfs = channel.fromPath("${params.base_dir}/**/*MuSE.vep.vcf*")
+            .map { file -> [file.baseName.replaceAll(/\.MuSE.*/, ''), file] }
+
+        varscan_vcfs = channel.fromPath("${params.base_dir}/**/*varscan2.vep.vcf*")
+            .map { file -> [file.baseName.replaceAll(/\.varscan2.*/, ''), file] }
+    }
+
+    if (params.from_catalog && params.catalog_scan) {
+        // take the sample IDs mutation calling recorded in the output catalog; VCFs it is missing are warned about
+        mutect2_vcfs = with_catalog(mutect2_vcfs, catalog_vcfs)
+        muse_vcfs = with_catalog(muse_vcfs, catalog_vcfs)
+        varscan_vcfs = with_catalog(varscan_vcfs, catalog_vcfs)
+    }
 
     // combine all three caller results by sample_id
     vcfs = mutect2_vcfs
@@ -100,36 +149,66 @@ workflow {
             [sample_id, mutect2_vcf, muse_vcf, varscan_vcf]
         }
     
-    // sort vcfs
+    // sort vcfs (both engines need coordinate-sorted inputs)
     sorted_vcfs = SORT_VCFS(vcfs)
 
-    // reheader the vcfs
-    reheadered_vcfs = REHEADER(sorted_vcfs)
+    if (params.consensus_engine == 'bcftools') {
+        // reheader the vcfs
+        reheadered_vcfs = REHEADER(sorted_vcfs)
 
-    // compress and index vcfs
-    compressed_vcfs = INDEX(reheadered_vcfs)
+        // compress and index vcfs
+        compressed_vcfs = INDEX(reheadered_vcfs)
 
-    // bcftools intersect for consensus filtering
-    consensus_vcfs = INTERSECT(compressed_vcfs)
+        // bcftools intersect for consensus filtering
+        consensus_vcfs = INTERSECT(compressed_vcfs)
 
-    // merge vcfs
-    merged_consensus_vcfs = MERGE_VCFS(consensus_vcfs)
+        // merge vcfs
+        merged_consensus_vcfs = MERGE_VCFS(consensus_vcfs)
 
-    // delete duplicates using indel normalization
-    filtered_consensus_vcfs = NORM_INDELS(merged_consensus_vcfs)
+        // delete duplicates using indel normalization
+        filtered_consensus_vcfs = NORM_INDELS(merged_consensus_vcfs)
+    } else {
+        // merge, normalize and filter the caller vcfs in a single streaming pass
+        filtered_consensus_vcfs = CALL_CONSENSUS(sorted_vcfs, file("${projectDir}/call_consensus.py"))
+    }
+
+    // vep annotation: only consensus sites without annotations that are not in the shared store go to VEP
+    vep_store_script = file("${projectDir}/../mutation_calling/vep_store.py")
+    vep_store_dir = params.vep_store_dir ?: "${params.ref_dir}/vep_store"
+    vep_store = files(params.vep_store ?: "${vep_store_dir}/vep_store*.sqlite").findAll { it.exists() }
 
-    // vep annotation
-    annotated_consensus_vcfs = VEP(filtered_consensus_vcfs)
+    consensus_vcf_files = filtered_consensus_vcfs.map { sample_id, vcf -> vcf }.collect()
+    annotated_sites = VEP(VEP_SITES(consensus_vcf_files, vep_store_script, vep_store))
+    annotated_consensus_vcfs = VEP_JOIN(consensus_vcf_files, annotated_sites, vep_store_script, vep_store, vep_store_dir).vcfs
+        .flatten()
+        .map { vcf -> tuple(vcf.name.replaceAll(/\.consensus\..*/, ''), vcf) }
 
     // generate MAF files
     consensus_mafs = CREATE_MAF(annotated_consensus_vcfs)
 
-    // remove synonymous variant calls
-    filtered_consensus_mafs = KEEP_NONSYNONYMOUS(consensus_mafs)
-
-    // rename hg38
-    renamed_consensus_mafs = RENAME_HG38(filtered_consensus_mafs)
-
-    // oncokb annotation
-    ONCOKB(renamed_consensus_mafs)
+    // remove synonymous variant calls and rename hg38 in a single pass
+    nonsynonymous_list = file(params.nonsynonymous_list ?: "${params.ref_cache ?: params.ref_dir}/nonsynonymous.txt")
+    renamed_consensus_mafs = PROCESS_MAF(consensus_mafs, nonsynonymous_list, file("${projectDir}/../mutation_calling/process_mafs.py"))
+
+    // oncokb annotation (one batched task, shared cache with mutation calling)
+    oncokb_cache_dir = params.oncokb_cache_dir ?: "${params.ref_dir}/oncokb_cache"
+    oncokb_cache = files(params.oncokb_cache ?: "${oncokb_cache_dir}/oncokb_cache*.sqlite").findAll { it.exists() }
+    ONCOKB(
+        renamed_consensus_mafs.map { sample_id, maf -> maf }.collect(),
+        file("${projectDir}/../mutation_calling/annotate_oncokb.py"),
+        oncokb_cache,
+        oncokb_cache_dir
+    )
+
+    // record the consensus VEP-annotated VCFs in the output catalog
+    consensus_vcf_dir = "${params.base_dir}/mutation_calls/consensus/vep_annotated_vcfs"
+    CATALOG_RECORD(
+        annotated_consensus_vcfs
+            .map { sample_id, vcf -> [sample_id, 'consensus', 'vep_vcf', file("${consensus_vcf_dir}/${vcf.name}"), vcf.name].join('\t') }
+            .collectFile(name: 'catalog_entries.tsv', newLine: true, sort: true),
+        annotated_consensus_vcfs.map { sample_id, vcf -> vcf }.collect(),
+        catalog_script,
+        'consensus_calling',
+        catalog_dir
+    )
 }
\ No newline at end of file
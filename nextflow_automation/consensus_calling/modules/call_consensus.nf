@@ -0,0 +1,40 @@
+/*
+call_consensus.nf module
+
+This module builds the consensus VCF in a single task with call_consensus.py: the
+sorted Mutect2, MuSE and VarScan2 VCFs (from SORT_VCFS) are streamed as a k-way merge by position, records are
+normalized on the fly and sites called by at least params.min_callers callers are kept.
+
+Replaces REHEADER -> INDEX -> INTERSECT -> MERGE_VCFS -> NORM_INDELS.
+
+Python version: 3.10.
+*/
+
+process CALL_CONSENSUS {
+    tag "${sample_id}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'medTime'
+
+    input:
+    tuple val(sample_id), path(mutect2_vcf), path(muse_vcf), path(varscan2_vcf)
+    path consensus_script
+
+    output:
+    tuple val(sample_id), path("${sample_id}.consensus.norm.vcf")
+
+    script:
+    def fasta_arg = (params.left_align_indels ? "--fasta /references/Homo_sapiens_assembly38.fasta" : "")
+
+    """
+    # stream the caller vcfs into a single consensus vcf
+    python3 ${consensus_script} \\
+        --names mutect2,MuSE,varscan2 \\
+        --min_callers ${params.min_callers} \\
+        ${fasta_arg} \\
+        -o "${sample_id}.consensus.norm.vcf" \\
+        $mutect2_vcf \\
+        $muse_vcf \\
+        $varscan2_vcf
+    """
+}
@@ -1,7 +1,8 @@
 /*
 index.nf
 
-This module compresses and indexes the sorted vcfs.
+This module compresses and indexes the sorted vcfs. VCFs that are already
+bgzipped (--compress_vcfs) are only indexed.
 
 samtools version: 1.10.
 */
@@ -17,19 +18,24 @@ process INDEX {
     tuple val(sample_id), path(mutect2_vcf), path(muse_vcf), path(varscan2_vcf)
 
     output:
-    tuple val(sample_id), path("*mutect2*.vcf.gz"), path("*mutect2*.vcf.gz.tbi"), path("*MuSE*.vcf.gz"), path("*MuSE*.vcf.gz.tbi"), path("*varscan2*.vcf.gz"), path("*varscan2*.vcf.gz.tbi")
+    tuple val(sample_id), path("*mutect2*.vcf.gz", includeInputs: true), path("*mutect2*.vcf.gz.tbi"), path("*MuSE*.vcf.gz", includeInputs: true), path("*MuSE*.vcf.gz.tbi"), path("*varscan2*.vcf.gz", includeInputs: true), path("*varscan2*.vcf.gz.tbi")
 
     script:
+    def vcfs = [mutect2_vcf, muse_vcf, varscan2_vcf]
+    def compressed_vcfs = vcfs.collect { vcf -> vcf.name.endsWith(".gz") ? "${vcf}" : "${vcf}.gz" }
+
     """
-    # compress vcfs
-    bgzip $mutect2_vcf
-    bgzip $muse_vcf
-    bgzip $varscan2_vcf
+    # compress vcfs (unless already bgzipped)
+    for vcf in ${vcfs.join(' ')}; do
+        if [[ "\$vcf" != *.gz ]]; then
+            bgzip "\$vcf"
+        fi
+    done
 
     # index compressed vcfs
-    tabix "${mutect2_vcf}.gz"
-    tabix "${muse_vcf}.gz"
-    tabix "${varscan2_vcf}.gz"
+    for vcf in ${compressed_vcfs.join(' ')}; do
+        tabix -f "\$vcf"
+    done
     """
 
 }
\ No newline at end of file
@@ -17,13 +17,14 @@ process INTERSECT {
     tuple val(sample_id), path(mutect2_vcf), path(mutect2_index), path(muse_vcf), path(muse_index), path(varscan2_vcf), path(varscan2_index)
 
     output:
-    tuple val(sample_id), path("**/0000.vcf"), path("**/0001.vcf"), path("**/0002.vcf")
+    tuple val(sample_id), path("**/0000.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("**/0001.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("**/0002.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}")
 
     script:
     """
-    # create consensus vcfs
+    # create consensus vcfs (bgzipped and indexed with --compress_vcfs)
     bcftools isec -n +2 -p \
     $sample_id \
+    -O ${params.compress_vcfs ? 'z' : 'v'} \
     $mutect2_vcf \
     $muse_vcf \
     $varscan2_vcf
@@ -2,7 +2,7 @@
 norm_indels.nf
 
 This module normalizes the vcf files and deletes duplicates using
-bcftools norm.
+bcftools norm. With --compress_vcfs, the output stays bgzipped.
 
 bcftools version 1.10.2
 */
@@ -17,14 +17,16 @@ process NORM_INDELS {
     tuple val(sample_id), path(consensus_vcf), path(consensus_index)
 
     output:
-    tuple val(sample_id), path("${sample_id}.consensus.norm.vcf")
+    tuple val(sample_id), path("${sample_id}.consensus.norm.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}")
 
     script:
+    def vcf_ext = (params.compress_vcfs ? "vcf.gz" : "vcf")
+
     """
     # merge the vcfs
     bcftools norm $consensus_vcf \
     -d none \
-    -O v \
-    -o "${sample_id}.consensus.norm.vcf"
+    -O ${params.compress_vcfs ? 'z' : 'v'} \
+    -o "${sample_id}.consensus.norm.${vcf_ext}"
     """
 }
\ No newline at end of file
@@ -2,33 +2,47 @@
 oncokb.nf
 
 This module provides clinically relevant annotations to the variant calling MAF files
-using Oncokb.
+using OncoKB.
+
+All consensus MAFs are annotated by a single task with 'annotate_oncokb.py' (shared
+with the mutation calling workflow), which serves repeated gene/protein changes from
+the persistent OncoKB caches and sends only cache misses to the API, in batches. The
+annotations it fetches are published as a cache of the run's own, renamed to the run's
+name only when published so the run name stays out of the task hash.
 
 Oncokb Version: 3.0.0.
 */
 
 process ONCOKB {
-    tag "${sample_id}"
+    tag "batch"
     publishDir "${params.base_dir}/mutation_calls/consensus/oncokb_annotation", mode: 'copy', pattern: "*vep.nonsynonymous.oncokb.maf"
+    publishDir "${cache_dir}", mode: 'copy', pattern: "oncokb_cache.run.sqlite",
+        saveAs: { name -> "oncokb_cache.${workflow.runName}.sqlite" }
     label 'lowCpu'
     label 'lowMem'
     label 'medTime'
     secret 'ONCOKB_API_KEY'
 
     input:
-    tuple val(sample_id), path(nonsyno_maf)
+    path(nonsyno_mafs)
+    path oncokb_script
+    path(previous_caches, stageAs: "previous/*")
+    val cache_dir
 
     output:
-    tuple val(sample_id), path("*vep.nonsynonymous.oncokb.maf")
+    path("*vep.nonsynonymous.oncokb.maf")
+    path("oncokb_cache.run.sqlite")
 
     script:
     """
-    # annotate via oncokb
-    python /app/MafAnnotator.py \
-    -i $nonsyno_maf \
-    -o "${sample_id}.consensus.vep.nonsynonymous.oncokb.maf" \
+    # annotate via oncokb; fetched annotations go to this run's own cache and the shared
+    # caches are only read, so runs annotating at the same time never overwrite each other
+    python ${oncokb_script} annotate \
+    --cache oncokb_cache.run.sqlite \
+    --previous ${previous_caches} \
     -r GRCh38 \
     -b "\$ONCOKB_API_KEY" \
-    -t BRAIN
+    -t BRAIN \
+    ${nonsyno_mafs}
     """
-}
\ No newline at end of file
+}
@@ -0,0 +1,34 @@
+/*
+process_maf.nf module
+
+This module filters synonymous mutations out of the consensus MAF files and renames
+all instances of 'hg38' to 'GRCh38' in a single pass with 'process_mafs.py' (shared
+with the mutation calling workflow), replacing the KEEP_NONSYNONYMOUS and RENAME_HG38
+tasks. Terms in 'nonsynonymous.txt' are matched against the Variant_Classification and
+Consequence columns only.
+
+Python version: 3.10
+*/
+
+process PROCESS_MAF {
+    tag "${sample_id}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    tuple val(sample_id), path(maf_file)
+    path nonsynonymous_list
+    path process_script
+
+    output:
+    tuple val(sample_id), path("*vep.nonsynonymous.rename.maf")
+
+    script:
+    """
+    python3 ${process_script} \\
+        --maf ${maf_file} \\
+        --nonsynonymous_list ${nonsynonymous_list} \\
+        --renamed "${sample_id}.consensus.vep.nonsynonymous.rename.maf"
+    """
+}
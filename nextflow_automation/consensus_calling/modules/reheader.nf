@@ -2,7 +2,8 @@
 reheader.nf module
 
 This module renames the headers of each vcf file as it is important for 
-downstream tools like 'bcftools isec'.
+downstream tools like 'bcftools isec'. Bgzipped inputs (--compress_vcfs)
+stay bgzipped.
 
 bcftools version: 1.10.
 */
@@ -17,12 +18,14 @@ process REHEADER {
     tuple val(sample_id), path(mutect2_vcf), path(muse_vcf), path(varscan2_vcf)
     
     output:
-    tuple val(sample_id), path("${sample_id}.mutect2.reheader.vcf"), path("${sample_id}.MuSE.reheader.vcf"), path("${sample_id}.varscan2.reheader.vcf")
+    tuple val(sample_id), path("${sample_id}.mutect2.reheader.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("${sample_id}.MuSE.reheader.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("${sample_id}.varscan2.reheader.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}")
 
     script:
+    def vcf_ext = (params.compress_vcfs ? "vcf.gz" : "vcf")
+
     """
     # extract header
-    chrom_line=\$(grep "^#CHROM" "${mutect2_vcf}")
+    chrom_line=\$(bcftools view -h "${mutect2_vcf}" | grep "^#CHROM")
 
     # parse sample names
     sample1=\$(echo "\$chrom_line" | awk '{print \$10}')
@@ -33,14 +36,14 @@ process REHEADER {
         # write/append to text files and rearrange columns
         echo "\$sample2" > column-order.txt
         echo "\$sample1" >> column-order.txt
-        bcftools view "${mutect2_vcf}" -S "column-order.txt" > "${sample_id}.mutect2.recolumn.vcf"
+        bcftools view "${mutect2_vcf}" -S "column-order.txt" -O ${params.compress_vcfs ? 'z' : 'v'} -o "${sample_id}.mutect2.recolumn.${vcf_ext}"
 
         # write text files and reheader the vcfs
         echo "\$sample2 NORMAL" > reheader.txt
         echo "\$sample1 TUMOR" >> reheader.txt
-        bcftools reheader "${sample_id}.mutect2.recolumn.vcf" \\
+        bcftools reheader "${sample_id}.mutect2.recolumn.${vcf_ext}" \\
             -s "reheader.txt" \\
-            -o "${sample_id}.mutect2.reheader.vcf"
+            -o "${sample_id}.mutect2.reheader.${vcf_ext}"
 
     # Case: Normal Short Lab ID, TCGB ID Tumor ID
     elif [[ "\$sample2" =~ ^[0-9]+[A-Z]?-[0-9]+\$ ]]; then        
@@ -49,15 +52,15 @@ process REHEADER {
         echo "\$sample2 TUMOR" >> reheader.txt
         bcftools reheader "${mutect2_vcf}" \\
             -s "reheader.txt" \\
-            -o "${sample_id}.mutect2.reheader.vcf"
+            -o "${sample_id}.mutect2.reheader.${vcf_ext}"
 
     else
         echo "No pattern matched, copying original file"
-        cp "${mutect2_vcf}" "${sample_id}.mutect2.reheader.vcf"
+        cp "${mutect2_vcf}" "${sample_id}.mutect2.reheader.${vcf_ext}"
     fi
 
     # rename muse and varscan2 vcfs for consistent naming
-    cp "${muse_vcf}" "${sample_id}.MuSE.reheader.vcf"
-    cp "${varscan2_vcf}" "${sample_id}.varscan2.reheader.vcf"
+    cp "${muse_vcf}" "${sample_id}.MuSE.reheader.${vcf_ext}"
+    cp "${varscan2_vcf}" "${sample_id}.varscan2.reheader.${vcf_ext}"
     """
 }
\ No newline at end of file
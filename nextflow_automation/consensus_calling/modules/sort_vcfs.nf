@@ -3,6 +3,7 @@ sort_vcfs.nf module
 
 This module sorts the records in VCF files according to the order 
 of the contigs in the header/sequence dictionary and then by coordinate. 
+With --compress_vcfs, the sorted VCFs are written bgzipped.
 
 GATK Version: 4.2.0.0
 */
@@ -17,13 +18,15 @@ process SORT_VCFS {
     tuple val(sample_id), path(mutect2_vcf), path(muse_vcf), path(varscan2_vcf)
 
     output:
-    tuple val(sample_id), path("${sample_id}.mutect2.gatk-sort.vcf"), path("${sample_id}.muse.gatk-sort.vcf"), path("${sample_id}.varscan2.gatk-sort.vcf")
+    tuple val(sample_id), path("${sample_id}.mutect2.gatk-sort.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("${sample_id}.muse.gatk-sort.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("${sample_id}.varscan2.gatk-sort.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}")
 
     script:
+    def vcf_ext = (params.compress_vcfs ? "vcf.gz" : "vcf")
+
     """
     # sort the vcfs
-    gatk SortVcf -I $mutect2_vcf -O "${sample_id}.mutect2.gatk-sort.vcf"
-    gatk SortVcf -I $muse_vcf -O "${sample_id}.muse.gatk-sort.vcf"
-    gatk SortVcf -I $varscan2_vcf -O "${sample_id}.varscan2.gatk-sort.vcf"
+    gatk SortVcf -I $mutect2_vcf -O "${sample_id}.mutect2.gatk-sort.${vcf_ext}"
+    gatk SortVcf -I $muse_vcf -O "${sample_id}.muse.gatk-sort.${vcf_ext}"
+    gatk SortVcf -I $varscan2_vcf -O "${sample_id}.varscan2.gatk-sort.${vcf_ext}"
     """
 }
\ No newline at end of file
@@ -1,33 +1,42 @@
 /* 
 vep.nf module
 
-This module inputs the selected variant vcf files and annotates them for biological
-effects, phenotype association, allele frequency reporting, and deleteriousness predictions using VEP.
+This module annotates variants for biological effects, phenotype association, allele
+frequency reporting, and deleteriousness predictions using VEP.
 
-Ensembl VEP Version: 106.
-VEP Cache Version: 103.
+VEP runs once per batch on the sites VCF written by VEP_SITES: consensus sites taken
+from the (already annotated) caller VCFs keep their annotations, and sites found in the
+shared VEP annotation store are joined on by VEP_JOIN, so usually few or no variants
+are left to annotate here. See vep_store.nf.
+
+Ensembl VEP Version: 115.
+VEP Cache Version: 115.
 */
 
 process VEP {
-    tag "${sample_id}"
-    publishDir "${params.base_dir}/mutation_calls/consensus/vep_annotated_vcfs", mode: 'copy', pattern: "*vep.vcf"
+    tag "batch"
     label 'medCpu'
     label 'medMem'
     label 'medTime'
 
     input:
-    tuple val(sample_id), path(consensus_vcf)
+    path sites_vcf
 
     output:
-    tuple val(sample_id), path("${sample_id}.consensus.vep.vcf")
+    path("vep_sites.vep.vcf")
 
     script:
     """
-    # annotate via VEP
+    # annotate via VEP (a batch without new variants only needs the header copied)
+    if ! grep -qv '^#' ${sites_vcf}; then
+        cp ${sites_vcf} vep_sites.vep.vcf
+        exit 0
+    fi
+
     vep \
     --vcf \
-    --input_file $consensus_vcf \
-    --output_file "${sample_id}.consensus.vep.vcf" \
+    --input_file ${sites_vcf} \
+    --output_file vep_sites.vep.vcf \
     --everything \
     --species homo_sapiens \
     --no_stats \
@@ -36,6 +45,6 @@ process VEP {
     --offline \
     --fasta /references/Homo_sapiens_assembly38.fasta \
     --dir_cache /opt/vep/.vep \
-    --cache_version 103
+    --cache_version ${params.vep_cache_version}
     """
-}
\ No newline at end of file
+}
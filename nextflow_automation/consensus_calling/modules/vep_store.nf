@@ -0,0 +1,72 @@
+/*
+vep_store.nf module
+
+This module deduplicates VEP annotation of the consensus VCFs with 'vep_store.py'
+(shared with the mutation calling workflow) and the persistent VEP annotation store:
+  - VEP_SITES writes the consensus sites that carry no CSQ annotation yet and are not
+    in the store into one sites VCF for VEP
+  - VEP_JOIN loads the VEP output into the store and joins the annotations onto every
+    consensus VCF ('*.consensus.vep.vcf')
+
+The annotations a run adds are published to 'store_dir' as a store of its own.
+
+Python version: 3.10
+*/
+
+process VEP_SITES {
+    tag "batch"
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+
+    input:
+    path(consensus_vcfs)
+    path vep_store_script
+    path(previous_stores, stageAs: "previous/*")
+
+    output:
+    path("vep_sites.vcf")
+
+    script:
+    """
+    python3 ${vep_store_script} sites \\
+        --store "vep_store.${workflow.runName}.sqlite" \\
+        --previous ${previous_stores} \\
+        --release ${params.vep_cache_version} \\
+        -o vep_sites.vcf \\
+        ${consensus_vcfs}
+    """
+}
+
+process VEP_JOIN {
+    tag "batch"
+    publishDir "${params.base_dir}/mutation_calls/consensus/vep_annotated_vcfs", mode: 'copy', pattern: "*consensus.vep.vcf"
+    publishDir "${store_dir}", mode: 'copy', pattern: "vep_store.*.sqlite"
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+
+    input:
+    path(consensus_vcfs)
+    path annotated_sites
+    path vep_store_script
+    path(previous_stores, stageAs: "previous/*")
+    val store_dir
+
+    output:
+    path("*.consensus.vep.vcf"), emit: vcfs
+    path("vep_store.${workflow.runName}.sqlite"), emit: store
+
+    script:
+    """
+    # new annotations go to this run's own store and the shared stores are only read,
+    # so runs annotating at the same time never overwrite each other
+    python3 ${vep_store_script} join \\
+        --store "vep_store.${workflow.runName}.sqlite" \\
+        --previous ${previous_stores} \\
+        --release ${params.vep_cache_version} \\
+        --annotated ${annotated_sites} \\
+        --rename norm=vep \\
+        ${consensus_vcfs}
+    """
+}
@@ -6,11 +6,15 @@ include { SPLIT } from './modules/bbsplit.nf'
 include { BWA_ALIGN } from './modules/align.nf'
 include { MARK_DUPES } from './modules/mark_duplicates.nf'
 include { SET_TAGS } from './modules/set_tags.nf'
-include { RECAL_BASES } from './modules/recal_bases.nf'
-include { APPLY_BQSR } from './modules/apply_BQSR.nf'
+include { RECAL_BASES; RECAL_BASES_SHARD; GATHER_BQSR_REPORTS } from './modules/recal_bases.nf'
+include { APPLY_BQSR; APPLY_BQSR_SHARD } from './modules/apply_BQSR.nf'
+include { SPLIT_INTERVALS } from './modules/split_intervals.nf'
+include { GATHER_BAMS } from './modules/gather_bams.nf'
+include { CONVERT_CRAM } from './modules/convert_cram.nf'
 include { FASTQC } from './modules/fastqc.nf'
 include { MULTIQC } from './modules/multiqc.nf'
 include { CALC_COVERAGE } from './modules/calc_coverage.nf'
+include { CATALOG_RECORD } from './modules/catalog.nf'
 
 
 // main workflow
@@ -33,6 +37,13 @@ workflow DATA_PROCESSING {
 
         Optional arguments:
         --cpus                        Number of CPUs to use for processing (default: 30)
+        --sort_threads                Threads for the samtools sort fed by BWA-mem, out of the task CPUs (default: a quarter of them)
+        --sort_memory                 Per-thread memory for that sort, e.g. 1G (default: derived from task memory)
+        --scatter_count               Number of contig shards to scatter BQSR across, without Spark (default: 1, no scatter)
+        --set_tags_in_bqsr            With --scatter_count > 1, set NM/MD/UQ tags per shard in ApplyBQSR instead of SET_TAGS (default: false)
+        --cram                        Publish the analysis-ready alignments as reference-compressed CRAMs instead of BAMs (default: false)
+        --ref_cache                   Node-local reference view from ref_cache.py, mounted read-only instead of --ref_dir
+        --catalog_dir                 Directory of the output catalog the analysis-ready BAMs are recorded in (default: <ref_dir>/output_catalog)
         --help                        Show this help message and exit
         """
         
@@ -171,14 +182,55 @@ workflow DATA_PROCESSING {
     // merge BAMs and mark duplicates
     marked_bams = MARK_DUPES(sorted_bams)
 
-    // set up tags for the BAMs and combine with reference directory
-    tagged_bams = SET_TAGS(marked_bams)
+    if (params.scatter_count > 1) {
+        // split the genome into balanced shards of whole contigs
+        SPLIT_INTERVALS(params.scatter_count)
+        bqsr_shards = SPLIT_INTERVALS.out.shards
+        n_shards = bqsr_shards.map { shards -> [shards].flatten().size() }
 
-    // recalibrate base quality scores and combine with reference directory
-    recal_data_tables = RECAL_BASES(tagged_bams)
+        // set tags up front, or per shard during ApplyBQSR
+        tagged_bams = params.set_tags_in_bqsr ? marked_bams : SET_TAGS(marked_bams)
 
-    // apply the BQSR algorithm
-    analysis_ready_bams = APPLY_BQSR(recal_data_tables)
+        // recalibrate base quality scores per shard and gather the reports into one table
+        recal_shards = RECAL_BASES_SHARD(tagged_bams, bqsr_shards)
+            .combine(n_shards)
+            .map { sample_id, table, n -> tuple(groupKey(sample_id, n), table) }
+            .groupTuple(by: 0)
+            .map { key, tables -> tuple(key.getGroupTarget(), tables) }
+        recal_data_tables = GATHER_BQSR_REPORTS(recal_shards)
+
+        // apply the BQSR algorithm per shard (plus the unmapped reads) and gather the analysis-ready BAM
+        apply_shards = bqsr_shards.combine(SPLIT_INTERVALS.out.unmapped)
+            .map { shards_and_unmapped -> shards_and_unmapped.flatten() }
+        n_apply_shards = apply_shards.map { shards -> shards.size() }
+
+        bqsr_bam_shards = APPLY_BQSR_SHARD(tagged_bams.join(recal_data_tables), apply_shards)
+            .combine(n_apply_shards)
+            .map { sample_id, bam, n -> tuple(groupKey(sample_id, n), bam) }
+            .groupTuple(by: 0)
+            .map { key, bams -> tuple(key.getGroupTarget(), bams) }
+        GATHER_BAMS(bqsr_bam_shards)
+        analysis_ready_bams = GATHER_BAMS.out.bqsr_bams
+        bam_md5s = GATHER_BAMS.out.md5s
+    } else {
+        // set up tags for the BAMs and combine with reference directory
+        tagged_bams = SET_TAGS(marked_bams)
+
+        // recalibrate base quality scores and combine with reference directory
+        recal_data_tables = RECAL_BASES(tagged_bams)
+
+        // apply the BQSR algorithm
+        APPLY_BQSR(recal_data_tables)
+        analysis_ready_bams = APPLY_BQSR.out.bqsr_bams
+        bam_md5s = APPLY_BQSR.out.md5s
+    }
+
+    // optionally publish reference-compressed CRAMs in place of the BAMs
+    if (params.cram) {
+        CONVERT_CRAM(analysis_ready_bams)
+        analysis_ready_bams = CONVERT_CRAM.out.bqsr_crams
+        bam_md5s = CONVERT_CRAM.out.md5s
+    }
 
     // use Picard to calculate coverage statistics on analysis ready bams
     CALC_COVERAGE(analysis_ready_bams)
@@ -187,4 +239,22 @@ workflow DATA_PROCESSING {
     completion_signal = CALC_COVERAGE.out.stats.collect().map { "ready" }
 
     MULTIQC(completion_signal)
+
+    // record the analysis-ready BAMs (or CRAMs) in the output catalog (their MD5 sidecars spare re-reading them)
+    catalog_dir = params.catalog_dir ?: "${params.ref_dir}/output_catalog"
+    bam_dir = "${params.output_dir}/preprocessing/analysis_ready_bams"
+    catalog_artifacts = analysis_ready_bams
+        .flatMap { sample_id, bam, bai ->
+            params.cram
+                ? [[sample_id, '', 'cram', bam], [sample_id, '', 'crai', bai]]
+                : [[sample_id, '', 'bam', bam], [sample_id, '', 'bai', bai]] }
+    CATALOG_RECORD(
+        catalog_artifacts
+            .map { sample_id, caller, type, artifact -> [sample_id, caller, type, file("${bam_dir}/${artifact.name}"), artifact.name].join('\t') }
+            .collectFile(name: 'catalog_entries.tsv', newLine: true, sort: true),
+        catalog_artifacts.map { row -> row[3] }.mix(bam_md5s).collect(),
+        file("${projectDir}/../catalog/catalog.py"),
+        'data_processing',
+        catalog_dir
+    )
 }
@@ -4,6 +4,12 @@ align.nf module
 This module takes trimmed FASTQ files ${sample_id}_${lane}_val_{1,2}.fq.gz), aligns them
 to the human reference genome via BWA-mem, and uses SAMtools for file manipulation.
 
+BWA-mem output is piped straight into 'samtools sort -n', so no intermediate SAM or
+BAM is written. Reads are sorted by name, the order MarkDuplicatesSpark works best
+with. The task's CPUs are split between the two: samtools sort gets params.sort_threads
+(a quarter of the CPUs when unset) and BWA-mem the rest. The sort's per-thread memory
+is params.sort_memory (derived from the task memory when unset).
+
 samtools version: 1.10
 BWA version: 0.7.17
 */
@@ -21,7 +27,15 @@ process BWA_ALIGN {
     tuple val(sample_id), path("${sample_id}_${lane}.sorted.bam"), emit: temp_bams
 
     script:
+    // split the CPUs between bwa mem and samtools sort so the pipe does not oversubscribe them
+    def sort_threads = params.sort_threads ?: Math.max(task.cpus.intdiv(4), 1)
+    def bwa_threads = Math.max(task.cpus - sort_threads, 1)
+    // by default give half of the task memory to samtools sort, split across its threads
+    def sort_memory = params.sort_memory ?: "${Math.max((task.memory.toMega() / 2 / sort_threads) as long, 256)}M"
+
     """
+    set -o pipefail
+
     echo "Aligning ${sample_id} on lane ${lane} with platform ${platform} using BWA-mem..."
 
     # set reference genome based on testing vs. production env
@@ -33,7 +47,7 @@ process BWA_ALIGN {
 
     echo "Aligning with reference genome \$REF_GENOME"
 
-    # run alignment
+    # run alignment and sort by read name in a single stream
     bwa mem \\
         "/references/\$REF_GENOME" \\
         "$trimmed_read_1" \\
@@ -42,22 +56,12 @@ process BWA_ALIGN {
         -v 3 \\
         -Y \\
         -M \\
-        -t ${task.cpus} \\
-        -o "${sample_id}_${lane}.tmp.sam"
-
-    # convert sam file to temporary bam file
-    samtools view "${sample_id}_${lane}.tmp.sam" \
-    -@ ${task.cpus} \
-    -o "${sample_id}_${lane}.tmp.bam" \
-    -b -1
-
-    # sort the bam file
-    samtools sort -n \
-    -@ ${task.cpus} \
-    -o "${sample_id}_${lane}.sorted.bam" \
-    "${sample_id}_${lane}.tmp.bam"
-
-    # clean up intra-process temp files
-    rm -f "${sample_id}_${lane}.tmp.sam" "${sample_id}_${lane}.tmp.bam"
+        -t ${bwa_threads} \\
+    | samtools sort -n \\
+        -@ ${sort_threads} \\
+        -m ${sort_memory} \\
+        -T "${sample_id}_${lane}.sort_tmp" \\
+        -o "${sample_id}_${lane}.sorted.bam" \\
+        -
     """
 }
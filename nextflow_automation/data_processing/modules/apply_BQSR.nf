@@ -4,13 +4,17 @@ apply_BQSR.nf
 This module takes the recalibrated base tables and applies the
 GATK BQSR algorithm, outputting the analysis-ready BAM.
 
+APPLY_BQSR_SHARD is the scattered alternative: the non-Spark ApplyBQSR runs once per
+interval shard (and can set the NM/MD/UQ tags in the same pass), and GATHER_BAMS
+concatenates the shards into the analysis-ready BAM.
+
 GATK version: 4.2.0.0.
 Python version: 3.6.10.
 */
 
 process APPLY_BQSR {
     tag "$sample_id"
-    publishDir "${params.output_dir}/preprocessing/analysis_ready_bams", mode: 'copy'
+    publishDir "${params.output_dir}/preprocessing/analysis_ready_bams", mode: 'copy', enabled: !params.cram
     label 'highCpu'
     label 'highMem'
     label 'shortTime'
@@ -20,6 +24,7 @@ process APPLY_BQSR {
     
     output:
     tuple val(sample_id), path("${sample_id}*bam"), path("${sample_id}*bai"), emit: bqsr_bams
+    path("${sample_id}.BQSR.bam.md5"), emit: md5s
 
     script:
     """
@@ -29,12 +34,60 @@ process APPLY_BQSR {
             --bqsr-recal-file $recal_data_table \\
             -O "${sample_id}.BQSR.bam" \\
             --conf "spark.executor.cores=${task.cpus}"
+
+        # checksum sidecar (used for the output catalog and BAM cache keys)
+        md5sum "${sample_id}.BQSR.bam" | cut -d ' ' -f 1 > "${sample_id}.BQSR.bam.md5"
     else
         gatk ApplyBQSR \\
             -I ${tagged_bam} \\
             --bqsr-recal-file ${recal_data_table} \\
             --create-output-bam-index true \\
+            --create-output-bam-md5 true \\
             -O ${sample_id}.BQSR.bam
     fi
     """
-}
\ No newline at end of file
+}
+
+process APPLY_BQSR_SHARD {
+    tag "${sample_id}:${intervals.baseName}"
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+
+    input:
+    tuple val(sample_id), path(bam), path(index), path(recal_data_table)
+    each path(intervals)
+
+    output:
+    tuple val(sample_id), path("${sample_id}.${intervals.baseName}.BQSR.bam"), emit: bqsr_shards
+
+    script:
+    def shard = "${sample_id}.${intervals.baseName}"
+    def interval_arg = (intervals.name == "unmapped.intervals" ? "unmapped" : "${intervals}")
+
+    """
+    # set reference genome based on testing vs. production env
+    if [ "${params.test_mode}" == "true" ] ; then
+        REF_GENOME="Homo_sapiens_assembly38_chr20.fasta"
+    else
+        REF_GENOME="Homo_sapiens_assembly38.fasta"
+    fi
+
+    gatk ApplyBQSR \\
+        -I "${bam}" \\
+        -L ${interval_arg} \\
+        --bqsr-recal-file "${recal_data_table}" \\
+        -O "${params.set_tags_in_bqsr ? "${shard}.untagged.bam" : "${shard}.BQSR.bam"}"
+
+    # optionally set the NM/MD/UQ tags on the shard in the same task (replaces SET_TAGS)
+    if [ "${params.set_tags_in_bqsr}" == "true" ] ; then
+        gatk SetNmMdAndUqTags \\
+            -I "${shard}.untagged.bam" \\
+            -O "${shard}.BQSR.bam" \\
+            -R "/references/\$REF_GENOME" \\
+            --TMP_DIR ./
+
+        rm -f "${shard}.untagged.bam"
+    fi
+    """
+}
@@ -5,6 +5,9 @@ This module takes paired-end FASTQ files and uses BBMap's bbsplit tool to
 separate reads that align to the mouse reference genome  and those that align
 to the human reference genome.
 
+The prebuilt BBSplit index (build 99) is read in place from /references/ref,
+a node-local read-only view when --ref_cache is set (see ref_cache.py).
+
 BBMap version: BBMap version 38.06
 */
 
@@ -26,12 +29,9 @@ process SPLIT {
     """
     echo "Splitting $sample_id on $lane..."
 
-    # copy bbsplit ref index/genome to your nextflow working directory if it doesn't already exist
-    if [ ! -d ./ref ]; then
-        cp -r "/references/ref" ./
-    fi
-
+    # read the bbsplit ref index/genome in place (/references/ref) instead of copying it per task
     bbsplit.sh build=99 \
+    path=/references \
     in1=$contaminated_read1 \
     in2=$contaminated_read2 \
     basename="${sample_id}_${lane}_%_val_#.fq.gz" \
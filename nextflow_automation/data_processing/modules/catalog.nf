@@ -0,0 +1,103 @@
+/*
+catalog.nf module
+
+This module keeps the shared output catalog with 'catalog.py':
+  - CATALOG_RECORD records the run's published artifacts (listed with their sample, caller,
+    artifact type and published path) in a catalog file of the run's own, published to
+    'catalog_dir' as 'output_catalog.<run name>.sqlite', so runs finishing at the same time
+    never overwrite each other's entries
+  - CATALOG_QUERY writes the catalogued artifacts of the given types below a directory
+    as a TSV, from all the catalog files of 'catalog_dir', so a workflow can read its
+    inputs with the sample IDs they were recorded with
+  - catalog_inputs turns the CATALOG_QUERY rows into a workflow's inputs, so the input
+    directory is never walked: only the recorded paths are checked for existence
+  - with_catalog (for an explicit directory scan) merges the files a workflow found below
+    its input directory with the CATALOG_QUERY rows of them: the catalog's sample IDs win,
+    and files missing from the catalog are still used, with a warning
+
+Python version: 3.10
+*/
+
+process CATALOG_RECORD {
+    tag "${workflow_name}"
+    publishDir "${catalog_dir}", mode: 'copy', pattern: "output_catalog.*.sqlite"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    path(entries)
+    path(artifacts, stageAs: "artifacts/*")
+    path catalog_script
+    val workflow_name
+    val catalog_dir
+
+    output:
+    path("output_catalog.${workflow.runName}.sqlite")
+
+    script:
+    """
+    python3 ${catalog_script} record \\
+        --catalog "output_catalog.${workflow.runName}.sqlite" \\
+        --entries ${entries} \\
+        --artifact_dir artifacts \\
+        --workflow ${workflow_name} \\
+        --run ${workflow.runName}
+    """
+}
+
+process CATALOG_QUERY {
+    tag "${artifact_types.join(',')}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    path catalog_script
+    path(catalogs, stageAs: "catalog/*")
+    val artifact_types
+    val under
+
+    output:
+    path("catalog_artifacts.tsv")
+
+    script:
+    """
+    python3 ${catalog_script} query \\
+        --catalog catalog \\
+        --type ${artifact_types.join(' ')} \\
+        --under "${under}" \\
+        -o catalog_artifacts.tsv
+    """
+}
+
+// [sample_id, file] of the CATALOG_QUERY rows; recorded files that no longer exist are dropped with a warning
+def catalog_inputs(catalog_tsv) {
+    return catalog_tsv
+        .splitCsv(header: true, sep: '\t')
+        .map { row -> tuple(row.sample_id, file(row.path)) }
+        .filter { sample_id, cataloged_file ->
+            if (!cataloged_file.exists()) {
+                log.warn "${cataloged_file} is in the output catalog but does not exist"
+            }
+            cataloged_file.exists()
+        }
+}
+
+// [sample_id, file] of the files found below a directory, with the sample ID the output catalog recorded
+// for the file when it has one; files the catalog is missing keep their own sample ID and are warned about
+def with_catalog(found, catalog_tsv) {
+    def cataloged = catalog_tsv
+        .splitCsv(header: true, sep: '\t')
+        .map { row -> tuple(file(row.path).toString(), row.sample_id) }
+    return found
+        .map { sample_id, found_file -> tuple(found_file.toString(), tuple(sample_id, found_file)) }
+        .join(cataloged, remainder: true)
+        .filter { path, found_entry, cataloged_id -> found_entry != null }
+        .map { path, found_entry, cataloged_id ->
+            if (cataloged_id == null) {
+                log.warn "${path} is not in the output catalog; record it with 'catalog.py add'"
+            }
+            tuple(cataloged_id ?: found_entry[0], found_entry[1])
+        }
+}
@@ -0,0 +1,46 @@
+/*
+convert_cram.nf module
+
+This module converts the analysis-ready BAM into a reference-compressed CRAM
+(with --cram), indexes it and writes its MD5 sidecar. The CRAM is published
+in place of the BAM, which stays in the work directory.
+
+samtools version: 1.10.
+*/
+
+process CONVERT_CRAM {
+    tag "$sample_id"
+    publishDir "${params.output_dir}/preprocessing/analysis_ready_bams", mode: 'copy'
+    label 'medCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    tuple val(sample_id), path(bam), path(bai)
+
+    output:
+    tuple val(sample_id), path("${sample_id}.BQSR.cram"), path("${sample_id}.BQSR.cram.crai"), emit: bqsr_crams
+    path("${sample_id}.BQSR.cram.md5"), emit: md5s
+
+    script:
+    """
+    # set reference genome based on testing vs. production env
+    if [ "${params.test_mode}" == "true" ] ; then
+        REF_GENOME="Homo_sapiens_assembly38_chr20.fasta"
+    else
+        REF_GENOME="Homo_sapiens_assembly38.fasta"
+    fi
+
+    # reference-compress the BAM and index the CRAM
+    samtools view -C \\
+        -T "/references/\$REF_GENOME" \\
+        -@ ${task.cpus} \\
+        -o "${sample_id}.BQSR.cram" \\
+        ${bam}
+
+    samtools index "${sample_id}.BQSR.cram"
+
+    # checksum sidecar (used for the output catalog and BAM cache keys)
+    md5sum "${sample_id}.BQSR.cram" | cut -d ' ' -f 1 > "${sample_id}.BQSR.cram.md5"
+    """
+}
@@ -0,0 +1,35 @@
+/*
+gather_bams.nf module
+
+This module concatenates the per-shard recalibrated BAMs from APPLY_BQSR_SHARD,
+in genomic order, into the analysis-ready BAM, indexes it and writes its MD5 sidecar.
+
+GATK version: 4.2.0.0.
+*/
+
+process GATHER_BAMS {
+    tag "$sample_id"
+    publishDir "${params.output_dir}/preprocessing/analysis_ready_bams", mode: 'copy', enabled: !params.cram
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+
+    input:
+    tuple val(sample_id), path(shard_bams)
+
+    output:
+    tuple val(sample_id), path("${sample_id}.BQSR.bam"), path("${sample_id}.BQSR.bai"), emit: bqsr_bams
+    path("${sample_id}.BQSR.bam.md5"), emit: md5s
+
+    script:
+    // shard names sort in genomic order (0000-scattered ... NNNN-scattered, then unmapped)
+    def ordered_bams = [shard_bams].flatten().sort { it.name }
+
+    """
+    gatk GatherBamFiles \\
+        ${ordered_bams.collect { "-I ${it}" }.join(" ")} \\
+        -O "${sample_id}.BQSR.bam" \\
+        --CREATE_INDEX true \\
+        --CREATE_MD5_FILE true
+    """
+}
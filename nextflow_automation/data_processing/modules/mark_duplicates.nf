@@ -4,7 +4,8 @@ mark_duplicates.nf module
 This module takes lane-specific BAM files for each sample, merges them, 
 and marks duplicates using GATK's MarkDuplicatesSpark.
 
-The output is a single MarkDuplicate BAM for each sample.
+The input BAMs are sorted by read name (see BWA_ALIGN). The output is a single
+coordinate-sorted MarkDuplicate BAM for each sample.
 
 GATK version: 4.2.0.0.
 Python version: 3.6.10.
@@ -38,14 +39,22 @@ process MARK_DUPES {
     else
         gatk MarkDuplicates \\
             ${sorted_bams.collect { "-I ${it}" }.join(" ")} \\
-            -O ${sample_id}.MarkDuplicate.bam \\
+            -O ${sample_id}.queryname.MarkDuplicate.bam \\
             -M ${sample_id}.metrics.txt \\
-            --REMOVE_DUPLICATES false \\
-            --ASSUME_SORT_ORDER coordinate \\
-            --CREATE_INDEX true
+            --REMOVE_DUPLICATES false
+
+        # MarkDuplicates keeps the queryname order; coordinate sort and index like the Spark output
+        gatk SortSam \\
+            -I ${sample_id}.queryname.MarkDuplicate.bam \\
+            -O ${sample_id}.MarkDuplicate.bam \\
+            --SORT_ORDER coordinate \\
+            --CREATE_INDEX true \\
+            --TMP_DIR ./
+
+        rm -f ${sample_id}.queryname.MarkDuplicate.bam
 
         # rename the .bai file to .bam.bai
-        mv *.bai "${sample_id}.MarkDuplicate.bam.bai"
+        mv ${sample_id}.MarkDuplicate.bai "${sample_id}.MarkDuplicate.bam.bai"
 
         # artificially make sbi file generate sbi file
         touch "${sample_id}.MarkDuplicate.bam.sbi"
@@ -2,7 +2,11 @@
 recal_bases.nf
 
 This module takes the tagged BAM files and recalibrates base
-quality scores using GATK BaseRecalibratorSpark
+quality scores using GATK BaseRecalibratorSpark.
+
+RECAL_BASES_SHARD and GATHER_BQSR_REPORTS are the scattered alternative: the
+non-Spark BaseRecalibrator runs once per interval shard and the reports are
+gathered into one table.
 
 GATK version: 4.2.0.0.
 Python version: 3.6.10.
@@ -40,4 +44,63 @@ process RECAL_BASES {
             --known-sites "/references/Mills_and_1000G_gold_standard_indels_hg38_chr20.vcf.gz"
         fi
     """
-}
\ No newline at end of file
+}
+
+process RECAL_BASES_SHARD {
+    tag "${sample_id}:${intervals.baseName}"
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+
+    input:
+    tuple val(sample_id), path(bam), path(index)
+    each path(intervals)
+
+    output:
+    tuple val(sample_id), path("${sample_id}.${intervals.baseName}.recal_data.table"), emit: recal_tables
+
+    script:
+    """
+    # set reference and known sites based on testing vs. production env
+    if [ "${params.test_mode}" == "true" ] ; then
+        REF_GENOME="Homo_sapiens_assembly38_chr20.fasta"
+        DBSNP="dbsnp_146_hg38_chr20_tso-only.vcf.gz"
+        KNOWN_INDELS="Mills_and_1000G_gold_standard_indels_hg38_chr20.vcf.gz"
+    else
+        REF_GENOME="Homo_sapiens_assembly38.fasta"
+        DBSNP="Homo_sapiens_assembly38.dbsnp138.vcf.gz"
+        KNOWN_INDELS="Homo_sapiens_assembly38.known_indels.vcf.gz"
+    fi
+
+    gatk BaseRecalibrator \\
+        -I "${bam}" \\
+        -R "/references/\$REF_GENOME" \\
+        -L "${intervals}" \\
+        --known-sites "/references/\$DBSNP" \\
+        --known-sites "/references/\$KNOWN_INDELS" \\
+        -O "${sample_id}.${intervals.baseName}.recal_data.table"
+    """
+}
+
+
+process GATHER_BQSR_REPORTS {
+    tag "$sample_id"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+    publishDir "${params.output_dir}/preprocessing/recal-tables", mode: 'copy', pattern: "*.recal_data.table"
+
+    input:
+    tuple val(sample_id), path(recal_tables)
+
+    output:
+    tuple val(sample_id), path("${sample_id}.recal_data.table"), emit: recal_table
+
+    script:
+    """
+    # merge the per-shard recalibration reports into a single table
+    gatk GatherBQSRReports \\
+        ${[recal_tables].flatten().collect { "-I ${it}" }.join(" ")} \\
+        -O "${sample_id}.recal_data.table"
+    """
+}
@@ -0,0 +1,46 @@
+/*
+split_intervals.nf module
+
+This module splits the reference genome into balanced shards of whole contigs
+for the scattered BQSR steps (RECAL_BASES_SHARD / APPLY_BQSR_SHARD).
+
+Contigs are never subdivided, so every mapped read falls into exactly one shard
+and the recalibrated shards can be concatenated back in order by GATHER_BAMS.
+An extra 'unmapped.intervals' placeholder shard carries the unplaced unmapped reads.
+
+GATK version: 4.2.0.0.
+*/
+
+process SPLIT_INTERVALS {
+    tag "scatter_${scatter_count}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    val scatter_count
+
+    output:
+    path("shards/*-scattered.interval_list"), emit: shards
+    path("unmapped.intervals"), emit: unmapped
+
+    script:
+    """
+    # set reference genome based on testing vs. production env
+    if [ "${params.test_mode}" == "true" ] ; then
+        REF_GENOME="Homo_sapiens_assembly38_chr20.fasta"
+    else
+        REF_GENOME="Homo_sapiens_assembly38.fasta"
+    fi
+
+    # build one interval per contig and split them into balanced shards
+    gatk SplitIntervals \\
+        -R "/references/\$REF_GENOME" \\
+        --scatter-count ${scatter_count} \\
+        --subdivision-mode BALANCING_WITHOUT_INTERVAL_SUBDIVISION \\
+        -O shards
+
+    # placeholder shard for the unplaced unmapped reads (passed to GATK as '-L unmapped')
+    echo "unmapped" > unmapped.intervals
+    """
+}
@@ -0,0 +1 @@
+from .fingerprint_matrix import FingerprintMatrix, read_haplotype_map, read_fingerprint, lod_scores, update, main
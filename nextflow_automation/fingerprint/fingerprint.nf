@@ -3,6 +3,8 @@ nextflow.enable.dsl = 2
 // import modules
 include { EXTRACT_FINGERPRINT } from './modules/extract_fingerprint.nf'
 include { CROSSCHECK_FINGERPRINTS } from './modules/crosscheck_fingerprints.nf'
+include { CROSSCHECK_INCREMENTAL } from './modules/crosscheck_incremental.nf'
+include { CATALOG_RECORD; CATALOG_QUERY; catalog_inputs; with_catalog } from './modules/catalog.nf'
 
 
 // ─── shared helpers ─────────────────────────────────────────────────────────
@@ -35,8 +37,23 @@ def help_message() {
         --ref_dir         Path to the reference directory
         --haplotype_map   File name of the haplotype map inside ref_dir (eg: hg38_chr1-22XY.map)
 
+      Optional arguments:
+        --incremental             Only crosscheck VCFs new to the fingerprint store (or fingerprinted
+                                  again) against the cohort (default: false)
+        --fingerprint_matrix_dir  Directory of the fingerprint store, one matrix and metrics shard per run
+                                  (default: <ref_dir>/fingerprint_matrix)
+        --crosscheck_metrics      Earlier metrics of the cohort to start from (eg: an all-vs-all
+                                  crosscheck.metrics)
+
     Optional arguments (both workflows):
       --cpus              Number of CPUs to use for processing (default: 1)
+      --catalog_dir       Directory of the output catalog the fingerprint VCFs are recorded in
+                          (default: <ref_dir>/output_catalog)
+      --from_catalog      Take the BAMs below --bam_dir (EXTRACT) or the fingerprint VCFs below --vcf_dir
+                          (CROSSCHECK) from the output catalog, with the sample IDs recorded with them,
+                          instead of searching the directory (default: false)
+      --catalog_scan      With --from_catalog, search the directory anyway, warning about files the
+                          catalog is missing (default: false)
       --help              Show this help message and exit
     """
     println(help)
@@ -59,6 +76,29 @@ def log_banner() {
     """.stripIndent()
 }
 
+// output catalog shared by the workflows
+def catalog_dir() {
+    return params.catalog_dir ?: "${params.ref_dir}/output_catalog"
+}
+
+// the catalog files of the output catalog (one per run that recorded artifacts); --from_catalog requires one
+def catalog_files() {
+    def catalogs = files("${catalog_dir()}/output_catalog*.sqlite").findAll { it.exists() }
+    if (params.from_catalog && !catalogs) {
+        error "ERROR: --from_catalog needs the output catalog in ${catalog_dir()}"
+    }
+    return catalogs
+}
+
+// index next to a BAM (<name>.bam.bai or <name>.bai) or CRAM (<name>.cram.crai), or [] when there is none
+def find_bai(bam) {
+    def candidates = bam.name.endsWith('.cram')
+        ? [file("${bam}.crai")]
+        : [file("${bam}.bai"), file("${bam.toString().replace('.bam', '.bai')}")]
+    def bai = candidates.find { it.exists() }
+    return bai ?: []
+}
+
 
 // ─── EXTRACT: BAMs → per-sample fingerprint VCFs ────────────────────────────
 
@@ -88,25 +128,46 @@ workflow EXTRACT {
 
     log_banner()
 
-    // channel in all BAMs, parse sample_id as everything before .BQSR
-    Channel
-        .fromPath([
-            "${params.bam_dir}/*.bam",
-            "${params.bam_dir}/**/*.bam"
-        ])
-        .map { bam ->
-            def sample_id = (bam.name =~ /^(\S+)\.BQSR/)[0][1]  // match everything before the first .BQSR
-            def bai = file("${bam}.bai").exists() ?
-                      file("${bam}.bai") :
-                      file("${bam.toString().replace('.bam', '.bai')}").exists() ?
-                      file("${bam.toString().replace('.bam', '.bai')}") :
-                      []
-            tuple(sample_id, bam, bai)
-        }
+    catalog_script = file("${projectDir}/../catalog/catalog.py")
+
+    if (params.from_catalog && !params.catalog_scan) {
+        // the BAMs the output catalog has below --bam_dir, with the sample IDs they were recorded with
+        found_bams = catalog_inputs(CATALOG_QUERY(catalog_script, catalog_files(), ['bam', 'cram'], file(params.bam_dir).toString()))
+    } else {
+        // channel in all BAMs, parse sample_id as everything before .BQSR (or the name without its extensions)
+        Channel
+            .fromPath([
+                "${params.bam_dir}/*.{bam,cram}",
+                "${params.bam_dir}/**/*.{bam,cram}"
+            ])
+            .map { bam ->
+                def match = bam.name =~ /^(\S+)\.BQSR/  // match everything before the first .BQSR
+                tuple(match ? match[0][1] : bam.simpleName, bam)
+            }
+            .set { found_bams }
+    }
+
+    if (params.from_catalog && params.catalog_scan) {
+        // take the sample IDs the BAMs were recorded with in the output catalog; BAMs it is missing are warned about
+        found_bams = with_catalog(found_bams, CATALOG_QUERY(catalog_script, catalog_files(), ['bam', 'cram'], file(params.bam_dir).toString()))
+    }
+    found_bams
+        .map { sample_id, bam -> tuple(sample_id, bam, find_bai(bam)) }
         .set { all_bams }
 
     // extract per-sample fingerprint VCFs
-    EXTRACT_FINGERPRINT(all_bams)
+    fingerprint_vcfs = EXTRACT_FINGERPRINT(all_bams).vcf
+
+    // record the fingerprint VCFs in the output catalog
+    CATALOG_RECORD(
+        fingerprint_vcfs
+            .map { vcf -> [vcf.simpleName, '', 'fingerprint_vcf', file("${params.output_dir}/fingerprint/vcfs/${vcf.name}"), vcf.name].join('\t') }
+            .collectFile(name: 'catalog_entries.tsv', newLine: true, sort: true),
+        fingerprint_vcfs.collect(),
+        catalog_script,
+        'fingerprint',
+        catalog_dir()
+    )
 }
 
 
@@ -138,15 +199,45 @@ workflow CROSSCHECK {
 
     log_banner()
 
-    // channel in all fingerprint VCFs (top-level + recursive) and collect into a list
-    Channel
-        .fromPath([
-            "${params.vcf_dir}/*.vcf",
-            "${params.vcf_dir}/**/*.vcf"
-        ])
+    if (params.from_catalog && !params.catalog_scan) {
+        // the fingerprint VCFs the output catalog has below --vcf_dir
+        found_vcfs = catalog_inputs(CATALOG_QUERY(file("${projectDir}/../catalog/catalog.py"), catalog_files(), ['fingerprint_vcf'], file(params.vcf_dir).toString()))
+    } else {
+        // channel in all fingerprint VCFs (top-level + recursive)
+        Channel
+            .fromPath([
+                "${params.vcf_dir}/*.vcf",
+                "${params.vcf_dir}/**/*.vcf"
+            ])
+            .map { vcf -> tuple(null, vcf) }
+            .set { found_vcfs }
+    }
+
+    if (params.from_catalog && params.catalog_scan) {
+        // warn about the fingerprint VCFs the output catalog is missing
+        found_vcfs = with_catalog(found_vcfs, CATALOG_QUERY(file("${projectDir}/../catalog/catalog.py"), catalog_files(), ['fingerprint_vcf'], file(params.vcf_dir).toString()))
+    }
+    // collect into a list
+    found_vcfs
+        .map { sample_id, vcf -> vcf }
         .collect()
         .set { all_vcfs }
 
-    // run all-vs-all crosscheck across all fingerprint VCFs
-    CROSSCHECK_FINGERPRINTS(all_vcfs)
+    if (params.incremental) {
+        // crosscheck only the VCFs new to the fingerprint store, against every run's shard of it
+        matrix_dir       = params.fingerprint_matrix_dir ?: "${params.ref_dir}/fingerprint_matrix"
+        store_shards     = files("${matrix_dir}/fingerprint_matrix*.npz") + files("${matrix_dir}/crosscheck*.metrics")
+        previous_metrics = params.crosscheck_metrics ? file(params.crosscheck_metrics) : null
+
+        CROSSCHECK_INCREMENTAL(
+            all_vcfs,
+            file("${projectDir}/fingerprint_matrix.py"),
+            store_shards,
+            previous_metrics?.exists() ? previous_metrics : [],
+            matrix_dir
+        )
+    } else {
+        // run all-vs-all crosscheck across all fingerprint VCFs
+        CROSSCHECK_FINGERPRINTS(all_vcfs)
+    }
 }
@@ -0,0 +1,452 @@
+"""
+fingerprint_matrix.py module
+
+Incremental fingerprint crosschecking for the WESley fingerprint pipeline.
+
+Instead of an all-vs-all Picard CrosscheckFingerprints over every fingerprint VCF of the cohort,
+the haplotype-block genotype likelihoods of every fingerprinted sample are kept in a compact matrix
+(Phred-scaled PLs as uint8, samples x haplotype blocks x 3 genotypes, in a compressed .npz file).
+A run only reads the VCFs that are not in the matrix yet (or whose content changed since, by MD5),
+compares them against the existing cohort and each other (and themselves), and adds those pairs to
+the cohort's crosscheck metrics. A VCF re-fingerprinted under the same name replaces its old row,
+and the metrics of its earlier version are dropped.
+
+The matrix and metrics are kept in a store directory as one shard per run,
+'fingerprint_matrix.<run>.npz' (the rows the run added, with when it ran) and
+'crosscheck.<run>.metrics' (the pairs it computed), so runs sharing a store never overwrite
+each other's samples or pairs. A run reads every shard of the store together; the latest row of a
+file wins. Pairs that concurrent runs could not see (each other's new samples) are found missing
+and computed by the next run. A matrix and metrics written before this change
+('fingerprint_matrix.npz', 'crosscheck.metrics') are read as the oldest shard.
+
+LOD scores follow Picard's fingerprinting model: per haplotype block, with Hardy-Weinberg genotype
+frequencies f from the block's MAF and genotype likelihoods L1, L2 of the two samples,
+    LOD = sum over blocks of log10( sum_g f_g L1_g L2_g / (sum_g f_g L1_g * sum_g f_g L2_g) )
+and the tumor-aware scores apply a loss-of-heterozygosity rate to the tumor side's likelihoods.
+As with Picard's MAX_EFFECT_OF_EACH_HAPLOTYPE_BLOCK (default 3.0), no genotype of a block is less
+likely than 10^-3 times its most likely one, ie: the PLs are clipped to 30 when comparing. Blocks
+missing from either sample are uninformative and add 0. The scores of a batch of new samples against
+the whole cohort are computed with numpy, in chunks of both.
+
+Results are written in Picard's CrosscheckMetric format (CROSSCHECK_BY=FILE): like Picard, one row
+per ordered pair, both orders of every pair and every file against itself, classified with LOD_THRESHOLD as in CrosscheckFingerprints, expected to match when both fingerprints
+carry the same sample name.
+
+Usage:
+    python fingerprint_matrix.py --haplotype_map hg38_chr1-22XY.map \\
+        --store previous --run run_07 --shard_dir . -o crosscheck.metrics \\
+        --lod_threshold -5 *.fingerprint.vcf
+
+Python version: 3.10+
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+
+GENOTYPING_ERROR_RATE = 0.01
+LOSS_OF_HET_RATE = 0.5
+MAX_EFFECT_OF_EACH_HAPLOTYPE_BLOCK = 3.0
+MAX_PL = 255
+CHUNK_SIZE = 256
+
+METRICS_CLASS = "## METRICS CLASS\tpicard.fingerprint.CrosscheckMetric"
+METRICS_COLUMNS = [
+    "LEFT_GROUP_VALUE", "RIGHT_GROUP_VALUE", "RESULT", "DATA_TYPE", "LOD_SCORE", "LOD_SCORE_TUMOR_NORMAL",
+    "LOD_SCORE_NORMAL_TUMOR", "LEFT_RUN_BARCODE", "LEFT_LANE", "LEFT_MOLECULAR_BARCODE_SEQUENCE", "LEFT_LIBRARY",
+    "LEFT_SAMPLE", "LEFT_FILE", "RIGHT_RUN_BARCODE", "RIGHT_LANE", "RIGHT_MOLECULAR_BARCODE_SEQUENCE",
+    "RIGHT_LIBRARY", "RIGHT_SAMPLE", "RIGHT_FILE",
+]
+
+
+def read_haplotype_map(path: str) -> tuple[list[str], np.ndarray, dict[tuple[str, int], tuple[int, str, str]]]:
+    """Read a Picard haplotype map; return (block names, block MAFs, {(chrom, pos): (block, major, minor)})."""
+    rows = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("@") or line.startswith("#") or not line.strip():
+                continue
+            fields = line.rstrip("\n").split("\t")
+            # CHROMOSOME POSITION NAME MAJOR_ALLELE MINOR_ALLELE MAF ANCHOR_SNP PANELS
+            anchor = fields[6] if len(fields) > 6 and fields[6] else fields[2]
+            rows.append((fields[0], int(fields[1]), fields[2], fields[3].upper(), fields[4].upper(), float(fields[5]), anchor))
+
+    blocks = {name: i for i, name in enumerate(row[2] for row in rows if row[2] == row[6])}
+    maf = np.zeros(len(blocks))
+    snps = {}
+    for chrom, pos, name, major, minor, snp_maf, anchor in rows:
+        if anchor not in blocks:
+            raise ValueError(f"{path}: SNP {name} is linked to unknown anchor SNP {anchor}")
+        if name == anchor:
+            maf[blocks[anchor]] = snp_maf
+        snps[(chrom, pos)] = (blocks[anchor], major, minor)
+    return list(blocks), maf, snps
+
+
+def open_vcf(path: str):
+    return gzip.open(path, "rt") if path.endswith(".gz") else open(path)
+
+
+def read_fingerprint(path: str, snps: dict[tuple[str, int], tuple[int, str, str]], n_blocks: int) -> tuple[str, np.ndarray]:
+    """Read a fingerprint VCF as (sample name, PLs per block in major/het/minor order, uint8 [n_blocks, 3])."""
+    log_pls = np.zeros((n_blocks, 3))
+    sample = None
+    with open_vcf(path) as f:
+        for line in f:
+            if line.startswith("##"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if line.startswith("#"):
+                if len(fields) < 10:
+                    raise ValueError(f"{path} has no sample column")
+                sample = fields[9]
+                continue
+            snp = snps.get((fields[0], int(fields[1])))
+            if snp is None or len(fields) < 10:
+                continue
+            block, major, minor = snp
+            ref, alt = fields[3].upper(), fields[4].split(",")[0].upper()
+            if alt == ".":
+                alt = minor if ref == major else major
+            values = dict(zip(fields[8].split(":"), fields[9].split(":")))
+
+            if "PL" in values and values["PL"] not in ("", ".") and len(values["PL"].split(",")) == 3:
+                pls = np.array([float(pl) for pl in values["PL"].split(",")])
+            elif values.get("GT", ".").replace("|", "/") in ("0/0", "0/1", "1/0", "1/1"):
+                # genotype only: the called genotype with GENOTYPING_ERROR_RATE spread over the others
+                called = sum(int(allele) for allele in values["GT"].replace("|", "/").split("/"))
+                pls = np.full(3, -10 * np.log10(GENOTYPING_ERROR_RATE / 2))
+                pls[called] = 0
+            else:
+                continue
+
+            # PLs are in REF/REF, REF/ALT, ALT/ALT order; the matrix keeps major/het/minor
+            if (ref, alt) == (major, minor):
+                log_pls[block] += pls
+            elif (ref, alt) == (minor, major):
+                log_pls[block] += pls[::-1]
+
+    if sample is None:
+        raise ValueError(f"{path} has no #CHROM header line")
+    log_pls -= log_pls.min(axis=1, keepdims=True)
+    return sample, np.minimum(np.rint(log_pls), MAX_PL).astype(np.uint8)
+
+
+class FingerprintMatrix:
+    """Per-sample haplotype-block PLs of the fingerprinted cohort, stored as a compressed .npz file.
+
+    Each row also keeps the MD5 of its VCF and the time from which metrics of it are valid (0 for a
+    file new to the matrix, the run's time for one that replaced an earlier version); 'created' is
+    when the matrix (a run's shard) was written, in ns.
+    """
+
+    def __init__(self, blocks: list[str], maf: np.ndarray):
+        self.blocks = list(blocks)
+        self.maf = np.asarray(maf, dtype=float)
+        self.files: list[str] = []
+        self.samples: list[str] = []
+        self.keys: list[str] = []
+        self.since: list[int] = []
+        self.pls = np.zeros((0, len(self.blocks), 3), dtype=np.uint8)
+        self.created = 0
+
+    @classmethod
+    def load(cls, path: str) -> "FingerprintMatrix":
+        with np.load(path) as data:
+            matrix = cls(data["blocks"].tolist(), data["maf"])
+            matrix.files = data["files"].tolist()
+            matrix.samples = data["samples"].tolist()
+            matrix.pls = data["pls"]
+            # matrices written before the store was sharded have no keys or times
+            matrix.keys = data["keys"].tolist() if "keys" in data else [""] * len(matrix.files)
+            matrix.since = data["since"].tolist() if "since" in data else [0] * len(matrix.files)
+            matrix.created = int(data["created"]) if "created" in data else 0
+        return matrix
+
+    def save(self, path: str):
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, blocks=np.array(self.blocks, dtype=str), maf=self.maf, files=np.array(self.files, dtype=str),
+                                samples=np.array(self.samples, dtype=str), keys=np.array(self.keys, dtype=str),
+                                since=np.array(self.since, dtype=np.int64), pls=self.pls, created=np.int64(self.created))
+        os.replace(path + ".tmp", path)
+
+    def add(self, names: list[str], samples: list[str], pls: list[np.ndarray], keys: list[str] | None = None,
+            since: list[int] | None = None):
+        self.files += names
+        self.samples += samples
+        self.keys += keys if keys is not None else [""] * len(names)
+        self.since += since if since is not None else [0] * len(names)
+        if pls:
+            self.pls = np.concatenate([self.pls, np.stack(pls)])
+
+    def rows(self, names: list[str]) -> "FingerprintMatrix":
+        """A matrix of the given files' rows, in that order."""
+        index = {name: i for i, name in enumerate(self.files)}
+        subset = FingerprintMatrix(self.blocks, self.maf)
+        rows = [index[name] for name in names]
+        subset.add(names, [self.samples[i] for i in rows], [self.pls[i] for i in rows],
+                   [self.keys[i] for i in rows], [self.since[i] for i in rows])
+        return subset
+
+
+def genotype_frequencies(maf: np.ndarray) -> np.ndarray:
+    """Hardy-Weinberg major/het/minor genotype frequencies per block, [n_blocks, 3]."""
+    return np.stack([(1 - maf) ** 2, 2 * maf * (1 - maf), maf ** 2], axis=-1)
+
+
+def loss_of_het(likelihoods: np.ndarray, rate: float = LOSS_OF_HET_RATE) -> np.ndarray:
+    """Likelihoods of a tumor's data given its germline genotype, allowing heterozygous sites to lose an allele."""
+    transition = np.array([[1, 0, 0], [rate / 2, 1 - rate, rate / 2], [0, 0, 1]])
+    return likelihoods @ transition.T
+
+
+def lod_scores(left: np.ndarray, right: np.ndarray, maf: np.ndarray, chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """LOD of identity of every left vs every right sample; left/right are likelihoods [n, n_blocks, 3]."""
+    frequencies = genotype_frequencies(maf)
+    weighted_left = left * frequencies
+    left_evidence = np.log10(weighted_left.sum(axis=-1)).sum(axis=-1)
+    right_evidence = np.log10((right * frequencies).sum(axis=-1)).sum(axis=-1)
+
+    # chunks of both sides bound the [chunk, chunk, n_blocks] intermediate, however many samples are new
+    lods = np.empty((left.shape[0], right.shape[0]))
+    for left_start in range(0, left.shape[0], chunk_size):
+        rows = slice(left_start, left_start + chunk_size)
+        for start in range(0, right.shape[0], chunk_size):
+            chunk = slice(start, start + chunk_size)
+            same = np.einsum("ibg,jbg->ijb", weighted_left[rows], right[chunk], optimize=True)
+            lods[rows, chunk] = np.log10(same).sum(axis=-1) - left_evidence[rows, None] - right_evidence[None, chunk]
+    return lods
+
+
+def match_result(lod: float, expected_match: bool, lod_threshold: float) -> str:
+    """Classify a LOD score the way CrosscheckFingerprints does."""
+    if expected_match:
+        if lod < lod_threshold:
+            return "UNEXPECTED_MISMATCH"
+        return "EXPECTED_MATCH" if lod > -lod_threshold else "INCONCLUSIVE"
+    if lod > -lod_threshold:
+        return "UNEXPECTED_MATCH"
+    return "EXPECTED_MISMATCH" if lod < lod_threshold else "INCONCLUSIVE"
+
+
+def crosscheck(matrix: FingerprintMatrix, first_new: int, lod_threshold: float,
+               max_effect: float = MAX_EFFECT_OF_EACH_HAPLOTYPE_BLOCK) -> list[dict[str, str]]:
+    """Metrics of every pair (in both orders, and self-pairs) with a sample from index first_new on."""
+    if first_new >= len(matrix.files):
+        return []
+    likelihoods = 10 ** (-np.minimum(matrix.pls, 10 * max_effect) / 10)
+    new = likelihoods[first_new:]
+    lods = lod_scores(new, likelihoods, matrix.maf)
+    tumor_normal = lod_scores(loss_of_het(new), likelihoods, matrix.maf)
+    normal_tumor = lod_scores(new, loss_of_het(likelihoods), matrix.maf)
+
+    rows = []
+    for left in range(len(matrix.files)):
+        for right in range(len(matrix.files)):
+            if left < first_new and right < first_new:
+                continue
+            # the scores are computed with the new sample on the left; swap the tumor-aware ones otherwise
+            if left >= first_new:
+                i, j, lod_tn, lod_nt = left - first_new, right, tumor_normal, normal_tumor
+            else:
+                i, j, lod_tn, lod_nt = right - first_new, left, normal_tumor, tumor_normal
+            expected_match = matrix.samples[left] == matrix.samples[right]
+            rows.append({
+                "LEFT_GROUP_VALUE": matrix.files[left], "RIGHT_GROUP_VALUE": matrix.files[right],
+                "RESULT": match_result(lods[i, j], expected_match, lod_threshold), "DATA_TYPE": "FILE",
+                "LOD_SCORE": f"{lods[i, j]:.6f}", "LOD_SCORE_TUMOR_NORMAL": f"{lod_tn[i, j]:.6f}",
+                "LOD_SCORE_NORMAL_TUMOR": f"{lod_nt[i, j]:.6f}",
+                "LEFT_SAMPLE": matrix.samples[left], "LEFT_FILE": matrix.files[left],
+                "RIGHT_SAMPLE": matrix.samples[right], "RIGHT_FILE": matrix.files[right],
+            })
+    return rows
+
+
+def read_metrics(path: str) -> tuple[list[str], list[str], list[dict[str, str]]]:
+    """Read a CrosscheckMetric file as (header lines up to the METRICS CLASS line, columns, rows)."""
+    header, columns, rows = [], None, []
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if columns is None:
+                if line.startswith("## METRICS CLASS"):
+                    header.append(line)
+                    columns = next(f).rstrip("\n").split("\t")
+                else:
+                    header.append(line)
+            elif not line.strip():
+                break  # a histogram section may follow the metrics
+            else:
+                rows.append(dict(zip(columns, line.split("\t"))))
+    if columns is None:
+        raise ValueError(f"{path} has no METRICS CLASS section")
+    return header, columns, rows
+
+
+def write_metrics(path: str, header: list[str], columns: list[str], rows: list[dict[str, str]]):
+    with open(path, "w") as f:
+        f.writelines(line + "\n" for line in header)
+        f.write("\t".join(columns) + "\n")
+        f.writelines("\t".join(row.get(column, "") for column in columns) + "\n" for row in rows)
+
+
+def vcf_key(path: str) -> str:
+    """MD5 of a fingerprint VCF's content, to tell a re-fingerprinted file from the one in the matrix."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def metrics_header(command: str, created: int | None = None) -> list[str]:
+    header = ["## htsjdk.samtools.metrics.StringHeader", f"# {command}"]
+    if created is not None:
+        header.append(f"# CREATED={created}")
+    return header + ["", METRICS_CLASS]
+
+
+def metrics_created(header: list[str]) -> int:
+    """When a store shard's metrics were computed (0 for metrics written before the store was sharded)."""
+    for line in header:
+        if line.startswith("# CREATED="):
+            return int(line[len("# CREATED="):])
+    return 0
+
+
+def load_store(store: str | None, blocks: list[str], maf: np.ndarray, haplotype_map: str) -> FingerprintMatrix:
+    """Merge the matrix shards of a store (and a legacy fingerprint_matrix.npz); the latest row of a file wins."""
+    shards = []
+    for path in sorted(glob.glob(os.path.join(store, "fingerprint_matrix*.npz"))) if store else []:
+        shard = FingerprintMatrix.load(path)
+        if shard.blocks != blocks:
+            raise ValueError(f"{path} was built with a different haplotype map than {haplotype_map}")
+        shards.append(shard)
+
+    latest: dict[str, tuple[FingerprintMatrix, int]] = {}
+    for shard in sorted(shards, key=lambda shard: shard.created):
+        for i, name in enumerate(shard.files):
+            latest[name] = (shard, i)
+    matrix = FingerprintMatrix(blocks, maf)
+    for name, (shard, i) in latest.items():
+        matrix.add([name], [shard.samples[i]], [shard.pls[i]], [shard.keys[i]], [shard.since[i]])
+    return matrix
+
+
+def load_metrics(store: str | None, metrics: str | None, matrix: FingerprintMatrix) -> dict[tuple[str, str], dict[str, str]]:
+    """Crosscheck rows of the store's metrics shards (and earlier metrics) still valid for the matrix, by ordered pair.
+
+    A row is dropped when either file was re-fingerprinted after the row was computed; of rows for the
+    same pair, the latest wins.
+    """
+    paths = [metrics] if metrics and os.path.exists(metrics) else []
+    paths += sorted(glob.glob(os.path.join(store, "crosscheck*.metrics"))) if store else []
+    sources = []
+    for path in paths:
+        header, _, rows = read_metrics(path)
+        sources.append((metrics_created(header), rows))
+
+    since = dict(zip(matrix.files, matrix.since))
+    valid = {}
+    for created, rows in sorted(sources, key=lambda source: source[0]):
+        for row in rows:
+            pair = tuple(os.path.basename(row.get(column, "")) for column in ("LEFT_GROUP_VALUE", "RIGHT_GROUP_VALUE"))
+            if created >= since.get(pair[0], 0) and created >= since.get(pair[1], 0):
+                valid.pop(pair, None)
+                valid[pair] = row
+    return valid
+
+
+def update(vcf_paths: list[str], haplotype_map: str, store: str | None, shard_dir: str, run: str,
+           metrics: str | None, output: str, lod_threshold: float, command: str = "fingerprint_matrix.py",
+           max_effect: float = MAX_EFFECT_OF_EACH_HAPLOTYPE_BLOCK) -> dict[str, int]:
+    """Crosscheck new and re-fingerprinted VCFs against the store's cohort; return counts.
+
+    The rows and pairs this run computes are written as the run's shard to shard_dir; the metrics of the
+    whole cohort to output.
+    """
+    created = time.time_ns()
+    blocks, maf, snps = read_haplotype_map(haplotype_map)
+    matrix = load_store(store, blocks, maf, haplotype_map)
+    valid = load_metrics(store, metrics, matrix)
+
+    stored = dict(zip(matrix.files, matrix.keys))
+    shard = FingerprintMatrix(blocks, maf)
+    new = []
+    for path in vcf_paths:
+        name = os.path.basename(path)
+        if name in shard.files:
+            continue
+        key = vcf_key(path)
+        if name in stored and stored[name] in (key, ""):
+            if not stored[name]:
+                # a row from before VCFs were keyed: record its key rather than crosscheck it again
+                known = matrix.rows([name])
+                shard.add([name], known.samples, list(known.pls), [key], known.since)
+            continue
+        # a re-fingerprinted file's earlier metrics are only valid until now
+        sample, sample_pls = read_fingerprint(path, snps, len(blocks))
+        shard.add([name], [sample], [sample_pls], [key], [created if name in stored else 0])
+        new.append(name)
+
+    # pairs missing from the store (eg: between the new samples of concurrent runs) are crosschecked again
+    old = [name for name in matrix.files if name not in new]
+    partners: dict[str, set[str]] = {name: set() for name in old}
+    for left, right in valid:
+        if left in partners and right in partners:
+            partners[left].add(right)
+    incomplete = [name for name in old if len(partners[name]) < len(old)]
+    if incomplete:
+        print(f"{len(incomplete)} fingerprints are missing pairs in {store}; crosschecking them again", file=sys.stderr)
+
+    complete = [name for name in old if name not in incomplete]
+    cohort = matrix.rows(complete + incomplete)
+    fresh = shard.rows(new)
+    cohort.add(fresh.files, fresh.samples, list(fresh.pls), fresh.keys, fresh.since)
+    rows = crosscheck(cohort, len(complete), lod_threshold, max_effect)
+    for row in rows:
+        valid.pop((row["LEFT_GROUP_VALUE"], row["RIGHT_GROUP_VALUE"]), None)
+        valid[(row["LEFT_GROUP_VALUE"], row["RIGHT_GROUP_VALUE"])] = row
+
+    header, columns = metrics_header(command), METRICS_COLUMNS
+    if metrics and os.path.exists(metrics):
+        header, columns, _ = read_metrics(metrics)
+    write_metrics(output, header, columns, list(valid.values()))
+    if shard.files or rows:
+        shard.created = created
+        shard.save(os.path.join(shard_dir, f"fingerprint_matrix.{run}.npz"))
+    if rows:
+        write_metrics(os.path.join(shard_dir, f"crosscheck.{run}.metrics"), metrics_header(command, created),
+                      METRICS_COLUMNS, rows)
+    return {"new": len(new), "cohort": len(cohort.files), "pairs": len(rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental fingerprint crosschecking for WESley")
+    parser.add_argument("vcfs", nargs="+", help="Fingerprint VCFs (from Picard ExtractFingerprint)")
+    parser.add_argument("--haplotype_map", type=str, required=True, help="Picard haplotype map")
+    parser.add_argument("--store", type=str, help="Directory of the cohort's matrix and metrics shards (if present)")
+    parser.add_argument("--run", type=str, required=True, help="Name of this run's shard")
+    parser.add_argument("--shard_dir", type=str, default=".", help="Where to write this run's shard (default: .)")
+    parser.add_argument("--metrics", type=str, help="Earlier crosscheck metrics of the cohort, eg: an all-vs-all Picard run (if present)")
+    parser.add_argument("-o", "--output", type=str, required=True, help="Crosscheck metrics of the whole cohort")
+    parser.add_argument("--lod_threshold", type=float, default=-5, help="LOD_THRESHOLD as in CrosscheckFingerprints (default: -5)")
+    parser.add_argument("--max_effect_of_each_haplotype_block", type=float, default=MAX_EFFECT_OF_EACH_HAPLOTYPE_BLOCK,
+                        help="MAX_EFFECT_OF_EACH_HAPLOTYPE_BLOCK as in CrosscheckFingerprints (default: 3.0)")
+
+    args = parser.parse_args()
+    counts = update(args.vcfs, args.haplotype_map, args.store, args.shard_dir, args.run, args.metrics, args.output,
+                    args.lod_threshold, " ".join(["fingerprint_matrix.py"] + sys.argv[1:]),
+                    args.max_effect_of_each_haplotype_block)
+    print(f"{counts['new']} new fingerprints crosschecked against a cohort of {counts['cohort']}: "
+          f"{counts['pairs']} pairs computed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
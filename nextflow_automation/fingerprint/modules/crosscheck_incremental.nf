@@ -0,0 +1,50 @@
+/*
+crosscheck_incremental.nf module
+
+This module crosschecks only the fingerprint VCFs that are new to the cohort (or were
+fingerprinted again) with 'fingerprint_matrix.py': their haplotype-block genotype likelihoods
+are compared against every earlier sample of the fingerprint store and each other, and the
+metrics of the whole cohort are written to 'crosscheck.metrics'.
+
+The rows and pairs a run computes are published to 'store_dir' as that run's shard,
+'fingerprint_matrix.<run>.npz' and 'crosscheck.<run>.metrics', so concurrent runs sharing a
+store never overwrite each other. The shard is written under a fixed name and renamed to the
+run's name when published, which keeps the run name out of the task hash.
+
+Python version: 3.10
+*/
+
+process CROSSCHECK_INCREMENTAL {
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+    stageInMode 'symlink'
+
+    publishDir "${params.output_dir}/fingerprint/comparison-metrics", mode: 'copy', pattern: "crosscheck.metrics"
+    publishDir "${store_dir}", mode: 'copy', pattern: "{fingerprint_matrix,crosscheck}.run.*",
+        saveAs: { name -> name.replace(".run.", ".${workflow.runName}.") }
+
+    input:
+    path(vcfs)
+    path fingerprint_matrix_script
+    path(store_shards, stageAs: "previous/*")
+    path(previous_metrics, stageAs: "previous_metrics/*")
+    val store_dir
+
+    output:
+    path("crosscheck.metrics"), emit: metrics
+    path("fingerprint_matrix.run.npz"), optional: true, emit: matrix
+    path("crosscheck.run.metrics"), optional: true, emit: shard_metrics
+
+    script:
+    """
+    python3 ${fingerprint_matrix_script} \\
+        --haplotype_map /references/${params.haplotype_map} \\
+        --store previous \\
+        --run run \\
+        ${previous_metrics ? "--metrics ${previous_metrics}" : ''} \\
+        -o crosscheck.metrics \\
+        --lod_threshold -5 \\
+        ${vcfs}
+    """
+}
@@ -1 +1,5 @@
-from .make_mc_manifest import find_normal_info, lookup_shortid, build_manifest_local, build_manifest_omics, main
\ No newline at end of file
+from .make_mc_manifest import find_normal_info, lookup_shortid, build_manifest_local, build_manifest_omics, fetch_read_set_metadata, ManifestCache, filter_new_samples, catalog_names, main
+from .process_mafs import read_terms, process_maf
+from .annotate_oncokb import OncoKBCache, OncoKBClient, annotate_mafs
+from .vep_store import VepStore, collect_sites, load_annotations, join_annotations
+from .maf_warehouse import MafWarehouse, find_mafs, read_maf, merge_calls
@@ -0,0 +1,391 @@
+"""
+annotate_oncokb.py module
+
+Batched, cached OncoKB annotation of MAF files for the WESley mutation and consensus calling
+pipelines. Replaces one 'MafAnnotator.py' run per MAF:
+  - every MAF of a run is read first and its calls reduced to unique OncoKB queries
+    (gene, alteration, consequence, protein start/end, tumor type, reference genome)
+  - queries are looked up in a SQLite cache keyed by the query and the OncoKB data version,
+    so a gene/protein change is only sent to the API once per data release, across samples,
+    callers and runs
+  - the cache of a run only holds the annotations it fetched; the caches of earlier runs are
+    read with --previous, so concurrent runs each write their own file and none is overwritten
+  - cache misses are sent to the API as batched 'annotate/mutations/byProteinChange' POSTs
+  - annotated MAFs ('*.oncokb.maf') are then written from the cache, with the MafAnnotator
+    mutation columns (ONCOGENIC, MUTATION_EFFECT, LEVEL_*, HIGHEST_*_LEVEL, *_CITATIONS)
+
+'compact' merges the per-run caches of a cache directory into a single 'oncokb_cache.sqlite',
+keeping only the entries of the current OncoKB data version, and removes the merged caches.
+
+Usage:
+    python annotate_oncokb.py annotate --cache oncokb_cache.RUN.sqlite --previous oncokb_cache*.sqlite \\
+        --token "$ONCOKB_API_KEY" --tumor_type BRAIN --output_dir . SAMPLE.*.vep.nonsynonymous.rename.maf
+    python annotate_oncokb.py compact --cache_dir /refs/oncokb_cache --token "$ONCOKB_API_KEY"
+
+Python version: 3.8+ (runs in the e10m/oncokb image)
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_API_URL = "https://www.oncokb.org/api/v1"
+
+# HTTP status codes that are retried with backoff (rate limiting and transient server errors)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# MAF Variant_Classification -> OncoKB consequence (as in MafAnnotator)
+CONSEQUENCES = {
+    "Missense_Mutation": "missense_variant",
+    "Nonsense_Mutation": "stop_gained",
+    "Nonstop_Mutation": "stop_lost",
+    "Frame_Shift_Del": "frameshift_variant",
+    "Frame_Shift_Ins": "frameshift_variant",
+    "In_Frame_Del": "inframe_deletion",
+    "In_Frame_Ins": "inframe_insertion",
+    "Splice_Site": "splice_region_variant",
+    "Splice_Region": "splice_region_variant",
+    "Translation_Start_Site": "start_lost",
+}
+
+TX_LEVELS = ["LEVEL_1", "LEVEL_2", "LEVEL_3A", "LEVEL_3B", "LEVEL_4", "LEVEL_R1", "LEVEL_R2"]
+DX_LEVELS = ["LEVEL_Dx1", "LEVEL_Dx2", "LEVEL_Dx3"]
+PX_LEVELS = ["LEVEL_Px1", "LEVEL_Px2", "LEVEL_Px3"]
+# treatment levels from most to least significant, used for HIGHEST_LEVEL
+LEVEL_ORDER = ["LEVEL_R1", "LEVEL_1", "LEVEL_2", "LEVEL_3A", "LEVEL_3B", "LEVEL_4", "LEVEL_R2"]
+
+ANNOTATION_COLUMNS = (
+    ["ANNOTATED", "GENE_IN_ONCOKB", "VARIANT_IN_ONCOKB", "MUTATION_EFFECT", "MUTATION_EFFECT_CITATIONS",
+     "ONCOGENIC"]
+    + TX_LEVELS + ["HIGHEST_LEVEL", "HIGHEST_SENSITIVE_LEVEL", "HIGHEST_RESISTANCE_LEVEL", "TX_CITATIONS"]
+    + DX_LEVELS + ["HIGHEST_DX_LEVEL", "DX_CITATIONS"]
+    + PX_LEVELS + ["HIGHEST_PX_LEVEL", "PX_CITATIONS"]
+)
+
+
+class OncoKBCache:
+    """SQLite cache of OncoKB annotations, keyed by query and OncoKB data version.
+
+    Annotations only change with a new OncoKB data release, so entries for older data versions
+    are never served once the API reports a new one. New annotations are written to path only;
+    the previous caches (e.g. of other runs) are opened read-only and looked up after it.
+    """
+
+    def __init__(self, path: str, previous: list[str] = ()):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS annotations (
+                data_version TEXT NOT NULL, query TEXT NOT NULL, response TEXT NOT NULL,
+                PRIMARY KEY (data_version, query));
+        """)
+        self.previous = [sqlite3.connect(f"file:{os.path.abspath(cache)}?mode=ro", uri=True)
+                         for cache in previous if os.path.abspath(cache) != os.path.abspath(path)]
+
+    def close(self):
+        self.conn.close()
+        for conn in self.previous:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, data_version: str, keys: list[str]) -> dict[str, dict]:
+        """Return cached responses for whichever of keys are cached, here or in a previous cache."""
+        cached = {}
+        for conn in (self.conn, *self.previous):
+            remaining = [key for key in keys if key not in cached]
+            for start in range(0, len(remaining), 500):
+                chunk = remaining[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT query, response FROM annotations WHERE data_version = ? "
+                    f"AND query IN ({','.join('?' * len(chunk))})", [data_version, *chunk])
+                cached.update((key, json.loads(response)) for key, response in rows)
+        return cached
+
+    def put(self, data_version: str, responses: dict[str, dict]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?)",
+                [(data_version, key, json.dumps(response)) for key, response in responses.items()])
+
+
+class OncoKBClient:
+    """Minimal OncoKB API client (data version and batched protein change annotation)."""
+
+    def __init__(self, token: str | None, api_url: str = DEFAULT_API_URL, batch_size: int = 100,
+                 max_retries: int = 5, backoff: float = 1.0, timeout: float = 120):
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def _request(self, path: str, body=None):
+        headers = {"Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(self.max_retries + 1):
+            request = urllib.request.Request(f"{self.api_url}/{path}", data=data, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.load(response)
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    raise
+            # exponential backoff with jitter
+            time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    def data_version(self) -> str:
+        """OncoKB data release the API currently serves (e.g. 'v4.24')."""
+        return self._request("info")["dataVersion"]["version"]
+
+    def annotate(self, queries: list[dict]) -> list[dict]:
+        """Annotate queries in batches of batch_size; responses are returned in query order."""
+        responses = []
+        for start in range(0, len(queries), self.batch_size):
+            batch = queries[start:start + self.batch_size]
+            result = self._request("annotate/mutations/byProteinChange", batch)
+            if len(result) != len(batch):
+                raise RuntimeError(f"OncoKB returned {len(result)} annotations for {len(batch)} queries")
+            responses.extend(result)
+        return responses
+
+
+def build_query(row: dict, tumor_type: str, reference_genome: str) -> dict | None:
+    """OncoKB protein change query for one MAF row, or None when the row cannot be annotated."""
+    gene = row.get("Hugo_Symbol", "")
+    classification = row.get("Variant_Classification", "")
+    alteration = row.get("HGVSp_Short", "")
+    alteration = alteration[2:] if alteration.startswith("p.") else alteration
+
+    if gene == "TERT" and classification == "5'Flank":
+        alteration = "Promoter"
+    if not gene or gene == "Unknown" or not alteration:
+        return None
+
+    query = {
+        "gene": {"hugoSymbol": gene},
+        "alteration": alteration,
+        "consequence": CONSEQUENCES.get(classification, "any"),
+        "tumorType": tumor_type,
+        "referenceGenome": reference_genome,
+    }
+    # Protein_position is 'start/length' or 'start-end/length'
+    positions = re.match(r"(\d+)(?:-(\d+))?/", row.get("Protein_position", ""))
+    if positions:
+        query["proteinStart"] = int(positions.group(1))
+        query["proteinEnd"] = int(positions.group(2) or positions.group(1))
+    return query
+
+
+def query_key(query: dict) -> str:
+    return json.dumps(query, sort_keys=True)
+
+
+def read_maf(path: str) -> tuple[list[str], list[str], list[list[str]]]:
+    """Return (comment lines, header, rows) of a MAF."""
+    comments, header, rows = [], None, []
+    with open(path) as f:
+        for line in f:
+            if header is None:
+                if line.startswith("#"):
+                    comments.append(line)
+                    continue
+                header = line.rstrip("\n").split("\t")
+                continue
+            if line.strip():
+                rows.append(line.rstrip("\n").split("\t"))
+    if header is None:
+        raise ValueError(f"{path} has no header line")
+    return comments, header, rows
+
+
+def _join(values) -> str:
+    return ",".join(dict.fromkeys(value for value in values if value))
+
+
+def _citations(items) -> str:
+    pmids = [str(pmid) for item in items for pmid in item.get("pmids", [])]
+    abstracts = [f"{abstract.get('abstract', '')}({abstract.get('link', '')})"
+                 for item in items for abstract in item.get("abstracts", [])]
+    return ";".join(dict.fromkeys(pmids + abstracts))
+
+
+def annotation_columns(response: dict | None) -> list[str]:
+    """MafAnnotator-style mutation annotation columns for one OncoKB response."""
+    if response is None:
+        return ["False"] + [""] * (len(ANNOTATION_COLUMNS) - 1)
+
+    treatments = response.get("treatments") or []
+    diagnostics = response.get("diagnosticImplications") or []
+    prognostics = response.get("prognosticImplications") or []
+    mutation_effect = response.get("mutationEffect") or {}
+    sensitive = response.get("highestSensitiveLevel") or ""
+    resistance = response.get("highestResistanceLevel") or ""
+    highest = next((level for level in LEVEL_ORDER if level in (sensitive, resistance)), "")
+
+    def tumor_types(implications, level):
+        return _join((item.get("tumorType") or {}).get("name", "")
+                     for item in implications if item.get("levelOfEvidence") == level)
+
+    columns = [
+        "True",
+        str(bool(response.get("geneExist"))),
+        str(bool(response.get("variantExist"))),
+        mutation_effect.get("knownEffect", ""),
+        _citations([mutation_effect.get("citations") or {}]),
+        response.get("oncogenic", ""),
+    ]
+    columns += [_join("+".join(drug["drugName"] for drug in treatment.get("drugs", []))
+                      for treatment in treatments if treatment.get("level") == level) for level in TX_LEVELS]
+    columns += [highest, sensitive, resistance, _citations(treatments)]
+    columns += [tumor_types(diagnostics, level) for level in DX_LEVELS]
+    columns += [response.get("highestDiagnosticImplicationLevel") or "", _citations(diagnostics)]
+    columns += [tumor_types(prognostics, level) for level in PX_LEVELS]
+    columns += [response.get("highestPrognosticImplicationLevel") or "", _citations(prognostics)]
+    return columns
+
+
+def output_name(maf_path: str) -> str:
+    """GBX1.mutect2.paired.vep.nonsynonymous.rename.maf -> GBX1.mutect2.paired.vep.nonsynonymous.oncokb.maf"""
+    return re.sub(r"(\.rename)?\.maf$", ".oncokb.maf", os.path.basename(maf_path))
+
+
+def annotate_mafs(maf_paths: list[str], output_dir: str, cache: OncoKBCache, client: OncoKBClient,
+                  tumor_type: str = "BRAIN", reference_genome: str = "GRCh38") -> dict[str, int]:
+    """Annotate maf_paths into output_dir; return counts of unique queries, cache hits and API lookups."""
+    mafs = [(path, *read_maf(path)) for path in maf_paths]
+
+    # reduce every call of every MAF to its unique OncoKB queries
+    queries = {}
+    row_keys = []
+    for _, _, header, rows in mafs:
+        keys = []
+        for row in rows:
+            query = build_query(dict(zip(header, row)), tumor_type, reference_genome)
+            key = query_key(query) if query else None
+            if key:
+                queries.setdefault(key, query)
+            keys.append(key)
+        row_keys.append(keys)
+
+    # serve what the cache has for the current data version, batch the rest to the API
+    data_version = client.data_version() if queries else ""
+    responses = cache.get(data_version, list(queries)) if queries else {}
+    missing = [key for key in queries if key not in responses]
+    if missing:
+        fetched = dict(zip(missing, client.annotate([queries[key] for key in missing])))
+        cache.put(data_version, fetched)
+        responses.update(fetched)
+
+    os.makedirs(output_dir, exist_ok=True)
+    for (path, comments, header, rows), keys in zip(mafs, row_keys):
+        with open(os.path.join(output_dir, output_name(path)), "w") as f:
+            f.writelines(comments)
+            f.write("\t".join(header + ANNOTATION_COLUMNS) + "\n")
+            for row, key in zip(rows, keys):
+                f.write("\t".join(row + annotation_columns(responses.get(key) if key else None)) + "\n")
+
+    return {"queries": len(queries), "cached": len(queries) - len(missing), "fetched": len(missing)}
+
+
+def cache_files(cache_dir: str) -> list[str]:
+    """The OncoKB caches of a cache directory ('oncokb_cache*.sqlite')."""
+    return sorted(glob.glob(os.path.join(glob.escape(cache_dir), "oncokb_cache*.sqlite")))
+
+
+def compact(caches: list[str], output: str, data_version: str) -> dict[str, int]:
+    """Merge caches into output, keeping only the entries of data_version; return counts."""
+    if os.path.exists(output + ".tmp"):
+        os.remove(output + ".tmp")
+    dropped = 0
+    with OncoKBCache(output + ".tmp") as merged:
+        for path in caches:
+            conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+            try:
+                rows = conn.execute("SELECT data_version, query, response FROM annotations").fetchall()
+            finally:
+                conn.close()
+            current = [row for row in rows if row[0] == data_version]
+            with merged.conn:
+                merged.conn.executemany("INSERT OR REPLACE INTO annotations VALUES (?, ?, ?)", current)
+            dropped += len(rows) - len(current)
+    os.replace(output + ".tmp", output)
+    with sqlite3.connect(output) as conn:
+        entries = conn.execute("SELECT COUNT(*) FROM annotations").fetchone()[0]
+    return {"caches": len(caches), "entries": entries, "dropped": dropped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched, cached OncoKB annotation of WESley MAF files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    annotate = subparsers.add_parser("annotate", help="Annotate MAFs, from the caches where possible")
+    annotate.add_argument("mafs", nargs="+", help="MAF files to annotate")
+    annotate.add_argument("--cache", type=str, required=True,
+                          help="SQLite annotation cache the fetched annotations are written to (created if missing)")
+    annotate.add_argument("--previous", nargs="*", default=[],
+                          help="Caches of earlier runs to serve annotations from (read-only)")
+    annotate.add_argument("-o", "--output_dir", type=str, default=".", help="Directory for the '*.oncokb.maf' files")
+    annotate.add_argument("-t", "--tumor_type", type=str, default="BRAIN", help="OncoKB tumor type (default: BRAIN)")
+    annotate.add_argument("-r", "--reference_genome", type=str, default="GRCh38", help="Reference genome (default: GRCh38)")
+    annotate.add_argument("--batch_size", type=int, default=100, help="Queries per API request (default: 100)")
+
+    compact_parser = subparsers.add_parser("compact", help="Merge the per-run caches of a cache directory into one, "
+                                                           "dropping the entries of older OncoKB data versions")
+    compact_parser.add_argument("--cache_dir", type=str, required=True, help="Directory of the 'oncokb_cache*.sqlite' caches")
+    compact_parser.add_argument("--data_version", type=str,
+                                help="OncoKB data version to keep (default: the one the OncoKB API serves)")
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("-b", "--token", type=str, default=os.environ.get("ONCOKB_API_KEY"),
+                               help="OncoKB API token (default: $ONCOKB_API_KEY)")
+        subparser.add_argument("--api_url", type=str, default=DEFAULT_API_URL,
+                               help=f"OncoKB API URL (default: {DEFAULT_API_URL})")
+
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        caches = cache_files(args.cache_dir)
+        if not caches:
+            sys.exit(f"no OncoKB caches in {args.cache_dir}")
+        data_version = args.data_version or OncoKBClient(args.token, args.api_url).data_version()
+        output = os.path.join(args.cache_dir, "oncokb_cache.sqlite")
+        counts = compact(caches, output, data_version)
+        # the merged caches are removed only once the compacted cache is in place
+        for path in caches:
+            if os.path.abspath(path) != os.path.abspath(output):
+                os.remove(path)
+        print(f"Compacted {counts['caches']} cache(s) into {output}: {counts['entries']} entries for OncoKB "
+              f"{data_version}, {counts['dropped']} entries of older data versions dropped", file=sys.stderr)
+        return
+
+    client = OncoKBClient(args.token, args.api_url, args.batch_size)
+    with OncoKBCache(args.cache, args.previous) as cache:
+        counts = annotate_mafs(args.mafs, args.output_dir, cache, client, args.tumor_type, args.reference_genome)
+
+    print(f"Annotated {len(args.mafs)} MAF(s): {counts['queries']} unique queries, "
+          f"{counts['cached']} from cache, {counts['fetched']} from the OncoKB API", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
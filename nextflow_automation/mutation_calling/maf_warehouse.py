@@ -0,0 +1,342 @@
+"""
+maf_warehouse.py module
+
+Cohort-wide Parquet warehouse of the WESley mutation calls.
+
+Each run publishes one small MAF per sample and caller ('mutation_calls/<caller>/oncokb_annotation/
+*.vep.nonsynonymous.oncokb.maf' and 'mutation_calls/<caller>/tertp/*.tertp.maf'). Only the MAFs of
+the CALLER_ORDER callers are ingested: consensus MAFs found in the same tree (written by consensus
+calling from these calls) are skipped, so they are not counted as another caller. Ingesting a batch
+streams those MAFs (only the stored columns are read) into typed columns, one row per sample and
+variant (CHROM, POS, REF, ALT):
+
+    <store>/batch=<batch>/variants.parquet   the batch's variants, sorted by gene and sample
+    <store>/_index/batch=<batch>.parquet     one row per ingested sample of the batch
+
+Calls of the same variant by several callers are merged into one row that lists the supporting
+callers; its other fields come from the first caller in CALLER_ORDER that has them. The OncoKB
+columns (ONCOGENIC, MUTATION_EFFECT and the highest treatment, diagnostic and prognostic levels)
+are kept, and are empty for TERT promoter calls (which are not annotated).
+
+Variants are deduplicated across reruns: re-ingesting a batch replaces it, and a sample ingested
+again with another batch is only read from its latest ingestion (the index records when each
+sample was ingested). Queries by gene, sample, caller and OncoKB level, and cohort recurrence
+counts, scan the Parquet files only, where the gene sort lets row group statistics skip most of
+each file. Ingesting a batch only writes that batch's files, so the store can be built by the
+workflows one batch at a time.
+
+Usage:
+    python maf_warehouse.py ingest --store /path/to/maf_warehouse --batch batch_07 /data/batch_07/mutation_calls
+    python maf_warehouse.py query --store /path/to/maf_warehouse --genes IDH1 TP53 --min_callers 2
+    python maf_warehouse.py query --store /path/to/maf_warehouse --levels LEVEL_1 LEVEL_2 -o actionable.tsv
+    python maf_warehouse.py recurrence --store /path/to/maf_warehouse --by variant --oncogenic Oncogenic "Likely Oncogenic"
+
+Python version: 3.10+
+"""
+
+import argparse
+import fnmatch
+import glob
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+
+import polars as pl
+
+# stored column -> (MAF column, type); MAF positions are kept 1-based
+MAF_COLUMNS = {
+    "gene": ("Hugo_Symbol", pl.Utf8),
+    "chrom": ("Chromosome", pl.Utf8),
+    "start": ("Start_Position", pl.Int64),
+    "end": ("End_Position", pl.Int64),
+    "ref": ("Reference_Allele", pl.Utf8),
+    "alt": ("Tumor_Seq_Allele2", pl.Utf8),
+    "classification": ("Variant_Classification", pl.Utf8),
+    "variant_type": ("Variant_Type", pl.Utf8),
+    "hgvsp": ("HGVSp_Short", pl.Utf8),
+    "t_depth": ("t_depth", pl.Int64),
+    "t_alt_count": ("t_alt_count", pl.Int64),
+    "n_depth": ("n_depth", pl.Int64),
+    "n_alt_count": ("n_alt_count", pl.Int64),
+    "oncogenic": ("ONCOGENIC", pl.Utf8),
+    "mutation_effect": ("MUTATION_EFFECT", pl.Utf8),
+    "highest_level": ("HIGHEST_LEVEL", pl.Utf8),
+    "highest_dx_level": ("HIGHEST_DX_LEVEL", pl.Utf8),
+    "highest_px_level": ("HIGHEST_PX_LEVEL", pl.Utf8),
+}
+REQUIRED_COLUMNS = ("gene", "chrom", "start", "end", "ref", "alt")
+LEVEL_COLUMNS = ("highest_level", "highest_dx_level", "highest_px_level")
+VARIANT_KEY = ["sample", "chrom", "start", "ref", "alt"]
+VARIANT_SCHEMA = {
+    "sample": pl.Utf8,
+    **{column: dtype for column, (_, dtype) in MAF_COLUMNS.items()},
+    "callers": pl.List(pl.Utf8),
+    "num_callers": pl.Int64,
+    "tertp": pl.Boolean,
+}
+INDEX_SCHEMA = {
+    "batch": pl.Utf8,
+    "sample": pl.Utf8,
+    "path": pl.Utf8,
+    "variants": pl.Int64,
+    "calls": pl.Int64,
+    "ingested_at": pl.Utf8,
+}
+# callers whose fields are kept when several call a variant, in order of preference
+CALLER_ORDER = ["mutect2", "MuSE", "varscan2"]
+MAF_PATTERNS = ["*.oncokb.maf", "*tertp*.maf"]
+ROW_GROUP_SIZE = 4096
+
+
+def find_mafs(paths: list[str]) -> list[str]:
+    """The given MAF files, plus the OncoKB-annotated and TERT promoter MAFs of the CALLER_ORDER callers
+    below any given directory (the consensus MAFs of consensus calling are skipped)."""
+    mafs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            mafs.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            mafs.extend(os.path.join(root, name) for name in sorted(names)
+                        if any(fnmatch.fnmatch(name, pattern) for pattern in MAF_PATTERNS)
+                        and name.count(".") >= 2 and name.split(".")[1] in CALLER_ORDER)
+    return mafs
+
+
+def maf_source(path: str) -> tuple[str, str]:
+    """GBX1.mutect2.paired.vep.nonsynonymous.oncokb.maf -> ('GBX1', 'mutect2')"""
+    fields = os.path.basename(path).split(".")
+    if len(fields) < 3 or not path.endswith(".maf"):
+        raise ValueError(f"{path} is not named <sample>.<caller>...maf")
+    if fields[1] not in CALLER_ORDER:
+        raise ValueError(f"{path} is not from one of the callers {', '.join(CALLER_ORDER)}")
+    return fields[0], fields[1]
+
+
+def read_maf(path: str) -> pl.DataFrame:
+    """Read the MAF_COLUMNS of a MAF as typed columns, with its sample, caller and whether it holds TERT promoter calls."""
+    sample, caller = maf_source(path)
+    with open(path) as f:
+        header = next((line.rstrip("\n").split("\t") for line in f if not line.startswith("#")), [])
+    missing = [MAF_COLUMNS[column][0] for column in REQUIRED_COLUMNS if MAF_COLUMNS[column][0] not in header]
+    if missing:
+        raise ValueError(f"{path} is missing MAF column(s): {', '.join(missing)}")
+
+    # the OncoKB columns are absent from unannotated (TERT promoter) MAFs
+    columns = [
+        (pl.col(maf_column).cast(dtype, strict=False) if maf_column in header else pl.lit(None, dtype)).alias(column)
+        for column, (maf_column, dtype) in MAF_COLUMNS.items()
+    ]
+    return (
+        pl.scan_csv(path, separator="\t", comment_prefix="#", quote_char=None, infer_schema_length=0)
+        .select(pl.lit(sample).alias("sample"), *columns, pl.lit(caller).alias("caller"),
+                pl.lit(".tertp." in os.path.basename(path)).alias("tertp"))
+        .collect()
+    )
+
+
+def merge_calls(calls: pl.DataFrame) -> pl.DataFrame:
+    """One row per sample and variant, listing its callers and taking each field from the preferred caller."""
+    rank = pl.col("caller").replace_strict(CALLER_ORDER, list(range(len(CALLER_ORDER))),
+                                           default=len(CALLER_ORDER), return_dtype=pl.Int64)
+    fields = [column for column in MAF_COLUMNS if column not in VARIANT_KEY]
+    return (
+        calls.sort(rank, "caller")
+        .group_by(VARIANT_KEY, maintain_order=True)
+        .agg(
+            *[pl.col(column).drop_nulls().first() for column in fields],
+            pl.col("caller").unique(maintain_order=True).alias("callers"),
+            pl.col("tertp").any(),
+        )
+        .with_columns(pl.col("callers").list.len().cast(pl.Int64).alias("num_callers"))
+        .select(list(VARIANT_SCHEMA))
+        .sort("gene", "sample", "chrom", "start", nulls_last=True)
+    )
+
+
+class MafWarehouse:
+    """Parquet variant store partitioned by batch, see the module docstring."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def index(self) -> pl.DataFrame:
+        """The ingested samples of every batch."""
+        paths = sorted(glob.glob(os.path.join(self.root, "_index", "batch=*.parquet")))
+        if not paths:
+            return pl.DataFrame(schema=INDEX_SCHEMA)
+        return pl.concat([pl.read_parquet(path) for path in paths])
+
+    def batches(self) -> list[str]:
+        return sorted(self.index()["batch"].unique().to_list())
+
+    def current(self, batches: list[str] | None = None) -> pl.DataFrame:
+        """Index rows of the latest ingestion of every sample (optionally only among the given batches)."""
+        index = self.index()
+        if batches:
+            index = index.filter(pl.col("batch").is_in(batches))
+        return index.sort("ingested_at", "batch").group_by("sample", maintain_order=True).last().sort("sample")
+
+    def ingest(self, paths: list[str], batch: str) -> int:
+        """Write the variants of one batch's MAFs (replacing the batch); return the variant count."""
+        if not batch or "/" in batch or batch.startswith("."):
+            raise ValueError(f"invalid batch name: {batch!r}")
+
+        mafs = find_mafs(paths)
+        calls = pl.concat([read_maf(path) for path in mafs]) if mafs else pl.DataFrame()
+        variants = merge_calls(calls) if calls.height else pl.DataFrame(schema=VARIANT_SCHEMA)
+        self.remove(batch)
+
+        relative_path = os.path.join(f"batch={batch}", "variants.parquet")
+        os.makedirs(os.path.join(self.root, f"batch={batch}"), exist_ok=True)
+        variants.write_parquet(os.path.join(self.root, relative_path), row_group_size=ROW_GROUP_SIZE, statistics=True)
+
+        # every sample with a MAF is indexed, so samples without calls count towards the cohort
+        ingested_at = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        counts = {sample: [0, 0] for sample in sorted({maf_source(path)[0] for path in mafs})}
+        for sample, rows in (calls.group_by("sample").len().rows() if calls.height else []):
+            counts[sample][1] = rows
+        for sample, rows in variants.group_by("sample").len().rows():
+            counts[sample][0] = rows
+        index = pl.DataFrame(
+            [{"batch": batch, "sample": sample, "path": relative_path, "variants": variant_count,
+              "calls": call_count, "ingested_at": ingested_at}
+             for sample, (variant_count, call_count) in counts.items()],
+            schema=INDEX_SCHEMA,
+        )
+
+        # the batch's index is written last, so a partly ingested batch is never queried
+        os.makedirs(os.path.join(self.root, "_index"), exist_ok=True)
+        index_path = os.path.join(self.root, "_index", f"batch={batch}.parquet")
+        index.write_parquet(index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        return variants.height
+
+    def remove(self, batch: str):
+        """Drop a batch's index and variants from the store."""
+        index_path = os.path.join(self.root, "_index", f"batch={batch}.parquet")
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        if os.path.isdir(os.path.join(self.root, f"batch={batch}")):
+            shutil.rmtree(os.path.join(self.root, f"batch={batch}"))
+
+    def scan(self, batches: list[str] | None = None) -> pl.LazyFrame:
+        """The variants of every sample's latest ingestion, with their batch."""
+        frames = [
+            pl.scan_parquet(os.path.join(self.root, path))
+            .filter(pl.col("sample").is_in(samples))
+            .with_columns(pl.lit(batch).alias("batch"))
+            for batch, path, samples in (
+                self.current(batches).group_by("batch", "path").agg("sample").sort("batch").iter_rows()
+            )
+        ]
+        if not frames:
+            return pl.LazyFrame(schema={"batch": pl.Utf8, **VARIANT_SCHEMA})
+        return pl.concat(frames).select("batch", *VARIANT_SCHEMA)
+
+    def query(self, genes: list[str] | None = None, samples: list[str] | None = None,
+              callers: list[str] | None = None, oncogenic: list[str] | None = None,
+              levels: list[str] | None = None, min_callers: int = 1,
+              batches: list[str] | None = None) -> pl.DataFrame:
+        """Variants matching all of the given filters, ordered by gene, sample and position.
+
+        callers keeps variants called by any of them; levels matches the highest treatment,
+        diagnostic or prognostic level (eg: LEVEL_1, LEVEL_Dx2).
+        """
+        condition = pl.col("num_callers") >= min_callers
+        if genes:
+            condition &= pl.col("gene").is_in(genes)
+        if samples:
+            condition &= pl.col("sample").is_in(samples)
+        if callers:
+            condition &= pl.any_horizontal([pl.col("callers").list.contains(caller) for caller in callers])
+        if oncogenic:
+            condition &= pl.col("oncogenic").is_in(oncogenic)
+        if levels:
+            condition &= pl.any_horizontal([pl.col(column).is_in(levels) for column in LEVEL_COLUMNS])
+        return self.scan(batches).filter(condition).collect().sort("gene", "sample", "chrom", "start", nulls_last=True)
+
+    def recurrence(self, by: str = "gene", min_samples: int = 1, batches: list[str] | None = None,
+                   **filters) -> pl.DataFrame:
+        """Number and fraction of the cohort's samples with a matching variant, per gene or per variant.
+
+        filters are those of query(); the cohort is every current sample of the batches.
+        """
+        if by not in ("gene", "variant"):
+            raise ValueError(f"recurrence is counted by 'gene' or 'variant', not {by!r}")
+        cohort = self.current(batches).height
+        keys = ["gene"] if by == "gene" else ["gene", "chrom", "start", "ref", "alt"]
+        details = [] if by == "gene" else [pl.col("hgvsp").drop_nulls().first()]
+        variants = self.query(batches=batches, **filters)
+        return (
+            variants.group_by(keys)
+            .agg(*details, pl.col("sample").n_unique().cast(pl.Int64).alias("samples"),
+                 pl.len().cast(pl.Int64).alias("variants"))
+            .with_columns((pl.col("samples") / cohort if cohort else pl.lit(0.0)).alias("fraction"))
+            .filter(pl.col("samples") >= min_samples)
+            .sort(["samples", *keys], descending=[True] + [False] * len(keys), nulls_last=True)
+        )
+
+
+def write_tsv(table: pl.DataFrame, output: str | None):
+    """Write a query result as a TSV (callers comma-separated), to stdout without an output path."""
+    if "callers" in table.columns:
+        table = table.with_columns(pl.col("callers").list.join(","))
+    if output:
+        table.write_csv(output, separator="\t")
+    else:
+        sys.stdout.write(table.write_csv(separator="\t"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort-wide Parquet warehouse of the WESley mutation calls")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Add (or replace) one batch's MAFs")
+    ingest.add_argument("paths", nargs="+",
+                        help=f"MAF files, or directories searched for {' and '.join(MAF_PATTERNS)} MAFs")
+    ingest.add_argument("--batch", type=str, required=True, help="Batch name (eg: batch_07)")
+
+    query = subparsers.add_parser("query", help="Variants matching the filters, across batches")
+    recurrence = subparsers.add_parser("recurrence", help="Samples with a matching variant, per gene or variant")
+    recurrence.add_argument("--by", choices=["gene", "variant"], default="gene", help="Count per gene or per variant")
+    recurrence.add_argument("--min_samples", type=int, default=1, help="Only genes/variants in at least this many samples")
+
+    for subparser in (query, recurrence):
+        subparser.add_argument("--genes", type=str, nargs="+", help="Only these genes (Hugo symbols)")
+        subparser.add_argument("--samples", type=str, nargs="+", help="Only these samples")
+        subparser.add_argument("--callers", type=str, nargs="+", help="Only variants called by any of these callers")
+        subparser.add_argument("--min_callers", type=int, default=1, help="Only variants called by at least this many callers")
+        subparser.add_argument("--oncogenic", type=str, nargs="+", help="Only these OncoKB ONCOGENIC values (eg: Oncogenic)")
+        subparser.add_argument("--levels", type=str, nargs="+",
+                               help="Only variants whose highest OncoKB level is one of these (eg: LEVEL_1 LEVEL_Dx1)")
+        subparser.add_argument("--batches", type=str, nargs="+", help="Only these batches")
+        subparser.add_argument("-o", "--output", type=str, help="Output TSV (default: stdout)")
+
+    for subparser in (ingest, query, recurrence):
+        subparser.add_argument("--store", type=str, required=True, help="MAF warehouse directory")
+
+    args = parser.parse_args()
+    warehouse = MafWarehouse(args.store)
+
+    if args.command == "ingest":
+        count = warehouse.ingest(args.paths, args.batch)
+        print(f"Stored {count} variants of batch {args.batch}", file=sys.stderr)
+        return
+
+    filters = {"genes": args.genes, "samples": args.samples, "callers": args.callers, "oncogenic": args.oncogenic,
+               "levels": args.levels, "min_callers": args.min_callers}
+    if args.command == "query":
+        variants = warehouse.query(batches=args.batches, **filters)
+        write_tsv(variants, args.output)
+        print(f"{variants.height} variants in {variants['sample'].n_unique()} samples", file=sys.stderr)
+    else:
+        counts = warehouse.recurrence(args.by, args.min_samples, args.batches, **filters)
+        write_tsv(counts, args.output)
+        print(f"{counts.height} recurrent {args.by}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,17 +27,52 @@ Output format (manifest.json):
 
 Missing optional fields (tumor_bai, tumor_sbi, normal_id, normal_bam, normal_bai) are null.
 
+With --cache, ReadSet metadata, directory listings and the metadata sheet are kept in a
+SQLite file between runs, so a new batch only fetches or lists what changed. With --since,
+only samples missing from a previous manifest are written. With --catalog, the BAM directories
+are not listed: their files are taken from the output catalog the workflows record their
+published files in (see catalog/catalog.py), stat-ing only the recorded paths and the index
+files next to them. With --catalog_scan as well, the directories are listed as without a
+catalog, and the BAMs the catalog is missing are warned about (and still used).
+
+CRAMs (as written by data processing with --cram) are picked up like BAMs, with their .crai
+indexes in the *_bai fields.
+
 Python version: 3.10+
 Polars version: 1.34.0
 """
 
 import os
+import io
+import bisect
+import fnmatch
 import glob
 import re
+import sys
+import time
+import random
+import sqlite3
 import argparse
 import json
+from concurrent.futures import ThreadPoolExecutor
 import polars as pl
 
+# error codes HealthOmics / botocore use when a request is rate limited
+THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException", "Throttling", "RequestLimitExceeded"}
+
+# alignment file extensions and their index suffixes, in order of preference
+ALIGNMENT_INDEXES = {".bam": ".bai", ".cram": ".crai"}
+
+
+def index_suffix(alignment: str | None) -> str:
+    """Index suffix of a CRAM path ('.crai'), otherwise '.bai' (a BAM, or no alignment found)."""
+    return ALIGNMENT_INDEXES.get(os.path.splitext(alignment or "")[1], ".bai")
+
+
+def glob_alignments(pattern: str) -> list[str]:
+    """glob.glob of '<pattern>.bam', then of '<pattern>.cram'."""
+    return [path for extension in ALIGNMENT_INDEXES for path in glob.glob(f"{pattern}{extension}")]
+
 
 def find_normal_info(sample_id: str, metadata_subset: pl.DataFrame, normals_df: pl.DataFrame, bam_dir: str) -> dict:
     """Look up normal sample information for a given tumor sample."""
@@ -81,8 +116,8 @@ def find_normal_info(sample_id: str, metadata_subset: pl.DataFrame, normals_df:
         normal_id = matching_normals.get_column("Short ID").item()
 
         # Find BAM and BAI files
-        bam_files = glob.glob(f"{bam_dir}/normals/{normal_id}*.bam")
-        bai_files = glob.glob(f"{bam_dir}/normals/{normal_id}*.bai")
+        bam_files = glob_alignments(f"{bam_dir}/normals/{normal_id}*")
+        bai_files = glob.glob(f"{bam_dir}/normals/{normal_id}*{index_suffix(bam_files[0] if bam_files else None)}")
 
         return {
             "Tumor_ID": tumor_id,
@@ -96,13 +131,13 @@ def find_normal_info(sample_id: str, metadata_subset: pl.DataFrame, normals_df:
         normal_bam = None
         normal_id = None
         for row in matching_normals.iter_rows(named=True):
-            matches = (glob.glob(f"{bam_dir}/normals/*{row['Line']}*.bam"))
+            matches = glob_alignments(f"{bam_dir}/normals/*{row['Line']}*")
             if matches:
                 normal_bam = matches[0]
                 normal_id = row["Short ID"]
                 break
 
-        bai_files = glob.glob(f"{bam_dir}/normals/{normal_id}*.bai") if normal_id else []
+        bai_files = glob.glob(f"{bam_dir}/normals/{normal_id}*{index_suffix(normal_bam)}") if normal_id else []
 
         return {
             "Tumor_ID": tumor_id,
@@ -117,31 +152,237 @@ def lookup_shortid(tcgb_id: str, metadata_subset: pl.DataFrame) -> str:
     short_id = metadata_row.get_column("Short ID").item()
     return short_id
 
-def build_manifest_local(bam_dir: str, metadata_sheet: str) -> list[dict]:
+class ManifestCache:
+    """SQLite cache that persists manifest inputs between runs.
+
+    - ReadSet metadata, keyed by (sequence store ID, read set ID); read sets are immutable
+      once imported, so cached entries never need refreshing.
+    - Directory listings, keyed by path and directory mtime (adding, removing or renaming
+      a file changes the mtime).
+    - The metadata sheet subset, keyed by path, mtime and size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS read_sets (
+                store_id TEXT NOT NULL, read_set_id TEXT NOT NULL, metadata TEXT NOT NULL,
+                PRIMARY KEY (store_id, read_set_id));
+            CREATE TABLE IF NOT EXISTS directories (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, names TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS metadata_sheets (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, data BLOB NOT NULL);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_read_sets(self, store_id: str, read_set_ids: list[str]) -> dict[str, dict]:
+        """Return cached metadata for whichever of read_set_ids are cached."""
+        cached = {}
+        for start in range(0, len(read_set_ids), 500):
+            chunk = read_set_ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT read_set_id, metadata FROM read_sets WHERE store_id = ? "
+                f"AND read_set_id IN ({','.join('?' * len(chunk))})", [store_id, *chunk])
+            cached.update((read_set_id, json.loads(metadata)) for read_set_id, metadata in rows)
+        return cached
+
+    def put_read_sets(self, store_id: str, metadata_by_id: dict[str, dict]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO read_sets VALUES (?, ?, ?)",
+                [(store_id, read_set_id, json.dumps(meta, default=str)) for read_set_id, meta in metadata_by_id.items()])
+
+    def get_directory(self, path: str, mtime_ns: int) -> list[str] | None:
+        row = self.conn.execute("SELECT names FROM directories WHERE path = ? AND mtime_ns = ?",
+                                (os.path.abspath(path), mtime_ns)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_directory(self, path: str, mtime_ns: int, names: list[str]):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                              (os.path.abspath(path), mtime_ns, json.dumps(names)))
+
+    def get_metadata_sheet(self, path: str, mtime_ns: int, size: int) -> pl.DataFrame | None:
+        row = self.conn.execute("SELECT data FROM metadata_sheets WHERE path = ? AND mtime_ns = ? AND size = ?",
+                                (os.path.abspath(path), mtime_ns, size)).fetchone()
+        return pl.read_ipc(io.BytesIO(row[0])) if row else None
+
+    def put_metadata_sheet(self, path: str, mtime_ns: int, size: int, df: pl.DataFrame):
+        buffer = io.BytesIO()
+        df.write_ipc(buffer)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO metadata_sheets VALUES (?, ?, ?, ?)",
+                              (os.path.abspath(path), mtime_ns, size, buffer.getvalue()))
+
+def catalog_names(catalog: str, directory: str) -> list[str]:
+    """Names of the files the output catalog has directly in a directory, in path order.
+
+    The catalog is a catalog directory, whose output_catalog*.sqlite files (one per run)
+    are read together, or a single catalog file.
+    """
+    prefix = os.path.abspath(directory).rstrip("/") + "/"
+    catalogs = sorted(glob.glob(os.path.join(catalog, "output_catalog*.sqlite"))) if os.path.isdir(catalog) else [catalog]
+    paths = set()
+    for path in catalogs:
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        try:
+            # every path starting with '<dir>/' sorts between '<dir>/' and '<dir>0'
+            paths.update(row[0] for row in conn.execute("SELECT path FROM artifacts WHERE path >= ? AND path < ?",
+                                                        (prefix, prefix[:-1] + "0")))
+        finally:
+            conn.close()
+    return [path[len(prefix):] for path in sorted(paths) if "/" not in path[len(prefix):]]
+
+def catalog_listing(catalog: str, directory: str) -> list[str]:
+    """Names of a directory's files from the output catalog, without listing the directory.
+
+    The catalog's files that still exist are kept, with the indexes (.bai/.crai) and
+    splitting indexes (.sbi) next to its BAMs and CRAMs; each is found by stat-ing its
+    exact path. Catalogued files that are gone are warned about.
+    """
+    names = []
+    for name in catalog_names(catalog, directory):
+        if not os.path.exists(os.path.join(directory, name)):
+            print(f"Warning: {os.path.join(directory, name)} is in the output catalog but does not exist",
+                  file=sys.stderr)
+            continue
+        if name not in names:
+            names.append(name)
+        stem, extension = os.path.splitext(name)
+        if extension in ALIGNMENT_INDEXES:
+            index = ALIGNMENT_INDEXES[extension]
+            for candidate in (f"{name}{index}", f"{stem}{index}", f"{name}.sbi"):
+                if candidate not in names and os.path.exists(os.path.join(directory, candidate)):
+                    names.append(candidate)
+    return names
+
+def list_directory(directory: str, cache: ManifestCache | None = None, catalog: str | None = None,
+                   catalog_scan: bool = False) -> tuple[list[str], list[tuple[str, int]]]:
+    """List a directory once and index it for glob-equivalent lookups.
+
+    Returns the entry names in listing order (the order glob.glob returns them in)
+    and the same names sorted, paired with their listing position, for prefix
+    searches via bisect. A missing directory lists as empty, like glob. With a cache,
+    an unchanged directory (same mtime) is not listed again. With an output catalog,
+    the names come from the catalog instead (see catalog_listing); with catalog_scan,
+    the directory is listed anyway and the BAMs and CRAMs the catalog is missing are
+    warned about, and are still used.
+    """
+    if catalog and not catalog_scan:
+        names = catalog_listing(catalog, directory)
+        return names, sorted((name, position) for position, name in enumerate(names))
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except OSError:
+        return [], []
+    names = cache.get_directory(directory, mtime_ns) if cache else None
+    if names is None:
+        try:
+            with os.scandir(directory) as entries:
+                names = [entry.name for entry in entries]
+        except OSError:
+            names = []
+        if cache:
+            cache.put_directory(directory, mtime_ns, names)
+    if catalog:
+        cataloged = set(catalog_names(catalog, directory))
+        for name in sorted(names):
+            if name.endswith((".bam", ".cram")) and name not in cataloged:
+                print(f"Warning: {os.path.join(directory, name)} is not in the output catalog; "
+                      f"record it with 'catalog.py add'", file=sys.stderr)
+    return names, sorted((name, position) for position, name in enumerate(names))
+
+def list_directories(pattern: str, cache: ManifestCache | None = None, catalog: str | None = None,
+                     catalog_scan: bool = False) -> list[tuple[str, list[str], list[tuple[str, int]]]]:
+    """List every directory glob.glob(pattern) matches, in glob order.
+
+    A literal path matches itself when it exists, so literal and glob BAM directories
+    are handled alike. Returns (directory, names, index) as list_directory does.
+    """
+    return [(directory, *list_directory(directory, cache, catalog, catalog_scan)) for directory in glob.glob(pattern)]
+
+def glob_listings(listings: list[tuple[str, list[str], list[tuple[str, int]]]], pattern: str) -> list[str]:
+    """Return what glob.glob('<directory>/<pattern>') returns for each listed directory.
+
+    Candidates are found by a bisect prefix search on the pattern's literal prefix
+    and matched with fnmatch; like glob, names starting with '.' only match a
+    pattern that does.
+    """
+    prefix = re.split(r"[*?[]", pattern, maxsplit=1)[0]
+    show_hidden = pattern.startswith(".")
+    paths = []
+    for directory, _, index in listings:
+        matches = []
+        for name, position in index[bisect.bisect_left(index, (prefix, -1)):]:
+            if not name.startswith(prefix):
+                break
+            if (show_hidden or not name.startswith(".")) and fnmatch.fnmatchcase(name, pattern):
+                matches.append((position, name))
+        paths.extend(os.path.join(directory, name) for _, name in sorted(matches))
+    return paths
+
+def read_metadata_subset(metadata_sheet: str, cache: ManifestCache | None = None) -> pl.DataFrame:
+    """Read the columns of the sequencing metadata sheet used for pairing.
+
+    With a cache, the sheet is only parsed again when its mtime or size changed.
+    """
+    stat = os.stat(metadata_sheet)
+    metadata_subset = cache.get_metadata_sheet(metadata_sheet, stat.st_mtime_ns, stat.st_size) if cache else None
+    if metadata_subset is None:
+        metadata_df = pl.read_excel(metadata_sheet)
+        metadata_subset = metadata_df.select(["WES ID", "Short ID", "Sample Type", "Line", "DOES PT HAVE NRM?"])
+        if cache:
+            cache.put_metadata_sheet(metadata_sheet, stat.st_mtime_ns, stat.st_size, metadata_subset)
+    return metadata_subset
+
+def build_manifest_local(bam_dir: str, metadata_sheet: str, cache: ManifestCache | None = None,
+                         catalog: str | None = None, catalog_scan: bool = False) -> list[dict]:
     """Scan a local BAM directory and return a list of sample dicts.
 
     Returns dicts with keys: sample_id, tumor_id, tumor_bam, tumor_bai,
     tumor_sbi, normal_id, normal_bam, normal_bai.
     Missing optional fields are None (not 'NO_FILE').
+
+    The BAM directory and its normals/ subdirectory are each listed once and BAM/BAI/SBI
+    files are resolved from the listings with the same patterns the per-file globs use
+    (see glob_listings), while tumors are paired with normals through Polars joins on
+    the metadata sheet. The result is the same as running lookup_shortid and
+    find_normal_info with per-file globs for every BAM, for literal and glob BAM
+    directories alike.
+
+    An optional ManifestCache skips re-reading unchanged directories and metadata sheets. With
+    an output catalog (written by catalog.py), the directories' files are taken from it instead
+    of listing them, unless catalog_scan is set (see list_directory).
     """
-    metadata_df = pl.read_excel(metadata_sheet)
-    metadata_subset = metadata_df.select(["WES ID", "Short ID", "Sample Type", "Line", "DOES PT HAVE NRM?"])
+    metadata_subset = read_metadata_subset(metadata_sheet, cache)
     normals_df = metadata_subset.filter(pl.col("Sample Type") == "NRM")
 
-    files = glob.glob(f"{bam_dir}/*.bam")
-    samples = []
+    # directory prefixes exactly as glob.glob would report them
+    tumor_listings = list_directories(os.path.split(f"{bam_dir}/*.bam")[0], cache, catalog, catalog_scan)
+    normal_listings = list_directories(os.path.split(f"{bam_dir}/normals/*.bam")[0], cache, catalog, catalog_scan)
+    files = [path for extension in ALIGNMENT_INDEXES for path in glob_listings(tumor_listings, f"*{extension}")]
 
+    # extract sample IDs from BAM filenames (TCGB or short ID pattern)
+    tumors = []
     for file in files:
         bam_file = os.path.basename(file)
         path = os.path.dirname(file)
 
-        # Find index files — None when absent
-        bai_files = glob.glob(f"{bam_dir}/{bam_file}*bai")
+        # find index files (.bai or .crai) — None when absent
+        bai_files = glob_listings(tumor_listings, f"{bam_file}*{index_suffix(bam_file)[1:]}")
+        sbi_files = glob_listings(tumor_listings, f"{bam_file}*sbi")
         bai_file = bai_files[0] if bai_files else None
-        sbi_files = glob.glob(f"{bam_dir}/{bam_file}*sbi")
         sbi_file = sbi_files[0] if sbi_files else None
 
-        # Extract sample ID from BAM filename (TCGB or short ID pattern)
         tcgb_match = re.search(r"^\d+\w*-\d+", bam_file)
         short_match = re.search(r"\w+\d+", bam_file)
         original_id = (tcgb_match.group(0) if tcgb_match
@@ -149,25 +390,130 @@ def build_manifest_local(bam_dir: str, metadata_sheet: str) -> list[dict]:
                        else None)
         if not original_id:
             continue
-
-        short_id = lookup_shortid(original_id, metadata_subset) if tcgb_match else original_id
-
-        normal_info = find_normal_info(short_id, metadata_subset, normals_df, bam_dir)
-
-        samples.append({
+        tumors.append({
             "sample_id": original_id,
-            "tumor_id": short_id,
+            "is_tcgb": tcgb_match is not None,
             "tumor_bam": f"{path}/{bam_file}",
             "tumor_bai": bai_file,
             "tumor_sbi": sbi_file,
-            "normal_id":  None if normal_info["Normal_ID"]  == "NO_FILE" else normal_info["Normal_ID"],
-            "normal_bam": None if normal_info["Normal_BAM"] == "NO_FILE" else normal_info["Normal_BAM"],
-            "normal_bai": None if normal_info["Normal_BAI"] == "NO_FILE" else normal_info["Normal_BAI"],
+        })
+    if not tumors:
+        return []
+
+    wes_ids = (metadata_subset.group_by("WES ID")
+               .agg(pl.len().alias("wes_rows"), pl.col("Short ID").first().alias("wes_short_id")))
+    tumor_rows = (metadata_subset.group_by("Short ID")
+                  .agg(pl.len().alias("tumor_rows"),
+                       pl.col("DOES PT HAVE NRM?").first().alias("has_normal"),
+                       pl.col("Line").first().alias("line")))
+    normal_lines = (normals_df.group_by("Line", maintain_order=True)
+                    .agg(pl.len().alias("n_normals"), pl.col("Short ID").first().alias("normal_short_id")))
+
+    # pair every tumor with its metadata row and the normals sharing its cell line
+    paired = (pl.DataFrame(tumors, schema_overrides={"tumor_bai": pl.String, "tumor_sbi": pl.String})
+              .with_row_index("order")
+              .join(wes_ids, left_on="sample_id", right_on="WES ID", how="left")
+              .with_columns(pl.when(pl.col("is_tcgb"))
+                            .then(pl.col("wes_short_id"))
+                            .otherwise(pl.col("sample_id"))
+                            .alias("tumor_id"))
+              .join(tumor_rows, left_on="tumor_id", right_on="Short ID", how="left")
+              .join(normal_lines, left_on="line", right_on="Line", how="left")
+              .sort("order"))
+
+    line_matches = {}  # cell line -> first normals/*<line>*.bam (then *.cram) in glob order
+    samples = []
+    for row in paired.iter_rows(named=True):
+        if row["is_tcgb"] and row["wes_rows"] != 1:
+            # raises exactly like the per-sample lookup for a missing or duplicated WES ID
+            lookup_shortid(row["sample_id"], metadata_subset)
+        if row["tumor_rows"] is not None and row["tumor_rows"] > 1:
+            # raises exactly like the per-sample lookup for a duplicated Short ID
+            find_normal_info(row["tumor_id"], metadata_subset, normals_df, bam_dir)
+
+        short_id = row["tumor_id"]
+        normal_id = normal_bam = normal_bai = None
+        if row["tumor_rows"] == 1 and row["has_normal"] == "Y" and row["n_normals"]:
+            # Case: 1 normal sequenced for that cell line
+            if row["n_normals"] == 1:
+                normal_id = row["normal_short_id"]
+                normal_bam = next((match for extension in ALIGNMENT_INDEXES
+                                   for match in glob_listings(normal_listings, f"{normal_id}*{extension}")), None)
+                normal_bai = next(iter(glob_listings(normal_listings, f"{normal_id}*{index_suffix(normal_bam)}")), None)
+            # Case: multiple normals sequenced — first BAM containing the cell line
+            else:
+                line = row["line"]
+                if line not in line_matches:
+                    line_matches[line] = next((match for extension in ALIGNMENT_INDEXES
+                                               for match in glob_listings(normal_listings, f"*{line}*{extension}")), None)
+                normal_bam = line_matches[line]
+                normal_id = row["normal_short_id"] if normal_bam else None
+                if normal_id:
+                    normal_bai = next(iter(glob_listings(normal_listings, f"{normal_id}*{index_suffix(normal_bam)}")), None)
+
+        samples.append({
+            "sample_id": row["sample_id"],
+            "tumor_id": short_id,
+            "tumor_bam": row["tumor_bam"],
+            "tumor_bai": row["tumor_bai"],
+            "tumor_sbi": row["tumor_sbi"],
+            "normal_id": normal_id,
+            "normal_bam": normal_bam,
+            "normal_bai": normal_bai,
         })
 
     return samples
 
-def build_manifest_omics(store_id: str, region: str) -> list[dict]:
+def is_throttling_error(exc: Exception) -> bool:
+    """Return True if a boto3 ClientError was raised because the request was throttled."""
+    response = getattr(exc, "response", None)
+    if not isinstance(response, dict):
+        return False
+    return response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+def fetch_read_set_metadata(omics, store_id: str, read_set_ids: list[str], max_workers: int = 16,
+                            max_retries: int = 5, backoff: float = 0.5) -> list[dict]:
+    """Fetch ReadSet metadata for many read sets with bounded concurrency.
+
+    At most max_workers get_read_set_metadata calls are in flight at once. Throttled
+    calls are retried up to max_retries times with jittered exponential backoff; any
+    other error is raised. Results are returned in the same order as read_set_ids.
+    """
+    def _fetch(read_set_id: str) -> dict:
+        for attempt in range(max_retries + 1):
+            try:
+                return omics.get_read_set_metadata(id=read_set_id, sequenceStoreId=store_id)
+            except Exception as exc:
+                if not is_throttling_error(exc) or attempt == max_retries:
+                    raise
+                time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+    if max_workers <= 1:
+        return [_fetch(read_set_id) for read_set_id in read_set_ids]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_fetch, read_set_ids))
+
+def _trim_read_set_metadata(meta: dict) -> dict:
+    """Keep only the ReadSet metadata fields the manifest uses (for caching)."""
+    files = meta.get("files", {})
+    return {
+        "sampleId": meta.get("sampleId"),
+        "subjectId": meta.get("subjectId"),
+        "files": {
+            name: {"s3Access": {"s3Uri": files[name].get("s3Access", {}).get("s3Uri")}}
+            for name in ("source1", "index") if name in files
+        },
+    }
+
+def filter_new_samples(samples: list[dict], previous_manifest: str) -> list[dict]:
+    """Return the samples whose sample_id is not in a previously written manifest."""
+    with open(previous_manifest) as f:
+        seen = {s["sample_id"] for s in json.load(f).get("samples", [])}
+    return [s for s in samples if s["sample_id"] not in seen]
+
+def build_manifest_omics(store_id: str, region: str, max_workers: int = 16, omics=None,
+                         cache: ManifestCache | None = None) -> list[dict]:
     """Query a HealthOmics Sequence Store and return a list of sample dicts.
 
     Tumor/normal classification uses a regex on sampleId (BLD, NRM, CD45 → normal).
@@ -178,11 +524,19 @@ def build_manifest_omics(store_id: str, region: str) -> list[dict]:
       1. AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY env vars
       2. ~/.aws/credentials (from `aws configure` or SSO)
       3. IAM execution role (automatic inside HealthOmics workflow runs)
-    """
-    import boto3
 
-    # connect to HealthOmics client, add readset metadata into list
-    omics = boto3.client("omics", region_name=region)
+    ReadSet metadata is fetched concurrently (max_workers requests in flight, see
+    fetch_read_set_metadata) but classified in listing order, so the manifest does not
+    depend on which request finishes first. An existing omics client can be passed in.
+    With a ManifestCache, only read sets not seen in an earlier run are fetched.
+    """
+    # connect to HealthOmics client, add readset metadata into list; the connection pool
+    # must hold max_workers connections (botocore defaults to 10)
+    if omics is None:
+        import boto3
+        from botocore.config import Config
+        omics = boto3.client("omics", region_name=region,
+                             config=Config(max_pool_connections=max(max_workers, 10)))
     paginator = omics.get_paginator("list_read_sets")
     all_readsets = []
     for page in paginator.paginate(sequenceStoreId=store_id):
@@ -191,9 +545,17 @@ def build_manifest_omics(store_id: str, region: str) -> list[dict]:
     tumors = []
     normals = {}  # subjectId → {sample_id, bam_uri, bai_uri}
 
+    # fetch readset metadata concurrently (only uncached read sets), keeping listing order
+    read_set_ids = [rs["id"] for rs in all_readsets]
+    cached = cache.get_read_sets(store_id, read_set_ids) if cache else {}
+    missing = [read_set_id for read_set_id in read_set_ids if read_set_id not in cached]
+    fetched = dict(zip(missing, fetch_read_set_metadata(omics, store_id, missing, max_workers=max_workers)))
+    if cache and fetched:
+        cache.put_read_sets(store_id, {read_set_id: _trim_read_set_metadata(meta) for read_set_id, meta in fetched.items()})
+    all_metadata = [cached[read_set_id] if read_set_id in cached else fetched[read_set_id] for read_set_id in read_set_ids]
+
     # parse metadata from readset JSONs
-    for rs in all_readsets:
-        meta = omics.get_read_set_metadata(id=rs["id"], sequenceStoreId=store_id)
+    for meta in all_metadata:
         sample_id  = meta.get("sampleId")
         subject_id = meta.get("subjectId")
         files      = meta.get("files", {})
@@ -247,6 +609,27 @@ def main():
     # HealthOmics-only args — validated at runtime if --platform omics
     parser.add_argument("--store_id", type=str, help="(omics only) HealthOmics Sequence Store ID")
     parser.add_argument("--region",   type=str, help="(omics only) AWS region of the Sequence Store")
+    parser.add_argument(
+        "--workers", type=int, default=16,
+        help="(omics only) Maximum concurrent ReadSet metadata requests (default: 16)"
+    )
+    parser.add_argument(
+        "--cache", type=str,
+        help="SQLite cache file reused between runs (created if missing)"
+    )
+    parser.add_argument(
+        "--catalog", type=str,
+        help="(local only) Output catalog directory (or a single catalog file) to take the BAMs of --bam_dir from, "
+             "instead of listing it"
+    )
+    parser.add_argument(
+        "--catalog_scan", action="store_true",
+        help="(local only) With --catalog, list --bam_dir anyway and warn about the BAMs the catalog is missing"
+    )
+    parser.add_argument(
+        "--since", type=str,
+        help="Previous manifest JSON; only samples not already in it are written"
+    )
 
     args = parser.parse_args()
 
@@ -255,11 +638,22 @@ def main():
             parser.error("--bam_dir is required when --platform local")
         if not args.metadata:
             parser.error("--metadata is required when --platform local")
-        samples = build_manifest_local(args.bam_dir, args.metadata)
-    else:
-        if not args.store_id or not args.region:
-            parser.error("--store_id and --region are required when --platform omics")
-        samples = build_manifest_omics(args.store_id, args.region)
+    elif not args.store_id or not args.region:
+        parser.error("--store_id and --region are required when --platform omics")
+
+    cache = ManifestCache(args.cache) if args.cache else None
+    try:
+        if args.platform == "local":
+            samples = build_manifest_local(args.bam_dir, args.metadata, cache=cache, catalog=args.catalog,
+                                           catalog_scan=args.catalog_scan)
+        else:
+            samples = build_manifest_omics(args.store_id, args.region, max_workers=args.workers, cache=cache)
+    finally:
+        if cache:
+            cache.close()
+
+    if args.since:
+        samples = filter_new_samples(samples, args.since)
 
     manifest = {"samples": samples}
     with open(args.output, "w") as f:
@@ -0,0 +1,35 @@
+/*
+cram_to_bam.nf module
+
+This module decodes a CRAM to a BAM (and its index) for MuSE: MuSE v1.0rc is built
+against a samtools too old to read CRAM. It runs once per CRAM, so a CRAM normal
+shared by several tumors is decoded once; the BAMs only live in the work directory.
+
+SAMTools version: 1.10
+*/
+
+process CRAM_TO_BAM {
+    tag "${cram.simpleName}"
+    label 'medCpu'
+    label 'lowMem'
+    label 'medTime'
+
+    input:
+    tuple val(cram_key), path(cram), path(crai)
+    path ref_fasta
+    path ref_fasta_index
+
+    output:
+    tuple val(cram_key), path("${cram.baseName}.bam"), path("${cram.baseName}.bam.bai")
+
+    script:
+    """
+    samtools view -b \\
+        -T ${ref_fasta} \\
+        -@ ${task.cpus} \\
+        -o "${cram.baseName}.bam" \\
+        ${cram}
+
+    samtools index "${cram.baseName}.bam"
+    """
+}
@@ -20,10 +20,11 @@ process FILTER_MUTECT_CALLS {
     path ref_dict
 
     output:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.mutect2*filtered.vcf")
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.mutect2*filtered.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}")
 
     script:
-    def output_name = (unfiltered_vcf =~ /paired/ ? "${sample_id}.mutect2.paired.filtered.vcf" : "${sample_id}.mutect2.tumorOnly.filtered.vcf")
+    def vcf_ext = (params.compress_vcfs ? "vcf.gz" : "vcf")
+    def output_name = (unfiltered_vcf =~ /paired/ ? "${sample_id}.mutect2.paired.filtered.${vcf_ext}" : "${sample_id}.mutect2.tumorOnly.filtered.${vcf_ext}")
 
     """
     gatk FilterMutectCalls \\
@@ -0,0 +1,44 @@
+/*
+gather_mutect2.nf module
+
+This module gathers the per-shard outputs of a scattered MUTECT2_CALL run back
+into a single unfiltered VCF and a single merged stats file per sample.
+
+The per-shard F1R2 archives are not merged here; LEARN_READ_ORIENTATION accepts
+all of them directly.
+
+GATK Version: 4.2.0.0
+*/
+
+process GATHER_MUTECT2 {
+    tag "${sample_id}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    tuple val(sample_id), val(tumor_id), val(normal_id), path(shard_vcfs, stageAs: "?/*"), path(shard_stats, stageAs: "?/*")
+    path ref_dict
+
+    output:
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.mutect2.*.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("${sample_id}.mutect2.*.stats")
+
+    script:
+    def vcfs = [shard_vcfs].flatten()
+    def stats = [shard_stats].flatten()
+    def vcf_ext = (params.compress_vcfs ? "vcf.gz" : "vcf")
+    def output_name = (vcfs[0].name =~ /paired/ ? "${sample_id}.mutect2.paired.${vcf_ext}" : "${sample_id}.mutect2.tumorOnly.${vcf_ext}")
+
+    """
+    # merge shard VCFs (MergeVcfs sorts records across shards by the sequence dictionary)
+    gatk MergeVcfs \\
+        ${vcfs.collect { "-I ${it}" }.join(" ")} \\
+        -D ${ref_dict} \\
+        -O ${output_name}
+
+    # merge shard stats for FilterMutectCalls
+    gatk MergeMutectStats \\
+        ${stats.collect { "-stats ${it}" }.join(" ")} \\
+        -O "${output_name}.stats"
+    """
+}
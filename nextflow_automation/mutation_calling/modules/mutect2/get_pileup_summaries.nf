@@ -1,8 +1,12 @@
 /*
 get_pileup_summaries.nf module
 
-This module generates pileup summaries for both tumor and normal samples
-to enable contamination estimation in downstream processing.
+This module generates pileup summaries at common germline sites to enable contamination
+estimation in downstream processing.
+
+GET_PILEUP_SUMMARIES summarizes the tumor of each pair. NORMAL_PILEUP_SUMMARIES summarizes
+each unique normal BAM once, however many tumors it is paired with; storeDir keeps the table
+under ${cache_dir}/pileup_summaries/<sites key>/<BAM key>, so later runs reuse it too.
 
 GATK Version: 4.2.0.0
 */
@@ -14,7 +18,7 @@ process GET_PILEUP_SUMMARIES {
     label 'medTime'
 
     input:
-    tuple val(sample_id), val(tumor_id), path(tumor_bam), path(tumor_bai), path(tumor_sbi), val(normal_id), path(normal_bam), path(normal_bai)
+    tuple val(sample_id), val(tumor_id), path(tumor_bam), path(tumor_bai), path(tumor_sbi), val(normal_id)
     path ref_fasta
     path ref_fasta_index
     path ref_dict
@@ -23,21 +27,9 @@ process GET_PILEUP_SUMMARIES {
     path interval_list
 
     output:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.tumor-pileups.table"), path("${sample_id}.normal-pileups.table")
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.tumor-pileups.table")
 
     script:
-    def normal_pileup_cmd = (normal_bam.name != 'NO_FILE' && normal_bam.size() > 0 ?
-        """
-        gatk GetPileupSummaries \\
-        -R ${ref_fasta} \\
-        -I ${normal_bam} \\
-        --interval-set-rule INTERSECTION \\
-        -L ${interval_list} \\
-        -V ${contamination_vcf} \\
-        -L ${contamination_vcf} \\
-        -O "${sample_id}.normal-pileups.table"
-        """ : "touch ${sample_id}.normal-pileups.table")
-
     """
     # Get tumor pileup summaries
     gatk GetPileupSummaries \\
@@ -48,8 +40,40 @@ process GET_PILEUP_SUMMARIES {
     -V ${contamination_vcf} \\
     -L ${contamination_vcf} \\
     -O "${sample_id}.tumor-pileups.table"
+    """
+}
+
+process NORMAL_PILEUP_SUMMARIES {
+    tag "${normal_id}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'medTime'
+    storeDir "${cache_dir}/pileup_summaries/${sites_key}/${normal_key}"
+
+    input:
+    tuple val(normal_key), val(normal_id), path(normal_bam), path(normal_bai)
+    path ref_fasta
+    path ref_fasta_index
+    path ref_dict
+    path contamination_vcf
+    path contamination_vcf_index
+    path interval_list
+    val cache_dir
+    val sites_key
 
-    # Get normal pileup summaries (if paired mode)
-    ${normal_pileup_cmd}
+    output:
+    tuple val(normal_key), path("${normal_id}.normal-pileups.table")
+
+    script:
+    """
+    # Get normal pileup summaries
+    gatk GetPileupSummaries \\
+    -R ${ref_fasta} \\
+    -I ${normal_bam} \\
+    --interval-set-rule INTERSECTION \\
+    -L ${interval_list} \\
+    -V ${contamination_vcf} \\
+    -L ${contamination_vcf} \\
+    -O "${normal_id}.normal-pileups.table"
     """
 }
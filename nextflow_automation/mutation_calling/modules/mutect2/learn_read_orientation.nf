@@ -4,6 +4,8 @@ learn_read_orientation.nf module
 This module learns read orientation bias patterns from F1R2 data
 to enable artifact filtering in downstream variant processing.
 
+Accepts one F1R2 archive, or one per interval shard when Mutect2 was scattered.
+
 GATK Version: 4.2.0.0
 */
 
@@ -14,15 +16,17 @@ process LEARN_READ_ORIENTATION {
     label 'shortTime'
 
     input:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path(unfiltered_vcf), path(f1r2_tar), path(m2_stats)
+    tuple val(sample_id), val(tumor_id), val(normal_id), path(unfiltered_vcf), path(f1r2_tars, stageAs: "?/*"), path(m2_stats)
 
     output:
     tuple val(sample_id), val(tumor_id), val(normal_id), path(unfiltered_vcf), path("${sample_id}.read-orientation-model.tar.gz"), path(m2_stats)
 
     script:
+    def f1r2_args = [f1r2_tars].flatten().collect { "-I ${it}" }.join(" ")
+
     """
     gatk LearnReadOrientationModel \\
-        -I "${f1r2_tar}" \\
+        ${f1r2_args} \\
         -O "${sample_id}.read-orientation-model.tar.gz"
     """
 }
\ No newline at end of file
@@ -4,6 +4,10 @@ mutect2_call.nf module
 This module performs the initial GATK Mutect2 variant calling step.
 Generates unfiltered variants and F1R2 orientation data for downstream processing.
 
+The interval list is declared with 'each' so the same sample can be called once per
+interval shard (see SPLIT_INTERVALS / GATHER_MUTECT2). 'padding' is the interval
+padding passed to '-ip': the caller passes 0 for shards SPLIT_INTERVALS already padded.
+
 GATK Version: 4.2.0.0
 */
 
@@ -20,15 +24,17 @@ process MUTECT2_CALL {
     path ref_dict
     path gnomad_vcf
     path gnomad_vcf_index
-    path interval_list
+    each path(interval_list)
+    val padding
 
     output:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.mutect2.*.vcf"), path("${sample_id}.f1r2.tar.gz"), path("${sample_id}*stats")
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.mutect2.*.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}"), path("${sample_id}.f1r2.tar.gz"), path("${sample_id}*stats")
 
     script:
     def normal_args = (normal_bam.size() > 0 ?
         "-I ${normal_bam} -normal ${normal_id}" : "")
-    def output_name = (normal_args ? "${sample_id}.mutect2.paired.vcf" : "${sample_id}.mutect2.tumorOnly.vcf")
+    def vcf_ext = (params.compress_vcfs ? "vcf.gz" : "vcf")
+    def output_name = (normal_args ? "${sample_id}.mutect2.paired.${vcf_ext}" : "${sample_id}.mutect2.tumorOnly.${vcf_ext}")
 
     """
     gatk Mutect2 \\
@@ -45,6 +51,6 @@ process MUTECT2_CALL {
         --max-reads-per-alignment-start 0 \\
         --max-mnp-distance 0 \\
         --max-suspicious-reads-per-alignment-start 6 \\
-        -ip 200
+        -ip ${padding}
     """
 }
@@ -0,0 +1,40 @@
+/*
+split_intervals.nf module
+
+This module pads and splits the target interval list into balanced shards so
+Mutect2 can be scattered across them and run in parallel.
+
+Padding is applied before splitting (the '-ip 200' MUTECT2_CALL applies to an unsplit list)
+and intervals are never subdivided, so neighbouring shards cannot overlap and
+produce duplicate calls at shard boundaries.
+
+GATK Version: 4.2.0.0
+*/
+
+process SPLIT_INTERVALS {
+    tag "${interval_list.name}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    path interval_list
+    path ref_fasta
+    path ref_fasta_index
+    path ref_dict
+    val scatter_count
+
+    output:
+    path("shards/*-scattered.interval_list")
+
+    script:
+    """
+    gatk SplitIntervals \\
+        -R ${ref_fasta} \\
+        -L ${interval_list} \\
+        -ip 200 \\
+        --scatter-count ${scatter_count} \\
+        --subdivision-mode BALANCING_WITHOUT_INTERVAL_SUBDIVISION \\
+        -O shards
+    """
+}
@@ -4,31 +4,37 @@ create_pon.nf module
 This module creates a somatic panel of normals for Mutect2 to filter
 out technical artifacts and germline variants.
 
+CREATE_PON runs once per interval shard on that shard's GenomicsDB workspace
+(publishing the shard PON to '<store_dir>/shards/<shard key>/' when 'store_dir'
+is set, so an unchanged shard is not rebuilt), and GATHER_PON merges the shard
+PONs into the panel for the whole interval list.
+
 Recommended # of normal samples: >= 40.
 
 GATK Version: 4.2.0.0
 */
 
 process CREATE_PON {
-    tag "${interval_list.name}"
+    tag "${shard.baseName}"
+    publishDir "${store_dir}/shards/${shard_key}", mode: 'copy', enabled: store_dir as boolean
     label 'lowCpu'
     label 'highMem'
     label 'medTime'
 
     input:
-    path(pon_db_tar)
+    tuple val(shard_key), path(shard), path(pon_db_tar)
     path ref_fasta
     path ref_fasta_index
+    path ref_dict
     path gnomad_vcf
     path gnomad_vcf_index
-    path interval_list
+    val store_dir
 
     output:
-    path "*pon*vcf.gz"
-    path "*pon*vcf.gz.tbi"
+    tuple val(shard_key), path("${shard.baseName}.pon.vcf.gz"), path("${shard.baseName}.pon.vcf.gz.tbi")
 
     script:
-    def output_prefix = interval_list.baseName
+    def output_prefix = shard.baseName
 
     """
     tar -xf ${pon_db_tar}
@@ -42,3 +48,31 @@ process CREATE_PON {
     gatk IndexFeatureFile -I "${output_prefix}.pon.vcf.gz"
     """
 }
+
+process GATHER_PON {
+    tag "${interval_list.name}"
+    publishDir "${params.output_dir}", mode: 'copy'
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+
+    input:
+    path(shard_pons, stageAs: "?/*")
+    path ref_dict
+    path interval_list
+
+    output:
+    path "${interval_list.baseName}.pon.vcf.gz"
+    path "${interval_list.baseName}.pon.vcf.gz.tbi"
+
+    script:
+    def vcfs = [shard_pons].flatten()
+
+    """
+    # merge shard PONs (MergeVcfs sorts records across shards by the sequence dictionary)
+    gatk MergeVcfs \\
+        ${vcfs.collect { "-I ${it}" }.join(" ")} \\
+        -D ${ref_dict} \\
+        -O "${interval_list.baseName}.pon.vcf.gz"
+    """
+}
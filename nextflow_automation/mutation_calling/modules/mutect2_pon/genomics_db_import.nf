@@ -4,36 +4,71 @@ genomics_db_import.nf module
 This module creates a local GenomicsDB from VCF files for efficient
 querying for creation of a Panel of Normals (PON).
 
+It runs once per interval shard. Given the shard's workspace from an earlier
+run (and the samples already in it), only the new normals' VCFs are added
+to that workspace instead of importing every normal again. With 'store_dir'
+set, the workspace and its sample list (sample ID and BAM key of each
+imported normal) are published to '<store_dir>/shards/<shard key>/' for the
+next run.
+
 Recommended # of normal samples: >= 40.
 
 GATK Version: 4.2.0.0
 */
 
 process GENOMICS_DB_IMPORT {
-    tag "${interval_list.name}"
+    tag "${shard.baseName}"
+    publishDir "${store_dir}/shards/${shard_key}", mode: 'copy', enabled: store_dir as boolean, pattern: "{pon_db.tar,samples.txt}"
     label 'lowCpu'
     label 'highMem'
     label 'medTime'
 
     input:
-    path(all_vcfs)
+    tuple val(shard_key), path(shard), path(previous_db, stageAs: "previous/*"), path(previous_samples, stageAs: "previous/*"), val(sample_ids), val(normal_keys), path(vcfs), path(vcf_indexes)
     path ref_fasta
     path ref_fasta_index
-    path interval_list
+    path ref_dict
+    val store_dir
 
     output:
-    path "pon_db.tar"
+    tuple val(shard_key), path(shard), path("pon_db.tar"), path("samples.txt")
 
     script:
-    def vcf_args = all_vcfs.collect { "-V ${it}" }.join(" ")
+    def vcf_args = [vcfs].flatten().collect { "-V ${it}" }.join(" ")
+    def sample_entries = [[sample_ids].flatten(), [normal_keys].flatten()].transpose().flatten().join(' ')
 
     """
-    gatk GenomicsDBImport \\
-    -R ${ref_fasta} \\
-    -L ${interval_list} \\
-    --genomicsdb-workspace-path pon_db \\
-    $vcf_args
+    if [[ -n "${previous_db}" ]]; then
+        # add the new normals to the shard's workspace (which keeps its intervals)
+        tar -xf ${previous_db}
+        gatk GenomicsDBImport \\
+            --genomicsdb-update-workspace-path pon_db \\
+            $vcf_args
+        cp ${previous_samples} samples.txt
+    else
+        gatk GenomicsDBImport \\
+            -R ${ref_fasta} \\
+            -L ${shard} \\
+            --merge-input-intervals true \\
+            --genomicsdb-workspace-path pon_db \\
+            $vcf_args
+        : > samples.txt
+    fi
+    printf '%s\\t%s\\n' ${sample_entries} >> samples.txt
 
     tar -cf pon_db.tar pon_db/
     """
 }
+
+// which normals a shard workspace needs imported, as [reimport, indices]: the normals not in its
+// stored sample list, or all of them when a stored sample's BAM key changed (a reprocessed
+// normal), since GenomicsDB cannot replace a sample already in a workspace
+def pon_imports(shard, known, sample_ids, normal_keys) {
+    def all = (0..<sample_ids.size()).toList()
+    def changed = all.findAll { known.containsKey(sample_ids[it]) && known[sample_ids[it]] != normal_keys[it] }
+    if (changed) {
+        log.warn "${sample_ids[changed].join(', ')} changed since ${shard.name} was imported; re-importing all normals of the shard"
+        return [true, all]
+    }
+    return [false, all.findAll { !known.containsKey(sample_ids[it]) }]
+}
@@ -4,6 +4,9 @@ mutect2_pon.nf module
 This module performs the initial GATK Mutect2 variant calling step
 for creating a Panel of Normals (PON) from normal samples only.
 
+The calls are kept in 'cache_dir' per normal BAM (keyed by content), so
+adding normals to a PON only calls the new ones.
+
 Recommended # of normal samples: >= 40.
 
 GATK Version: 4.2.0.0
@@ -14,14 +17,17 @@ process MUTECT2_PON {
     label 'lowCpu'
     label 'medMem'
     label 'extraLongTime'
+    storeDir "${cache_dir}/normal_vcfs/${normal_key}"
 
     input:
-    tuple val(sample_id), path(normal_bam), path(normal_bai)
+    tuple val(normal_key), val(sample_id), path(normal_bam), path(normal_bai)
     path ref_fasta
     path ref_fasta_index
+    path ref_dict
+    val cache_dir
 
     output:
-    path("*vcf*")
+    tuple val(normal_key), val(sample_id), path("${sample_id}.vcf.gz"), path("${sample_id}.vcf.gz.tbi")
 
     script:
     """
@@ -1,7 +1,7 @@
 // index.nf module
 //
 // This module inputs vcf files from all three variant callers, compresses them, and indexes them via bgzip/tabix
-// from the samtools package.
+// from the samtools package. VCFs already bgzipped by their caller (--compress_vcfs) are only indexed.
 //
 // samtools version: 1.10.
 
@@ -18,12 +18,16 @@ process INDEX {
     tuple val(sample_id), val(tumor_id), val(normal_id), path(vcf_file)
 
     output:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path("*.vcf.gz"), path("*.vcf.gz.tbi")
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("*.vcf.gz", includeInputs: true), path("*.vcf.gz.tbi")
 
     script:
+    def compressed_vcf = (vcf_file.name.endsWith(".gz") ? "${vcf_file}" : "${vcf_file}.gz")
+
     """
-    # compress and index all variant caller vcf files
-    bgzip ${vcf_file}
-    tabix ${vcf_file}.gz
+    # compress (unless already bgzipped) and index all variant caller vcf files
+    if [[ "${vcf_file}" != *.gz ]]; then
+        bgzip ${vcf_file}
+    fi
+    tabix -f ${compressed_vcf}
     """
 }
\ No newline at end of file
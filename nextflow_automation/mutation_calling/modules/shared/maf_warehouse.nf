@@ -0,0 +1,36 @@
+/*
+maf_warehouse.nf
+
+This module ingests the batch's OncoKB-annotated and TERT promoter MAFs into the
+cohort-wide Parquet MAF warehouse with 'maf_warehouse.py'. Only the batch's own
+partition and index are written, and they are published into 'store_dir' next to
+the other batches.
+
+Python version: 3.10
+*/
+
+process STORE_MAFS {
+    tag "${batch_name}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+    publishDir "${store_dir}", mode: 'copy'
+
+    input:
+    path(mafs)
+    path maf_warehouse_script
+    val batch_name
+    val store_dir
+
+    output:
+    path("batch=*/variants.parquet")
+    path("_index/batch=*.parquet")
+
+    script:
+    """
+    python3 ${maf_warehouse_script} ingest \\
+        --store . \\
+        --batch "${batch_name}" \\
+        ${mafs}
+    """
+}
@@ -6,6 +6,15 @@ files using OncoKB.
 
 OncoKB Version: 3.0.0.
 
+All MAFs of a run are annotated by a single task with 'annotate_oncokb.py': calls
+are reduced to unique OncoKB queries, looked up in a persistent SQLite cache keyed
+by the query and the OncoKB data version, and only cache misses are sent to the API
+(in batches). The annotations a run fetches are published to 'cache_dir' as a cache
+of its own ('oncokb_cache.<run name>.sqlite'); later runs (and the consensus calling
+workflow) read every cache there. The cache is written under a fixed name and renamed
+to the run's name when published, which keeps the run name out of the task hash, so
+'-resume' reuses the task. 'annotate_oncokb.py compact' merges the per-run caches.
+
 Two process variants share an identical script body apart from how they obtain
 the OncoKB API key:
   - ONCOKB (local): pulls the key from a Nextflow secret (`secret 'ONCOKB_API_KEY'`).
@@ -18,61 +27,61 @@ System.getenv('AWS_WORKFLOW_RUN').
 */
 
 process ONCOKB {
-    tag "${sample_id}"
+    tag "batch"
     publishDir "${params.output_dir}/mutation_calls/mutect2/oncokb_annotation", mode: 'copy', pattern: "*mutect2*vep.nonsynonymous*"
     publishDir "${params.output_dir}/mutation_calls/MuSE/oncokb_annotation", mode: 'copy', pattern: "*MuSE*vep.nonsynonymous*"
     publishDir "${params.output_dir}/mutation_calls/varscan2/oncokb_annotation", mode: 'copy', pattern: "*varscan2*vep.nonsynonymous*"
+    publishDir "${cache_dir}", mode: 'copy', pattern: "oncokb_cache.run.sqlite",
+        saveAs: { name -> "oncokb_cache.${workflow.runName}.sqlite" }
     label 'lowCpu'
     label 'lowMem'
     label 'medTime'
     secret 'ONCOKB_API_KEY'
 
     input:
-    tuple val(sample_id), path(nonsyno_maf)
+    path(nonsyno_mafs)
+    path oncokb_script
+    path(previous_caches, stageAs: "previous/*")
+    val cache_dir
 
     output:
-    tuple val(sample_id), path("*vep.nonsynonymous.oncokb.maf")
+    path("*vep.nonsynonymous.oncokb.maf"), emit: mafs
+    path("oncokb_cache.run.sqlite"), emit: cache
 
     script:
     """
-    # save the base name to change parameters based on variant caller
-    BASE_NAME=\$(basename "${nonsyno_maf}")
-
-    if [[ "\$BASE_NAME" == *"mutect2.tumorOnly"* ]]; then
-        OUTPUT_NAME="${sample_id}.mutect2.tumorOnly.vep.nonsynonymous.oncokb.maf"
-    elif [[ "\$BASE_NAME" == *"mutect2.paired"* ]]; then
-        OUTPUT_NAME="${sample_id}.mutect2.paired.vep.nonsynonymous.oncokb.maf"
-    elif [[ "\$BASE_NAME" == *"MuSE"* ]]; then
-        OUTPUT_NAME="${sample_id}.MuSE.vep.nonsynonymous.oncokb.maf"
-    elif [[ "\$BASE_NAME" == *"varscan2"* ]]; then
-        OUTPUT_NAME="${sample_id}.varscan2.vep.nonsynonymous.oncokb.maf"
-    fi
-
-    # annotate via oncokb
-    python /app/MafAnnotator.py \
-    -i $nonsyno_maf \
-    -o \$OUTPUT_NAME \
+    # annotate via oncokb; fetched annotations go to this run's own cache and the shared
+    # caches are only read, so runs annotating at the same time never overwrite each other
+    python ${oncokb_script} annotate \
+    --cache oncokb_cache.run.sqlite \
+    --previous ${previous_caches} \
     -r GRCh38 \
     -b "\$ONCOKB_API_KEY" \
-    -t BRAIN
+    -t BRAIN \
+    ${nonsyno_mafs}
     """
 }
 
-
 process ONCOKB_OMICS {
-    tag "${sample_id}"
+    tag "batch"
     publishDir "${params.output_dir}/mutation_calls/mutect2/oncokb_annotation", mode: 'copy', pattern: "*mutect2*vep.nonsynonymous*"
     publishDir "${params.output_dir}/mutation_calls/MuSE/oncokb_annotation", mode: 'copy', pattern: "*MuSE*vep.nonsynonymous*"
     publishDir "${params.output_dir}/mutation_calls/varscan2/oncokb_annotation", mode: 'copy', pattern: "*varscan2*vep.nonsynonymous*"
+    publishDir "${cache_dir}", mode: 'copy', pattern: "oncokb_cache.run.sqlite",
+        saveAs: { name -> "oncokb_cache.${workflow.runName}.sqlite" }
     label 'lowCpu'
     label 'lowMem'
     label 'medTime'
 
     input:
-    tuple val(sample_id), path(nonsyno_maf)
+    path(nonsyno_mafs)
+    path oncokb_script
+    path(previous_caches, stageAs: "previous/*")
+    val cache_dir
 
     output:
-    tuple val(sample_id), path("*vep.nonsynonymous.oncokb.maf")
+    path("*vep.nonsynonymous.oncokb.maf"), emit: mafs
+    path("oncokb_cache.run.sqlite"), emit: cache
 
     script:
     """
@@ -83,25 +92,14 @@ process ONCOKB_OMICS {
         --query SecretString \
         --output text)
 
-    # save the base name to change parameters based on variant caller
-    BASE_NAME=\$(basename "${nonsyno_maf}")
-
-    if [[ "\$BASE_NAME" == *"mutect2.tumorOnly"* ]]; then
-        OUTPUT_NAME="${sample_id}.mutect2.tumorOnly.vep.nonsynonymous.oncokb.maf"
-    elif [[ "\$BASE_NAME" == *"mutect2.paired"* ]]; then
-        OUTPUT_NAME="${sample_id}.mutect2.paired.vep.nonsynonymous.oncokb.maf"
-    elif [[ "\$BASE_NAME" == *"MuSE"* ]]; then
-        OUTPUT_NAME="${sample_id}.MuSE.vep.nonsynonymous.oncokb.maf"
-    elif [[ "\$BASE_NAME" == *"varscan2"* ]]; then
-        OUTPUT_NAME="${sample_id}.varscan2.vep.nonsynonymous.oncokb.maf"
-    fi
-
-    # annotate via oncokb
-    python /app/MafAnnotator.py \
-    -i $nonsyno_maf \
-    -o \$OUTPUT_NAME \
+    # annotate via oncokb; fetched annotations go to this run's own cache and the shared
+    # caches are only read, so runs annotating at the same time never overwrite each other
+    python ${oncokb_script} annotate \
+    --cache oncokb_cache.run.sqlite \
+    --previous ${previous_caches} \
     -r GRCh38 \
     -b "\$ONCOKB_API_KEY" \
-    -t BRAIN
+    -t BRAIN \
+    ${nonsyno_mafs}
     """
 }
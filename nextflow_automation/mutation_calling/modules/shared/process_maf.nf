@@ -0,0 +1,42 @@
+/*
+process_maf.nf module
+
+This module post-processes the raw MAF files in a single pass with 'process_mafs.py',
+replacing the KEEP_TERTP, KEEP_NONSYNONYMOUS and RENAME_HG38 tasks. It writes:
+  - the TERT promoter (tertP) calls
+  - the nonsynonymous calls (terms in 'nonsynonymous.txt' are matched against the
+    Variant_Classification and Consequence columns) with 'hg38' renamed to 'GRCh38'
+
+Python version: 3.10
+*/
+
+process PROCESS_MAF {
+    tag "${sample_id}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'shortTime'
+    publishDir "${params.output_dir}/mutation_calls/mutect2/tertp", mode: 'copy', pattern: "*mutect2*tertp.maf"
+    publishDir "${params.output_dir}/mutation_calls/MuSE/tertp", mode: 'copy', pattern: "*MuSE*tertp.maf"
+    publishDir "${params.output_dir}/mutation_calls/varscan2/tertp", mode: 'copy', pattern: "*varscan2*tertp.maf"
+
+    input:
+    tuple val(sample_id), path(maf)
+    path nonsynonymous_list
+    path process_script
+
+    output:
+    tuple val(sample_id), path("*vep.nonsynonymous.rename.maf"), emit: renamed
+    tuple val(sample_id), path("*vep.tertp.maf"), emit: tertp
+
+    script:
+    // e.g. GBX1406.mutect2.paired.vep.maf -> GBX1406.mutect2.paired.vep
+    def prefix = maf.name.replaceAll(/\.maf$/, '')
+
+    """
+    python3 ${process_script} \\
+        --maf ${maf} \\
+        --nonsynonymous_list ${nonsynonymous_list} \\
+        --tertp "${prefix}.tertp.maf" \\
+        --renamed "${prefix}.nonsynonymous.rename.maf"
+    """
+}
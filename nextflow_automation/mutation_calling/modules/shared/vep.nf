@@ -1,8 +1,12 @@
 /*
 vep.nf module
 
-This module inputs the selected variant vcf files and annotates them for biological
-effects, phenotype association, allele frequency reporting, and deleteriousness predictions using VEP.
+This module annotates variants for biological effects, phenotype association, allele
+frequency reporting, and deleteriousness predictions using VEP.
+
+VEP runs once per batch on the sites VCF written by VEP_SITES (the unique variants of
+all selected VCFs that are not in the VEP annotation store yet); VEP_JOIN then joins the
+annotations back onto each caller's VCF. See vep_store.nf.
 
 Ensembl VEP Version: 115.
 
@@ -18,37 +22,33 @@ System.getenv('AWS_WORKFLOW_RUN').
 */
 
 process VEP {
-    tag "${sample_id}"
-    publishDir "${params.output_dir}/mutation_calls/mutect2/vep_annotated_vcfs", mode: 'copy', pattern: "*mutect2*vep.vcf*"
-    publishDir "${params.output_dir}/mutation_calls/MuSE/vep_annotated_vcfs", mode: 'copy', pattern: "*MuSE*vep.vcf*"
-    publishDir "${params.output_dir}/mutation_calls/varscan2/vep_annotated_vcfs", mode: 'copy', pattern: "*varscan2*vep.vcf*"
-    label 'medCpu'
+    tag "batch"
+    label 'highCpu'
     label 'medMem'
-    label 'medTime'
+    label 'longTime'
 
     input:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path(selected_vcf), path(index_file)
+    path sites_vcf
     path ref_fasta
     path ref_fasta_index
     path ref_dict
     val vep_cache
 
     output:
-    tuple val(sample_id), path("*vep.vcf")
+    path("vep_sites.vep.vcf")
 
     script:
     """
-    # save base name (no file paths) for file name manipulation based on variant caller
-    BASE_NAME=\$(basename "${selected_vcf}")
-
-    # replace file name parts based on variant caller
-    OUTPUT_NAME=\${BASE_NAME/pass/vep}
+    # annotate via VEP (a batch without new variants only needs the header copied)
+    if ! grep -qv '^#' ${sites_vcf}; then
+        cp ${sites_vcf} vep_sites.vep.vcf
+        exit 0
+    fi
 
-    # annotate via VEP
     /opt/vep/src/ensembl-vep/vep \
     --vcf \
-    --input_file $selected_vcf \
-    --output_file "\${OUTPUT_NAME%.gz}" \
+    --input_file ${sites_vcf} \
+    --output_file vep_sites.vep.vcf \
     --everything \
     --species homo_sapiens \
     --no_stats \
@@ -57,38 +57,38 @@ process VEP {
     --offline \
     --fasta ${ref_fasta} \
     --dir_cache ${vep_cache} \
-    --cache_version 115
+    --cache_version ${params.vep_cache_version}
     """
 }
 
 process VEP_OMICS {
-    tag "${sample_id}"
-    publishDir "${params.output_dir}/mutation_calls/mutect2/vep_annotated_vcfs", mode: 'copy', pattern: "*mutect2*vep.vcf*"
-    publishDir "${params.output_dir}/mutation_calls/MuSE/vep_annotated_vcfs", mode: 'copy', pattern: "*MuSE*vep.vcf*"
-    publishDir "${params.output_dir}/mutation_calls/varscan2/vep_annotated_vcfs", mode: 'copy', pattern: "*varscan2*vep.vcf*"
-    label 'medCpu'
+    tag "batch"
+    label 'highCpu'
     label 'medMem'
-    label 'medTime'
+    label 'longTime'
 
     input:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path(selected_vcf), path(index_file)
+    path sites_vcf
     path ref_fasta
     path ref_fasta_index
     path ref_dict
     path vep_cache
 
     output:
-    tuple val(sample_id), path("*vep.vcf")
+    path("vep_sites.vep.vcf")
 
     script:
     """
-    BASE_NAME=\$(basename "${selected_vcf}")
-    OUTPUT_NAME=\${BASE_NAME/pass/vep}
+    # annotate via VEP (a batch without new variants only needs the header copied)
+    if ! grep -qv '^#' ${sites_vcf}; then
+        cp ${sites_vcf} vep_sites.vep.vcf
+        exit 0
+    fi
 
     /opt/vep/src/ensembl-vep/vep \
     --vcf \
-    --input_file $selected_vcf \
-    --output_file "\${OUTPUT_NAME%.gz}" \
+    --input_file ${sites_vcf} \
+    --output_file vep_sites.vep.vcf \
     --everything \
     --species homo_sapiens \
     --no_stats \
@@ -97,6 +97,6 @@ process VEP_OMICS {
     --offline \
     --fasta ${ref_fasta} \
     --dir_cache ${vep_cache} \
-    --cache_version 115
+    --cache_version ${params.vep_cache_version}
     """
 }
@@ -0,0 +1,76 @@
+/*
+vep_store.nf module
+
+This module deduplicates VEP annotation across callers, samples and runs with
+'vep_store.py' and a persistent, variant-keyed SQLite store:
+  - VEP_SITES writes the unique variants of all selected VCFs of the batch that are not
+    in the store yet into one sites VCF, which VEP / VEP_OMICS annotate once
+  - VEP_JOIN loads the VEP output into the store and joins the annotations back onto
+    every caller's VCF ('*.vep.vcf', as VEP used to write them per file)
+
+The annotations a run adds are published to 'store_dir' as a store of its own
+('vep_store.<run name>.sqlite'); later runs (and the consensus calling workflow) read
+every store there and only send new variants to VEP.
+
+Python version: 3.10
+*/
+
+process VEP_SITES {
+    tag "batch"
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+
+    input:
+    path(selected_vcfs)
+    path vep_store_script
+    path(previous_stores, stageAs: "previous/*")
+
+    output:
+    path("vep_sites.vcf")
+
+    script:
+    """
+    python3 ${vep_store_script} sites \\
+        --store "vep_store.${workflow.runName}.sqlite" \\
+        --previous ${previous_stores} \\
+        --release ${params.vep_cache_version} \\
+        -o vep_sites.vcf \\
+        ${selected_vcfs}
+    """
+}
+
+process VEP_JOIN {
+    tag "batch"
+    publishDir "${params.output_dir}/mutation_calls/mutect2/vep_annotated_vcfs", mode: 'copy', pattern: "*mutect2*vep.vcf*"
+    publishDir "${params.output_dir}/mutation_calls/MuSE/vep_annotated_vcfs", mode: 'copy', pattern: "*MuSE*vep.vcf*"
+    publishDir "${params.output_dir}/mutation_calls/varscan2/vep_annotated_vcfs", mode: 'copy', pattern: "*varscan2*vep.vcf*"
+    publishDir "${store_dir}", mode: 'copy', pattern: "vep_store.*.sqlite"
+    label 'lowCpu'
+    label 'medMem'
+    label 'shortTime'
+
+    input:
+    path(selected_vcfs)
+    path annotated_sites
+    path vep_store_script
+    path(previous_stores, stageAs: "previous/*")
+    val store_dir
+
+    output:
+    path("*.vep.vcf"), emit: vcfs
+    path("vep_store.${workflow.runName}.sqlite"), emit: store
+
+    script:
+    """
+    # new annotations go to this run's own store and the shared stores are only read,
+    # so runs annotating at the same time never overwrite each other
+    python3 ${vep_store_script} join \\
+        --store "vep_store.${workflow.runName}.sqlite" \\
+        --previous ${previous_stores} \\
+        --release ${params.vep_cache_version} \\
+        --annotated ${annotated_sites} \\
+        --rename pass=vep \\
+        ${selected_vcfs}
+    """
+}
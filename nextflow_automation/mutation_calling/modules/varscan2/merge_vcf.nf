@@ -2,7 +2,11 @@
 merge_vcf.nf module
 
 This module merges the high confidence somatic VCF files from VarScan2,
-compresses the files, and indexes them.
+compresses the files, and indexes them. The merged VCF is decompressed again
+unless --compress_vcfs is set.
+
+When VarScan2 was run per region shard (VARSCAN2_STREAM), all shard VCFs are
+gathered here in the same step.
 
 GATK Version: 4.2.0.0
 */
@@ -14,21 +18,25 @@ process MERGE_VCFS {
     label 'shortTime'
 
     input:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path(snp_vcf), path(indel_vcf)
+    tuple val(sample_id), val(tumor_id), val(normal_id), path(snp_vcfs), path(indel_vcfs)
     path ref_dict
 
     output:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.varscan2.vcf")
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.varscan2.${params.compress_vcfs ? 'vcf.gz' : 'vcf'}")
 
     script:
+    def vcf_args = ([snp_vcfs] + [indel_vcfs]).flatten().collect { "-I ${it}" }.join(" ")
+
     """
     # merge high confidence snp and indel vcf files
     gatk MergeVcfs \
-    -I $snp_vcf \
-    -I $indel_vcf \
+    ${vcf_args} \
     -O "${sample_id}.varscan2.vcf.gz" \
     -D ${ref_dict}
 
-    gunzip "${sample_id}.varscan2.vcf.gz"
+    # keep the bgzipped vcf for INDEX with --compress_vcfs
+    if [ "${params.compress_vcfs}" != "true" ]; then
+        gunzip "${sample_id}.varscan2.vcf.gz"
+    fi
     """
 }
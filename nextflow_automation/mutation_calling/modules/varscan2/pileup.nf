@@ -1,8 +1,14 @@
 /*
 pileup.nf module
 
-This module takes temporary SAM files and converts them to temporary BAM files
-using SAMTools version 1.10.
+This module generates the samtools pileups VarScan2 'somatic' calls from, using
+SAMTools version 1.10.
+
+PILEUP writes the joint normal and tumor pileup of each pair (VarScan2's -mpileup input,
+the default). With --share_normal_pileup, TUMOR_PILEUP writes the tumor pileup of each
+pair and NORMAL_PILEUP writes each unique normal BAM's pileup once, bgzipped, however many
+tumors it is paired with; storeDir keeps it under ${cache_dir}/pileups/<BAM key>, so later
+runs reuse it too.
 */
 process PILEUP {
     tag "${sample_id}"
@@ -11,7 +17,7 @@ process PILEUP {
     label 'extraLongTime'
 
     input:
-    tuple val(sample_id), val(tumor_id), path(tumor_bam), path(tumor_bai), path(tumor_sbi), val(normal_id), path(normal_bam, stageAs: "normal.bam"), path(normal_bai, stageAs: "normal.bai")
+    tuple val(sample_id), val(tumor_id), path(tumor_bam), path(tumor_bai), path(tumor_sbi), val(normal_id), path(normal_bam, stageAs: "normal/*"), path(normal_bai, stageAs: "normal/*")
     path ref_fasta
     path ref_fasta_index
     path ref_dict
@@ -29,3 +35,57 @@ process PILEUP {
     $normal_bam $tumor_bam
     """
 }
+
+process TUMOR_PILEUP {
+    tag "${sample_id}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'extraLongTime'
+
+    input:
+    tuple val(sample_id), val(tumor_id), path(tumor_bam), path(tumor_bai), path(tumor_sbi), val(normal_id)
+    path ref_fasta
+    path ref_fasta_index
+    path ref_dict
+
+    output:
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.tumor.pileup")
+
+    script:
+    """
+    # create tumor pileup text file
+    samtools mpileup -B \
+    -f ${ref_fasta} \
+    -q 1 \
+    -o ${sample_id}.tumor.pileup \
+    $tumor_bam
+    """
+}
+
+process NORMAL_PILEUP {
+    tag "${normal_id}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'extraLongTime'
+    storeDir "${cache_dir}/pileups/${normal_key}"
+
+    input:
+    tuple val(normal_key), val(normal_id), path(normal_bam), path(normal_bai)
+    path ref_fasta
+    path ref_fasta_index
+    path ref_dict
+    val cache_dir
+
+    output:
+    tuple val(normal_key), path("${normal_id}.normal.pileup.gz")
+
+    script:
+    """
+    # create the normal pileup, bgzipped as it is kept for later runs
+    samtools mpileup -B \
+    -f ${ref_fasta} \
+    -q 1 \
+    $normal_bam \
+    | bgzip -c > ${normal_id}.normal.pileup.gz
+    """
+}
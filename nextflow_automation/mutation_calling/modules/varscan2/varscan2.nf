@@ -1,8 +1,11 @@
 /* 
 varscan2.nf module
 
-This module channels in metadata from the metadata sheet performs mutation calling
-on the reads using the MuSE variant caller for only paired samples.
+This module calls somatic variants for paired samples using the VarScan2 'somatic'
+method, from the joint normal and tumor pileup of the pair (-mpileup, the default) or,
+with --share_normal_pileup, from the pair's tumor pileup and the bgzipped pileup of its
+normal (shared by every pair of the same normal BAM). The two inputs are not
+interchangeable: VarScan2 reads them differently, so the calls can differ.
 
 Openjdk/Java Version: 11.0.27.
 VarScan Version: v2.4.3
@@ -17,16 +20,19 @@ process VARSCAN2 {
     label 'extraLongTime'
 
     input:
-    tuple val(sample_id), val(tumor_id), val(normal_id), path(pileup)
+    tuple val(sample_id), val(tumor_id), val(normal_id), path(pileup), path(normal_pileup)  // normal_pileup is [] for a joint pileup
     
     output:
     tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.snp.Somatic.hc.vcf"), path("${sample_id}.indel.Somatic.hc.vcf")
 
     script:
+    // the joint pileup is read from stdin; the shared normal pileup is decompressed on the fly
+    def somatic = normal_pileup ?
+        "java -jar /app/VarScan.v2.4.3.jar somatic <(gzip -dc ${normal_pileup}) ${pileup} \"${sample_id}\"" :
+        "cat ${pileup} | java -jar /app/VarScan.v2.4.3.jar somatic -mpileup"
     """
     # call variants using pileup files using VarScan 'somatic' method
-    cat $pileup | java -jar /app/VarScan.v2.4.3.jar somatic \
-    -mpileup \
+    ${somatic} \
     --min-coverage 8 \
     --min-coverage-normal 8 \
     --min-coverage-tumor 6 \
@@ -0,0 +1,90 @@
+/*
+varscan2_stream.nf module
+
+This module fuses the PILEUP and VARSCAN2 steps: samtools mpileup is piped
+straight into VarScan2 'somatic', so no pileup text file is written to the
+work directory.
+
+Each task calls one region shard (a BED file, or an interval list produced by
+SPLIT_INTERVALS). When sharded ('--varscan2_shard_by'), the pileup is generated
+contig by contig with '-r' so every shard only reads its own part of the BAMs;
+the unsharded whole-genome BED is piled up by a single samtools mpileup with '-l'
+rather than one per contig. Shard outputs are merged by MERGE_VCFS; only the
+merged VCF is published (by INDEX), not the per-shard VCFs.
+
+SAMTools Version: 1.10
+Openjdk/Java Version: 11.0.27.
+VarScan Version: v2.4.3
+*/
+
+process VARSCAN2_STREAM {
+    tag "${sample_id}:${regions.baseName}"
+    label 'lowCpu'
+    label 'lowMem'
+    label 'extraLongTime'
+
+    input:
+    tuple val(sample_id), val(tumor_id), path(tumor_bam), path(tumor_bai), path(tumor_sbi), val(normal_id), path(normal_bam, stageAs: "normal/*"), path(normal_bai, stageAs: "normal/*")
+    path ref_fasta
+    path ref_fasta_index
+    path ref_dict
+    each path(regions)
+
+    output:
+    tuple val(sample_id), val(tumor_id), val(normal_id), path("${sample_id}.${regions.baseName}.snp.Somatic.hc.vcf"), path("${sample_id}.${regions.baseName}.indel.Somatic.hc.vcf")
+
+    script:
+    def prefix = "${sample_id}.${regions.baseName}"
+    def sharded = params.varscan2_shard_by ? "true" : "false"
+
+    """
+    set -o pipefail
+
+    # convert interval lists (1-based, with header) to BED; BED files are used as is
+    if [[ "${regions}" == *.interval_list ]]; then
+        grep -v '^@' ${regions} | awk 'BEGIN { OFS = "\\t" } { print \$1, \$2 - 1, \$3 }' > regions.bed
+    else
+        cp ${regions} regions.bed
+    fi
+
+    # stream the pileup into VarScan 'somatic': a shard contig by contig with '-r', so it only reads its own
+    # part of the BAMs, the whole genome in a single mpileup rather than one per contig
+    if ${sharded}; then
+        for contig in \$(cut -f 1 regions.bed | uniq); do
+            samtools mpileup -B \
+            -f ${ref_fasta} \
+            -q 1 \
+            -r "\$contig" \
+            -l regions.bed \
+            $normal_bam $tumor_bam
+        done
+    else
+        samtools mpileup -B \
+        -f ${ref_fasta} \
+        -q 1 \
+        -l regions.bed \
+        $normal_bam $tumor_bam
+    fi | java -jar /app/VarScan.v2.4.3.jar somatic \
+    -mpileup \
+    --min-coverage 8 \
+    --min-coverage-normal 8 \
+    --min-coverage-tumor 6 \
+    --min-var-freq 0.1 \
+    --min-freq-for-hom 0.75 \
+    --p-value 0.99 \
+    --somatic-p-value 0.05 \
+    --strand-filter 0 \
+    --output-vcf \
+    --output-indel "${prefix}.indel.vcf" \
+    --output-snp "${prefix}.snp.vcf"
+
+    # processing initial variant calls with 'processSomatic'
+    java -jar /app/VarScan.v2.4.3.jar processSomatic \
+    "${prefix}.indel.vcf" \
+    --p-Value 0.01
+
+    java -jar /app/VarScan.v2.4.3.jar processSomatic \
+    "${prefix}.snp.vcf" \
+    --p-Value 0.01
+    """
+}
@@ -1,11 +1,15 @@
 nextflow.enable.dsl=2
 
 // import modules
-include { PILEUP } from './modules/varscan2/pileup.nf'
+include { PILEUP; TUMOR_PILEUP; NORMAL_PILEUP } from './modules/varscan2/pileup.nf'
 include { MUSE } from './modules/muse/muse.nf'
+include { CRAM_TO_BAM } from './modules/muse/cram_to_bam.nf'
 include { VARSCAN2 } from './modules/varscan2/varscan2.nf'
+include { VARSCAN2_STREAM } from './modules/varscan2/varscan2_stream.nf'
+include { SPLIT_INTERVALS } from './modules/mutect2/split_intervals.nf'
 include { MUTECT2_CALL } from './modules/mutect2/mutect2_call.nf'
-include { GET_PILEUP_SUMMARIES } from './modules/mutect2/get_pileup_summaries.nf'
+include { GATHER_MUTECT2 } from './modules/mutect2/gather_mutect2.nf'
+include { GET_PILEUP_SUMMARIES; NORMAL_PILEUP_SUMMARIES } from './modules/mutect2/get_pileup_summaries.nf'
 include { CALCULATE_CONTAMINATION } from './modules/mutect2/calculate_contamination.nf'
 include { LEARN_READ_ORIENTATION } from './modules/mutect2/learn_read_orientation.nf'
 include { FILTER_MUTECT_CALLS } from './modules/mutect2/filter_mutect_calls.nf'
@@ -13,15 +17,17 @@ include { INDEX } from './modules/shared/index.nf'
 include { MERGE_VCFS } from './modules/varscan2/merge_vcf.nf'
 include { SELECT_VARIANTS } from './modules/shared/select_variants.nf'
 include { VEP; VEP_OMICS } from './modules/shared/vep.nf'
+include { VEP_SITES; VEP_JOIN } from './modules/shared/vep_store.nf'
 include { REHEADER } from './modules/shared/reheader.nf'
 include { CREATE_MAF } from './modules/shared/create_maf.nf'
-include { KEEP_NONSYNONYMOUS } from './modules/shared/keep_nonsynonymous.nf'
-include { RENAME_HG38 } from './modules/shared/rename_hg38.nf'
+include { PROCESS_MAF } from './modules/shared/process_maf.nf'
 include { ONCOKB; ONCOKB_OMICS } from './modules/shared/oncokb.nf'
+include { CATALOG_RECORD } from './modules/shared/catalog.nf'
+include { STORE_MAFS } from './modules/shared/maf_warehouse.nf'
 include { MUTECT2_PON } from './modules/mutect2_pon/mutect2_pon.nf'
-include { GENOMICS_DB_IMPORT } from './modules/mutect2_pon/genomics_db_import.nf'
-include { CREATE_PON } from './modules/mutect2_pon/create_pon.nf'
-include { KEEP_TERTP } from './modules/shared/keep_tertP.nf'
+include { GENOMICS_DB_IMPORT; pon_imports } from './modules/mutect2_pon/genomics_db_import.nf'
+include { CREATE_PON; GATHER_PON } from './modules/mutect2_pon/create_pon.nf'
+include { bam_key } from '../shared/bam_key.nf'
 
 
 // define functions for user guidance
@@ -40,6 +46,26 @@ def help_message() {
 
     Optional arguments:
     --cpus                        Number of CPUs to use for processing (default: 30)
+    --scatter_count               Number of interval shards to scatter Mutect2 across (default: 1, no scatter)
+    --stream_varscan2             Pipe mpileup straight into VarScan2 instead of writing a pileup file (default: false)
+    --varscan2_shard_by           Shard streamed VarScan2 by 'chromosome' (one shard per primary chromosome, plus one for
+                                  all other contigs) or 'interval' (--scatter_count shards of the interval list;
+                                  restricts calling to the padded targets) (default: no sharding)
+    --compress_vcfs               Keep the Mutect2 and VarScan2 VCFs bgzipped from the callers on, so INDEX only indexes them (default: false)
+    --oncokb_cache_dir            Directory the shared OncoKB annotation cache is published to (default: <ref_dir>/oncokb_cache)
+    --oncokb_cache                OncoKB caches to read, may be a glob (default: <oncokb_cache_dir>/oncokb_cache*.sqlite)
+    --vep_store_dir               Directory the shared VEP annotation store is published to (default: <ref_dir>/vep_store)
+    --vep_store                   VEP annotation stores to read, may be a glob (default: <vep_store_dir>/vep_store*.sqlite)
+    --share_normal_pileup         Run VarScan2 on each normal's pileup, computed once per normal BAM, and the tumor pileup
+                                  instead of a joint normal/tumor mpileup per pair; VarScan2's calls can differ (default: false)
+    --normal_cache_dir            Directory caching normal pileup summaries and pileups per normal BAM (default: <work dir>/normal_cache)
+    --catalog_dir                 Directory of the output catalog the VEP-annotated VCFs and MAFs are recorded in (default: <ref_dir>/output_catalog)
+    --maf_warehouse_dir           Cohort-wide Parquet MAF warehouse the batch's MAFs are added to (default: <ref_dir>/maf_warehouse)
+    --batch_name                  Batch name the MAFs are stored under in the MAF warehouse (default: name of --output_dir)
+    --normal_dir                  Directory of normal BAMs to build the Mutect2 PON from (CREATE_M2_PON)
+    --pon_dir                     Directory normal VCFs and, with --incremental_pon, shard workspaces and PONs are kept in (CREATE_M2_PON) (default: <ref_dir>/m2_pon)
+    --incremental_pon             Add only new normals to the stored shard workspaces and rebuild only the changed shard PONs (CREATE_M2_PON) (default: false)
+    --ref_cache                   Node-local reference view from ref_cache.py, used for reference files instead of --ref_dir
     --help                        Show this help message and exit
 
     Generating the manifest (local):
@@ -90,6 +116,11 @@ def parameter_validation() {
         error "ERROR: --interval_list parameter is required"
         exit 1
     }
+
+    if (params.varscan2_shard_by && !(params.varscan2_shard_by in ['chromosome', 'interval'])) {
+        error "ERROR: --varscan2_shard_by must be 'chromosome' or 'interval'"
+        exit 1
+    }
 }
 
 
@@ -107,18 +138,37 @@ workflow {
         exit 1
     }
 
-    // stage reference files from params (derive from ref_dir when not set explicitly)
-    ref_fasta           = file(params.ref_fasta             ?: "${params.ref_dir}/Homo_sapiens_assembly38.fasta")
-    ref_fasta_index     = file(params.ref_fasta_index       ?: "${params.ref_dir}/Homo_sapiens_assembly38.fasta.fai")
-    ref_dict            = file(params.ref_dict              ?: "${params.ref_dir}/Homo_sapiens_assembly38.dict")
-    gnomad_vcf          = file(params.gnomad_vcf            ?: "${params.ref_dir}/af-only-gnomad.hg38.vcf.gz")
-    gnomad_vcf_index    = file(params.gnomad_vcf_index      ?: "${params.ref_dir}/af-only-gnomad.hg38.vcf.gz.tbi")
-    contamination_vcf   = file(params.contamination_vcf     ?: "${params.ref_dir}/small_exac_common_3.hg38.vcf.gz")
-    contamination_vcf_index = file(params.contamination_vcf_index ?: "${params.ref_dir}/small_exac_common_3.hg38.vcf.gz.tbi")
-    muse_dbsnp          = file(params.muse_dbsnp            ?: "${params.ref_dir}/common_all_20180418.vcf.gz")
-    muse_dbsnp_index    = file(params.muse_dbsnp_index      ?: "${params.ref_dir}/common_all_20180418.vcf.gz.tbi")
+    // stage reference files from params (derive from ref_cache or ref_dir when not set explicitly)
+    ref_source          = params.ref_cache ?: params.ref_dir
+    ref_fasta           = file(params.ref_fasta             ?: "${ref_source}/Homo_sapiens_assembly38.fasta")
+    ref_fasta_index     = file(params.ref_fasta_index       ?: "${ref_source}/Homo_sapiens_assembly38.fasta.fai")
+    ref_dict            = file(params.ref_dict              ?: "${ref_source}/Homo_sapiens_assembly38.dict")
+    gnomad_vcf          = file(params.gnomad_vcf            ?: "${ref_source}/af-only-gnomad.hg38.vcf.gz")
+    gnomad_vcf_index    = file(params.gnomad_vcf_index      ?: "${ref_source}/af-only-gnomad.hg38.vcf.gz.tbi")
+    contamination_vcf   = file(params.contamination_vcf     ?: "${ref_source}/small_exac_common_3.hg38.vcf.gz")
+    contamination_vcf_index = file(params.contamination_vcf_index ?: "${ref_source}/small_exac_common_3.hg38.vcf.gz.tbi")
+    muse_dbsnp          = file(params.muse_dbsnp            ?: "${ref_source}/common_all_20180418.vcf.gz")
+    muse_dbsnp_index    = file(params.muse_dbsnp_index      ?: "${ref_source}/common_all_20180418.vcf.gz.tbi")
     interval_list       = file(params.interval_list)
-    nonsynonymous_list  = file(params.nonsynonymous_list    ?: "${params.ref_dir}/nonsynonymous.txt")
+    nonsynonymous_list  = file(params.nonsynonymous_list    ?: "${ref_source}/nonsynonymous.txt")
+    process_script      = file("${projectDir}/process_mafs.py")
+    oncokb_script       = file("${projectDir}/annotate_oncokb.py")
+    vep_store_script    = file("${projectDir}/vep_store.py")
+    // persistent OncoKB cache: read every cache in --oncokb_cache_dir (or --oncokb_cache);
+    // the run's new annotations are published to --oncokb_cache_dir as a cache of its own
+    oncokb_cache_dir    = params.oncokb_cache_dir ?: "${params.ref_dir}/oncokb_cache"
+    oncokb_cache        = files(params.oncokb_cache ?: "${oncokb_cache_dir}/oncokb_cache*.sqlite").findAll { it.exists() }
+    // persistent VEP annotation store (same layout as the OncoKB cache)
+    vep_store_dir       = params.vep_store_dir ?: "${params.ref_dir}/vep_store"
+    vep_store           = files(params.vep_store ?: "${vep_store_dir}/vep_store*.sqlite").findAll { it.exists() }
+    // normal-side products are cached per normal BAM; pileup summaries also depend on the sites they cover
+    normal_cache_dir    = params.normal_cache_dir ?: "${workflow.workDir}/normal_cache"
+    // output catalog the published VCFs and MAFs are recorded in
+    catalog_dir         = params.catalog_dir ?: "${params.ref_dir}/output_catalog"
+    // cohort-wide MAF warehouse the batch is added to
+    maf_warehouse_dir   = params.maf_warehouse_dir ?: "${params.ref_dir}/maf_warehouse"
+    batch_name          = params.batch_name ?: file(params.output_dir).name
+    sites_key           = "${interval_list.text.md5()}:${contamination_vcf.name}".md5().take(16)
     // vep_cache: on HealthOmics it's an S3 URI to be staged (path); locally
     // it's an in-container path string (val) so Nextflow doesn't bind-mount
     // /opt/vep over the container's VEP install. See VEP / VEP_OMICS in vep.nf.
@@ -154,9 +204,60 @@ workflow {
     }
     .set { samples }
 
+    // each unique normal BAM (keyed by content) once, however many tumors it is paired with
+    normal_keys = samples.paired
+        .map { sample_id, tumor_id, tumor_bam, tumor_bai, tumor_sbi, normal_id, normal_bam, normal_bai ->
+            tuple(bam_key(normal_bam), sample_id) }
+    unique_normals = samples.paired
+        .map { sample_id, tumor_id, tumor_bam, tumor_bai, tumor_sbi, normal_id, normal_bam, normal_bai ->
+            tuple(bam_key(normal_bam), normal_id, normal_bam, normal_bai) }
+        .unique { row -> row[0] }
+    tumor_bams = bams.map { sample_id, tumor_id, tumor_bam, tumor_bai, tumor_sbi, normal_id, normal_bam, normal_bai ->
+        tuple(sample_id, tumor_id, tumor_bam, tumor_bai, tumor_sbi, normal_id) }
+
+    // split the padded interval list into balanced shards (used by Mutect2 and interval-sharded VarScan2)
+    if (params.scatter_count > 1 || params.varscan2_shard_by == 'interval') {
+        interval_shards = SPLIT_INTERVALS(interval_list, ref_fasta, ref_fasta_index, ref_dict, params.scatter_count)
+    }
+
     // run Mutect2 steps defined by GATK best practices
-    mutect2_calls = MUTECT2_CALL(bams, ref_fasta, ref_fasta_index, ref_dict, gnomad_vcf, gnomad_vcf_index, interval_list)
-    pileup_summaries = GET_PILEUP_SUMMARIES(bams, ref_fasta, ref_fasta_index, ref_dict, contamination_vcf, contamination_vcf_index, interval_list)
+    if (params.scatter_count > 1) {
+        // call each interval shard in parallel
+        shard_count = interval_shards.map { shards -> [shards].flatten().size() }
+
+        // the shards are padded by SPLIT_INTERVALS already
+        mutect2_shards = MUTECT2_CALL(bams, ref_fasta, ref_fasta_index, ref_dict, gnomad_vcf, gnomad_vcf_index, interval_shards, 0)
+
+        // group shard outputs per sample; groupKey releases each sample as soon as all its shards finish
+        grouped_shards = mutect2_shards
+            .combine(shard_count)
+            .map { sample_id, tumor_id, normal_id, vcf, f1r2, stats, n_shards ->
+                tuple(groupKey(sample_id, n_shards), tumor_id, normal_id, vcf, f1r2, stats) }
+            .groupTuple(by: 0)
+            .map { key, tumor_ids, normal_ids, vcfs, f1r2s, stats ->
+                tuple(key.getGroupTarget(), tumor_ids[0], normal_ids[0], vcfs, f1r2s, stats) }
+
+        // gather shard VCFs and stats; every shard's F1R2 archive goes to LEARN_READ_ORIENTATION
+        gathered_calls = GATHER_MUTECT2(grouped_shards.map { sample_id, tumor_id, normal_id, vcfs, f1r2s, stats ->
+            tuple(sample_id, tumor_id, normal_id, vcfs, stats) }, ref_dict)
+
+        mutect2_calls = gathered_calls
+            .join(grouped_shards.map { sample_id, tumor_id, normal_id, vcfs, f1r2s, stats ->
+                tuple(sample_id, tumor_id, normal_id, f1r2s) }, by: [0, 1, 2])
+            .map { sample_id, tumor_id, normal_id, vcf, stats, f1r2s ->
+                tuple(sample_id, tumor_id, normal_id, vcf, f1r2s, stats) }
+    } else {
+        mutect2_calls = MUTECT2_CALL(bams, ref_fasta, ref_fasta_index, ref_dict, gnomad_vcf, gnomad_vcf_index, interval_list, 200)
+    }
+
+    // tumor pileup summaries per pair; normal pileup summaries per unique normal, fanned back out to its pairs
+    tumor_summaries = GET_PILEUP_SUMMARIES(tumor_bams, ref_fasta, ref_fasta_index, ref_dict, contamination_vcf, contamination_vcf_index, interval_list)
+    normal_summaries = NORMAL_PILEUP_SUMMARIES(unique_normals, ref_fasta, ref_fasta_index, ref_dict, contamination_vcf, contamination_vcf_index, interval_list, normal_cache_dir, sites_key)
+    pileup_summaries = tumor_summaries
+        .join(normal_keys
+            .combine(normal_summaries, by: 0)
+            .map { normal_key, sample_id, table -> tuple(sample_id, table) }
+            .mix(samples.tumor_only.map { row -> tuple(row[0], []) }))
     contamination_data = CALCULATE_CONTAMINATION(pileup_summaries)
     orientation_models = LEARN_READ_ORIENTATION(mutect2_calls)
 
@@ -170,12 +271,87 @@ workflow {
     // filter Mutect2 calls
     mutect2_vcfs = FILTER_MUTECT_CALLS(filter_input, ref_fasta, ref_fasta_index, ref_dict)
 
+    // MuSE v1.0rc cannot read CRAM: decode each CRAM of the pairs to a BAM once, then swap the
+    // decoded tumors and normals into the pairs
+    decoded_bams = CRAM_TO_BAM(
+        samples.paired
+            .flatMap { sample_id, tumor_id, tumor_bam, tumor_bai, tumor_sbi, normal_id, normal_bam, normal_bai ->
+                [[tumor_bam, tumor_bai], [normal_bam, normal_bai]] }
+            .filter { alignment, index -> alignment.name.endsWith('.cram') }
+            .unique { entry -> entry[0].toString() }
+            .map { alignment, index -> tuple(alignment.toString(), alignment, index) },
+        ref_fasta, ref_fasta_index)
+    samples.paired
+        .branch { row ->
+            cram: row[2].name.endsWith('.cram')
+            bam: true
+        }
+        .set { muse_tumors }
+    muse_tumors.cram
+        .map { row -> tuple(row[2].toString(), row) }
+        .combine(decoded_bams, by: 0)
+        .map { cram_key, row, bam, bai -> [row[0], row[1], bam, bai, []] + row[5..7] }
+        .mix(muse_tumors.bam)
+        .branch { row ->
+            cram: row[6].name.endsWith('.cram')
+            bam: true
+        }
+        .set { muse_normals }
+    muse_pairs = muse_normals.cram
+        .map { row -> tuple(row[6].toString(), row) }
+        .combine(decoded_bams, by: 0)
+        .map { cram_key, row, bam, bai -> row[0..5] + [bam, bai] }
+        .mix(muse_normals.bam)
+
     // run MuSE variant caller
-    muse_vcfs = MUSE(samples.paired, ref_fasta, ref_fasta_index, ref_dict, muse_dbsnp, muse_dbsnp_index)
+    muse_vcfs = MUSE(muse_pairs, ref_fasta, ref_fasta_index, ref_dict, muse_dbsnp, muse_dbsnp_index)
 
     // run VarScan2 variant caller
-    pileups = PILEUP(samples.paired, ref_fasta, ref_fasta_index, ref_dict)
-    varscan2_raw_vcfs = VARSCAN2(pileups)
+    if (params.stream_varscan2) {
+        // one BED per primary chromosome (plus one for all other contigs: chrM, alt, random, decoys),
+        // one shard per interval list shard, or a single whole-genome BED
+        reference_contigs = Channel.of(ref_fasta_index).splitCsv(sep: '\t')
+        if (params.varscan2_shard_by == 'chromosome') {
+            varscan2_regions = reference_contigs
+                .collectFile(sort: false) { row ->
+                    def shard = row[0] ==~ /(chr)?([0-9]+|X|Y)/ ? row[0] : 'other_contigs'
+                    ["${shard}.bed", "${row[0]}\t0\t${row[1]}\n"] }
+                .collect()
+        } else if (params.varscan2_shard_by == 'interval') {
+            varscan2_regions = interval_shards
+        } else {
+            varscan2_regions = reference_contigs
+                .map { row -> "${row[0]}\t0\t${row[1]}\n" }
+                .collectFile(name: 'genome.bed', sort: false)
+                .collect()
+        }
+        region_count = varscan2_regions.map { regions -> [regions].flatten().size() }
+
+        // pipe mpileup into VarScan2 per shard, then group the shard calls per sample
+        varscan2_raw_vcfs = VARSCAN2_STREAM(samples.paired, ref_fasta, ref_fasta_index, ref_dict, varscan2_regions)
+            .combine(region_count)
+            .map { sample_id, tumor_id, normal_id, snp_vcf, indel_vcf, n_shards ->
+                tuple(groupKey(sample_id, n_shards), tumor_id, normal_id, snp_vcf, indel_vcf) }
+            .groupTuple(by: 0)
+            .map { key, tumor_ids, normal_ids, snp_vcfs, indel_vcfs ->
+                tuple(key.getGroupTarget(), tumor_ids[0], normal_ids[0], snp_vcfs, indel_vcfs) }
+    } else if (params.share_normal_pileup) {
+        // tumor pileup per pair, normal pileup per unique normal (shared by all of its pairs)
+        tumor_pileups = TUMOR_PILEUP(
+            samples.paired.map { sample_id, tumor_id, tumor_bam, tumor_bai, tumor_sbi, normal_id, normal_bam, normal_bai ->
+                tuple(sample_id, tumor_id, tumor_bam, tumor_bai, tumor_sbi, normal_id) },
+            ref_fasta, ref_fasta_index, ref_dict)
+        normal_pileups = NORMAL_PILEUP(unique_normals, ref_fasta, ref_fasta_index, ref_dict, normal_cache_dir)
+        pileups = tumor_pileups.join(normal_keys
+            .combine(normal_pileups, by: 0)
+            .map { normal_key, sample_id, pileup -> tuple(sample_id, pileup) })
+        varscan2_raw_vcfs = VARSCAN2(pileups)
+    } else {
+        // joint normal and tumor pileup per pair
+        pileups = PILEUP(samples.paired, ref_fasta, ref_fasta_index, ref_dict)
+            .map { sample_id, tumor_id, normal_id, pileup -> tuple(sample_id, tumor_id, normal_id, pileup, []) }
+        varscan2_raw_vcfs = VARSCAN2(pileups)
+    }
 
     // merge the varscan2 vcfs
     varscan2_vcfs = MERGE_VCFS(varscan2_raw_vcfs, ref_dict)
@@ -189,12 +365,21 @@ workflow {
     // select for passing variants via gatk SelectVariants
     selected_vcfs = SELECT_VARIANTS(compressed_vcfs)
 
-    // annotate for biological effects via VEP — dispatch to the path-input
+    // collect the batch's variants that are not in the VEP annotation store yet
+    batch_vcfs = selected_vcfs.map { sample_id, tumor_id, normal_id, vcf, index -> vcf }.collect()
+    vep_sites = VEP_SITES(batch_vcfs, vep_store_script, vep_store)
+
+    // annotate for biological effects via VEP once per batch — dispatch to the path-input
     // variant on HealthOmics (S3 staging) or the val-input variant locally
     // (uses cache baked into e10m/vep:115 at /opt/vep/.vep)
-    vep_annotated_vcfs = is_omics
-        ? VEP_OMICS(selected_vcfs, ref_fasta, ref_fasta_index, ref_dict, vep_cache)
-        : VEP(selected_vcfs, ref_fasta, ref_fasta_index, ref_dict, vep_cache)
+    annotated_sites = is_omics
+        ? VEP_OMICS(vep_sites, ref_fasta, ref_fasta_index, ref_dict, vep_cache)
+        : VEP(vep_sites, ref_fasta, ref_fasta_index, ref_dict, vep_cache)
+
+    // store the new annotations and join them back onto every caller's VCF
+    vep_annotated_vcfs = VEP_JOIN(batch_vcfs, annotated_sites, vep_store_script, vep_store, vep_store_dir).vcfs
+        .flatten()
+        .map { vcf -> tuple(vcf.name.replaceAll(/\.(mutect2|MuSE|varscan2)\..*/, ''), vcf) }
 
     // change the column names in the vcf for standardization
     reheadered_vcfs = REHEADER(vep_annotated_vcfs)
@@ -202,20 +387,40 @@ workflow {
     // generate MAF files
     maf_files = CREATE_MAF(reheadered_vcfs, ref_fasta, ref_fasta_index, ref_dict)
 
-    // grep and keep only tert promoter mutations
-    KEEP_TERTP(maf_files)
-
-    // filter out synonymous mutations
-    nonsynonymous_mutations = KEEP_NONSYNONYMOUS(maf_files, nonsynonymous_list)
-
-    // rename and reformat the files
-    renamed_files = RENAME_HG38(nonsynonymous_mutations)
-
-    // oncokb annotation for clinical relevance — dispatch to the AWS Secrets
-    // Manager variant on HealthOmics, otherwise use the Nextflow secret variant
-    is_omics
-        ? ONCOKB_OMICS(renamed_files)
-        : ONCOKB(renamed_files)
+    // keep tert promoter mutations, filter out synonymous mutations and rename hg38 in one pass
+    processed_mafs = PROCESS_MAF(maf_files, nonsynonymous_list, process_script)
+    renamed_files = processed_mafs.renamed
+
+    // oncokb annotation for clinical relevance in one batched, cached task — dispatch
+    // to the AWS Secrets Manager variant on HealthOmics, otherwise use the Nextflow secret variant
+    nonsyno_mafs = renamed_files.map { sample_id, maf -> maf }.collect()
+    oncokb_mafs = is_omics
+        ? ONCOKB_OMICS(nonsyno_mafs, oncokb_script, oncokb_cache, oncokb_cache_dir).mafs
+        : ONCOKB(nonsyno_mafs, oncokb_script, oncokb_cache, oncokb_cache_dir).mafs
+
+    // add the batch's annotated and TERT promoter calls to the cohort-wide MAF warehouse
+    STORE_MAFS(
+        oncokb_mafs.flatten().mix(processed_mafs.tertp.map { sample_id, maf -> maf }).collect(),
+        file("${projectDir}/maf_warehouse.py"),
+        batch_name,
+        maf_warehouse_dir
+    )
+
+    // record the per-caller VEP-annotated VCFs and MAFs in the output catalog
+    catalog_artifacts = vep_annotated_vcfs.map { sample_id, vcf -> tuple(sample_id, 'vep_vcf', 'vep_annotated_vcfs', vcf) }
+        .mix(maf_files.map { sample_id, maf -> tuple(sample_id, 'maf', 'raw_maf', maf) })
+        .map { sample_id, type, subdir, artifact ->
+            def caller = (artifact.name =~ /\.(mutect2|MuSE|varscan2)\./)[0][1]
+            tuple(sample_id, caller, type, file("${params.output_dir}/mutation_calls/${caller}/${subdir}/${artifact.name}"), artifact) }
+    CATALOG_RECORD(
+        catalog_artifacts
+            .map { sample_id, caller, type, published, artifact -> [sample_id, caller, type, published, artifact.name].join('\t') }
+            .collectFile(name: 'catalog_entries.tsv', newLine: true, sort: true),
+        catalog_artifacts.map { row -> row[4] }.collect(),
+        file("${projectDir}/../catalog/catalog.py"),
+        'mutation_calling',
+        catalog_dir
+    )
 }
 
 workflow CREATE_M2_PON {
@@ -231,35 +436,91 @@ workflow CREATE_M2_PON {
         exit 1
     }
 
-    // stage reference files from params (derive from ref_dir when not set explicitly)
-    ref_fasta           = file(params.ref_fasta         ?: "${params.ref_dir}/Homo_sapiens_assembly38.fasta")
-    ref_fasta_index     = file(params.ref_fasta_index   ?: "${params.ref_dir}/Homo_sapiens_assembly38.fasta.fai")
-    gnomad_vcf          = file(params.gnomad_vcf        ?: "${params.ref_dir}/af-only-gnomad.hg38.vcf.gz")
-    gnomad_vcf_index    = file(params.gnomad_vcf_index  ?: "${params.ref_dir}/af-only-gnomad.hg38.vcf.gz.tbi")
+    // stage reference files from params (derive from ref_cache or ref_dir when not set explicitly)
+    ref_source          = params.ref_cache ?: params.ref_dir
+    ref_fasta           = file(params.ref_fasta         ?: "${ref_source}/Homo_sapiens_assembly38.fasta")
+    ref_fasta_index     = file(params.ref_fasta_index   ?: "${ref_source}/Homo_sapiens_assembly38.fasta.fai")
+    ref_dict            = file(params.ref_dict          ?: "${ref_source}/Homo_sapiens_assembly38.dict")
+    gnomad_vcf          = file(params.gnomad_vcf        ?: "${ref_source}/af-only-gnomad.hg38.vcf.gz")
+    gnomad_vcf_index    = file(params.gnomad_vcf_index  ?: "${ref_source}/af-only-gnomad.hg38.vcf.gz.tbi")
     interval_list       = file(params.interval_list)
 
+    // normal VCFs are cached per normal BAM under --pon_dir; with --incremental_pon, each shard's
+    // GenomicsDB workspace, sample list and PON are kept there too and only updated with new normals
+    pon_dir             = params.pon_dir ?: "${params.ref_dir}/m2_pon"
+    store_dir           = params.incremental_pon ? pon_dir : ''
+
     // logging workflow details
     log_workflow()
 
-    // channel in the normal samples
+    // channel in the normal samples (BAMs or CRAMs)
     channel.fromFilePairs([
         "${params.normal_dir}/*.{bam,bam.bai}",
-        "${params.normal_dir}/**/*.{bam,bam.bai}"], flat: true)  // generate tuple [sample_id, bam, bai]
+        "${params.normal_dir}/**/*.{bam,bam.bai}",
+        "${params.normal_dir}/*.{cram,cram.crai}",
+        "${params.normal_dir}/**/*.{cram,cram.crai}"], flat: true)  // generate tuple [sample_id, bam, bai]
     // extract sample ID from filename
     .map { base_name, read1, read2 ->
         def sample_id = base_name.tokenize('.')[0]  // string split, parse first element
-        tuple(sample_id, read1, read2) }
+        tuple(bam_key(read1), sample_id, read1, read2) }
     .set { normal_bams }
 
     // main workflow
-    normal_vcfs = MUTECT2_PON(normal_bams, ref_fasta, ref_fasta_index)
+    normal_vcfs = MUTECT2_PON(normal_bams, ref_fasta, ref_fasta_index, ref_dict, pon_dir)
+
+    // import and create the PON per padded interval shard; SPLIT_INTERVALS pads the list even
+    // with scatter_count = 1, so the PON covers the same regions however it is scattered
+    shards = SPLIT_INTERVALS(interval_list, ref_fasta, ref_fasta_index, ref_dict, params.scatter_count).flatten()
+
+    // key each shard by its content; in incremental mode, pick up its stored workspace and PON
+    shard_state = shards.map { shard ->
+        def key = shard.text.md5().take(16)
+        def stored_db = file("${pon_dir}/shards/${key}/pon_db.tar")
+        def stored_samples = file("${pon_dir}/shards/${key}/samples.txt")
+        def stored_pon = file("${pon_dir}/shards/${key}/${shard.baseName}.pon.vcf.gz")
+        def stored = params.incremental_pon && stored_db.exists() && stored_samples.exists()
+        // sample ID -> BAM key of the normals already in the stored workspace
+        def known = stored ? stored_samples.readLines()*.trim().findAll().collectEntries { line ->
+            def fields = line.tokenize('\t')
+            [(fields[0]): fields.size() > 1 ? fields[1] : null] } : [:]
+        def pon = stored && stored_pon.exists() && file("${stored_pon}.tbi").exists() ? stored_pon : []
+        tuple(key, shard, stored ? stored_db : [], stored ? stored_samples : [], known, pon) }
+
+    // every normal VCF against every shard, grouped per shard
+    shard_normals = shard_state
+        .combine(normal_vcfs)
+        .map { key, shard, db, samples, known, pon, normal_key, sample_id, vcf, tbi -> tuple(key, sample_id, normal_key, vcf, tbi) }
+        .groupTuple()
+
+    // import the normals not yet in a shard's workspace (by sample and BAM key; a reprocessed normal
+    // re-imports the shard from scratch); shards without new normals reuse their stored PON, or
+    // rebuild it from their stored workspace when it is missing
+    shard_state
+        .join(shard_normals)
+        .map { key, shard, db, samples, known, pon, sample_ids, normal_keys, vcfs, tbis ->
+            def (reimport, added) = pon_imports(shard, known, sample_ids, normal_keys)
+            tuple(key, shard, reimport ? [] : db, reimport ? [] : samples,
+                sample_ids[added], normal_keys[added], vcfs[added], tbis[added], pon) }
+        .branch { key, shard, db, samples, new_ids, new_keys, vcfs, tbis, pon ->
+            update: new_ids
+            stored: pon
+            rebuild: true
+        }
+        .set { shard_inputs }
 
-    // collect vcfs and pass to genomics_db_import
-    normal_vcfs
-        .collect()
-        .set { all_vcfs }
+    imported = GENOMICS_DB_IMPORT(
+        shard_inputs.update.map { key, shard, db, samples, new_ids, new_keys, vcfs, tbis, pon ->
+            tuple(key, shard, db, samples, new_ids, new_keys, vcfs, tbis) },
+        ref_fasta, ref_fasta_index, ref_dict, store_dir)
 
-    genomics_db = GENOMICS_DB_IMPORT(all_vcfs, ref_fasta, ref_fasta_index, interval_list)
+    workspaces = imported
+        .map { key, shard, db, samples -> tuple(key, shard, db) }
+        .mix(shard_inputs.rebuild.map { key, shard, db, samples, new_ids, new_keys, vcfs, tbis, pon -> tuple(key, shard, db) })
 
-    CREATE_PON(genomics_db, ref_fasta, ref_fasta_index, gnomad_vcf, gnomad_vcf_index, interval_list)
-}
\ No newline at end of file
+    shard_pons = CREATE_PON(workspaces, ref_fasta, ref_fasta_index, ref_dict, gnomad_vcf, gnomad_vcf_index, store_dir)
+        .mix(shard_inputs.stored.map { key, shard, db, samples, new_ids, new_keys, vcfs, tbis, pon ->
+            tuple(key, pon, file("${pon}.tbi")) })
+
+    // gather the shard PONs into the panel for the whole interval list
+    GATHER_PON(shard_pons.map { key, vcf, tbi -> vcf }.collect(), ref_dict, interval_list)
+}
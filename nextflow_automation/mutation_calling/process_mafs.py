@@ -0,0 +1,121 @@
+"""
+process_mafs.py module
+
+Single-pass MAF post-processing for the WESley mutation and consensus calling pipelines.
+
+Reads a vcf2maf MAF once and writes, from the same pass, the outputs previously produced by the
+KEEP_TERTP, KEEP_NONSYNONYMOUS and RENAME_HG38 tasks:
+  - --tertp:         TERT promoter calls (lines mentioning both TERT and upstream_gene_variant,
+                     as the previous 'grep TERT | grep upstream_gene_variant')
+  - --nonsynonymous: calls whose Variant_Classification and Consequence terms are not listed in
+                     --nonsynonymous_list
+  - --renamed:       the nonsynonymous calls with every 'hg38' replaced by 'GRCh38' (for OncoKB)
+
+Nonsynonymous filtering looks only at the Variant_Classification and Consequence columns (set
+lookups), so a listed term elsewhere on the line (e.g. in all_effects) no longer drops a call.
+Comment lines and the column header are copied to every output.
+
+Usage:
+    python process_mafs.py --maf SAMPLE.mutect2.paired.vep.maf \\
+        --nonsynonymous_list nonsynonymous.txt \\
+        --tertp SAMPLE.mutect2.paired.vep.tertp.maf \\
+        --renamed SAMPLE.mutect2.paired.vep.nonsynonymous.rename.maf
+
+Python version: 3.10+
+"""
+
+import argparse
+import re
+import sys
+
+REQUIRED_COLUMNS = ("Variant_Classification", "Consequence")
+TERT_PROMOTER_GENE = "TERT"
+TERT_PROMOTER_CONSEQUENCE = "upstream_gene_variant"
+
+
+def read_terms(path: str) -> set[str]:
+    """Read one excluded classification or consequence term per line (blank and '#' lines skipped)."""
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip() and not line.startswith("#")}
+
+
+def consequence_terms(consequence: str) -> set[str]:
+    """Split a VEP Consequence value ('a&b' or 'a,b') into its terms."""
+    return set(re.split(r"[&,]", consequence)) if consequence else set()
+
+
+def process_maf(maf_path: str, excluded_terms: set[str], tertp: str | None = None,
+                nonsynonymous: str | None = None, renamed: str | None = None) -> dict[str, int]:
+    """Stream maf_path once into the requested outputs; return the number of calls written to each."""
+    outputs = {name: open(path, "w") for name, path in
+               (("tertp", tertp), ("nonsynonymous", nonsynonymous), ("renamed", renamed)) if path}
+    counts = {name: 0 for name in outputs}
+    tertp_output, nonsynonymous_output, renamed_output = (
+        outputs.get(name) for name in ("tertp", "nonsynonymous", "renamed")
+    )
+    columns = None
+
+    try:
+        with open(maf_path) as maf:
+            for line in maf:
+                if columns is None:
+                    # comment lines and the column header go to every output
+                    if line.startswith("Hugo_Symbol"):
+                        header = line.rstrip("\n").split("\t")
+                        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+                        if missing:
+                            raise ValueError(f"{maf_path} is missing MAF column(s): {', '.join(missing)}")
+                        columns = [header.index(column) for column in REQUIRED_COLUMNS]
+                    elif not line.startswith("#"):
+                        raise ValueError(f"{maf_path} has no Hugo_Symbol header line")
+                    for name, output in outputs.items():
+                        output.write(line.replace("hg38", "GRCh38") if name == "renamed" else line)
+                    continue
+
+                fields = line.rstrip("\n").split("\t")
+                classification, consequence = (fields[i] if i < len(fields) else "" for i in columns)
+                terms = consequence_terms(consequence)
+
+                if tertp_output and TERT_PROMOTER_GENE in line and TERT_PROMOTER_CONSEQUENCE in line:
+                    tertp_output.write(line)
+                    counts["tertp"] += 1
+
+                if classification in excluded_terms or not terms.isdisjoint(excluded_terms):
+                    continue
+                if nonsynonymous_output:
+                    nonsynonymous_output.write(line)
+                    counts["nonsynonymous"] += 1
+                if renamed_output:
+                    renamed_output.write(line.replace("hg38", "GRCh38"))
+                    counts["renamed"] += 1
+    finally:
+        for output in outputs.values():
+            output.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Single-pass TERT promoter, nonsynonymous and GRCh38 MAF processing for WESley"
+    )
+    parser.add_argument("--maf", type=str, required=True, help="Input MAF from vcf2maf")
+    parser.add_argument(
+        "--nonsynonymous_list", type=str, required=True,
+        help="File of Variant_Classification / Consequence terms to exclude, one per line"
+    )
+    parser.add_argument("--tertp", type=str, help="Output MAF of TERT promoter calls")
+    parser.add_argument("--nonsynonymous", type=str, help="Output MAF of nonsynonymous calls")
+    parser.add_argument("--renamed", type=str, help="Output MAF of nonsynonymous calls with 'hg38' renamed to 'GRCh38'")
+
+    args = parser.parse_args()
+    if not (args.tertp or args.nonsynonymous or args.renamed):
+        parser.error("at least one of --tertp, --nonsynonymous or --renamed is required")
+
+    counts = process_maf(args.maf, read_terms(args.nonsynonymous_list), args.tertp, args.nonsynonymous, args.renamed)
+    for name, count in counts.items():
+        print(f"{name}: {count} calls written", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+vep_store.py module
+
+Variant-keyed VEP annotation store for the WESley mutation and consensus calling pipelines.
+
+Instead of running VEP on every caller's VCF of every sample, a batch is annotated in three steps:
+  - sites: collect the unique variants (CHROM, POS, REF, ALT) of all VCFs in the batch that are
+           not yet in the store (and carry no CSQ yet) into one sites-only VCF
+  - VEP is run once on that sites VCF
+  - join:  load the VEP output into the store (CSQ per variant, plus the VEP header lines) and
+           write every input VCF back with its CSQ annotations joined on from the store
+
+The store is a SQLite file keyed by VEP release and variant, so a variant is annotated once per
+VEP/cache release across callers, samples, batches and workflows. Records that already carry a
+CSQ annotation (e.g. consensus sites taken from annotated caller VCFs) are kept as they are.
+A run only writes the annotations it adds to --store; the stores of earlier runs are read with
+--previous, so concurrent runs each write their own file and none is overwritten.
+
+Usage:
+    python vep_store.py sites --store vep_store.RUN.sqlite --previous vep_store*.sqlite --release 115 \\
+        -o vep_sites.vcf *.pass.vcf.gz
+    vep --vcf --input_file vep_sites.vcf --output_file vep_sites.vep.vcf ...
+    python vep_store.py join --store vep_store.RUN.sqlite --previous vep_store*.sqlite --release 115 \\
+        --annotated vep_sites.vep.vcf --rename pass=vep *.pass.vcf.gz
+
+Python version: 3.10+
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import zlib
+
+CSQ_HEADER_PREFIX = "##INFO=<ID=CSQ,"
+
+
+class VepStore:
+    """SQLite store of VEP annotations.
+
+    - CSQ values (zlib-compressed), keyed by (VEP release, CHROM, POS, REF, ALT); an empty value
+      records a variant VEP returned without consequences, so it is not sent to VEP again.
+    - The VEP header lines ('##VEP*' and the CSQ INFO definition) per release.
+
+    New annotations are written to path only; the previous stores (e.g. of other runs) are
+    opened read-only and looked up after it.
+    """
+
+    def __init__(self, path: str, read_only: bool = False, previous: list[str] = ()):
+        self.path = path
+        self.previous = [sqlite3.connect(f"file:{os.path.abspath(store)}?mode=ro", uri=True)
+                         for store in previous if os.path.abspath(store) != os.path.abspath(path)]
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS annotations (
+                release TEXT NOT NULL, chrom TEXT NOT NULL, pos INTEGER NOT NULL, ref TEXT NOT NULL,
+                alt TEXT NOT NULL, csq BLOB NOT NULL,
+                PRIMARY KEY (release, chrom, pos, ref, alt));
+            CREATE TABLE IF NOT EXISTS headers (
+                release TEXT PRIMARY KEY, lines TEXT NOT NULL);
+        """)
+
+    def close(self):
+        self.conn.close()
+        for conn in self.previous:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, release: str, chrom: str, variants: list[tuple[int, str, str]]) -> dict[tuple, str]:
+        """Return {(pos, ref, alt): csq} for the variants of one contig found here or in a previous store."""
+        found = {}
+        for conn in (self.conn, *self.previous):
+            wanted = {variant for variant in variants if variant not in found}
+            positions = sorted({pos for pos, _, _ in wanted})
+            for start in range(0, len(positions), 500):
+                chunk = positions[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT pos, ref, alt, csq FROM annotations WHERE release = ? AND chrom = ? "
+                    f"AND pos IN ({','.join('?' * len(chunk))})", [release, chrom, *chunk])
+                for pos, ref, alt, csq in rows:
+                    if (pos, ref, alt) in wanted:
+                        found[(pos, ref, alt)] = zlib.decompress(csq).decode()
+        return found
+
+    def put(self, release: str, annotations: list[tuple[str, int, str, str, str]]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)",
+                [(release, chrom, pos, ref, alt, zlib.compress(csq.encode()))
+                 for chrom, pos, ref, alt, csq in annotations])
+
+    def get_header(self, release: str) -> list[str]:
+        for conn in (self.conn, *self.previous):
+            row = conn.execute("SELECT lines FROM headers WHERE release = ?", (release,)).fetchone()
+            if row:
+                return json.loads(row[0])
+        return []
+
+    def put_header(self, release: str, lines: list[str]):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO headers VALUES (?, ?)", (release, json.dumps(lines)))
+
+
+def open_vcf(path: str, mode: str = "rt"):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode[0])
+
+
+def read_vcf(path: str) -> tuple[list[str], str, list[list[str]]]:
+    """Return (meta lines, #CHROM line, records split into columns) of a VCF."""
+    meta, columns, records = [], None, []
+    with open_vcf(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("##"):
+                meta.append(line)
+            elif line.startswith("#"):
+                columns = line
+            elif line:
+                records.append(line.split("\t"))
+    if columns is None:
+        raise ValueError(f"{path} has no #CHROM header line")
+    return meta, columns, records
+
+
+def get_csq(info: str) -> str | None:
+    """CSQ value of an INFO column, or None when absent."""
+    for field in info.split(";"):
+        if field.startswith("CSQ="):
+            return field[4:]
+    return None
+
+
+def vep_header(meta: list[str]) -> list[str]:
+    """VEP's header lines: '##VEP*' provenance lines and the CSQ INFO definition."""
+    return [line for line in meta if line.startswith("##VEP") or line.startswith(CSQ_HEADER_PREFIX)]
+
+
+def collect_sites(vcf_paths: list[str], store: VepStore | None, release: str, output: str) -> int:
+    """Write the unannotated variants of vcf_paths missing from the store as a sites VCF; return the count."""
+    contigs, contig_lines, sites = {}, [], {}
+    for path in vcf_paths:
+        meta, _, records = read_vcf(path)
+        for line in meta:
+            if line.startswith("##contig=<ID="):
+                contig = line[len("##contig=<ID="):].split(",")[0].rstrip(">")
+                if contig not in contigs:
+                    contigs[contig] = len(contigs)
+                    contig_lines.append(line)
+        for fields in records:
+            if len(fields) > 7 and get_csq(fields[7]) is not None:
+                continue
+            sites.setdefault(fields[0], set()).add((int(fields[1]), fields[3], fields[4]))
+
+    missing = []
+    for chrom, variants in sites.items():
+        stored = store.get(release, chrom, list(variants)) if store else {}
+        missing += [(chrom, *variant) for variant in variants if variant not in stored]
+    missing.sort(key=lambda site: (contigs.get(site[0], len(contigs)), site[0], site[1], site[2], site[3]))
+
+    with open(output, "w") as f:
+        f.write("##fileformat=VCFv4.2\n")
+        f.writelines(line + "\n" for line in contig_lines)
+        f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+        f.writelines(f"{chrom}\t{pos}\t.\t{ref}\t{alt}\t.\t.\t.\n" for chrom, pos, ref, alt in missing)
+    return len(missing)
+
+
+def load_annotations(annotated_vcf: str, store: VepStore, release: str) -> int:
+    """Store the CSQ of every record of a VEP-annotated sites VCF; return the number of variants."""
+    meta, _, records = read_vcf(annotated_vcf)
+    header = vep_header(meta)
+    if header:
+        store.put_header(release, header)
+    store.put(release, [(fields[0], int(fields[1]), fields[3], fields[4], get_csq(fields[7]) or "")
+                        for fields in records])
+    return len(records)
+
+
+def output_name(vcf_path: str, rename: tuple[str, str]) -> str:
+    """Output file name, e.g. GBX1.MuSE.pass.vcf.gz -> GBX1.MuSE.vep.vcf (like ${BASE_NAME/pass/vep})."""
+    name = os.path.basename(vcf_path).replace(*rename, 1)
+    return name[:-3] if name.endswith(".gz") else name
+
+
+def join_annotations(vcf_paths: list[str], store: VepStore, release: str, output_dir: str,
+                     rename: tuple[str, str] = ("pass", "vep")) -> dict[str, int]:
+    """Write each VCF with its CSQ annotations joined on from the store; return annotation counts."""
+    header = store.get_header(release)
+    counts = {"annotated": 0, "kept": 0, "missing": 0}
+    os.makedirs(output_dir, exist_ok=True)
+
+    for path in vcf_paths:
+        meta, columns, records = read_vcf(path)
+        by_contig = {}
+        for fields in records:
+            by_contig.setdefault(fields[0], []).append((int(fields[1]), fields[3], fields[4]))
+        stored = {chrom: store.get(release, chrom, variants) for chrom, variants in by_contig.items()}
+
+        # add the VEP header lines, keeping an existing CSQ definition
+        has_csq = any(line.startswith(CSQ_HEADER_PREFIX) for line in meta)
+        added = [line for line in header
+                 if line not in meta and not (has_csq and line.startswith(CSQ_HEADER_PREFIX))]
+        with open(os.path.join(output_dir, output_name(path, rename)), "w") as f:
+            f.writelines(line + "\n" for line in meta + added)
+            f.write(columns + "\n")
+            for fields in records:
+                if get_csq(fields[7]) is not None:
+                    counts["kept"] += 1
+                else:
+                    csq = stored[fields[0]].get((int(fields[1]), fields[3], fields[4]))
+                    if csq is None:
+                        counts["missing"] += 1
+                    else:
+                        counts["annotated"] += 1
+                        if csq:
+                            fields[7] = f"CSQ={csq}" if fields[7] in ("", ".") else f"{fields[7]};CSQ={csq}"
+                f.write("\t".join(fields) + "\n")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variant-keyed VEP annotation store for WESley")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sites = subparsers.add_parser("sites", help="Write the variants that still need VEP as one sites VCF")
+    sites.add_argument("vcfs", nargs="+", help="VCF files of the batch (.vcf or .vcf.gz)")
+    sites.add_argument("-o", "--output", type=str, required=True, help="Sites VCF to annotate with VEP")
+
+    join = subparsers.add_parser("join", help="Store VEP output and join CSQ annotations onto the VCFs")
+    join.add_argument("vcfs", nargs="+", help="VCF files of the batch (.vcf or .vcf.gz)")
+    join.add_argument("--annotated", type=str, required=True, help="VEP output for the sites VCF")
+    join.add_argument("-o", "--output_dir", type=str, default=".", help="Directory for the annotated VCFs")
+    join.add_argument("--rename", type=str, default="pass=vep",
+                      help="Output name substitution OLD=NEW applied to each input file name (default: pass=vep)")
+
+    for subparser in (sites, join):
+        subparser.add_argument("--store", type=str, required=True,
+                               help="SQLite annotation store the new annotations are written to")
+        subparser.add_argument("--previous", nargs="*", default=[],
+                               help="Stores of earlier runs to read annotations from (read-only)")
+        subparser.add_argument("--release", type=str, required=True,
+                               help="VEP/cache release the annotations belong to (e.g. 115)")
+
+    args = parser.parse_args()
+
+    if args.command == "sites":
+        stores = [path for path in (args.store, *args.previous) if os.path.exists(path)]
+        store = VepStore(stores[0], read_only=True, previous=stores[1:]) if stores else None
+        try:
+            written = collect_sites(args.vcfs, store, args.release, args.output)
+        finally:
+            if store:
+                store.close()
+        print(f"{written} variants need VEP annotation", file=sys.stderr)
+    else:
+        with VepStore(args.store, previous=args.previous) as store:
+            loaded = load_annotations(args.annotated, store, args.release)
+            counts = join_annotations(args.vcfs, store, args.release, args.output_dir,
+                                      tuple(args.rename.split("=", 1)))
+        print(f"Stored {loaded} new annotations; records annotated from the store: {counts['annotated']}, "
+              f"already annotated: {counts['kept']}, not found: {counts['missing']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .ref_cache import RefCache, file_digest, main
@@ -0,0 +1,264 @@
+"""
+ref_cache.py module
+
+Node-local, content-addressed reference cache for the WESley workflows.
+
+Tasks read multi-GB references (FASTA, BWA and BBSplit indexes, gnomAD, dbSNP, the VEP cache) from
+--ref_dir, which is usually network storage, through a bind mount or a staged symlink, and SPLIT used
+to copy the whole BBSplit index into every task's work directory. This tool copies the reference
+directory onto local disk once per node:
+
+  - objects/<ab>/<sha256>   one read-only copy of every distinct file content
+  - views/<key>/            the reference directory's layout, hardlinked to the objects (so a view
+                            takes no extra space, and identical files across reference versions are
+                            stored once); <key> is derived from the view's files and their checksums
+  - view                    symlink to the current view, swapped atomically by 'populate'
+
+Pass <cache_dir>/view to the workflows as --ref_cache. They then mount (read-only) or stage
+references from the view; caches and stores kept under --ref_dir are unaffected. Checksums are
+remembered by path, size and modification time, so re-populating only copies new or changed files.
+
+Subcommands:
+  - populate: copy --ref_dir into the cache and point 'view' at it
+  - prewarm:  read the hot indexes of the current view into the page cache
+  - verify:   re-checksum every object
+  - prune:    drop views other than the current one and the objects no view uses
+
+Usage:
+    python ref_cache.py populate --ref_dir /mnt/references --cache_dir /local/wesley_refs
+    python ref_cache.py prewarm --cache_dir /local/wesley_refs
+    nextflow -C nextflow.config run data_processing.nf --ref_dir /mnt/references --ref_cache /local/wesley_refs/view ...
+
+Python version: 3.10+
+"""
+
+import argparse
+import fcntl
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# caches and stores the workflows publish under --ref_dir: mutable, so never part of a view
+DEFAULT_EXCLUDES = [
+    "oncokb_cache", "vep_store", "cnvkit_coverage", "cnv_segment_store", "fingerprint_matrix",
+    "output_catalog", "m2_pon", "maf_warehouse",
+]
+
+# files worth keeping in the page cache: FASTA and BWA indexes, sequence dictionaries, the BBSplit index
+HOT_PATTERNS = ["*.fasta", "*.fa", "*.fai", "*.dict", "*.amb", "*.ann", "*.bwt", "*.pac", "*.sa", "ref/*"]
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def matches(relpath: str, patterns: list[str]) -> bool:
+    """True if relpath, its top-level directory or its file name matches one of the glob patterns."""
+    parts = relpath.split(os.sep)
+    return any(fnmatch.fnmatch(relpath, pattern) or fnmatch.fnmatch(parts[0], pattern)
+               or fnmatch.fnmatch(parts[-1], pattern) for pattern in patterns)
+
+
+class RefCache:
+    """A content-addressed reference cache rooted at cache_dir."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.views_dir = os.path.join(cache_dir, "views")
+        self.view_link = os.path.join(cache_dir, "view")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.views_dir, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def lock(self):
+        """Exclusive lock on the cache, so concurrent runs on a node populate it once."""
+        handle = open(os.path.join(self.cache_dir, ".lock"), "w")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def digest(self, path: str) -> str:
+        """Checksum of a source file, reused while its size and modification time are unchanged."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        size, mtime_ns, digest = self.index.get(key, (None, None, None))
+        if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            digest = file_digest(path)
+            self.index[key] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def store(self, path: str) -> tuple[str, int]:
+        """Copy a file into the object store unless its content is there already; return (digest, bytes copied)."""
+        digest = self.digest(path)
+        target = self.object_path(digest)
+        if os.path.exists(target):
+            return digest, 0
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = f"{target}.{os.getpid()}.partial"
+        shutil.copyfile(path, partial)
+        if file_digest(partial) != digest:
+            os.remove(partial)
+            raise RuntimeError(f"{path} changed while it was being copied")
+        os.chmod(partial, 0o444)
+        os.replace(partial, target)
+        return digest, os.path.getsize(target)
+
+    def current_view(self) -> str | None:
+        return os.path.realpath(self.view_link) if os.path.islink(self.view_link) else None
+
+    def populate(self, ref_dir: str, excludes: list[str] | None = None) -> dict:
+        """Cache every file below ref_dir (but the excluded ones) and make it the current view."""
+        excludes = DEFAULT_EXCLUDES if excludes is None else excludes
+        with self.lock():
+            manifest, copied = {}, 0
+            for root, dirs, names in os.walk(ref_dir, followlinks=True):
+                dirs.sort()
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    relpath = os.path.relpath(path, ref_dir)
+                    if matches(relpath, excludes) or not os.path.isfile(path):
+                        continue
+                    manifest[relpath], size = self.store(path)
+                    copied += size
+
+            key = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:16]
+            view = os.path.join(self.views_dir, key)
+            if not os.path.isdir(view):
+                partial = f"{view}.{os.getpid()}.partial"
+                for relpath, digest in manifest.items():
+                    os.makedirs(os.path.dirname(os.path.join(partial, relpath)), exist_ok=True)
+                    os.link(self.object_path(digest), os.path.join(partial, relpath))
+                os.makedirs(partial, exist_ok=True)
+                with open(os.path.join(partial, ".manifest.json"), "w") as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+                os.rename(partial, view)
+
+            # swap the view symlink atomically: running tasks keep the view they mounted
+            link = f"{self.view_link}.{os.getpid()}.partial"
+            os.symlink(os.path.join("views", key), link)
+            os.replace(link, self.view_link)
+
+            with open(self.index_path, "w") as f:
+                json.dump(self.index, f)
+        return {"view": view, "files": len(manifest), "bytes_copied": copied}
+
+    def prewarm(self, patterns: list[str] | None = None) -> int:
+        """Read the current view's files matching patterns into the page cache; return the bytes read."""
+        view = self.current_view()
+        if view is None:
+            raise RuntimeError(f"{self.cache_dir} has no view yet, run 'populate' first")
+        patterns = HOT_PATTERNS if patterns is None else patterns
+        total = 0
+        buffer = bytearray(CHUNK_SIZE)
+        for root, _, names in os.walk(view):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                if not matches(os.path.relpath(path, view), patterns):
+                    continue
+                with open(path, "rb", buffering=0) as f:
+                    if hasattr(os, "posix_fadvise"):
+                        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                    while n := f.readinto(buffer):
+                        total += n
+        return total
+
+    def verify(self) -> list[str]:
+        """Objects whose content no longer matches their checksum."""
+        return [os.path.join(root, name)
+                for root, _, names in os.walk(self.objects_dir) for name in sorted(names)
+                if not name.endswith(".partial") and file_digest(os.path.join(root, name)) != name]
+
+    def prune(self) -> dict:
+        """Remove the views other than the current one, then the objects no remaining view links to.
+
+        Tasks of a run still reading an older view lose it, so prune between runs.
+        """
+        with self.lock():
+            current = self.current_view()
+            removed_views = 0
+            for name in os.listdir(self.views_dir):
+                view = os.path.join(self.views_dir, name)
+                if os.path.realpath(view) != current:
+                    shutil.rmtree(view)
+                    removed_views += 1
+
+            removed_objects, freed = 0, 0
+            for root, _, names in os.walk(self.objects_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    # an object hardlinked from no view has only its own link left
+                    if stat.st_nlink == 1:
+                        os.remove(path)
+                        removed_objects += 1
+                        freed += stat.st_size
+            self.index = {path: entry for path, entry in self.index.items()
+                          if os.path.exists(self.object_path(entry[2]))}
+            with open(self.index_path, "w") as f:
+                json.dump(self.index, f)
+        return {"views": removed_views, "objects": removed_objects, "bytes_freed": freed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Node-local content-addressed reference cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    populate = subparsers.add_parser("populate", help="Copy a reference directory into the cache")
+    populate.add_argument("--ref_dir", type=str, required=True, help="Reference directory to cache")
+    populate.add_argument("--exclude", nargs="*", default=None,
+                          help=f"Glob patterns to leave out (default: {' '.join(DEFAULT_EXCLUDES)})")
+    populate.add_argument("--prewarm", action="store_true", help="Prewarm the hot indexes afterwards")
+
+    prewarm = subparsers.add_parser("prewarm", help="Read the hot indexes into the page cache")
+    prewarm.add_argument("patterns", nargs="*", help=f"Glob patterns to read (default: {' '.join(HOT_PATTERNS)})")
+
+    subparsers.add_parser("verify", help="Re-checksum every object")
+    subparsers.add_parser("prune", help="Remove old views and the objects only they used")
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("--cache_dir", type=str, required=True, help="Node-local cache directory")
+
+    args = parser.parse_args()
+    cache = RefCache(args.cache_dir)
+
+    if args.command == "populate":
+        started = time.time()
+        result = cache.populate(args.ref_dir, args.exclude)
+        print(f"Cached {result['files']} files ({result['bytes_copied'] / 1024 ** 3:.1f} GB copied) in "
+              f"{time.time() - started:.0f}s; current view: {result['view']}", file=sys.stderr)
+        if args.prewarm:
+            print(f"Prewarmed {cache.prewarm() / 1024 ** 3:.1f} GB", file=sys.stderr)
+    elif args.command == "prewarm":
+        print(f"Prewarmed {cache.prewarm(args.patterns or None) / 1024 ** 3:.1f} GB", file=sys.stderr)
+    elif args.command == "verify":
+        corrupt = cache.verify()
+        for path in corrupt:
+            print(f"corrupt object: {path}", file=sys.stderr)
+        if corrupt:
+            sys.exit(1)
+    else:
+        result = cache.prune()
+        print(f"Removed {result['views']} views and {result['objects']} objects "
+              f"({result['bytes_freed'] / 1024 ** 3:.1f} GB)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+/*
+bam_key.nf
+
+The cache key of a BAM (or CRAM), shared by the workflows that keep per-BAM products
+with storeDir: CNVkit coverage, the normal pileup summaries and pileups, and the
+Mutect2 PON normals. A reprocessed BAM gets a new key, so its cached products are
+computed again.
+*/
+
+// cache key of a BAM: its .md5 sidecar when present, otherwise its name, size and modification time
+def bam_key(bam) {
+    def md5_file = file("${bam}.md5")
+    def fingerprint = md5_file.exists() ? md5_file.text.tokenize()[0] : "${bam.name}:${bam.size()}:${bam.lastModified()}"
+    return fingerprint.md5()
+}
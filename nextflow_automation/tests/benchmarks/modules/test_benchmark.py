@@ -0,0 +1,190 @@
+"""
+test_benchmark.py module
+
+This python script tests 'benchmark.py' with a small synthetic dataset and hand-written Nextflow traces.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import gzip
+import json
+import os
+import random
+import re
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from nextflow_automation.benchmarks.benchmark import (
+    build_report, compare_reports, generate_dataset, main, nextflow_command, parse_duration, parse_size,
+    plan_runs, read_fasta, read_trace, run_benchmarks, simulate_reads, summarize, write_manifest
+)
+
+REFERENCE = str(Path(__file__).resolve().parents[3] / "test-data" / "references" / "hg38_chr22.fasta")
+
+FORMATTED_TRACE = """task_id\thash\tnative_id\tname\tstatus\texit\tsubmit\tduration\trealtime\t%cpu\tpeak_rss\tpeak_vmem\trchar\twchar
+1\tab/123456\t111\tDATA_PROCESSING:BWA_ALIGN (BX1)\tCOMPLETED\t0\t2025-01-01 10:00:00.000\t2m 10s\t2m\t380.5%\t2 GB\t3 GB\t1.5 GB\t900 MB
+2\tcd/123456\t112\tDATA_PROCESSING:BWA_ALIGN (BX1_NORMAL)\tCOMPLETED\t0\t2025-01-01 10:00:00.000\t1m 5s\t1m\t390.0%\t1.5 GB\t3 GB\t1 GB\t600 MB
+3\tef/123456\t113\tDATA_PROCESSING:FASTQC (BX1)\tCACHED\t0\t2025-01-01 10:00:00.000\t-\t-\t-\t-\t-\t-\t-
+4\tgh/123456\t114\tDATA_PROCESSING:MARK_DUPES (BX1)\tFAILED\t1\t2025-01-01 10:00:00.000\t5s\t3.5s\t99.0%\t512 MB\t1 GB\t10 MB\t1 KB
+"""
+
+RAW_TRACE = """task_id\thash\tname\tprocess\ttag\tstatus\texit\tcpus\trealtime\tduration\t%cpu\tpeak_rss\tpeak_vmem\trchar\twchar
+1\tab/123456\tBWA_ALIGN (BX1)\tBWA_ALIGN\tBX1\tCOMPLETED\t0\t4\t120000\t130000\t380.5\t2147483648\t3221225472\t1610612736\t943718400
+"""
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def test_simulate_reads_come_from_the_reference():
+    """Without errors or variants, R1 and the reverse complement of R2 are reference substrings."""
+    contigs = read_fasta(REFERENCE)
+    contig = next(iter(contigs))
+    intervals = [(contig, 20000, 20300)]
+    reads = list(simulate_reads(contigs, intervals, 20, {}, 100, random.Random(0), error_rate=1e-12))
+    assert len(reads) == 20
+    complement = str.maketrans("ACGT", "TGCA")
+    for read1, read2 in reads:
+        assert len(read1) == len(read2) == 100
+        assert read1 in contigs[contig] and read2.translate(complement)[::-1] in contigs[contig]
+
+
+def test_generate_dataset(temp_dir):
+    """FASTQs are named the way DATA_PROCESSING parses sample and lane; depth sets the read count."""
+    description = generate_dataset(temp_dir, REFERENCE, samples=2, lanes=2, depth=10, intervals=8, seed=3)
+    assert description["sample_ids"] == ["BX1", "BX1_NORMAL", "BX2", "BX2_NORMAL"]
+    assert description["intervals"] == 8 and description["fastqs"] == 16
+
+    fastqs = sorted(os.listdir(os.path.join(temp_dir, "fastqs")))
+    assert fastqs[0] == "BX1_NORMAL_S2_L001_R1_001.fastq.gz"
+    for name in fastqs:
+        assert re.match(r"^(\S+)_S\d+", name) and re.search(r"L\d+", name) and re.search(r"_R[12]", name)
+    with gzip.open(os.path.join(temp_dir, "fastqs", fastqs[0]), "rt") as f:
+        assert sum(1 for _ in f) == 4 * description["read_pairs_per_lane"]
+
+    with open(os.path.join(temp_dir, "intervals.interval_list")) as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith("@HD") and lines[1].startswith("@SQ\tSN:chr22")
+    assert len([line for line in lines if not line.startswith("@")]) == 8
+    assert sorted(os.listdir(os.path.join(temp_dir, "caller_vcfs", "BX1"))) == [
+        "BX1.MuSE.vep.vcf", "BX1.mutect2.paired.vep.vcf", "BX1.varscan2.vep.vcf"
+    ]
+    with open(os.path.join(temp_dir, "dataset.json")) as f:
+        assert json.load(f)["seed"] == 3
+
+
+def test_parse_values():
+    assert parse_duration("1h 2m 3s") == 3723
+    assert parse_duration("850ms") == pytest.approx(0.85)
+    assert parse_duration("120000") == 120
+    assert parse_duration("-") is None
+    assert parse_size("1.5 GB") == 1.5 * 1024 ** 3
+    assert parse_size("2147483648") == 2147483648
+
+
+def test_summarize_formatted_and_raw_traces(temp_dir):
+    """Formatted (-with-trace) and raw (benchmark.config) traces give the same per-process metrics."""
+    formatted = summarize(read_trace(write(os.path.join(temp_dir, "formatted.txt"), FORMATTED_TRACE)))
+    assert list(formatted) == ["BWA_ALIGN", "FASTQC", "MARK_DUPES"]
+    assert formatted["BWA_ALIGN"]["tasks"] == 2
+    assert formatted["BWA_ALIGN"]["wall_time_s"] == 180 and formatted["BWA_ALIGN"]["max_task_s"] == 120
+    assert formatted["BWA_ALIGN"]["peak_rss_bytes"] == 2 * 1024 ** 3
+    assert formatted["BWA_ALIGN"]["read_bytes"] == 2.5 * 1024 ** 3
+    assert formatted["FASTQC"]["tasks"] == 0  # cached, not measured
+    assert formatted["MARK_DUPES"]["failed"] == 1 and formatted["MARK_DUPES"]["tasks"] == 0
+
+    raw = summarize(read_trace(write(os.path.join(temp_dir, "raw.txt"), RAW_TRACE)))
+    assert raw["BWA_ALIGN"]["cpu_efficiency"] == pytest.approx(95.1, abs=0.1)  # 3.805 of 4 CPUs
+    assert raw["BWA_ALIGN"]["peak_rss_bytes"] == 2 * 1024 ** 3
+
+
+def test_compare_reports(temp_dir):
+    """Regressions beyond the tolerance and noise floor are reported; small or favorable changes are not."""
+    baseline = build_report({"data_processing": write(os.path.join(temp_dir, "base.txt"), RAW_TRACE)})
+    assert compare_reports(baseline, baseline) == ([], [])
+
+    slower = RAW_TRACE.replace("\t120000\t130000\t380.5\t2147483648", "\t200000\t210000\t200.0\t2147483648")
+    current = build_report({"data_processing": write(os.path.join(temp_dir, "slow.txt"), slower)})
+    regressions, _ = compare_reports(current, baseline)
+    assert {r["metric"] for r in regressions} == {"wall_time_s", "max_task_s", "cpu_efficiency"}
+
+    # 2 seconds slower is within the noise floor; 40% more memory is a regression
+    noisy = RAW_TRACE.replace("\t120000\t", "\t122000\t").replace("\t2147483648\t", "\t3006477107\t")
+    current = build_report({"data_processing": write(os.path.join(temp_dir, "noisy.txt"), noisy)})
+    regressions, _ = compare_reports(current, baseline)
+    assert [r["metric"] for r in regressions] == ["peak_rss_bytes"]
+
+    regressions, notes = compare_reports({"workflows": {}}, baseline)
+    assert regressions == [] and notes == ["data_processing: not in the current report"]
+
+
+def test_write_manifest(temp_dir):
+    """Tumor BAMs are paired with their _NORMAL BAM, as make_mc_manifest would list them."""
+    for name in ("BX1.BQSR.bam", "BX1.BQSR.bai", "BX1_NORMAL.BQSR.bam", "BX2.BQSR.bam"):
+        write(os.path.join(temp_dir, name), "")
+    manifest = os.path.join(temp_dir, "manifest.json")
+    assert write_manifest(temp_dir, manifest) == 2
+    with open(manifest) as f:
+        samples = json.load(f)["samples"]
+    assert samples[0]["normal_bam"] == os.path.join(temp_dir, "BX1_NORMAL.BQSR.bam")
+    assert samples[0]["tumor_bai"] == os.path.join(temp_dir, "BX1.BQSR.bai")
+    assert samples[1]["normal_id"] is None and samples[1]["tumor_bai"] is None
+
+
+def test_plan_runs():
+    """Runs are ordered by dependency and carry the chained inputs."""
+    runs = plan_runs(["fingerprint", "data_processing", "cnvkit"], "/data", "/results", "/refs")
+    assert [run.name for run in runs] == [
+        "data_processing", "cnvkit:CREATE_NORM", "cnvkit:CNV_CALLING", "fingerprint:EXTRACT", "fingerprint:CROSSCHECK"
+    ]
+    assert runs[1].params["bam_dir"] == "/results/data_processing/preprocessing/analysis_ready_bams"
+    assert runs[1].params["targets"] == "/data/targets.bed"  # staged from the dataset, not copied into ref_dir
+
+    command = nextflow_command(runs[0], "/results/trace.txt", "dp.yaml")
+    assert command[command.index("-entry") + 1] == "DATA_PROCESSING"
+    assert command[command.index("-params-file") + 1] == "dp.yaml"
+    assert command[command.index("--ref_dir") + 1] == "/refs"
+    assert command[4].endswith("benchmark.config")
+
+
+def test_run_and_compare(temp_dir, monkeypatch):
+    """run executes Nextflow per workflow and reports its trace; compare exits non-zero on regressions."""
+    dataset = os.path.join(temp_dir, "dataset")
+    generate_dataset(dataset, REFERENCE, samples=1, intervals=4, depth=2)
+
+    # stand-in for the nextflow executable: writes the trace it is asked for
+    fake_nextflow = os.path.join(temp_dir, "nextflow")
+    write(fake_nextflow, f"#!{sys.executable}\nimport sys\n"
+                         f"trace = sys.argv[sys.argv.index('-with-trace') + 1]\n"
+                         f"open(trace, 'w').write({RAW_TRACE!r}.replace('BWA_ALIGN', 'CALL_CONSENSUS'))\n")
+    os.chmod(fake_nextflow, os.stat(fake_nextflow).st_mode | stat.S_IEXEC)
+
+    out_dir = os.path.join(temp_dir, "run")
+    report = run_benchmarks(dataset, temp_dir, out_dir, ["consensus_calling"], nextflow=fake_nextflow)
+    assert list(report["workflows"]) == ["consensus_calling"]
+    assert report["workflows"]["consensus_calling"]["processes"]["CALL_CONSENSUS"]["tasks"] == 1
+    assert report["dataset"]["samples"] == 1
+    assert os.path.exists(os.path.join(out_dir, "results", "consensus_calling", "BX1", "BX1.MuSE.vep.vcf"))
+
+    baseline = json.loads(json.dumps(report))
+    baseline["workflows"]["consensus_calling"]["processes"]["CALL_CONSENSUS"]["wall_time_s"] = 10
+    write(os.path.join(temp_dir, "baseline.json"), json.dumps(baseline))
+    monkeypatch.setattr(sys, "argv", ["benchmark.py", "compare", "--baseline", os.path.join(temp_dir, "baseline.json"),
+                                      os.path.join(out_dir, "benchmark_report.json")])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 1
@@ -0,0 +1,146 @@
+"""
+test_predict_resources.py module
+
+This python script tests 'predict_resources.py' with hand-written Nextflow traces over fake task work directories.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+from nextflow_automation.benchmarks.predict_resources import (
+    fit_linear, fit_models, input_bytes, main, predict, process_inputs, write_config
+)
+
+MB = 1024 ** 2
+COLUMNS = "task_id\thash\tname\tprocess\ttag\tstatus\texit\tcpus\trealtime\t%cpu\tpeak_rss\tworkdir"
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+def make_workdir(temp_dir, name, input_mb):
+    """A task work directory with one staged (symlinked) input of input_mb and one output file."""
+    workdir = os.path.join(temp_dir, "work", name)
+    os.makedirs(workdir)
+    source = os.path.join(temp_dir, f"{name}.bam")
+    with open(source, "wb") as f:
+        f.truncate(int(input_mb * MB))
+    os.symlink(source, os.path.join(workdir, "input.bam"))
+    with open(os.path.join(workdir, "output.bam"), "wb") as f:
+        f.truncate(5 * MB)
+    return workdir
+
+
+def write_trace(temp_dir, rows):
+    """Raw trace of (process, tag, status, cpus, realtime ms, %cpu, peak_rss bytes, workdir) rows."""
+    path = os.path.join(temp_dir, "trace.txt")
+    with open(path, "w") as f:
+        f.write(COLUMNS + "\n")
+        for i, (process, tag, status, cpus, realtime, cpu, rss, workdir) in enumerate(rows, 1):
+            f.write(f"{i}\tab/{i:06d}\t{process} ({tag})\t{process}\t{tag}\t{status}\t0\t{cpus}\t{realtime}\t{cpu}\t{rss}\t{workdir}\n")
+    return path
+
+
+@pytest.fixture
+def trace(temp_dir):
+    """MARK_DUPES memory and time grow with the BAM; FASTQC is flat; INDEX has too few tasks to model."""
+    rows = []
+    for i, input_mb in enumerate((10, 20, 40, 80)):
+        workdir = make_workdir(temp_dir, f"md{i}", input_mb)
+        rows.append(("MARK_DUPES", f"S{i}", "COMPLETED", 8, int((5 + input_mb / 4) * 60000), 190.0,
+                     int((1000 + 30 * input_mb) * MB), workdir))
+    for i in range(3):
+        rows.append(("FASTQC", f"S{i}", "COMPLETED", 8, 600000, 98.0 + i, 300 * MB, os.path.join(temp_dir, "gone", str(i))))
+    rows.append(("FASTQC", "S9", "FAILED", 8, 1000, 10.0, 100 * MB, "-"))
+    rows.append(("INDEX", "S0", "COMPLETED", 1, 1000, 90.0, 10 * MB, "-"))
+    return write_trace(temp_dir, rows)
+
+
+def test_input_bytes(temp_dir):
+    """Only staged (symlinked) inputs count; a missing work directory is unmeasured."""
+    workdir = make_workdir(temp_dir, "task", 3)
+    os.makedirs(os.path.join(temp_dir, "shards"))
+    with open(os.path.join(temp_dir, "shards", "1.vcf"), "wb") as f:
+        f.truncate(MB)
+    os.symlink(os.path.join(temp_dir, "shards"), os.path.join(workdir, "shards"))
+    assert input_bytes(workdir) == 4 * MB
+    assert input_bytes(os.path.join(temp_dir, "missing")) is None and input_bytes("-") is None
+
+
+def test_fit_linear():
+    """The fit covers every point with the margin; decreasing or too few sizes fall back to a constant."""
+    points = [(10, 1300), (20, 1600), (40, 2300), (80, 3300)]
+    fit = fit_linear(points, margin=0.1)
+    assert fit["slope"] > 0
+    assert all(fit["intercept"] + fit["slope"] * x >= 1.1 * y - 1e-6 for x, y in points)
+
+    assert fit_linear([(10, 500), (20, 400), (30, 300)], margin=0) == {"intercept": 500, "slope": 0.0}
+    assert fit_linear([(0, 200), (0, 300)], margin=0.5) == {"intercept": 450, "slope": 0.0}
+
+
+def test_fit_models(trace):
+    models = fit_models([trace], margin=0.2)
+    assert list(models["processes"]) == ["FASTQC", "MARK_DUPES"]
+
+    mark_dupes = models["processes"]["MARK_DUPES"]
+    assert mark_dupes["sized_tasks"] == 4 and mark_dupes["max_input_mb"] == 80
+    assert mark_dupes["cpus"] == 2  # 190% of the 8 allocated CPUs
+    small, large = predict(mark_dupes, 10), predict(mark_dupes, 80)
+    assert 1300 <= small["memory_mb"] < large["memory_mb"] <= 1.2 * 3400 + 1
+    assert large["time_min"] >= 25
+
+    fastqc = models["processes"]["FASTQC"]
+    assert fastqc["sized_tasks"] == 0 and fastqc["memory_mb"]["slope"] == 0
+    assert fastqc["cpus"] == 1
+    assert predict(fastqc, 1000) == {"cpus": 1, "memory_mb": 512, "time_min": 12}
+    assert predict(mark_dupes, 80, {"cpus": 1, "memory_mb": 2048, "time_min": 20}) == {
+        "cpus": 1, "memory_mb": 2048, "time_min": 20
+    }
+
+
+def test_write_config(temp_dir, trace):
+    """withName blocks size memory/time from the process's path inputs; unknown processes are skipped."""
+    workflow_dir = os.path.join(temp_dir, "wf")
+    os.makedirs(os.path.join(workflow_dir, "modules"))
+    with open(os.path.join(workflow_dir, "modules", "mark_duplicates.nf"), "w") as f:
+        f.write("process MARK_DUPES {\n    label 'highMem'\n\n    input:\n"
+                "    tuple val(sample_id), path(bam), path(bai)\n    each path(intervals)\n    path ref_fasta\n\n"
+                "    output:\n    path(\"${sample_id}.bam\")\n\n    script:\n    \"\"\"\n    echo\n    \"\"\"\n}\n")
+    assert process_inputs(workflow_dir) == {"MARK_DUPES": ["bam", "bai", "intervals", "ref_fasta"]}
+
+    output = os.path.join(temp_dir, "resources.config")
+    assert write_config(fit_models([trace]), workflow_dir, output, {"memory_mb": 4096}) == ["MARK_DUPES"]
+    with open(output) as f:
+        config = f.read()
+    assert "withName: 'MARK_DUPES' {" in config and "FASTQC" not in config
+    assert "cpus = 2" in config
+    assert "def mb = [bam, bai, intervals, ref_fasta].flatten().collect { it.size() }.sum(0) / 1048576;" in config
+    assert "Math.min(" in config and ", 4096)" in config and "task.attempt" in config
+    assert config.count("{") == config.count("}")
+
+
+def test_main(temp_dir, trace, monkeypatch, capsys):
+    """fit then predict from the command line."""
+    model = os.path.join(temp_dir, "model.json")
+    monkeypatch.setattr(sys, "argv", ["predict_resources.py", "fit", "-o", model, trace])
+    main()
+    task_input = make_workdir(temp_dir, "new", 40)
+    monkeypatch.setattr(sys, "argv", ["predict_resources.py", "predict", "--model", model, "--process", "MARK_DUPES",
+                                      "--max_cpus", "1", os.path.join(task_input, "input.bam")])
+    main()
+    prediction = json.loads(capsys.readouterr().out)
+    assert prediction["cpus"] == 1 and prediction["memory_mb"] >= 2200
+
+    monkeypatch.setattr(sys, "argv", ["predict_resources.py", "predict", "--model", model, "--process", "INDEX"])
+    with pytest.raises(SystemExit, match="no model for process INDEX"):
+        main()
@@ -0,0 +1,146 @@
+"""
+test_catalog.py module
+
+This python script tests 'catalog.py' with a few small published files.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import csv
+import hashlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+from nextflow_automation.catalog.catalog import (
+    OutputCatalog, artifact_entry, catalog_files, file_md5, main, query_catalogs, read_entries
+)
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def read_tsv(path):
+    with open(path) as f:
+        return list(csv.DictReader(f, delimiter="\t"))
+
+
+def test_file_md5(temp_dir):
+    """The checksum is computed from the content, unless the file has a .md5 sidecar."""
+    vcf = write(os.path.join(temp_dir, "S1.vcf"), "##fileformat=VCFv4.2\n")
+    assert file_md5(vcf) == hashlib.md5(b"##fileformat=VCFv4.2\n").hexdigest()
+
+    bam = write(os.path.join(temp_dir, "S1.BQSR.bam"), "bam")
+    write(f"{bam}.md5", "0123456789abcdef0123456789abcdef  S1.BQSR.bam\n")
+    assert file_md5(bam) == "0123456789abcdef0123456789abcdef"
+
+
+def test_record_and_query(temp_dir):
+    """Entries are recorded at their published paths and queried by type, caller, sample and directory."""
+    staged = os.path.join(temp_dir, "artifacts")
+    entries_tsv = write(os.path.join(temp_dir, "entries.tsv"), "".join(
+        f"{sample}\t{caller}\tvep_vcf\t{published}/{sample}.{caller}.vep.vcf\t{sample}.{caller}.vep.vcf\n"
+        for published in ("/results/batch_01", "/results/batch_010")
+        for sample in ("S1", "S2") for caller in ("mutect2", "MuSE")
+    ) + "S1\t\tbam\t/results/batch_01/S1.BQSR.bam\tS1.BQSR.bam\n")
+    for sample in ("S1", "S2"):
+        for caller in ("mutect2", "MuSE"):
+            write(os.path.join(staged, f"{sample}.{caller}.vep.vcf"), f"{sample} {caller}\n")
+    write(os.path.join(staged, "S1.BQSR.bam"), "bam")
+
+    entries = read_entries(entries_tsv, staged, workflow="mutation_calling", run="happy_euler")
+    assert len(entries) == 9
+    assert entries[-1]["caller"] is None and entries[-1]["size"] == 3
+
+    catalog_file = os.path.join(temp_dir, "output_catalog.sqlite")
+    with OutputCatalog(catalog_file) as catalog:
+        assert catalog.record(entries) == 9
+        # recording a path again replaces its entry
+        catalog.record([artifact_entry(os.path.join(staged, "S1.BQSR.bam"), "/results/batch_01/S1.BQSR.bam",
+                                       "bam", "S1", workflow="data_processing")])
+
+    with OutputCatalog(catalog_file, readonly=True) as catalog:
+        assert len(catalog.query()) == 9
+        under = catalog.query(["vep_vcf"], under="/results/batch_01/")
+        assert [row["path"] for row in under] == [
+            "/results/batch_01/S1.MuSE.vep.vcf", "/results/batch_01/S1.mutect2.vep.vcf",
+            "/results/batch_01/S2.MuSE.vep.vcf", "/results/batch_01/S2.mutect2.vep.vcf",
+        ]
+        assert under[0]["sample_id"] == "S1" and under[0]["run"] == "happy_euler"
+        assert under[0]["checksum"] == hashlib.md5(b"S1 MuSE\n").hexdigest()
+        assert len(catalog.query(callers=["mutect2"], sample_ids=["S2"])) == 2
+        assert catalog.query(["bam"])[0]["workflow"] == "data_processing"
+
+
+def test_prune(temp_dir):
+    """Entries of files that were removed are dropped."""
+    kept = write(os.path.join(temp_dir, "out", "S1.fingerprint.vcf"), "S1")
+    removed = write(os.path.join(temp_dir, "out", "S2.fingerprint.vcf"), "S2")
+    catalog_file = os.path.join(temp_dir, "output_catalog.sqlite")
+    with OutputCatalog(catalog_file) as catalog:
+        catalog.record([artifact_entry(path, path, "fingerprint_vcf") for path in (kept, removed)])
+        os.remove(removed)
+        assert catalog.prune() == 1
+        assert [row["path"] for row in catalog.query()] == [kept]
+
+
+def test_query_catalogs(temp_dir, monkeypatch):
+    """Per-run catalog files are queried together; a path recorded again keeps its latest entry."""
+    bams = [write(os.path.join(temp_dir, "bams", f"{sample}.BQSR.bam"), sample) for sample in ("S1", "S2")]
+    catalog_dir = os.path.join(temp_dir, "output_catalog")
+    os.makedirs(catalog_dir)
+    with OutputCatalog(os.path.join(catalog_dir, "output_catalog.sqlite")) as catalog:
+        catalog.record([artifact_entry(bams[0], bams[0], "bam", "S1", workflow="data_processing")])
+        catalog.conn.execute("UPDATE artifacts SET recorded_at = '2026-01-01T00:00:00+00:00'")
+        catalog.conn.commit()
+    with OutputCatalog(os.path.join(catalog_dir, "output_catalog.happy_euler.sqlite")) as catalog:
+        catalog.record([artifact_entry(path, path, "bam", sample, workflow="manual")
+                        for path, sample in zip(bams, ("S1_RERUN", "S2"))])
+    write(os.path.join(catalog_dir, "notes.sqlite"), "")
+
+    catalogs = catalog_files(catalog_dir)
+    assert [os.path.basename(path) for path in catalogs] == ["output_catalog.happy_euler.sqlite", "output_catalog.sqlite"]
+    assert catalog_files(os.path.join(temp_dir, "missing")) == []
+    entries = query_catalogs(catalogs, ["bam"])
+    assert [(entry["sample_id"], entry["workflow"]) for entry in entries] == [("S1_RERUN", "manual"), ("S2", "manual")]
+
+    os.remove(bams[1])
+    monkeypatch.setattr(sys, "argv", ["catalog.py", "prune", "--catalog", catalog_dir])
+    main()
+    assert [entry["sample_id"] for entry in query_catalogs(catalogs)] == ["S1_RERUN"]
+
+
+def test_main(temp_dir, monkeypatch):
+    """add then query from the command line; querying a missing catalog fails."""
+    bam_dir = os.path.join(temp_dir, "bams")
+    bams = [write(os.path.join(bam_dir, f"{sample}.BQSR.bam"), sample) for sample in ("S1", "S2_NORMAL")]
+    catalog_file = os.path.join(temp_dir, "output_catalog.sqlite")
+    monkeypatch.setattr(sys, "argv", ["catalog.py", "add", "--catalog", catalog_file, "--type", "bam", *bams])
+    main()
+
+    output = os.path.join(temp_dir, "artifacts.tsv")
+    monkeypatch.setattr(sys, "argv", ["catalog.py", "query", "--catalog", catalog_file, "--type", "bam",
+                                      "--under", bam_dir, "-o", output])
+    main()
+    rows = read_tsv(output)
+    assert [(row["sample_id"], row["caller"], row["path"]) for row in rows] == [
+        ("S1", "", bams[0]), ("S2_NORMAL", "", bams[1])
+    ]
+    assert list(rows[0]) == ["sample_id", "caller", "artifact_type", "path", "size", "checksum"]
+
+    monkeypatch.setattr(sys, "argv", ["catalog.py", "query", "--catalog", os.path.join(temp_dir, "missing.sqlite")])
+    with pytest.raises(SystemExit, match="does not exist"):
+        main()
@@ -0,0 +1,137 @@
+"""
+test_segment_store.py module
+
+This python script tests 'segment_store.py' with small CNVkit .seg and .cns files.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+from nextflow_automation.cnvkit.segment_store import (
+    SegmentStore, gene_interval, main, parse_region, read_segments
+)
+
+SEG_HEADER = "ID\tchrom\tloc.start\tloc.end\tnum.mark\tseg.mean"
+
+
+def write_seg(path, rows):
+    with open(path, "w") as f:
+        f.write("\n".join([SEG_HEADER] + ["\t".join(map(str, row)) for row in rows]) + "\n")
+    return path
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def batch_files(temp_dir):
+    """Merged-style .seg files of two batches; GBX1 and GBX3 have a deletion over chr9:21,967,752-21,995,301."""
+    batch1 = write_seg(os.path.join(temp_dir, "GBX1_noDrop_t0005.seg"), [
+        ("GBX1", "chr1", 1, 5000000, 400, 0.02),
+        ("GBX1", "chr9", 1, 20000000, 900, 0.01),
+        ("GBX1", "chr9", 20000001, 23000000, 120, -1.8),
+        ("GBX1", "chr9", 23000001, 138000000, 3000, 0.03),
+    ])
+    batch1_b = write_seg(os.path.join(temp_dir, "GBX2_noDrop_t0005.seg"), [
+        ("GBX2", "chr9", 1, 138000000, 4000, 0.05),
+    ])
+    batch2 = write_seg(os.path.join(temp_dir, "GBX3_noDrop_t0005.seg"), [
+        ("GBX3", "chr9", 21900001, 22000000, 30, -0.9),
+        ("GBX3", "chr9", 22000001, 22100000, 10, 0.4),
+    ])
+    return [batch1, batch1_b], [batch2]
+
+
+def test_read_segments(temp_dir):
+    """.seg starts are converted to 0-based; .cns files are named after their sample."""
+    seg = read_segments(write_seg(os.path.join(temp_dir, "a.seg"), [("GBX1", "chr1", 101, 200, 5, -0.5)]))
+    assert seg.row(0, named=True) == {
+        "sample": "GBX1", "chrom": "chr1", "start": 100, "end": 200, "num_probes": 5, "log2": -0.5, "source": "seg"
+    }
+
+    cns_path = os.path.join(temp_dir, "GBX1_noDrop_t0005.cns")
+    with open(cns_path, "w") as f:
+        f.write("chromosome\tstart\tend\tgene\tlog2\tdepth\tprobes\tweight\n")
+        f.write("chr1\t100\t200\tEGFR\t0.8\t50.0\t7\t3.2\n")
+    cns = read_segments(cns_path)
+    assert cns.row(0, named=True) == {
+        "sample": "GBX1_noDrop_t0005", "chrom": "chr1", "start": 100, "end": 200, "num_probes": 7, "log2": 0.8,
+        "source": "cns"
+    }
+
+    with pytest.raises(ValueError):
+        read_segments(os.path.join(temp_dir, "a.txt"))
+
+
+def test_ingest_and_query(temp_dir, batch_files):
+    """Region queries find overlapping segments across batches, including long segments starting far upstream."""
+    store = SegmentStore(os.path.join(temp_dir, "store"))
+    assert store.ingest(batch_files[0], "wes-01") == 5
+    assert store.ingest(batch_files[1], "wes-02") == 2
+    assert store.batches() == ["wes-01", "wes-02"]
+    assert os.path.exists(os.path.join(temp_dir, "store", "chrom=chr9", "batch=wes-02", "segments.parquet"))
+
+    chrom, start, end = parse_region("chr9:21,967,752-21,995,301")
+    hits = store.query(chrom, start, end)
+    assert hits.select("batch", "sample", "log2").rows() == [
+        ("wes-01", "GBX1", -1.8), ("wes-01", "GBX2", 0.05), ("wes-02", "GBX3", -0.9)
+    ]
+    assert hits["overlap"].to_list() == [27550, 27550, 27550]
+
+    deletions = store.query(chrom, start, end, max_log2=-0.4)
+    assert deletions["sample"].to_list() == ["GBX1", "GBX3"]
+    assert store.query(chrom, start, end, batches=["wes-02"])["sample"].to_list() == ["GBX3"]
+    assert store.query("chr2", 0, 1000).height == 0
+
+
+def test_reingest_replaces_batch(temp_dir, batch_files):
+    """Ingesting a batch again replaces its segments and leaves the other batches alone."""
+    store = SegmentStore(os.path.join(temp_dir, "store"))
+    store.ingest(batch_files[0], "wes-01")
+    store.ingest(batch_files[1], "wes-02")
+
+    store.ingest(batch_files[0][1:], "wes-01")
+    assert sorted(store.query("chr9", 21967751, 21995301)["sample"].to_list()) == ["GBX2", "GBX3"]
+    assert store.query("chr1", 0, 100).height == 0
+    assert not os.path.exists(os.path.join(temp_dir, "store", "chrom=chr1", "batch=wes-01"))
+
+    with pytest.raises(ValueError):
+        store.ingest(batch_files[1], "../wes-03")
+
+
+def test_gene_interval(temp_dir):
+    """Gene spans cover all transcripts on the primary contig."""
+    annotation = os.path.join(temp_dir, "refFlat.txt")
+    with open(annotation, "w") as f:
+        f.write("CDKN2A\tNM_000077\tchr9\t-\t21967752\t21995301\t0\t0\t1\t0,\t0,\n")
+        f.write("CDKN2A\tNM_058195\tchr9\t-\t21967751\t21994490\t0\t0\t1\t0,\t0,\n")
+        f.write("CDKN2A\tNM_001\tchr9_alt\t-\t100\t200\t0\t0\t1\t0,\t0,\n")
+    assert gene_interval(annotation, "CDKN2A") == ("chr9", 21967751, 21995301)
+    with pytest.raises(ValueError):
+        gene_interval(annotation, "EGFR")
+
+
+def test_main(temp_dir, batch_files, monkeypatch, capsys):
+    """The ingest and query subcommands run end to end."""
+    store_dir = os.path.join(temp_dir, "store")
+    monkeypatch.setattr(sys, "argv", ["segment_store.py", "ingest", "--store", store_dir, "--batch", "wes-01",
+                                      *batch_files[0]])
+    main()
+
+    output = os.path.join(temp_dir, "hits.tsv")
+    monkeypatch.setattr(sys, "argv", ["segment_store.py", "query", "--store", store_dir,
+                                      "--region", "chr9:21967752-21995301", "--max_log2", "-0.4", "-o", output])
+    main()
+    with open(output) as f:
+        lines = f.read().splitlines()
+    assert lines[0].split("\t") == ["batch", "sample", "chrom", "start", "end", "num_probes", "log2", "source", "overlap"]
+    assert len(lines) == 2 and lines[1].startswith("wes-01\tGBX1\tchr9")
@@ -0,0 +1,175 @@
+"""
+test_call_consensus.py module
+
+This python script tests 'call_consensus.py' with small synthetic caller VCFs.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import gzip
+import io
+import os
+import tempfile
+
+import pytest
+
+from nextflow_automation.consensus_calling.call_consensus import normalize, call_consensus, FastaReference
+
+# chr1 positions 1-20:   G C A A A T G C A T G C A T G C A T G C
+REFERENCE = "GCAAATGCATGCATGCATGC"
+HEADER = """##fileformat=VCFv4.2
+##FILTER=<ID=PASS,Description="All filters passed">
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##contig=<ID=chr1,length=20>
+##contig=<ID=chr2,length=20>
+"""
+
+
+def write_vcf(path, samples, records, extra_header=""):
+    text = HEADER + extra_header + "\t".join(
+        ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT", *samples]) + "\n"
+    text += "".join("\t".join(map(str, record)) + "\n" for record in records)
+    if path.endswith(".gz"):
+        with gzip.open(path, "wt") as f:
+            f.write(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text)
+    return path
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def fasta(temp_dir):
+    """Indexed two-contig reference FASTA."""
+    path = os.path.join(temp_dir, "ref.fasta")
+    with open(path, "w") as f:
+        f.write(f">chr1\n{REFERENCE[:8]}\n{REFERENCE[8:16]}\n{REFERENCE[16:]}\n>chr2\n{REFERENCE}\n")
+    offset_chr2 = len(f">chr1\n{REFERENCE[:8]}\n{REFERENCE[8:16]}\n{REFERENCE[16:]}\n>chr2\n")
+    with open(f"{path}.fai", "w") as f:
+        f.write(f"chr1\t20\t6\t8\t9\nchr2\t20\t{offset_chr2}\t20\t21\n")
+    return path
+
+
+@pytest.fixture
+def caller_vcfs(temp_dir):
+    """Mutect2 (named samples, tumor first), MuSE and VarScan2 (NORMAL/TUMOR) VCFs."""
+    mutect2 = write_vcf(
+        os.path.join(temp_dir, "S1.mutect2.paired.vep.vcf.gz"), ["23-028", "PT406.BLD"],
+        [
+            ("chr1", 2, ".", "C", "T", 50, "PASS", "DP=30", "GT", "0/1", "0/0"),       # all three
+            ("chr1", 4, ".", "AA", "A", 40, "PASS", "DP=25", "GT", "0/1", "0/0"),      # right-shifted deletion
+            ("chr1", 9, ".", "A", "G", 30, "PASS", "DP=20", "GT", "0/1", "0/0"),       # mutect2 only
+            ("chr1", 12, ".", "C", "T", 30, "PASS", "DP=20", "GT", "0/1", "0/0"),      # trimmed match with varscan2
+            ("chr2", 5, ".", "G", "A", 30, "PASS", ".", "GT", "0/1", "0/0"),           # mutect2 + MuSE
+        ],
+        extra_header="##normal_sample=PT406.BLD\n##tumor_sample=23-028\n",
+    )
+    muse = write_vcf(
+        os.path.join(temp_dir, "S1.MuSE.vep.vcf"), ["NORMAL", "TUMOR"],
+        [
+            ("chr1", 2, ".", "C", "T", ".", "PASS", ".", "GT", "0/0", "0/1"),
+            ("chr1", 15, ".", "T", "C", ".", "PASS", ".", "GT", "0/0", "0/1"),          # MuSE + VarScan2
+            ("chr2", 5, ".", "G", "A", ".", "PASS", ".", "GT", "0/0", "0/1"),
+        ],
+    )
+    varscan2 = write_vcf(
+        os.path.join(temp_dir, "S1.varscan2.vep.vcf"), ["NORMAL", "TUMOR"],
+        [
+            ("chr1", 2, ".", "C", "T", ".", "PASS", "DP=31", "GT", "0/0", "0/1"),
+            ("chr1", 2, ".", "CA", "C", ".", "PASS", "DP=31", "GT", "0/0", "0/1"),    # left-aligned deletion
+            ("chr1", 11, ".", "GC", "GT", ".", "PASS", "DP=31", "GT", "0/0", "0/1"),  # padded SNV
+            ("chr1", 15, ".", "T", "C", ".", "PASS", "DP=31", "GT", "0/0", "0/1"),
+        ],
+    )
+    return [mutect2, muse, varscan2]
+
+
+def run_consensus(vcfs, **kwargs):
+    output = io.StringIO()
+    written = call_consensus(vcfs, output, names=["mutect2", "MuSE", "varscan2"], **kwargs)
+    lines = output.getvalue().splitlines()
+    records = [line.split("\t") for line in lines if not line.startswith("#")]
+    assert len(records) == written
+    return lines, records
+
+
+def test_normalize(fasta):
+    """Shared bases are trimmed; indels are left-aligned only with a reference."""
+    assert normalize("chr1", 11, "GC", ["GT"]) == (12, "C", ["T"])
+    assert normalize("chr1", 4, "AA", ["A"]) == (4, "AA", ["A"])
+    assert normalize("chr1", 10, "CAT", ["CT"]) == (10, "CA", ["C"])
+    assert normalize("chr1", 10, "<DEL>", ["N"]) == (10, "<DEL>", ["N"])
+
+    reference = FastaReference(fasta)
+    try:
+        assert reference.fetch("chr1", 6, 12) == REFERENCE[6:12]
+        assert normalize("chr1", 4, "AA", ["A"], reference) == (2, "CA", ["C"])
+        assert normalize("chr1", 4, "AA", ["A"], reference, max_shift=1) == (3, "AA", ["A"])
+        assert normalize("chr1", 12, "C", ["T"], reference) == (12, "C", ["T"])
+    finally:
+        reference.close()
+
+
+def test_call_consensus(caller_vcfs):
+    """Sites called by two or more callers are kept once, from the highest priority caller."""
+    lines, records = run_consensus(caller_vcfs, min_callers=2)
+
+    header = next(line for line in lines if line.startswith("#CHROM"))
+    assert header.split("\t")[9:] == ["NORMAL", "TUMOR"]
+    assert "##contig=<ID=chr1,length=20>" in lines
+    assert any(line.startswith("##INFO=<ID=CALLERS") for line in lines)
+    assert sum(line.startswith("##INFO=<ID=DP") for line in lines) == 1
+
+    sites = [(r[0], r[1], r[3], r[4], r[7]) for r in records]
+    assert sites == [
+        ("chr1", "2", "C", "T", "DP=30;CALLERS=mutect2,MuSE,varscan2;NCALLERS=3"),
+        ("chr1", "12", "C", "T", "DP=20;CALLERS=mutect2,varscan2;NCALLERS=2"),
+        ("chr1", "15", "T", "C", "CALLERS=MuSE,varscan2;NCALLERS=2"),
+        ("chr2", "5", "G", "A", "CALLERS=mutect2,MuSE;NCALLERS=2"),
+    ]
+
+    # mutect2 columns (tumor first) are reordered to NORMAL, TUMOR
+    assert records[0][8:] == ["GT", "0/0", "0/1"]
+
+
+def test_call_consensus_left_align(caller_vcfs, fasta):
+    """With a reference, differently placed representations of one deletion are matched."""
+    _, records = run_consensus(caller_vcfs, min_callers=2, fasta_path=fasta)
+
+    deletion = [r for r in records if r[3] == "CA"]
+    assert len(deletion) == 1
+    assert deletion[0][:5] == ["chr1", "2", ".", "CA", "C"]
+    assert deletion[0][7] == "DP=25;CALLERS=mutect2,varscan2;NCALLERS=2"
+
+    positions = [(r[0], int(r[1])) for r in records]
+    assert positions == sorted(positions)
+
+
+def test_call_consensus_min_callers(caller_vcfs):
+    """min_callers=1 keeps every normalized site exactly once; 3 keeps only the unanimous site."""
+    _, records = run_consensus(caller_vcfs, min_callers=1)
+    assert len(records) == 7
+
+    _, records = run_consensus(caller_vcfs, min_callers=3)
+    assert [(r[1], r[7]) for r in records] == [("2", "DP=30;CALLERS=mutect2,MuSE,varscan2;NCALLERS=3")]
+
+
+def test_call_consensus_unsorted(temp_dir, caller_vcfs):
+    """Unsorted input is reported instead of producing a wrong consensus."""
+    unsorted = write_vcf(
+        os.path.join(temp_dir, "S1.MuSE.unsorted.vcf"), ["NORMAL", "TUMOR"],
+        [
+            ("chr1", 15, ".", "T", "C", ".", "PASS", ".", "GT", "0/0", "0/1"),
+            ("chr1", 2, ".", "C", "T", ".", "PASS", ".", "GT", "0/0", "0/1"),
+        ],
+    )
+    with pytest.raises(ValueError, match="not coordinate sorted"):
+        run_consensus([caller_vcfs[0], unsorted, caller_vcfs[2]])
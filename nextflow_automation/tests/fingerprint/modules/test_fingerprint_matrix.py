@@ -0,0 +1,305 @@
+"""
+test_fingerprint_matrix.py module
+
+This python script tests 'fingerprint_matrix.py' with a small haplotype map and simulated fingerprint VCFs.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+from nextflow_automation.fingerprint.fingerprint_matrix import (
+    FingerprintMatrix, genotype_frequencies, load_store, lod_scores, main, read_fingerprint, read_haplotype_map,
+    read_metrics, update
+)
+
+N_BLOCKS = 60
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def haplotype_map(temp_dir):
+    """A haplotype map of N_BLOCKS anchor SNPs; every tenth block has a linked SNP."""
+    path = os.path.join(temp_dir, "test.map")
+    lines = ["@HD\tVN:1.5\tSO:coordinate", "@SQ\tSN:chr1\tLN:100000000",
+             "#CHROMOSOME\tPOSITION\tNAME\tMAJOR_ALLELE\tMINOR_ALLELE\tMAF\tANCHOR_SNP\tPANELS"]
+    for block in range(N_BLOCKS):
+        lines.append(f"chr1\t{(block + 1) * 10000}\trs{block}\tA\tG\t0.4\t\t")
+        if block % 10 == 0:
+            lines.append(f"chr1\t{(block + 1) * 10000 + 50}\trs{block}_linked\tC\tT\t0.4\trs{block}\t")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def individual(seed):
+    """Genotypes (number of minor alleles) of one simulated individual."""
+    rng = random.Random(seed)
+    return [sum(rng.random() < 0.4 for _ in range(2)) for _ in range(N_BLOCKS)]
+
+
+def write_fingerprint(path, sample, genotypes, skip=(), confidence=30):
+    """Fingerprint VCF as ExtractFingerprint writes it: REF/ALT with PLs, confident in the given genotypes."""
+    lines = ["##fileformat=VCFv4.2", "\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT", sample])]
+    for block, genotype in enumerate(genotypes):
+        if block in skip:
+            continue
+        pls = [confidence] * 3
+        pls[genotype] = 0
+        # odd blocks are written with the minor allele as REF
+        ref, alt = ("A", "G") if block % 2 == 0 else ("G", "A")
+        if block % 2:
+            pls.reverse()
+        gt = ["0/0", "0/1", "1/1"][pls.index(0)]
+        lines.append(f"chr1\t{(block + 1) * 10000}\trs{block}\t{ref}\t{alt}\t.\tPASS\t.\tGT:PL\t{gt}:{','.join(map(str, pls))}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def test_read_haplotype_map(haplotype_map):
+    """Anchors define the blocks; linked SNPs map to their anchor's block."""
+    blocks, maf, snps = read_haplotype_map(haplotype_map)
+    assert len(blocks) == N_BLOCKS and blocks[:2] == ["rs0", "rs1"]
+    assert np.allclose(maf, 0.4)
+    assert snps[("chr1", 10050)] == (0, "C", "T")
+
+
+def test_read_fingerprint(temp_dir, haplotype_map):
+    """PLs are reoriented to major/het/minor; missing blocks are uninformative."""
+    blocks, _, snps = read_haplotype_map(haplotype_map)
+    genotypes = individual(1)
+    sample, pls = read_fingerprint(write_fingerprint(os.path.join(temp_dir, "a.vcf"), "GBX1", genotypes, skip={5}),
+                                   snps, len(blocks))
+    assert sample == "GBX1"
+    assert pls.dtype == np.uint8 and pls.shape == (N_BLOCKS, 3)
+    assert [int(np.argmin(row)) for i, row in enumerate(pls) if i != 5] == [g for i, g in enumerate(genotypes) if i != 5]
+    assert pls[5].tolist() == [0, 0, 0]
+
+
+def test_lod_scores_match_direct_computation():
+    """The vectorized LOD equals the per-block formula."""
+    rng = np.random.default_rng(0)
+    maf = rng.uniform(0.1, 0.5, size=20)
+    left, right = rng.uniform(0.01, 1, size=(3, 20, 3)), rng.uniform(0.01, 1, size=(5, 20, 3))
+    frequencies = genotype_frequencies(maf)
+
+    lods = lod_scores(left, right, maf, chunk_size=2)
+    for i in range(3):
+        for j in range(5):
+            expected = sum(
+                math.log10(sum(frequencies[b, g] * left[i, b, g] * right[j, b, g] for g in range(3))
+                           / (sum(frequencies[b, g] * left[i, b, g] for g in range(3))
+                              * sum(frequencies[b, g] * right[j, b, g] for g in range(3))))
+                for b in range(20)
+            )
+            assert lods[i, j] == pytest.approx(expected)
+
+
+def store_files(store):
+    return sorted(os.listdir(store))
+
+
+def results_of(metrics):
+    return {(r["LEFT_GROUP_VALUE"], r["RIGHT_GROUP_VALUE"]): r for r in read_metrics(metrics)[2]}
+
+
+def test_incremental_update(temp_dir, haplotype_map):
+    """A second batch is only compared against the cohort and itself, in both orders, and kept as its run's shard."""
+    vcfs = {
+        "GBX1_T.fingerprint.vcf": ("GBX1", individual(1)),
+        "GBX1_N.fingerprint.vcf": ("GBX1", individual(1)),
+        "GBX2_T.fingerprint.vcf": ("GBX2", individual(2)),
+        "GBX3_T.fingerprint.vcf": ("GBX3", individual(3)),
+        "GBX4_T.fingerprint.vcf": ("GBX3", individual(4)),  # sample swap
+    }
+    paths = {name: write_fingerprint(os.path.join(temp_dir, name), sample, genotypes)
+             for name, (sample, genotypes) in vcfs.items()}
+    store, metrics = os.path.join(temp_dir, "store"), os.path.join(temp_dir, "crosscheck.metrics")
+    os.mkdir(store)
+
+    counts = update([paths[name] for name in list(vcfs)[:3]], haplotype_map, store, store, "run1", None, metrics, -5)
+    assert counts == {"new": 3, "cohort": 3, "pairs": 9}
+
+    # already fingerprinted files are skipped
+    counts = update(list(paths.values()), haplotype_map, store, store, "run2", None, metrics, -5)
+    assert counts == {"new": 2, "cohort": 5, "pairs": 16}
+    assert store_files(store) == ["crosscheck.run1.metrics", "crosscheck.run2.metrics",
+                                  "fingerprint_matrix.run1.npz", "fingerprint_matrix.run2.npz"]
+    assert FingerprintMatrix.load(os.path.join(store, "fingerprint_matrix.run2.npz")).files == list(vcfs)[3:]
+    assert len(read_metrics(os.path.join(store, "crosscheck.run2.metrics"))[2]) == 16
+    assert load_store(store, *read_haplotype_map(haplotype_map)[:2], haplotype_map).files == list(vcfs)
+
+    header, columns, rows = read_metrics(metrics)
+    assert header[-1] == "## METRICS CLASS\tpicard.fingerprint.CrosscheckMetric"
+    assert columns[:5] == ["LEFT_GROUP_VALUE", "RIGHT_GROUP_VALUE", "RESULT", "DATA_TYPE", "LOD_SCORE"]
+    # every ordered pair once, self-pairs included, as Picard writes them
+    results = results_of(metrics)
+    assert len(rows) == 25 == len(results)
+
+    match = results[("GBX1_T.fingerprint.vcf", "GBX1_N.fingerprint.vcf")]
+    assert match["RESULT"] == "EXPECTED_MATCH" and float(match["LOD_SCORE"]) > 5
+    assert float(match["LOD_SCORE_TUMOR_NORMAL"]) > 0
+    assert results[("GBX2_T.fingerprint.vcf", "GBX2_T.fingerprint.vcf")]["RESULT"] == "EXPECTED_MATCH"
+    swap = results[("GBX3_T.fingerprint.vcf", "GBX4_T.fingerprint.vcf")]
+    assert swap["RESULT"] == "UNEXPECTED_MISMATCH" and float(swap["LOD_SCORE"]) < -5
+    assert results[("GBX2_T.fingerprint.vcf", "GBX4_T.fingerprint.vcf")]["RESULT"] == "EXPECTED_MISMATCH"
+
+    # the reverse order has the same LOD, with the tumor-aware scores swapped
+    reverse = results[("GBX4_T.fingerprint.vcf", "GBX2_T.fingerprint.vcf")]
+    forward = results[("GBX2_T.fingerprint.vcf", "GBX4_T.fingerprint.vcf")]
+    assert reverse["LOD_SCORE"] == forward["LOD_SCORE"]
+    assert reverse["LOD_SCORE_TUMOR_NORMAL"] == forward["LOD_SCORE_NORMAL_TUMOR"]
+    assert reverse["LOD_SCORE_NORMAL_TUMOR"] == forward["LOD_SCORE_TUMOR_NORMAL"]
+
+    # the same scores as crosschecking all five at once
+    full_metrics = os.path.join(temp_dir, "full.metrics")
+    update(list(paths.values()), haplotype_map, None, temp_dir, "full", None, full_metrics, -5)
+    full = results_of(full_metrics)
+    assert {key: row["LOD_SCORE_TUMOR_NORMAL"] for key, row in full.items()} == \
+        {key: row["LOD_SCORE_TUMOR_NORMAL"] for key, row in results.items()}
+
+    # a run with nothing new adds no shard
+    counts = update(list(paths.values()), haplotype_map, store, store, "run3", None, metrics, -5)
+    assert counts == {"new": 0, "cohort": 5, "pairs": 0}
+    assert len(store_files(store)) == 4 and len(read_metrics(metrics)[2]) == 25
+
+
+def test_concurrent_runs(temp_dir, haplotype_map):
+    """Runs sharing a store keep each other's samples, and the pairs neither could see are crosschecked later."""
+    paths = [write_fingerprint(os.path.join(temp_dir, f"GBX{i}.fingerprint.vcf"), f"GBX{i}", individual(i))
+             for i in range(4)]
+    store, metrics = os.path.join(temp_dir, "store"), os.path.join(temp_dir, "crosscheck.metrics")
+    os.mkdir(store)
+    update(paths[:2], haplotype_map, store, store, "run1", None, metrics, -5)
+
+    # both runs start from the same store and publish their shards to it
+    for run, path in (("run2", paths[2]), ("run3", paths[3])):
+        os.mkdir(os.path.join(temp_dir, run))
+        counts = update(paths[:2] + [path], haplotype_map, store, os.path.join(temp_dir, run), run, None, metrics, -5)
+        assert counts == {"new": 1, "cohort": 3, "pairs": 5}
+    for run in ("run2", "run3"):
+        for name in os.listdir(os.path.join(temp_dir, run)):
+            os.replace(os.path.join(temp_dir, run, name), os.path.join(store, name))
+
+    counts = update(paths, haplotype_map, store, store, "run4", None, metrics, -5)
+    assert counts == {"new": 0, "cohort": 4, "pairs": 12}
+    results = results_of(metrics)
+    assert len(results) == 16
+    assert results[("GBX2.fingerprint.vcf", "GBX3.fingerprint.vcf")]["RESULT"] == "EXPECTED_MISMATCH"
+
+
+def test_refingerprinted_vcf(temp_dir, haplotype_map):
+    """A VCF fingerprinted again under the same name replaces its row, and its earlier pairs are dropped."""
+    first, second = (os.path.join(temp_dir, f"GBX{i}.fingerprint.vcf") for i in (1, 2))
+    write_fingerprint(first, "GBX1", individual(1))
+    write_fingerprint(second, "GBX2", individual(2))
+    store, metrics = os.path.join(temp_dir, "store"), os.path.join(temp_dir, "crosscheck.metrics")
+    os.mkdir(store)
+    update([first, second], haplotype_map, store, store, "run1", None, metrics, -5)
+
+    # a concurrent run crosschecks a new sample against GBX2's first fingerprint...
+    third = write_fingerprint(os.path.join(temp_dir, "GBX3.fingerprint.vcf"), "GBX3", individual(1))
+    os.mkdir(os.path.join(temp_dir, "run2"))
+    update([first, second, third], haplotype_map, store, os.path.join(temp_dir, "run2"), "run2", None, metrics, -5)
+    assert results_of(metrics)[("GBX3.fingerprint.vcf", "GBX2.fingerprint.vcf")]["RESULT"] == "EXPECTED_MISMATCH"
+
+    # ...while GBX2 is fingerprinted again, from GBX1's DNA
+    write_fingerprint(second, "GBX2", individual(1))
+    counts = update([first, second], haplotype_map, store, store, "run3", None, metrics, -5)
+    assert counts == {"new": 1, "cohort": 2, "pairs": 3}
+    assert results_of(metrics)[("GBX1.fingerprint.vcf", "GBX2.fingerprint.vcf")]["RESULT"] == "UNEXPECTED_MATCH"
+    for name in os.listdir(os.path.join(temp_dir, "run2")):
+        os.replace(os.path.join(temp_dir, "run2", name), os.path.join(store, name))
+
+    # the concurrent run's pairs with the first fingerprint are stale and crosschecked again
+    counts = update([first, second, third], haplotype_map, store, store, "run4", None, metrics, -5)
+    assert counts["new"] == 0 and counts["pairs"] > 0
+    results = results_of(metrics)
+    assert len(results) == 9
+    assert results[("GBX3.fingerprint.vcf", "GBX2.fingerprint.vcf")]["RESULT"] == "UNEXPECTED_MATCH"
+    assert results[("GBX1.fingerprint.vcf", "GBX2.fingerprint.vcf")]["RESULT"] == "UNEXPECTED_MATCH"
+
+
+def test_legacy_store(temp_dir, haplotype_map):
+    """A matrix and metrics from before the store was sharded are read, and their files keyed without a crosscheck."""
+    paths = [write_fingerprint(os.path.join(temp_dir, f"GBX{i}.fingerprint.vcf"), f"GBX{i}", individual(i)) for i in (1, 2)]
+    store, metrics = os.path.join(temp_dir, "store"), os.path.join(temp_dir, "crosscheck.metrics")
+    os.mkdir(store)
+    update(paths, haplotype_map, store, store, "run1", None, metrics, -5)
+    legacy = FingerprintMatrix.load(os.path.join(store, "fingerprint_matrix.run1.npz"))
+    legacy.keys, legacy.created = ["", ""], 0
+    legacy.save(os.path.join(store, "fingerprint_matrix.npz"))
+    os.remove(os.path.join(store, "fingerprint_matrix.run1.npz"))
+    os.replace(os.path.join(store, "crosscheck.run1.metrics"), os.path.join(store, "crosscheck.metrics"))
+
+    counts = update(paths, haplotype_map, store, store, "run2", None, metrics, -5)
+    assert counts == {"new": 0, "cohort": 2, "pairs": 0}
+    assert len(read_metrics(metrics)[2]) == 4
+    assert store_files(store) == ["crosscheck.metrics", "fingerprint_matrix.npz", "fingerprint_matrix.run2.npz"]
+    assert all(FingerprintMatrix.load(os.path.join(store, "fingerprint_matrix.run2.npz")).keys)
+
+    update(paths, haplotype_map, store, store, "run3", None, metrics, -5)
+    assert len(store_files(store)) == 3
+
+
+def test_previous_picard_metrics(temp_dir, haplotype_map):
+    """Picard's metrics are kept (header and columns) and recomputed pairs replace their old rows."""
+    paths = [write_fingerprint(os.path.join(temp_dir, f"GBX{i}.fingerprint.vcf"), f"GBX{i}", individual(i)) for i in (1, 2)]
+    picard = os.path.join(temp_dir, "picard.metrics")
+    with open(picard, "w") as f:
+        f.write("## htsjdk.samtools.metrics.StringHeader\n# CrosscheckFingerprints ...\n\n"
+                "## METRICS CLASS\tpicard.fingerprint.CrosscheckMetric\n"
+                "LEFT_GROUP_VALUE\tRIGHT_GROUP_VALUE\tRESULT\tDATA_TYPE\tLOD_SCORE\n"
+                "/work/ab/GBX1.fingerprint.vcf\t/work/ab/GBX2.fingerprint.vcf\tEXPECTED_MISMATCH\tFILE\t-20.1\n"
+                "/work/ab/GBX0.fingerprint.vcf\t/work/ab/GBX1.fingerprint.vcf\tEXPECTED_MISMATCH\tFILE\t-18.4\n\n")
+
+    output = os.path.join(temp_dir, "crosscheck.metrics")
+    update(paths, haplotype_map, None, temp_dir, "run1", picard, output, -5)
+    header, columns, rows = read_metrics(output)
+    assert header[1] == "# CrosscheckFingerprints ..."
+    assert columns == ["LEFT_GROUP_VALUE", "RIGHT_GROUP_VALUE", "RESULT", "DATA_TYPE", "LOD_SCORE"]
+    assert [(row["LEFT_GROUP_VALUE"], row["RIGHT_GROUP_VALUE"]) for row in rows] == [
+        ("/work/ab/GBX0.fingerprint.vcf", "/work/ab/GBX1.fingerprint.vcf"),
+        ("GBX1.fingerprint.vcf", "GBX1.fingerprint.vcf"), ("GBX1.fingerprint.vcf", "GBX2.fingerprint.vcf"),
+        ("GBX2.fingerprint.vcf", "GBX1.fingerprint.vcf"), ("GBX2.fingerprint.vcf", "GBX2.fingerprint.vcf"),
+    ]
+
+
+def test_max_effect_of_each_haplotype_block(temp_dir, haplotype_map):
+    """Like Picard, each block's PLs are clipped to 10 x MAX_EFFECT_OF_EACH_HAPLOTYPE_BLOCK when comparing."""
+    def lods(confidence, max_effect=3.0):
+        paths = [write_fingerprint(os.path.join(temp_dir, f"GBX{i}.{confidence}.vcf"), f"GBX{i}", individual(i),
+                                   confidence=confidence) for i in (1, 2)]
+        output = os.path.join(temp_dir, f"{confidence}.{max_effect}.metrics")
+        update(paths, haplotype_map, None, temp_dir, "run", None, output, -5, max_effect=max_effect)
+        return [float(row["LOD_SCORE"]) for row in read_metrics(output)[2]]
+
+    # confident fingerprints (PL 200) score as if their PLs were 30, unless the cap is raised
+    assert lods(200) == pytest.approx(lods(30))
+    assert lods(200, max_effect=25.5)[1] < lods(30)[1]
+
+
+def test_main(temp_dir, haplotype_map, monkeypatch):
+    """The command line runs an update end to end."""
+    paths = [write_fingerprint(os.path.join(temp_dir, f"GBX{i}.fingerprint.vcf"), f"GBX{i}", individual(i)) for i in (1, 2)]
+    monkeypatch.setattr(sys, "argv", ["fingerprint_matrix.py", "--haplotype_map", haplotype_map,
+                                      "--store", os.path.join(temp_dir, "previous"), "--run", "run1",
+                                      "--shard_dir", temp_dir, "-o", os.path.join(temp_dir, "crosscheck.metrics"), *paths])
+    main()
+    assert FingerprintMatrix.load(os.path.join(temp_dir, "fingerprint_matrix.run1.npz")).samples == ["GBX1", "GBX2"]
+    assert len(read_metrics(os.path.join(temp_dir, "crosscheck.metrics"))[2]) == 4
+    assert len(read_metrics(os.path.join(temp_dir, "crosscheck.run1.metrics"))[2]) == 4
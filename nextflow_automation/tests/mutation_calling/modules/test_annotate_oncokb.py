@@ -0,0 +1,289 @@
+"""
+test_annotate_oncokb.py module
+
+This python script tests 'annotate_oncokb.py' against a local stub of the OncoKB API.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from nextflow_automation.mutation_calling.annotate_oncokb import (
+    ANNOTATION_COLUMNS, OncoKBCache, OncoKBClient, annotate_mafs, build_query, compact, main
+)
+
+COLUMNS = ["Hugo_Symbol", "Variant_Classification", "HGVSp_Short", "Protein_position", "Tumor_Sample_Barcode"]
+
+ANNOTATIONS = {
+    ("BRAF", "V600E"): {
+        "geneExist": True, "variantExist": True, "oncogenic": "Oncogenic",
+        "mutationEffect": {"knownEffect": "Gain-of-function", "citations": {"pmids": ["111", "222"], "abstracts": []}},
+        "highestSensitiveLevel": "LEVEL_3B", "highestResistanceLevel": None,
+        "treatments": [
+            {"level": "LEVEL_3B", "drugs": [{"drugName": "Dabrafenib"}, {"drugName": "Trametinib"}], "pmids": ["333"]},
+            {"level": "LEVEL_3B", "drugs": [{"drugName": "Vemurafenib"}], "pmids": ["444"]},
+        ],
+        "diagnosticImplications": [], "prognosticImplications": [],
+    },
+    ("IDH1", "R132H"): {
+        "geneExist": True, "variantExist": True, "oncogenic": "Oncogenic",
+        "mutationEffect": {"knownEffect": "Gain-of-function"},
+        "highestSensitiveLevel": "LEVEL_1", "highestResistanceLevel": None,
+        "treatments": [{"level": "LEVEL_1", "drugs": [{"drugName": "Vorasidenib"}], "pmids": ["555"]}],
+        "diagnosticImplications": [{"levelOfEvidence": "LEVEL_Dx2", "tumorType": {"name": "Diffuse Glioma"},
+                                    "pmids": ["666"]}],
+        "highestDiagnosticImplicationLevel": "LEVEL_Dx2",
+        "prognosticImplications": [],
+    },
+}
+
+
+class StubOncoKB(BaseHTTPRequestHandler):
+    """Local stand-in for the OncoKB API ('/info' and batched 'byProteinChange')."""
+
+    data_version = "v1.0"
+    queries = []
+    requests = []
+    fail_next = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        assert self.path == "/api/v1/info"
+        self._reply(200, {"dataVersion": {"version": StubOncoKB.data_version, "date": "01/01/2026"}})
+
+    def do_POST(self):
+        assert self.path == "/api/v1/annotate/mutations/byProteinChange"
+        assert self.headers["Authorization"] == "Bearer test-token"
+        batch = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if StubOncoKB.fail_next:
+            StubOncoKB.fail_next -= 1
+            return self._reply(429, {"message": "rate limited"})
+        StubOncoKB.requests.append(len(batch))
+        StubOncoKB.queries.extend(batch)
+        self._reply(200, [
+            {"query": query, "geneExist": False, "variantExist": False, "oncogenic": "Unknown", "treatments": []}
+            | ANNOTATIONS.get((query["gene"]["hugoSymbol"], query["alteration"]), {})
+            for query in batch
+        ])
+
+
+@pytest.fixture
+def oncokb_api():
+    """Start the stub API on a free local port; yield its base URL."""
+    StubOncoKB.data_version, StubOncoKB.queries, StubOncoKB.requests, StubOncoKB.fail_next = "v1.0", [], [], 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOncoKB)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/api/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+def write_maf(path, rows):
+    with open(path, "w") as f:
+        f.write("#version 2.4\n")
+        f.write("\t".join(COLUMNS) + "\n")
+        f.writelines("\t".join(row) + "\n" for row in rows)
+    return path
+
+
+@pytest.fixture
+def mafs(temp_dir):
+    """Two callers' MAFs for one sample plus a second sample, sharing most protein changes."""
+    braf = ["BRAF", "Missense_Mutation", "p.V600E", "600/766"]
+    idh1 = ["IDH1", "Missense_Mutation", "p.R132H", "132/414"]
+    egfr = ["EGFR", "Missense_Mutation", "p.A289V", "289/1210"]
+    tert = ["TERT", "5'Flank", "", ""]
+    intergenic = ["Unknown", "IGR", "", ""]
+    return [
+        write_maf(os.path.join(temp_dir, "GBX1.mutect2.paired.vep.nonsynonymous.rename.maf"),
+                  [braf + ["GBX1"], idh1 + ["GBX1"], tert + ["GBX1"], intergenic + ["GBX1"]]),
+        write_maf(os.path.join(temp_dir, "GBX1.MuSE.vep.nonsynonymous.rename.maf"), [braf + ["GBX1"], idh1 + ["GBX1"]]),
+        write_maf(os.path.join(temp_dir, "GBX2.varscan2.vep.nonsynonymous.rename.maf"), [idh1 + ["GBX2"], egfr + ["GBX2"]]),
+    ]
+
+
+def read_annotated(path):
+    with open(path) as f:
+        lines = f.read().splitlines()
+    header = lines[1].split("\t")
+    return lines[0], header, [dict(zip(header, line.split("\t"))) for line in lines[2:]]
+
+
+def test_build_query():
+    """MAF rows map to OncoKB protein change queries."""
+    query = build_query({"Hugo_Symbol": "BRAF", "Variant_Classification": "Missense_Mutation",
+                         "HGVSp_Short": "p.V600E", "Protein_position": "600/766"}, "BRAIN", "GRCh38")
+    assert query == {"gene": {"hugoSymbol": "BRAF"}, "alteration": "V600E", "consequence": "missense_variant",
+                     "tumorType": "BRAIN", "referenceGenome": "GRCh38", "proteinStart": 600, "proteinEnd": 600}
+
+    query = build_query({"Hugo_Symbol": "EGFR", "Variant_Classification": "In_Frame_Del",
+                         "HGVSp_Short": "p.E746_A750del", "Protein_position": "746-750/1210"}, "BRAIN", "GRCh38")
+    assert (query["consequence"], query["proteinStart"], query["proteinEnd"]) == ("inframe_deletion", 746, 750)
+
+    assert build_query({"Hugo_Symbol": "TERT", "Variant_Classification": "5'Flank", "HGVSp_Short": ""},
+                       "BRAIN", "GRCh38")["alteration"] == "Promoter"
+    assert build_query({"Hugo_Symbol": "Unknown", "Variant_Classification": "IGR", "HGVSp_Short": ""},
+                       "BRAIN", "GRCh38") is None
+
+
+def test_annotate_mafs(temp_dir, oncokb_api, mafs):
+    """Unique queries across all MAFs are fetched once, in batches, and joined back onto every row."""
+    output_dir = os.path.join(temp_dir, "out")
+    client = OncoKBClient("test-token", oncokb_api, batch_size=3)
+    with OncoKBCache(os.path.join(temp_dir, "cache.sqlite")) as cache:
+        counts = annotate_mafs(mafs, output_dir, cache, client)
+
+    # BRAF, IDH1, TERT promoter and EGFR; the intergenic call is not queried
+    assert counts == {"queries": 4, "cached": 0, "fetched": 4}
+    assert StubOncoKB.requests == [3, 1]
+    assert sorted(os.listdir(output_dir)) == [
+        "GBX1.MuSE.vep.nonsynonymous.oncokb.maf",
+        "GBX1.mutect2.paired.vep.nonsynonymous.oncokb.maf",
+        "GBX2.varscan2.vep.nonsynonymous.oncokb.maf",
+    ]
+
+    comment, header, rows = read_annotated(os.path.join(output_dir, "GBX1.mutect2.paired.vep.nonsynonymous.oncokb.maf"))
+    assert comment == "#version 2.4"
+    assert header == COLUMNS + ANNOTATION_COLUMNS
+    braf, idh1, tert, intergenic = rows
+    assert (braf["ONCOGENIC"], braf["MUTATION_EFFECT"], braf["MUTATION_EFFECT_CITATIONS"]) == \
+        ("Oncogenic", "Gain-of-function", "111;222")
+    assert braf["LEVEL_3B"] == "Dabrafenib+Trametinib,Vemurafenib"
+    assert (braf["HIGHEST_LEVEL"], braf["HIGHEST_SENSITIVE_LEVEL"], braf["TX_CITATIONS"]) == ("LEVEL_3B", "LEVEL_3B", "333;444")
+    assert (idh1["LEVEL_1"], idh1["HIGHEST_LEVEL"]) == ("Vorasidenib", "LEVEL_1")
+    assert (idh1["LEVEL_Dx2"], idh1["HIGHEST_DX_LEVEL"], idh1["DX_CITATIONS"]) == ("Diffuse Glioma", "LEVEL_Dx2", "666")
+    assert (tert["ANNOTATED"], tert["GENE_IN_ONCOKB"], tert["ONCOGENIC"]) == ("True", "False", "Unknown")
+    assert (intergenic["ANNOTATED"], intergenic["ONCOGENIC"]) == ("False", "")
+
+    _, _, rows = read_annotated(os.path.join(output_dir, "GBX2.varscan2.vep.nonsynonymous.oncokb.maf"))
+    assert [row["HIGHEST_LEVEL"] for row in rows] == ["LEVEL_1", ""]
+
+
+def test_annotate_mafs_cache(temp_dir, oncokb_api, mafs):
+    """A second run is served from the cache until the OncoKB data version changes."""
+    cache_path = os.path.join(temp_dir, "cache.sqlite")
+    client = OncoKBClient("test-token", oncokb_api)
+
+    with OncoKBCache(cache_path) as cache:
+        annotate_mafs(mafs[:1], os.path.join(temp_dir, "run1"), cache, client)
+    assert len(StubOncoKB.queries) == 3
+
+    with OncoKBCache(cache_path) as cache:
+        counts = annotate_mafs(mafs, os.path.join(temp_dir, "run2"), cache, client)
+    assert counts == {"queries": 4, "cached": 3, "fetched": 1}
+    assert StubOncoKB.queries[-1]["gene"]["hugoSymbol"] == "EGFR"
+
+    with open(os.path.join(temp_dir, "run1", "GBX1.mutect2.paired.vep.nonsynonymous.oncokb.maf")) as f1, \
+         open(os.path.join(temp_dir, "run2", "GBX1.mutect2.paired.vep.nonsynonymous.oncokb.maf")) as f2:
+        assert f1.read() == f2.read()
+
+    StubOncoKB.data_version = "v1.1"
+    with OncoKBCache(cache_path) as cache:
+        counts = annotate_mafs(mafs, os.path.join(temp_dir, "run3"), cache, client)
+    assert counts == {"queries": 4, "cached": 0, "fetched": 4}
+
+
+def test_annotate_mafs_previous_caches(temp_dir, oncokb_api, mafs):
+    """A run reads the caches of earlier runs and only writes what it fetched to its own cache."""
+    client = OncoKBClient("test-token", oncokb_api)
+    run1_cache = os.path.join(temp_dir, "oncokb_cache.run1.sqlite")
+    run2_cache = os.path.join(temp_dir, "oncokb_cache.run2.sqlite")
+
+    with OncoKBCache(run1_cache) as cache:
+        annotate_mafs(mafs[:1], os.path.join(temp_dir, "run1"), cache, client)
+    with OncoKBCache(run2_cache, [run1_cache, run2_cache]) as cache:
+        counts = annotate_mafs(mafs, os.path.join(temp_dir, "run2"), cache, client)
+    assert counts == {"queries": 4, "cached": 3, "fetched": 1}
+
+    with sqlite3.connect(run2_cache) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM annotations").fetchone() == (1,)
+    with OncoKBCache(os.path.join(temp_dir, "oncokb_cache.run3.sqlite"), [run1_cache, run2_cache]) as cache:
+        assert annotate_mafs(mafs, os.path.join(temp_dir, "run3"), cache, client)["fetched"] == 0
+
+
+def test_compact(temp_dir, oncokb_api, mafs):
+    """Per-run caches merge into one, without the entries of older data versions."""
+    client = OncoKBClient("test-token", oncokb_api)
+    caches = [os.path.join(temp_dir, f"oncokb_cache.run{i}.sqlite") for i in (1, 2, 3)]
+    with OncoKBCache(caches[0]) as cache:
+        annotate_mafs(mafs, os.path.join(temp_dir, "run1"), cache, client)
+    StubOncoKB.data_version = "v1.1"
+    with OncoKBCache(caches[1], caches[:1]) as cache:
+        annotate_mafs(mafs[:1], os.path.join(temp_dir, "run2"), cache, client)
+    with OncoKBCache(caches[2], caches[:2]) as cache:
+        annotate_mafs(mafs, os.path.join(temp_dir, "run3"), cache, client)
+
+    output = os.path.join(temp_dir, "oncokb_cache.sqlite")
+    assert compact(caches, output, "v1.1") == {"caches": 3, "entries": 4, "dropped": 4}
+    with sqlite3.connect(output) as conn:
+        assert conn.execute("SELECT DISTINCT data_version FROM annotations").fetchall() == [("v1.1",)]
+
+    queries = len(StubOncoKB.queries)
+    with OncoKBCache(os.path.join(temp_dir, "oncokb_cache.run4.sqlite"), [output]) as cache:
+        assert annotate_mafs(mafs, os.path.join(temp_dir, "run4"), cache, client)["cached"] == 4
+    assert len(StubOncoKB.queries) == queries
+
+
+def test_main_compact(temp_dir, oncokb_api, mafs, monkeypatch):
+    """The compact command replaces a cache directory's caches by one, for the data version the API serves."""
+    client = OncoKBClient("test-token", oncokb_api)
+    for run in ("run1", "run2"):
+        with OncoKBCache(os.path.join(temp_dir, f"oncokb_cache.{run}.sqlite")) as cache:
+            annotate_mafs(mafs, os.path.join(temp_dir, run), cache, client)
+
+    monkeypatch.setenv("ONCOKB_API_KEY", "test-token")
+    monkeypatch.setattr("sys.argv", ["annotate_oncokb.py", "compact", "--cache_dir", temp_dir, "--api_url", oncokb_api])
+    main()
+    assert sorted(name for name in os.listdir(temp_dir) if name.endswith(".sqlite")) == ["oncokb_cache.sqlite"]
+    with sqlite3.connect(os.path.join(temp_dir, "oncokb_cache.sqlite")) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM annotations").fetchone() == (4,)
+
+
+def test_client_retries_rate_limiting(oncokb_api):
+    """Rate-limited requests are retried; other failures are raised."""
+    query = {"gene": {"hugoSymbol": "BRAF"}, "alteration": "V600E", "tumorType": "BRAIN"}
+
+    StubOncoKB.fail_next = 2
+    client = OncoKBClient("test-token", oncokb_api, backoff=0.01)
+    assert client.annotate([query])[0]["oncogenic"] == "Oncogenic"
+
+    StubOncoKB.fail_next = 2
+    client = OncoKBClient("test-token", oncokb_api, max_retries=1, backoff=0.01)
+    with pytest.raises(urllib.error.HTTPError):
+        client.annotate([query])
+
+
+def test_main(temp_dir, oncokb_api, mafs, monkeypatch):
+    """The command line annotates every MAF into --output_dir."""
+    output_dir = os.path.join(temp_dir, "out")
+    monkeypatch.setenv("ONCOKB_API_KEY", "test-token")
+    monkeypatch.setattr("sys.argv", ["annotate_oncokb.py", "annotate", "--cache", os.path.join(temp_dir, "cache.sqlite"),
+                                     "--api_url", oncokb_api, "-o", output_dir, *mafs])
+    main()
+    assert len(os.listdir(output_dir)) == 3
@@ -0,0 +1,204 @@
+"""
+test_maf_warehouse.py module
+
+This python script tests 'maf_warehouse.py' with small OncoKB-annotated and TERT promoter MAFs.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import csv
+import os
+import sys
+import tempfile
+
+import polars as pl
+import pytest
+
+from nextflow_automation.mutation_calling.maf_warehouse import (
+    MafWarehouse, find_mafs, maf_source, main, merge_calls, read_maf
+)
+
+COLUMNS = ["Hugo_Symbol", "Chromosome", "Start_Position", "End_Position", "Variant_Classification", "Variant_Type",
+           "Reference_Allele", "Tumor_Seq_Allele2", "Tumor_Sample_Barcode", "HGVSp_Short", "t_depth", "t_alt_count",
+           "n_depth", "n_alt_count"]
+ONCOKB_COLUMNS = ["ONCOGENIC", "MUTATION_EFFECT", "HIGHEST_LEVEL", "HIGHEST_DX_LEVEL", "HIGHEST_PX_LEVEL"]
+
+IDH1 = ["IDH1", "chr2", "208248388", "208248388", "Missense_Mutation", "SNP", "C", "T", "", "p.R132H"]
+TP53 = ["TP53", "chr17", "7675088", "7675088", "Missense_Mutation", "SNP", "C", "T", "", "p.R175H"]
+PTEN = ["PTEN", "chr10", "87933147", "87933147", "Nonsense_Mutation", "SNP", "C", "T", "", "p.R130*"]
+TERT = ["TERT", "chr5", "1295113", "1295113", "5'Flank", "SNP", "G", "A", "", ""]
+IDH1_ONCOKB = ["Oncogenic", "Gain-of-function", "LEVEL_1", "LEVEL_Dx2", "LEVEL_Px1"]
+TP53_ONCOKB = ["Oncogenic", "Loss-of-function", "", "", "LEVEL_Px1"]
+PTEN_ONCOKB = ["Likely Oncogenic", "Likely Loss-of-function", "", "", ""]
+
+
+def write_maf(path, calls, oncokb=True):
+    """Write a vcf2maf-style MAF; calls are (variant fields, depths, OncoKB fields)."""
+    sample = os.path.basename(path).split(".")[0]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("#version 2.4\n")
+        f.write("\t".join(COLUMNS + (ONCOKB_COLUMNS if oncokb else [])) + "\n")
+        for variant, depths, annotation in calls:
+            row = variant[:8] + [sample] + variant[9:] + [str(depth) for depth in depths]
+            f.write("\t".join(row + (annotation if oncokb else [])) + "\n")
+    return path
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def batch_dirs(temp_dir):
+    """mutation_calls trees of two batches: GBX1 and GBX2 in batch_01; GBX2 (rerun), GBX3 and GBX4 (no calls) in batch_02."""
+    def oncokb_maf(batch, caller, sample, calls):
+        mode = "paired." if caller == "mutect2" else ""
+        return write_maf(os.path.join(temp_dir, batch, "mutation_calls", caller, "oncokb_annotation",
+                                      f"{sample}.{caller}.{mode}vep.nonsynonymous.oncokb.maf"), calls)
+
+    oncokb_maf("batch_01", "mutect2", "GBX1", [(IDH1, (80, 30, 60, 0), IDH1_ONCOKB), (TP53, (90, 45, 70, 0), TP53_ONCOKB)])
+    oncokb_maf("batch_01", "MuSE", "GBX1", [(IDH1, (82, 31, 61, 0), IDH1_ONCOKB)])
+    oncokb_maf("batch_01", "varscan2", "GBX1", [(IDH1, (79, 29, 60, 1), IDH1_ONCOKB)])
+    write_maf(os.path.join(temp_dir, "batch_01", "mutation_calls", "mutect2", "tertp",
+                           "GBX1.mutect2.paired.vep.tertp.maf"), [(TERT, (40, 12, 30, 0), None)], oncokb=False)
+    oncokb_maf("batch_01", "mutect2", "GBX2", [(IDH1, (50, 20, 40, 0), IDH1_ONCOKB), (PTEN, (60, 20, 50, 0), PTEN_ONCOKB)])
+    oncokb_maf("batch_02", "mutect2", "GBX2", [(PTEN, (65, 22, 50, 0), PTEN_ONCOKB)])
+    oncokb_maf("batch_02", "MuSE", "GBX3", [(TP53, (70, 35, 60, 0), TP53_ONCOKB)])
+    oncokb_maf("batch_02", "varscan2", "GBX4", [])
+    # consensus calling writes its MAFs into the same tree; they are not a caller of their own
+    oncokb_maf("batch_01", "consensus", "GBX2", [(IDH1, (50, 20, 40, 0), IDH1_ONCOKB)])
+    return os.path.join(temp_dir, "batch_01", "mutation_calls"), os.path.join(temp_dir, "batch_02", "mutation_calls")
+
+
+def test_read_maf(batch_dirs):
+    """MAF columns are typed and the OncoKB columns are empty for unannotated (TERT promoter) MAFs."""
+    mafs = find_mafs([batch_dirs[0]])
+    assert [os.path.basename(path) for path in mafs] == [
+        "GBX1.MuSE.vep.nonsynonymous.oncokb.maf",
+        "GBX1.mutect2.paired.vep.nonsynonymous.oncokb.maf",
+        "GBX2.mutect2.paired.vep.nonsynonymous.oncokb.maf",
+        "GBX1.mutect2.paired.vep.tertp.maf",
+        "GBX1.varscan2.vep.nonsynonymous.oncokb.maf",
+    ]
+    assert maf_source(mafs[1]) == ("GBX1", "mutect2")
+
+    calls = read_maf(mafs[1])
+    assert calls.select("sample", "gene", "start", "t_depth", "highest_level", "caller", "tertp").rows() == [
+        ("GBX1", "IDH1", 208248388, 80, "LEVEL_1", "mutect2", False),
+        ("GBX1", "TP53", 7675088, 90, None, "mutect2", False),
+    ]
+    tertp = read_maf(mafs[3])
+    assert tertp.select("gene", "oncogenic", "tertp").rows() == [("TERT", None, True)]
+
+    with pytest.raises(ValueError):
+        maf_source("GBX1.maf")
+    with pytest.raises(ValueError):
+        maf_source("GBX2.consensus.vep.nonsynonymous.oncokb.maf")
+
+
+def test_merge_calls(batch_dirs):
+    """Calls of a variant by several callers become one row, with the preferred caller's fields."""
+    variants = merge_calls(pl.concat([read_maf(path) for path in find_mafs([batch_dirs[0]])]))
+    assert variants.select("sample", "gene", "callers", "num_callers", "t_depth", "tertp").rows() == [
+        ("GBX1", "IDH1", ["mutect2", "MuSE", "varscan2"], 3, 80, False),
+        ("GBX2", "IDH1", ["mutect2"], 1, 50, False),
+        ("GBX2", "PTEN", ["mutect2"], 1, 60, False),
+        ("GBX1", "TERT", ["mutect2"], 1, 40, True),
+        ("GBX1", "TP53", ["mutect2"], 1, 90, False),
+    ]
+
+
+def test_ingest_and_query(temp_dir, batch_dirs):
+    """Queries by gene, caller, OncoKB level and sample read the latest ingestion of each sample."""
+    warehouse = MafWarehouse(os.path.join(temp_dir, "warehouse"))
+    assert warehouse.ingest([batch_dirs[0]], "batch_01") == 5
+    assert warehouse.ingest([batch_dirs[1]], "batch_02") == 2
+    assert warehouse.batches() == ["batch_01", "batch_02"]
+    assert os.path.exists(os.path.join(temp_dir, "warehouse", "batch=batch_02", "variants.parquet"))
+
+    # GBX2 was rerun in batch_02, where its IDH1 call is gone
+    current = warehouse.current()
+    assert current.select("sample", "batch", "variants").rows() == [
+        ("GBX1", "batch_01", 3), ("GBX2", "batch_02", 1), ("GBX3", "batch_02", 1), ("GBX4", "batch_02", 0)
+    ]
+    assert warehouse.query(genes=["IDH1"]).select("batch", "sample").rows() == [("batch_01", "GBX1")]
+    assert warehouse.query(genes=["PTEN"]).select("batch", "sample", "t_depth").rows() == [("batch_02", "GBX2", 65)]
+
+    assert warehouse.query(min_callers=2)["gene"].to_list() == ["IDH1"]
+    # the consensus MAF of GBX2 in batch_01 was not ingested as a second caller
+    assert warehouse.query(samples=["GBX2"], batches=["batch_01"]).select("gene", "callers", "num_callers").rows() == [
+        ("IDH1", ["mutect2"], 1), ("PTEN", ["mutect2"], 1)
+    ]
+    assert warehouse.query(callers=["MuSE"])["sample"].to_list() == ["GBX1", "GBX3"]
+    assert warehouse.query(levels=["LEVEL_1"])["gene"].to_list() == ["IDH1"]
+    assert warehouse.query(levels=["LEVEL_Px1"])["gene"].to_list() == ["IDH1", "TP53", "TP53"]
+    assert warehouse.query(oncogenic=["Likely Oncogenic"])["gene"].to_list() == ["PTEN"]
+    assert warehouse.query(samples=["GBX1"], batches=["batch_01"]).height == 3
+
+    # restricted to batch_01, GBX2 is read from there
+    assert warehouse.query(genes=["IDH1"], batches=["batch_01"])["sample"].to_list() == ["GBX1", "GBX2"]
+
+
+def test_recurrence(temp_dir, batch_dirs):
+    """Recurrence counts samples per gene or variant over the current samples of the cohort."""
+    warehouse = MafWarehouse(os.path.join(temp_dir, "warehouse"))
+    warehouse.ingest([batch_dirs[0]], "batch_01")
+    warehouse.ingest([batch_dirs[1]], "batch_02")
+
+    genes = warehouse.recurrence()
+    assert genes.select("gene", "samples", "fraction").rows() == [
+        ("TP53", 2, 0.5), ("IDH1", 1, 0.25), ("PTEN", 1, 0.25), ("TERT", 1, 0.25)
+    ]
+    variants = warehouse.recurrence("variant", min_samples=2, oncogenic=["Oncogenic"])
+    assert variants.select("gene", "start", "hgvsp", "samples").rows() == [("TP53", 7675088, "p.R175H", 2)]
+    with pytest.raises(ValueError):
+        warehouse.recurrence("caller")
+
+
+def test_reingest_replaces_batch(temp_dir, batch_dirs):
+    """Ingesting a batch again replaces its variants and leaves the other batches alone."""
+    warehouse = MafWarehouse(os.path.join(temp_dir, "warehouse"))
+    warehouse.ingest([batch_dirs[0]], "batch_01")
+    warehouse.ingest([batch_dirs[1]], "batch_02")
+
+    gbx1 = [path for path in find_mafs([batch_dirs[0]]) if os.path.basename(path).startswith("GBX1.mutect2")]
+    assert warehouse.ingest(gbx1, "batch_01") == 3
+    assert warehouse.query(genes=["IDH1"]).select("sample", "callers").rows() == [("GBX1", ["mutect2"])]
+    assert warehouse.current()["sample"].to_list() == ["GBX1", "GBX2", "GBX3", "GBX4"]
+
+    warehouse.remove("batch_02")
+    assert warehouse.batches() == ["batch_01"]
+    assert warehouse.query(genes=["PTEN"]).height == 0
+
+    with pytest.raises(ValueError):
+        warehouse.ingest([batch_dirs[1]], "../batch_03")
+
+
+def test_main(temp_dir, batch_dirs, monkeypatch):
+    """The ingest, query and recurrence subcommands run end to end."""
+    store_dir = os.path.join(temp_dir, "warehouse")
+    for batch, path in zip(("batch_01", "batch_02"), batch_dirs):
+        monkeypatch.setattr(sys, "argv", ["maf_warehouse.py", "ingest", "--store", store_dir, "--batch", batch, path])
+        main()
+
+    output = os.path.join(temp_dir, "idh1.tsv")
+    monkeypatch.setattr(sys, "argv", ["maf_warehouse.py", "query", "--store", store_dir, "--genes", "IDH1", "-o", output])
+    main()
+    with open(output) as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+    assert [(row["batch"], row["sample"], row["callers"], row["highest_level"]) for row in rows] == [
+        ("batch_01", "GBX1", "mutect2,MuSE,varscan2", "LEVEL_1")
+    ]
+
+    output = os.path.join(temp_dir, "recurrence.tsv")
+    monkeypatch.setattr(sys, "argv", ["maf_warehouse.py", "recurrence", "--store", store_dir, "--by", "variant",
+                                      "--min_samples", "2", "-o", output])
+    main()
+    with open(output) as f:
+        lines = f.read().splitlines()
+    assert lines[0].split("\t") == ["gene", "chrom", "start", "ref", "alt", "hgvsp", "samples", "variants", "fraction"]
+    assert lines[1].startswith("TP53\tchr17\t7675088\tC\tT\tp.R175H\t2\t2\t0.5")
@@ -15,9 +15,82 @@ from unittest.mock import patch
 import tempfile
 import os
 from pathlib import Path
+import threading
+import time
 from nextflow_automation.mutation_calling.make_mc_manifest import (
-    find_normal_info, lookup_shortid, build_manifest_local, build_manifest_omics, main
+    find_normal_info, lookup_shortid, build_manifest_local, build_manifest_omics, fetch_read_set_metadata,
+    ManifestCache, filter_new_samples, catalog_names, main
 )
+from nextflow_automation.catalog.catalog import OutputCatalog, artifact_entry
+from nextflow_automation.benchmarks.benchmark_make_mc_manifest import legacy_build_manifest_local, make_synthetic_batch
+
+
+class StubClientError(Exception):
+    """Mimics botocore's ClientError (error code under response['Error']['Code'])."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code, "Message": code}}
+
+
+class StubOmicsClient:
+    """Local stand-in for the boto3 'omics' client used by build_manifest_omics.
+
+    Read sets listed earlier answer later (to scramble completion order), and each id in
+    'throttle' fails with a ThrottlingException that many times before succeeding.
+    """
+
+    def __init__(self, read_sets, throttle=None, delay=0.01):
+        self.read_sets = read_sets
+        self.throttle = dict(throttle or {})
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_paginator(self, name):
+        assert name == "list_read_sets"
+        client = self
+
+        class _Paginator:
+            def paginate(self, sequenceStoreId):
+                ids = list(client.read_sets)
+                for start in range(0, len(ids), 2):
+                    yield {"readSets": [{"id": rs_id} for rs_id in ids[start:start + 2]]}
+
+        return _Paginator()
+
+    def get_read_set_metadata(self, id, sequenceStoreId):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            throttled = self.throttle.get(id, 0) > 0
+            if throttled:
+                self.throttle[id] -= 1
+        try:
+            if throttled:
+                raise StubClientError("ThrottlingException")
+            if id not in self.read_sets:
+                raise StubClientError("ResourceNotFoundException")
+            position = list(self.read_sets).index(id)
+            time.sleep(self.delay * (len(self.read_sets) - position))
+            return self.read_sets[id]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _read_set(sample_id, subject_id, rs_id):
+    return {
+        "sampleId": sample_id,
+        "subjectId": subject_id,
+        "files": {
+            "source1": {"s3Access": {"s3Uri": f"s3://omics/store/{rs_id}/source1.bam"}},
+            "index":   {"s3Access": {"s3Uri": f"s3://omics/store/{rs_id}/source1.bam.bai"}},
+        },
+    }
 
 
 @pytest.fixture
@@ -204,13 +277,19 @@ def test_build_manifest_omics():
 
     mock_omics.get_read_set_metadata.side_effect = _metadata
 
-    # boto3 is not installed in the local test image — inject a stub so the lazy
-    # `import boto3` inside build_manifest_omics resolves to our mock.
+    # boto3 is not installed in the local test image — inject stubs so the lazy
+    # `import boto3` / botocore Config inside build_manifest_omics resolve to our mocks.
     stub_boto3 = MagicMock()
     stub_boto3.client.return_value = mock_omics
+    stub_botocore = MagicMock()
+
+    with patch.dict("sys.modules", {"boto3": stub_boto3, "botocore": stub_botocore,
+                                    "botocore.config": stub_botocore.config}):
+        result = build_manifest_omics("store-001", "us-west-2", max_workers=32)
 
-    with patch.dict("sys.modules", {"boto3": stub_boto3}):
-        result = build_manifest_omics("store-001", "us-west-2")
+    # the connection pool is sized for the concurrent metadata requests
+    stub_botocore.config.Config.assert_called_once_with(max_pool_connections=32)
+    assert stub_boto3.client.call_args.kwargs["config"] is stub_botocore.config.Config.return_value
 
     assert isinstance(result, list)
     assert len(result) == 2
@@ -286,3 +365,272 @@ def test_main(sample_metadata):
         assert s2["normal_id"] is None
         assert s2["normal_bam"] is None
         assert s2["normal_bai"] is None
+
+
+def test_fetch_read_set_metadata_retries_throttling():
+    """Throttled requests are retried; results keep listing order and concurrency is bounded."""
+    read_sets = {f"rs-{i:03d}": _read_set(f"GBX{i}", str(i), f"rs-{i:03d}") for i in range(10)}
+    client = StubOmicsClient(read_sets, throttle={"rs-002": 2, "rs-007": 1})
+
+    result = fetch_read_set_metadata(client, "store-001", list(read_sets), max_workers=3, backoff=0)
+
+    assert [meta["sampleId"] for meta in result] == [f"GBX{i}" for i in range(10)]
+    assert client.calls == 10 + 3
+    assert client.max_in_flight <= 3
+
+
+def test_fetch_read_set_metadata_raises_other_errors():
+    """Non-throttling errors and exhausted retries are raised to the caller."""
+    read_sets = {"rs-001": _read_set("GBX1", "1", "rs-001")}
+
+    client = StubOmicsClient(read_sets, throttle={"rs-001": 5})
+    with pytest.raises(StubClientError):
+        fetch_read_set_metadata(client, "store-001", ["rs-001"], max_workers=2, max_retries=2, backoff=0)
+    assert client.calls == 3
+
+    client = StubOmicsClient(read_sets)
+    with pytest.raises(StubClientError, match="ResourceNotFoundException"):
+        fetch_read_set_metadata(client, "store-001", ["rs-404"], max_workers=2)
+    assert client.calls == 1
+
+
+def test_build_manifest_omics_concurrent_is_deterministic():
+    """Concurrent and sequential fetching produce the same manifest, whatever the completion order."""
+    read_sets = {
+        "rs-001": _read_set("GBX1406", "406", "rs-001"),
+        "rs-002": _read_set("PT406.BLD", "406", "rs-002"),
+        "rs-003": _read_set("GBX1407", "407", "rs-003"),
+        "rs-004": _read_set("PT406.NRM", "406", "rs-004"),  # later normal for the same subject wins
+        "rs-005": _read_set("GBX1408", "408", "rs-005"),
+    }
+
+    sequential = build_manifest_omics("store-001", "us-west-2", max_workers=1, omics=StubOmicsClient(read_sets))
+    concurrent = build_manifest_omics("store-001", "us-west-2", max_workers=8, omics=StubOmicsClient(read_sets))
+
+    assert concurrent == sequential
+    assert [s["sample_id"] for s in concurrent] == ["GBX1406", "GBX1407", "GBX1408"]
+    assert concurrent[0]["normal_id"] == "PT406.NRM"
+    assert concurrent[0]["normal_bam"] == "s3://omics/store/rs-004/source1.bam"
+    assert concurrent[1]["normal_id"] is None
+
+
+def test_build_manifest_local_matches_legacy(temp_dir):
+    """The indexed builder returns exactly the manifest of the per-BAM glob implementation."""
+    bam_dir = os.path.join(temp_dir, "bams")
+    normals_dir = os.path.join(bam_dir, "normals")
+    os.makedirs(normals_dir)
+    os.makedirs(os.path.join(bam_dir, "subdir.bam"))  # directories match globs too
+
+    metadata = pl.DataFrame({
+        "WES ID": ["23-028", "23-029", "23-030", "23-031", "23-032", "22-001", "22-002", "22-003", "22-004"],
+        "Short ID": ["GBX1406", "GBX1407", "GBX1408", "GBX1409", "GBX1410",
+                     "PT406.BLD", "PT408.BLD", "PT408.NRM", "PT410.BLD"],
+        "Sample Type": ["GBX", "GBX", "GBX", "GBX", "GBX", "NRM", "NRM", "NRM", "NRM"],
+        "DOES PT HAVE NRM?": ["Y", "N", "Y", "Y", "Y", "Y", "Y", "Y", "Y"],
+        "Line": ["406", "407", "408", None, "410", "406", "408", "408", "410"],
+    })
+    metadata_file = os.path.join(temp_dir, "metadata.xlsx")
+    metadata.write_excel(metadata_file)
+
+    for name in ["23-028.BQSR.bam", "23-028.BQSR.bam.tmp.bai", "23-028.BQSR.bam.bai", "23-028.BQSR.bam.sbi",
+                 "GBX1407.BQSR.bam", "23-030.BQSR.bam", "23-030.BQSR.bam.bai", "GBX1409.bam",
+                 "GBX1410.realigned.bam", "GBX1410.realigned.bam.bai", "GBX9999.bam", "notes.txt",
+                 ".hidden1234.bam", "GBX1411[a].bam", "GBX1411[a].bam.bai"]:
+        Path(bam_dir, name).touch()
+    for name in ["PT406.BLD.bam", "PT406.BLD.bam.bai", "PT406.BLD.old.bai",
+                 "x408.bam", "PT408.BLD.408.bam", "PT408.BLD.bam.bai", "PT410.BLD.bai", ".PT408.bam"]:
+        Path(normals_dir, name).touch()
+
+    assert build_manifest_local(bam_dir, metadata_file) == legacy_build_manifest_local(bam_dir, metadata_file)
+    assert build_manifest_local(bam_dir + "/", metadata_file) == legacy_build_manifest_local(bam_dir + "/", metadata_file)
+
+    # a glob BAM directory goes through the same listings, across every directory it matches
+    Path(temp_dir, "bams2", "normals").mkdir(parents=True)
+    for name in ["GBX1407.bam", "GBX1407.bam.bai", "normals/PT410.BLD.bam"]:
+        Path(temp_dir, "bams2", name).touch()
+    bam_glob = os.path.join(temp_dir, "bam*")
+    assert build_manifest_local(bam_glob, metadata_file) == legacy_build_manifest_local(bam_glob, metadata_file)
+    assert any(sample["tumor_bam"].startswith(os.path.join(temp_dir, "bams2"))
+               for sample in build_manifest_local(bam_glob, metadata_file))
+
+    # a TCGB-named BAM missing from the sheet fails the same way
+    Path(bam_dir, "23-999.BQSR.bam").touch()
+    with pytest.raises(ValueError):
+        legacy_build_manifest_local(bam_dir, metadata_file)
+    with pytest.raises(ValueError):
+        build_manifest_local(bam_dir, metadata_file)
+
+
+def test_build_manifest_local_synthetic_batch(temp_dir):
+    """Same manifest as the legacy builder on a synthetic batch with single and multiple normals."""
+    bam_dir, metadata_file = make_synthetic_batch(temp_dir, n_samples=300, n_normals=40)
+
+    result = build_manifest_local(bam_dir, metadata_file)
+
+    assert len(result) == 300
+    assert result == legacy_build_manifest_local(bam_dir, metadata_file)
+
+
+def test_manifest_cache_omics(temp_dir):
+    """With a cache, a second run only fetches read sets imported since the first run."""
+    read_sets = {
+        "rs-001": _read_set("GBX1406", "406", "rs-001"),
+        "rs-002": _read_set("PT406.BLD", "406", "rs-002"),
+    }
+    cache_file = os.path.join(temp_dir, "manifest.cache")
+
+    with ManifestCache(cache_file) as cache:
+        first = build_manifest_omics("store-001", "us-west-2", omics=StubOmicsClient(read_sets), cache=cache)
+    assert first[0]["normal_id"] == "PT406.BLD"
+
+    read_sets["rs-003"] = _read_set("GBX1407", "407", "rs-003")
+    client = StubOmicsClient(read_sets)
+    with ManifestCache(cache_file) as cache:
+        second = build_manifest_omics("store-001", "us-west-2", omics=client, cache=cache)
+
+    assert client.calls == 1
+    assert second == build_manifest_omics("store-001", "us-west-2", omics=StubOmicsClient(read_sets))
+
+
+def test_manifest_cache_local(temp_dir, sample_metadata):
+    """With a cache, unchanged directories and metadata sheets are not read again."""
+    bam_dir = os.path.join(temp_dir, "bams")
+    os.makedirs(os.path.join(bam_dir, "normals"))
+    Path(bam_dir, "23-028.BQSR.bam").touch()
+    Path(bam_dir, "normals", "PT406.BLD.bam").touch()
+    metadata_file = os.path.join(temp_dir, "metadata.xlsx")
+    sample_metadata.write_excel(metadata_file)
+    cache_file = os.path.join(temp_dir, "manifest.cache")
+
+    with ManifestCache(cache_file) as cache:
+        first = build_manifest_local(bam_dir, metadata_file, cache=cache)
+
+    module = "nextflow_automation.mutation_calling.make_mc_manifest"
+    with ManifestCache(cache_file) as cache, \
+            patch(f"{module}.os.scandir", side_effect=AssertionError("listed again")), \
+            patch(f"{module}.pl.read_excel", side_effect=AssertionError("read again")):
+        assert build_manifest_local(bam_dir, metadata_file, cache=cache) == first
+
+    # a new BAM changes the directory mtime, so the listing is refreshed
+    Path(bam_dir, "23-029.BQSR.bam").touch()
+    os.utime(bam_dir, ns=(os.stat(bam_dir).st_atime_ns, os.stat(bam_dir).st_mtime_ns + 1_000_000))
+    with ManifestCache(cache_file) as cache:
+        second = build_manifest_local(bam_dir, metadata_file, cache=cache)
+    assert sorted(s["sample_id"] for s in second) == ["23-028", "23-029"]
+
+
+def test_main_since_previous_manifest(temp_dir, sample_metadata):
+    """main() with --since writes only the samples missing from the previous manifest."""
+    bam_dir = os.path.join(temp_dir, "bams")
+    os.makedirs(os.path.join(bam_dir, "normals"))
+    Path(bam_dir, "23-028.BQSR.bam").touch()
+    metadata_file = os.path.join(temp_dir, "metadata.xlsx")
+    sample_metadata.write_excel(metadata_file)
+    previous = os.path.join(temp_dir, "previous.json")
+    output_file = os.path.join(temp_dir, "manifest.json")
+
+    base_args = ["make_mc_manifest.py", "--platform", "local", "--bam_dir", bam_dir, "--metadata", metadata_file,
+                 "--cache", os.path.join(temp_dir, "manifest.cache")]
+    with patch.object(sys, "argv", base_args + ["--output", previous]):
+        main()
+
+    Path(bam_dir, "23-029.BQSR.bam").touch()
+    os.utime(bam_dir, ns=(os.stat(bam_dir).st_atime_ns, os.stat(bam_dir).st_mtime_ns + 1_000_000))
+    with patch.object(sys, "argv", base_args + ["--output", output_file, "--since", previous]):
+        main()
+
+    with open(output_file) as f:
+        data = json.load(f)
+    assert [s["sample_id"] for s in data["samples"]] == ["23-029"]
+    assert filter_new_samples(data["samples"], output_file) == []
+
+
+def test_build_manifest_local_from_catalog(temp_dir, sample_metadata, capsys):
+    """With an output catalog, the BAM directories are not listed: their files come from the catalog."""
+    bam_dir = os.path.join(temp_dir, "bams")
+    os.makedirs(os.path.join(bam_dir, "normals"))
+    for name in ("23-028.BQSR.bam", "23-028.BQSR.bai", "23-029.BQSR.bam", "23-029.BQSR.bam.sbi"):
+        Path(bam_dir, name).touch()
+    Path(bam_dir, "normals", "PT406.BLD.bam").touch()
+    metadata_file = os.path.join(temp_dir, "metadata.xlsx")
+    sample_metadata.write_excel(metadata_file)
+    expected = build_manifest_local(bam_dir, metadata_file)
+
+    # the files of two runs, each in its own catalog file; the .sbi index was never recorded,
+    # and a recorded BAM was deleted since
+    catalog_dir = os.path.join(temp_dir, "output_catalog")
+    os.makedirs(catalog_dir)
+    runs = (("run_1", ("23-028.BQSR.bam", "23-028.BQSR.bai", "normals/PT406.BLD.bam")),
+            ("run_2", ("23-029.BQSR.bam", "23-031.BQSR.bam")))
+    Path(bam_dir, "23-031.BQSR.bam").touch()
+    for run, names in runs:
+        with OutputCatalog(os.path.join(catalog_dir, f"output_catalog.{run}.sqlite")) as catalog:
+            catalog.record([artifact_entry(os.path.join(bam_dir, name), os.path.join(bam_dir, name), "bam", name[:6])
+                            for name in names])
+    os.remove(os.path.join(bam_dir, "23-031.BQSR.bam"))
+    assert catalog_names(catalog_dir, bam_dir + "/") == ["23-028.BQSR.bai", "23-028.BQSR.bam", "23-029.BQSR.bam",
+                                                         "23-031.BQSR.bam"]
+    assert catalog_names(os.path.join(catalog_dir, "output_catalog.run_2.sqlite"), bam_dir) == ["23-029.BQSR.bam",
+                                                                                                "23-031.BQSR.bam"]
+    assert catalog_names(catalog_dir, os.path.join(bam_dir, "normals")) == ["PT406.BLD.bam"]
+
+    capsys.readouterr()
+    scanned = []
+    real_scandir = os.scandir
+    def recording_scandir(path="."):
+        scanned.append(os.fspath(path))
+        return real_scandir(path)
+    with patch("os.scandir", side_effect=recording_scandir):
+        assert build_manifest_local(bam_dir, metadata_file, catalog=catalog_dir) == expected
+    # only the catalog directory is listed (for its catalog files), never the BAM directories
+    assert [path for path in scanned if path.startswith(bam_dir)] == []
+    assert capsys.readouterr().err.splitlines() == [
+        f"Warning: {os.path.join(bam_dir, '23-031.BQSR.bam')} is in the output catalog but does not exist"]
+
+
+def test_build_manifest_local_catalog_scan(temp_dir, sample_metadata, capsys):
+    """With catalog_scan, the BAM directories are listed and the BAMs the catalog is missing are warned about."""
+    bam_dir = os.path.join(temp_dir, "bams")
+    os.makedirs(os.path.join(bam_dir, "normals"))
+    for name in ("23-028.BQSR.bam", "23-028.BQSR.bai", "23-029.BQSR.bam"):
+        Path(bam_dir, name).touch()
+    Path(bam_dir, "normals", "PT406.BLD.bam").touch()
+    metadata_file = os.path.join(temp_dir, "metadata.xlsx")
+    sample_metadata.write_excel(metadata_file)
+    expected = build_manifest_local(bam_dir, metadata_file)
+
+    # the normal BAM was never recorded
+    catalog_file = os.path.join(temp_dir, "output_catalog.run_1.sqlite")
+    with OutputCatalog(catalog_file) as catalog:
+        catalog.record([artifact_entry(os.path.join(bam_dir, name), os.path.join(bam_dir, name), "bam", name[:6])
+                        for name in ("23-028.BQSR.bam", "23-028.BQSR.bai", "23-029.BQSR.bam")])
+
+    capsys.readouterr()
+    assert build_manifest_local(bam_dir, metadata_file, catalog=catalog_file, catalog_scan=True) == expected
+    warnings = capsys.readouterr().err.splitlines()
+    assert warnings == [f"Warning: {os.path.join(bam_dir, 'normals', 'PT406.BLD.bam')} is not in the output catalog; "
+                        f"record it with 'catalog.py add'"]
+
+
+def test_build_manifest_local_cram(temp_dir, sample_metadata):
+    """CRAMs are paired like BAMs, with their .crai indexes."""
+    bam_dir = os.path.join(temp_dir, "bams")
+    os.makedirs(os.path.join(bam_dir, "normals"))
+    for name in ("23-028.BQSR.cram", "23-028.BQSR.cram.crai", "23-029.BQSR.bam", "23-029.BQSR.bam.bai"):
+        Path(bam_dir, name).touch()
+    for name in ("PT406.BLD.cram", "PT406.BLD.cram.crai"):
+        Path(bam_dir, "normals", name).touch()
+    metadata_file = os.path.join(temp_dir, "metadata.xlsx")
+    sample_metadata.write_excel(metadata_file)
+
+    result = build_manifest_local(bam_dir, metadata_file)
+    assert [s["sample_id"] for s in result] == ["23-029", "23-028"]
+    s1 = result[1]
+    assert s1["tumor_bam"] == os.path.join(bam_dir, "23-028.BQSR.cram")
+    assert s1["tumor_bai"] == os.path.join(bam_dir, "23-028.BQSR.cram.crai")
+    assert s1["normal_bam"] == os.path.join(bam_dir, "normals", "PT406.BLD.cram")
+    assert s1["normal_bai"] == os.path.join(bam_dir, "normals", "PT406.BLD.cram.crai")
+    assert result[0]["tumor_bai"] == os.path.join(bam_dir, "23-029.BQSR.bam.bai")
+
+    info = find_normal_info("GBX1406", sample_metadata, sample_metadata.filter(pl.col("Sample Type") == "NRM"), bam_dir)
+    assert (info["Normal_BAM"], info["Normal_BAI"]) == (s1["normal_bam"], s1["normal_bai"])
@@ -0,0 +1,103 @@
+"""
+test_process_mafs.py module
+
+This python script tests 'process_mafs.py' on a small synthetic vcf2maf MAF.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import os
+import tempfile
+
+import pytest
+
+from nextflow_automation.mutation_calling.process_mafs import read_terms, consequence_terms, process_maf
+
+COLUMNS = ["Hugo_Symbol", "NCBI_Build", "Chromosome", "Start_Position", "Variant_Classification",
+           "Consequence", "all_effects"]
+CALLS = [
+    ["EGFR", "hg38", "chr7", "55191822", "Missense_Mutation", "missense_variant", "EGFR,missense_variant"],
+    ["PTEN", "hg38", "chr10", "87863113", "Silent", "synonymous_variant", "PTEN,synonymous_variant"],
+    ["TERT", "hg38", "chr5", "1295113", "5'Flank", "upstream_gene_variant", "TERT,upstream_gene_variant"],
+    ["TP53", "hg38", "chr17", "7675088", "Splice_Region", "splice_region_variant&intron_variant", "."],
+    # a listed term in all_effects only must not drop the call
+    ["IDH1", "hg38", "chr2", "208248388", "Missense_Mutation", "missense_variant", "IDH1,synonymous_variant"],
+    # TERT promoter calls are any line mentioning TERT and upstream_gene_variant, as before
+    ["CLPTM1L", "hg38", "chr5", "1317744", "5'Flank", "upstream_gene_variant", "TERT,upstream_gene_variant"],
+]
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def maf_inputs(temp_dir):
+    """Synthetic MAF and nonsynonymous term list."""
+    maf = os.path.join(temp_dir, "GBX1.mutect2.paired.vep.maf")
+    with open(maf, "w") as f:
+        f.write("#version 2.4\n")
+        f.write("\t".join(COLUMNS) + "\n")
+        f.writelines("\t".join(call) + "\n" for call in CALLS)
+
+    terms = os.path.join(temp_dir, "nonsynonymous.txt")
+    with open(terms, "w") as f:
+        f.write("Silent\n5'Flank\nintron_variant\n\nsynonymous_variant\n")
+    return maf, terms
+
+
+def read_maf(path):
+    with open(path) as f:
+        return [line.rstrip("\n").split("\t") for line in f]
+
+
+def test_consequence_terms():
+    """Consequence values split on '&' and ','."""
+    assert consequence_terms("splice_region_variant&intron_variant") == {"splice_region_variant", "intron_variant"}
+    assert consequence_terms("missense_variant,NMD_transcript_variant") == {"missense_variant", "NMD_transcript_variant"}
+    assert consequence_terms("") == set()
+
+
+def test_process_maf(temp_dir, maf_inputs):
+    """One pass writes the tertP, nonsynonymous and renamed outputs."""
+    maf, terms = maf_inputs
+    outputs = {name: os.path.join(temp_dir, f"{name}.maf") for name in ("tertp", "nonsynonymous", "renamed")}
+
+    counts = process_maf(maf, read_terms(terms), **outputs)
+    assert counts == {"tertp": 2, "nonsynonymous": 2, "renamed": 2}
+
+    tertp = read_maf(outputs["tertp"])
+    assert tertp[:2] == [["#version 2.4"], COLUMNS]
+    assert [row[0] for row in tertp[2:]] == ["TERT", "CLPTM1L"]
+
+    nonsynonymous = read_maf(outputs["nonsynonymous"])
+    assert nonsynonymous[1] == COLUMNS
+    assert [row[0] for row in nonsynonymous[2:]] == ["EGFR", "IDH1"]
+    assert {row[1] for row in nonsynonymous[2:]} == {"hg38"}
+
+    renamed = read_maf(outputs["renamed"])
+    assert [row[0] for row in renamed[2:]] == ["EGFR", "IDH1"]
+    assert {row[1] for row in renamed[2:]} == {"GRCh38"}
+
+
+def test_process_maf_single_output(temp_dir, maf_inputs):
+    """Only the requested outputs are written."""
+    maf, terms = maf_inputs
+    renamed = os.path.join(temp_dir, "renamed.maf")
+
+    assert process_maf(maf, read_terms(terms), renamed=renamed) == {"renamed": 2}
+    assert sorted(os.listdir(temp_dir)) == ["GBX1.mutect2.paired.vep.maf", "nonsynonymous.txt", "renamed.maf"]
+
+
+def test_process_maf_missing_columns(temp_dir, maf_inputs):
+    """MAFs without the filtered columns are rejected."""
+    _, terms = maf_inputs
+    maf = os.path.join(temp_dir, "bad.maf")
+    with open(maf, "w") as f:
+        f.write("Hugo_Symbol\tChromosome\nEGFR\tchr7\n")
+
+    with pytest.raises(ValueError, match="Variant_Classification, Consequence"):
+        process_maf(maf, read_terms(terms), renamed=os.path.join(temp_dir, "renamed.maf"))
@@ -0,0 +1,197 @@
+"""
+test_vep_store.py module
+
+This python script tests 'vep_store.py' with small caller VCFs and a stand-in for the VEP output.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import gzip
+import os
+import sys
+import tempfile
+
+import pytest
+
+from nextflow_automation.mutation_calling.vep_store import (
+    VepStore, collect_sites, get_csq, join_annotations, load_annotations, main, read_vcf
+)
+
+HEADER = [
+    "##fileformat=VCFv4.2",
+    '##FILTER=<ID=PASS,Description="All filters passed">',
+    "##contig=<ID=chr1,length=1000>",
+    "##contig=<ID=chr2,length=1000>",
+]
+CSQ_HEADER = '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. Format: Allele|Consequence|SYMBOL">'
+
+
+def write_vcf(path, records, samples=("NORMAL", "TUMOR"), extra_header=()):
+    lines = HEADER + list(extra_header) + ["\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT", *samples])]
+    lines += ["\t".join(map(str, record)) for record in records]
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def fake_vep(sites_vcf, output):
+    """Stand-in for VEP --vcf: add the VEP header lines and a CSQ per record (none for chr2:50)."""
+    meta, columns, records = read_vcf(sites_vcf)
+    with open(output, "w") as f:
+        f.write("\n".join(meta + ['##VEP="v115" cache="/opt/vep/.vep/homo_sapiens/115_GRCh38"', CSQ_HEADER, columns]) + "\n")
+        for fields in records:
+            if (fields[0], fields[1]) != ("chr2", "50"):
+                fields[7] = f"CSQ={fields[4]}|missense_variant|GENE{fields[1]}"
+            f.write("\t".join(fields) + "\n")
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def caller_vcfs(temp_dir):
+    """Three callers' selected VCFs for one sample; most sites are shared."""
+    return [
+        write_vcf(os.path.join(temp_dir, "GBX1.mutect2.paired.pass.vcf.gz"), [
+            ("chr1", 100, ".", "A", "T", ".", "PASS", "DP=30", "GT", "0/0", "0/1"),
+            ("chr1", 200, ".", "CA", "C", ".", "PASS", "DP=25", "GT", "0/0", "0/1"),
+            ("chr2", 50, ".", "G", "A", ".", "PASS", "DP=20", "GT", "0/0", "0/1"),
+        ]),
+        write_vcf(os.path.join(temp_dir, "GBX1.MuSE.pass.vcf.gz"), [
+            ("chr1", 100, ".", "A", "T", ".", "PASS", ".", "GT", "0/0", "0/1"),
+            ("chr1", 300, ".", "G", "C", ".", "PASS", ".", "GT", "0/0", "0/1"),
+        ]),
+        write_vcf(os.path.join(temp_dir, "GBX1.varscan2.pass.vcf"), [
+            ("chr1", 100, ".", "A", "T", ".", "PASS", "SS=2", "GT", "0/0", "0/1"),
+            ("chr1", 200, ".", "CA", "C", ".", "PASS", "SS=2", "GT", "0/0", "0/1"),
+            ("chr1", 300, ".", "G", "A", ".", "PASS", "SS=2", "GT", "0/0", "0/1"),
+        ]),
+    ]
+
+
+def annotate_batch(temp_dir, vcfs, store_path, name):
+    """sites -> fake VEP -> join, as the VEP_SITES / VEP / VEP_JOIN tasks run it."""
+    sites = os.path.join(temp_dir, f"{name}.sites.vcf")
+    with VepStore(store_path) as store:
+        n_sites = collect_sites(vcfs, store, "115", sites)
+    fake_vep(sites, os.path.join(temp_dir, f"{name}.sites.vep.vcf"))
+    with VepStore(store_path) as store:
+        load_annotations(os.path.join(temp_dir, f"{name}.sites.vep.vcf"), store, "115")
+        counts = join_annotations(vcfs, store, "115", os.path.join(temp_dir, name))
+    return sites, n_sites, counts
+
+
+def test_collect_sites_deduplicates(temp_dir, caller_vcfs):
+    """Each unique variant of the batch is written once, in contig/position order."""
+    sites = os.path.join(temp_dir, "sites.vcf")
+    assert collect_sites(caller_vcfs, None, "115", sites) == 5
+
+    meta, columns, records = read_vcf(sites)
+    assert "##contig=<ID=chr2,length=1000>" in meta
+    assert columns.split("\t") == ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"]
+    assert [(r[0], r[1], r[3], r[4]) for r in records] == [
+        ("chr1", "100", "A", "T"), ("chr1", "200", "CA", "C"), ("chr1", "300", "G", "A"),
+        ("chr1", "300", "G", "C"), ("chr2", "50", "G", "A"),
+    ]
+
+
+def test_join_annotations(temp_dir, caller_vcfs):
+    """Annotations are joined back onto every caller VCF; the rest of each record is unchanged."""
+    _, n_sites, counts = annotate_batch(temp_dir, caller_vcfs, os.path.join(temp_dir, "store.sqlite"), "run1")
+    assert n_sites == 5
+    assert counts == {"annotated": 8, "kept": 0, "missing": 0}
+    assert sorted(os.listdir(os.path.join(temp_dir, "run1"))) == [
+        "GBX1.MuSE.vep.vcf", "GBX1.mutect2.paired.vep.vcf", "GBX1.varscan2.vep.vcf"
+    ]
+
+    meta, columns, records = read_vcf(os.path.join(temp_dir, "run1", "GBX1.mutect2.paired.vep.vcf"))
+    assert meta[:len(HEADER)] == HEADER
+    assert CSQ_HEADER in meta and any(line.startswith("##VEP=") for line in meta)
+    assert columns.endswith("FORMAT\tNORMAL\tTUMOR")
+    assert [r[7] for r in records] == ["DP=30;CSQ=T|missense_variant|GENE100", "DP=25;CSQ=C|missense_variant|GENE200", "DP=20"]
+    assert records[0][8:] == ["GT", "0/0", "0/1"]
+
+    _, _, records = read_vcf(os.path.join(temp_dir, "run1", "GBX1.MuSE.vep.vcf"))
+    assert [r[7] for r in records] == ["CSQ=T|missense_variant|GENE100", "CSQ=C|missense_variant|GENE300"]
+
+
+def test_store_reused_across_batches(temp_dir, caller_vcfs):
+    """A later batch only sends its new variants to VEP and gets identical annotations."""
+    store_path = os.path.join(temp_dir, "store.sqlite")
+    annotate_batch(temp_dir, caller_vcfs[:2], store_path, "run1")
+
+    _, n_sites, counts = annotate_batch(temp_dir, caller_vcfs, store_path, "run2")
+    assert n_sites == 1  # only varscan2's chr1:300 G>A is new
+    assert counts["missing"] == 0
+    for name in ("GBX1.mutect2.paired.vep.vcf", "GBX1.MuSE.vep.vcf"):
+        with open(os.path.join(temp_dir, "run1", name)) as f1, open(os.path.join(temp_dir, "run2", name)) as f2:
+            assert f1.read() == f2.read()
+
+    # another VEP release starts from an empty set of annotations
+    with VepStore(store_path) as store:
+        assert collect_sites(caller_vcfs, store, "116", os.path.join(temp_dir, "116.vcf")) == 5
+
+
+def test_previous_stores(temp_dir, caller_vcfs):
+    """A run reads the stores of earlier runs and only writes the annotations it adds to its own store."""
+    run1_store = os.path.join(temp_dir, "vep_store.run1.sqlite")
+    run2_store = os.path.join(temp_dir, "vep_store.run2.sqlite")
+    annotate_batch(temp_dir, caller_vcfs[:2], run1_store, "run1")
+
+    sites = os.path.join(temp_dir, "run2.sites.vcf")
+    with VepStore(run1_store, read_only=True) as store:
+        assert collect_sites(caller_vcfs, store, "115", sites) == 1
+    fake_vep(sites, os.path.join(temp_dir, "run2.sites.vep.vcf"))
+    with VepStore(run2_store, previous=[run1_store, run2_store]) as store:
+        assert load_annotations(os.path.join(temp_dir, "run2.sites.vep.vcf"), store, "115") == 1
+        counts = join_annotations(caller_vcfs, store, "115", os.path.join(temp_dir, "run2"))
+    assert counts == {"annotated": 8, "kept": 0, "missing": 0}
+
+    meta, _, _ = read_vcf(os.path.join(temp_dir, "run2", "GBX1.MuSE.vep.vcf"))
+    assert CSQ_HEADER in meta
+    with VepStore(run2_store, read_only=True) as store:
+        assert store.conn.execute("SELECT COUNT(*) FROM annotations").fetchone() == (1,)
+
+
+def test_existing_annotations_are_kept(temp_dir, caller_vcfs):
+    """Records that already carry CSQ (e.g. consensus sites) are neither re-annotated nor re-sent to VEP."""
+    consensus = write_vcf(os.path.join(temp_dir, "GBX1.consensus.norm.vcf"), [
+        ("chr1", 100, ".", "A", "T", ".", "PASS", "CSQ=T|upstream_gene_variant|OLD;CALLERS=mutect2,MuSE", "GT", "0/0", "0/1"),
+        ("chr1", 400, ".", "T", "G", ".", "PASS", "CALLERS=MuSE,varscan2", "GT", "0/0", "0/1"),
+    ], extra_header=[CSQ_HEADER])
+    store_path = os.path.join(temp_dir, "store.sqlite")
+
+    sites = os.path.join(temp_dir, "sites.vcf")
+    assert collect_sites([consensus], None, "115", sites) == 1
+    fake_vep(sites, os.path.join(temp_dir, "sites.vep.vcf"))
+    with VepStore(store_path) as store:
+        load_annotations(os.path.join(temp_dir, "sites.vep.vcf"), store, "115")
+        counts = join_annotations([consensus], store, "115", temp_dir, rename=("norm", "vep"))
+    assert counts == {"annotated": 1, "kept": 1, "missing": 0}
+
+    meta, _, records = read_vcf(os.path.join(temp_dir, "GBX1.consensus.vep.vcf"))
+    assert sum(line.startswith("##INFO=<ID=CSQ,") for line in meta) == 1
+    assert get_csq(records[0][7]) == "T|upstream_gene_variant|OLD"
+    assert records[1][7] == "CALLERS=MuSE,varscan2;CSQ=G|missense_variant|GENE400"
+
+
+def test_main(temp_dir, caller_vcfs, monkeypatch):
+    """The sites and join subcommands run the batch end to end."""
+    store_path = os.path.join(temp_dir, "store.sqlite")
+    sites = os.path.join(temp_dir, "vep_sites.vcf")
+    monkeypatch.setattr(sys, "argv", ["vep_store.py", "sites", "--store", store_path, "--release", "115",
+                                      "-o", sites, *caller_vcfs])
+    main()
+    assert not os.path.exists(store_path)
+
+    fake_vep(sites, os.path.join(temp_dir, "vep_sites.vep.vcf"))
+    monkeypatch.setattr(sys, "argv", ["vep_store.py", "join", "--store", store_path, "--release", "115",
+                                      "--annotated", os.path.join(temp_dir, "vep_sites.vep.vcf"),
+                                      "-o", os.path.join(temp_dir, "out"), *caller_vcfs])
+    main()
+    assert len(os.listdir(os.path.join(temp_dir, "out"))) == 3
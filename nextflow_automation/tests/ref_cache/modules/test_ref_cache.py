@@ -0,0 +1,109 @@
+"""
+test_ref_cache.py module
+
+This python script tests 'ref_cache.py' with a small reference directory.
+
+Python version: 3.10+
+PyTest version: 7.4.4
+"""
+import os
+import stat
+import sys
+import tempfile
+
+import pytest
+
+from nextflow_automation.ref_cache.ref_cache import RefCache, file_digest, main
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for testing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+@pytest.fixture
+def ref_dir(temp_dir):
+    """A reference directory with a FASTA and BWA index, a BBSplit index, a duplicate file and two stores."""
+    ref_dir = os.path.join(temp_dir, "references")
+    write(os.path.join(ref_dir, "Homo_sapiens_assembly38.fasta"), ">chr1\nACGT\n")
+    write(os.path.join(ref_dir, "Homo_sapiens_assembly38.fasta.bwt"), "bwt")
+    write(os.path.join(ref_dir, "ref", "genome", "1", "chr1.chrom.gz"), "genome")
+    write(os.path.join(ref_dir, "copy_of.fasta"), ">chr1\nACGT\n")
+    write(os.path.join(ref_dir, "vep_store", "vep_store.sqlite"), "mutable")
+    write(os.path.join(ref_dir, "oncokb_cache", "oncokb_cache.sqlite"), "mutable")
+    return ref_dir
+
+
+def test_populate(temp_dir, ref_dir):
+    """Files are stored once per content, hardlinked read-only into the view; stores are left out."""
+    cache = RefCache(os.path.join(temp_dir, "cache"))
+    result = cache.populate(ref_dir)
+    view = os.path.join(temp_dir, "cache", "view")
+    assert result["files"] == 4 and result["bytes_copied"] == len(">chr1\nACGT\n") + len("bwt") + len("genome")
+    assert os.path.realpath(view) == result["view"]
+    assert not os.path.exists(os.path.join(view, "vep_store")) and not os.path.exists(os.path.join(view, "oncokb_cache"))
+
+    fasta = os.path.join(view, "Homo_sapiens_assembly38.fasta")
+    with open(os.path.join(view, "ref", "genome", "1", "chr1.chrom.gz")) as f:
+        assert f.read() == "genome"
+    assert os.stat(fasta).st_ino == os.stat(os.path.join(view, "copy_of.fasta")).st_ino
+    assert os.stat(fasta).st_ino == os.stat(cache.object_path(file_digest(fasta))).st_ino
+    assert not os.stat(fasta).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def test_repopulate(temp_dir, ref_dir):
+    """Unchanged references copy nothing and keep the view; a changed file makes a new view."""
+    cache_dir = os.path.join(temp_dir, "cache")
+    first = RefCache(cache_dir).populate(ref_dir)
+    again = RefCache(cache_dir).populate(ref_dir)
+    assert again == {**first, "bytes_copied": 0}
+
+    write(os.path.join(ref_dir, "Homo_sapiens_assembly38.fasta.bwt"), "bwt v2")
+    cache = RefCache(cache_dir)
+    updated = cache.populate(ref_dir)
+    assert updated["view"] != first["view"] and updated["bytes_copied"] == len("bwt v2")
+    with open(os.path.join(cache_dir, "view", "Homo_sapiens_assembly38.fasta.bwt")) as f:
+        assert f.read() == "bwt v2"
+
+    # the old view and its orphaned object go; shared objects stay
+    assert cache.prune() == {"views": 1, "objects": 1, "bytes_freed": len("bwt")}
+    assert os.listdir(os.path.join(cache_dir, "views")) == [os.path.basename(updated["view"])]
+    assert os.path.exists(os.path.join(cache_dir, "view", "Homo_sapiens_assembly38.fasta"))
+
+
+def test_verify_and_prewarm(temp_dir, ref_dir):
+    cache = RefCache(os.path.join(temp_dir, "cache"))
+    with pytest.raises(RuntimeError, match="run 'populate' first"):
+        cache.prewarm()
+    cache.populate(ref_dir)
+    assert cache.verify() == []
+    # FASTA, BWT and the BBSplit index are hot; prewarm reads them
+    assert cache.prewarm() == 2 * len(">chr1\nACGT\n") + len("bwt") + len("genome")
+    assert cache.prewarm(["*.bwt"]) == len("bwt")
+
+    corrupted = os.path.join(temp_dir, "cache", "view", "Homo_sapiens_assembly38.fasta.bwt")
+    os.chmod(corrupted, 0o644)
+    write(corrupted, "rot")
+    assert [os.path.basename(path) for path in cache.verify()] == [file_digest(os.path.join(ref_dir, "Homo_sapiens_assembly38.fasta.bwt"))]
+
+
+def test_main(temp_dir, ref_dir, monkeypatch):
+    """populate with custom excludes, then verify from the command line."""
+    cache_dir = os.path.join(temp_dir, "cache")
+    monkeypatch.setattr(sys, "argv", ["ref_cache.py", "populate", "--ref_dir", ref_dir, "--cache_dir", cache_dir,
+                                      "--exclude", "vep_store", "*.bwt", "--prewarm"])
+    main()
+    view = os.path.join(cache_dir, "view")
+    assert os.path.exists(os.path.join(view, "oncokb_cache", "oncokb_cache.sqlite"))
+    assert not os.path.exists(os.path.join(view, "Homo_sapiens_assembly38.fasta.bwt"))
+    monkeypatch.setattr(sys, "argv", ["ref_cache.py", "verify", "--cache_dir", cache_dir])
+    main()